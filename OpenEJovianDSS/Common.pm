@@ -29,8 +29,9 @@ use File::Path qw(make_path);
 use File::Spec;
 use String::Util;
 
-use Fcntl qw(:DEFAULT :flock O_WRONLY O_APPEND O_CREAT O_SYNC);
+use Fcntl qw(:DEFAULT :flock :seek O_WRONLY O_APPEND O_CREAT O_SYNC);
 use IO::Handle;
+use Socket qw(AF_UNIX SOCK_DGRAM SOCK_STREAM MSG_DONTWAIT pack_sockaddr_un);
 
 use JSON qw(decode_json from_json to_json);
 #use PVE::SafeSyslog;
@@ -80,6 +81,7 @@ our @EXPORT_OK = qw(
   get_data_addresses
   get_data_port
   get_delete_timeout
+  get_snapshot_mount_idle_timeout
   get_user_name
   get_user_password
   get_chap_enabled
@@ -132,12 +134,15 @@ our @EXPORT_OK = qw(
   volume_update_size
 
   volume_publish
+  volumes_publish
   volume_unpublish
 
   volume_activate
+  volume_activate_bulk
   volume_deactivate
   store_setup
 
+  lun_record_local_get_all
   lun_record_local_get_info_list
   lun_record_update_device
 
@@ -232,6 +237,9 @@ use constant {
     # the wait guards).
     MULTIPATH_UNSTAGE_WAIT_UNUSED_ATTEMPTS => 60,
     MULTIPATH_UNSTAGE_WAIT_UNUSED_SLEEP    => 1,
+    # Least seconds between two /proc scans of the released-map wait, so a
+    # burst of block events from other devices costs one scan per interval.
+    MULTIPATH_UNSTAGE_RELEASE_SCAN_INTERVAL => 0.15,
     MULTIPATH_UNSTAGE_REMOVE_ATTEMPTS      => 10,
     MULTIPATH_UNSTAGE_REMOVE_SETTLE        => 1,
     MULTIPATH_UNSTAGE_BLOCKER_WAIT         => 5,
@@ -241,12 +249,17 @@ use constant {
     VOLUME_ACTIVATE_CYCLE_SLEEP            => 5,
     VOLUME_ACTIVATE_CYCLE_MIN_BUDGET       => 120,
     VOLUME_ACTIVATE_VERIFY_ATTEMPTS        => 10,
+    # Boot-time bulk reactivation: VMs reactivated at the same time.
+    BULK_ACTIVATE_WORKERS                  => 8,
     VOLUME_ACTIVATE_VERIFY_SLEEP           => 1,
     # Bound on one rescan-scsi-bus.sh helper run (_scsi_bus_rescan_try). On
     # expiry run_command dies regardless of noerr (review F-06); the sub
     # absorbs that death into its return-0 "rescan failed" verdict. Value is
     # the pre-existing hardcoded bound.
     SCSI_BUS_RESCAN_TIMEOUT                => 55,
+    # Node-wide rescan coordinator (_scsi_rescan_request): how long a new
+    # leader lets other activations queue their scans before one pass.
+    SCSI_RESCAN_COALESCE_WINDOW            => 0.2,
     # Bound on the blockdev --getsize64 capacity probe (_iscsi_capacity_ok):
     # a wedged/broken export can hang the open or the size ioctl — exactly
     # the failure the probe exists to detect — and every run_command under a
@@ -262,6 +275,25 @@ use constant {
     # timeout cannot reach.
     ISCSI_LOGIN_TIMEOUT                    => 30,
     ISCSI_LOGIN_CMD_TIMEOUT                => 35,
+    # Device-arrival waits (_uevent_monitor_open / _uevent_wait). Socket
+    # does not export the netlink macros, so the Linux ABI values are
+    # spelled out. UEVENT_GROUP_UDEV is the multicast group udevd
+    # re-broadcasts processed events on - they arrive after the /dev
+    # symlinks exist, which is what the waits look for.
+    UEVENT_AF_NETLINK                      => 16,
+    UEVENT_NETLINK_KOBJECT_UEVENT          => 15,
+    UEVENT_GROUP_UDEV                      => 2,
+    UEVENT_RECV_MAX                        => 8192,
+    # Memo window of the sysfs iSCSI session snapshot (_iscsi_sessions):
+    # short enough that a poll loop sees fresh state every tick, long
+    # enough to collapse the back-to-back reads of one step. Logins and
+    # logouts through this module drop the snapshot outright.
+    ISCSI_SESSIONS_CACHE_TTL               => 1,
+    # multipathd control socket (_multipathd_request): the abstract unix
+    # socket name multipathd listens on, and the largest reply accepted -
+    # `show paths` of a big host stays far below it.
+    MULTIPATHD_SOCKET_NAME                 => '/org/kernel/linux/storage/multipathd',
+    MULTIPATHD_REPLY_MAX                   => 16 * 1024 * 1024,
 };
 
 use constant {
@@ -397,6 +429,13 @@ sub get_delete_timeout {
     return $scfg->{delete_timeout} || 118;
 }
 
+sub get_snapshot_mount_idle_timeout {
+    my ($ctx) = @_;
+    my $scfg = $ctx->{scfg};
+
+    return $scfg->{snapshot_mount_idle_timeout} || 0;
+}
+
 sub get_data_copy_bs {
     my ($ctx) = @_;
     my $scfg = $ctx->{scfg};
@@ -984,7 +1023,10 @@ sub new_ctx {
     };
 }
 
-# Single-run dd copy between a block device path and a sequential stream
+# Path of the native copy tool, a sub so the tests can point it elsewhere.
+sub _data_copy_tool { '/usr/sbin/joviandss-data-copy' }
+
+# Single-run copy between a block device path and a sequential stream
 # filehandle, mirroring PVE::Storage::Plugin's own export/import dd usage.
 # Runs with NO lock held (the export/import methods take per-step locks
 # only), so the transfer duration is unbounded.  The stream is read/written
@@ -994,23 +1036,30 @@ sub new_ctx {
 #
 # Exactly one of $src/$dst is a filehandle (the stream) and the other a path
 # (the device):
-#   device -> stream:  data_copy($ctx, $path, $fh)   [status=progress lines
-#                      are reprinted to STDERR, upstream style]
+#   device -> stream:  data_copy($ctx, $path, $fh)   [progress lines are
+#                      reprinted to STDERR, upstream style]
 #   stream -> device:  data_copy($ctx, $fh, $path)
-# The dd block size comes from the data_copy_bs property (default 64K); on
-# import it is also the zero-detection granularity for conv=sparse, which is
-# correct only because the target volume is freshly allocated (unwritten
-# zvol blocks read as zeros) and is what keeps thin volumes thin across a
-# migration.  conv=fsync makes the data durable before success is reported.
+# The copy is done by joviandss-data-copy: large aligned buffers, O_DIRECT
+# where the device takes it and several I/Os in flight. On import it skips
+# every all-zero part of the stream, data_copy_bs (default 64K) being the
+# zero-detection granularity; that is correct only because the target
+# volume is freshly allocated (unwritten zvol blocks read as zeros) and is
+# what keeps thin volumes thin across a migration. The data is made durable
+# before success is reported. Where the tool is not installed dd does the
+# same with bs=data_copy_bs and conv=sparse,fsync.
 sub data_copy {
     my ( $ctx, $src, $dst ) = @_;
 
-    my $bs = get_data_copy_bs($ctx);
+    my $bs   = get_data_copy_bs($ctx);
+    my $tool = _data_copy_tool();
+    my $native = -x $tool;
 
     my ( $direction, $cmd, %redirect );
     if ( ref($dst) ) {    # device -> stream
         $direction = "device ${src} to stream";
-        $cmd       = [ 'dd', "if=${src}", "bs=${bs}", 'status=progress' ];
+        $cmd = $native
+          ? [ $tool, '--zero-size', $bs, 'export', $src ]
+          : [ 'dd', "if=${src}", "bs=${bs}", 'status=progress' ];
         %redirect  = (
             output => '>&' . fileno($dst),
             # split dd's carriage-return driven progress output into
@@ -1020,8 +1069,14 @@ sub data_copy {
     }
     else {                # stream -> device
         $direction = "stream to device ${dst}";
-        $cmd       = [ 'dd', "of=${dst}", "bs=${bs}", 'conv=sparse,notrunc,fsync' ];
+        $cmd = $native
+          ? [ $tool, '--zero-size', $bs, 'import', $dst ]
+          : [ 'dd', "of=${dst}", "bs=${bs}", 'conv=sparse,notrunc,fsync' ];
         %redirect  = ( input => '<&' . fileno($src) );
+        if ($native) {
+            $redirect{errfunc} =
+              sub { debugmsg( $ctx, 'debug', "Data copy: $_[0]" ) };
+        }
     }
 
     debugmsg( $ctx, "debug",
@@ -1114,7 +1169,7 @@ sub safe_var_print {
 # splices this into its properties() (re-declaring the names in the NFS plugin
 # would be a duplicate property error); BOTH plugins list the names in their
 # options(). Values are read by the generic OpenEJovianDSS::Lock getters
-# (get_lock_class_type / _dir / _acquire_timeout / _hold_timeout).
+# (get_lock_class_type / _mode / _dir / _acquire_timeout / _hold_timeout).
 sub lock_properties {
     return {
         jdssc_general_lock_type => {
@@ -1159,6 +1214,12 @@ sub lock_properties {
             type        => 'integer',
             minimum     => 0,
         },
+        jdssc_info_lock_mode => {
+            description => "Mode of the info-tier jdssc lock: 'shared' lets"
+                         . " read-only jdssc commands run concurrently",
+            type        => 'string',
+            enum        => [ 'shared', 'exclusive' ],
+        },
         multipath_lock_type => {
             description => "Scope of the multipath host-device-command lock",
             type        => 'string',
@@ -1186,7 +1247,7 @@ sub lock_properties {
 # $lock_class — which jdssc component lock class to take around the run
 # (trailing optional arg). One of:
 #   'jdssc_general'  → cluster-wide serialization (state-changing commands)  [default]
-#   'jdssc_info'     → per-host serialization only (host-safe read commands)
+#   'jdssc_info'     → per-host, shared by default (host-safe read commands)
 #
 #   TODO: implement capability to exit quickly, without retry
 #   if specific error was met
@@ -1474,6 +1535,195 @@ sub _multipath_cookie_sweep {
     return scalar(@cookies);
 }
 
+# multipathd control socket client. multipathd serves the commands the
+# `multipathd <command>` client forks for on an abstract unix socket: the
+# request is a native size_t length followed by the NUL terminated command,
+# the reply comes back framed the same way. Queries go to the daemon
+# directly - they take no multipath lock, the daemon serializes its
+# clients itself - while map and path changes keep the lock of the
+# commands they replace (_multipathd_cmd). One connection is kept per
+# process. Every helper answers undef when the daemon can not be reached
+# or does not answer in time; callers then fork the command line tools.
+my $MULTIPATHD_CONN;    # [ pid, socket ]
+
+sub _multipathd_socket_address {
+    return pack_sockaddr_un( "\0" . MULTIPATHD_SOCKET_NAME );
+}
+
+sub _multipathd_connect {
+    my ($ctx) = @_;
+
+    return $MULTIPATHD_CONN->[1]
+        if $MULTIPATHD_CONN && $MULTIPATHD_CONN->[0] == $$;
+
+    # A connection inherited over fork belongs to the parent
+    $MULTIPATHD_CONN = undef;
+
+    my $sock;
+    unless ( socket( $sock, AF_UNIX, SOCK_STREAM, 0 )
+             && connect( $sock, _multipathd_socket_address() ) ) {
+        debugmsg( $ctx, 'debug', "multipathd socket unavailable: $!\n" );
+        return undef;
+    }
+    $MULTIPATHD_CONN = [ $$, $sock ];
+    return $sock;
+}
+
+sub _multipathd_disconnect {
+    close( $MULTIPATHD_CONN->[1] ) if $MULTIPATHD_CONN;
+    $MULTIPATHD_CONN = undef;
+}
+
+# Read exactly $len bytes before $deadline. Dies on timeout or error,
+# returns undef when the daemon closed the connection.
+sub _multipathd_read {
+    my ( $sock, $len, $deadline ) = @_;
+
+    my $buf = '';
+    while ( length($buf) < $len ) {
+        my $left = $deadline - Time::HiRes::time();
+        die "timeout\n" if $left <= 0;
+
+        my $rin = '';
+        vec( $rin, fileno($sock), 1 ) = 1;
+        my $n = select( my $rout = $rin, undef, undef, $left );
+        next if $n < 0 && $!{EINTR};
+        die "timeout\n" if $n == 0;
+        die "select failed: $!\n" if $n < 0;
+
+        my $got = sysread( $sock, $buf, $len - length($buf), length($buf) );
+        next if !defined($got) && $!{EINTR};
+        # Reset: the daemon closed the connection before reading the request
+        return undef if !defined($got) && $!{ECONNRESET};
+        die "read failed: $!\n" if !defined($got);
+        return undef if $got == 0;
+    }
+    return $buf;
+}
+
+# One request/reply exchange on $sock. Dies on timeout or error, returns
+# undef when the daemon closed the connection.
+sub _multipathd_exchange {
+    my ( $sock, $command, $timeout ) = @_;
+
+    # A daemon gone away must fail the write, not kill the process
+    local $SIG{PIPE} = 'IGNORE';
+
+    my $deadline = Time::HiRes::time() + $timeout;
+    my $msg = pack( 'Q', length($command) + 1 ) . "${command}\0";
+    while ( length($msg) ) {
+        my $sent = syswrite( $sock, $msg );
+        next if !defined($sent) && $!{EINTR};
+        return undef if !defined($sent) && $!{EPIPE};
+        die "write failed: $!\n" if !defined($sent);
+        substr( $msg, 0, $sent, '' );
+    }
+
+    my $head = _multipathd_read( $sock, 8, $deadline );
+    return undef if !defined($head);
+    my $len = unpack( 'Q', $head );
+    die "reply of ${len} bytes refused\n" if $len > MULTIPATHD_REPLY_MAX;
+
+    my $reply = _multipathd_read( $sock, $len, $deadline );
+    return undef if !defined($reply);
+    $reply =~ s/\0+\z//;
+    return $reply;
+}
+
+# _multipathd_request($ctx, $command, $timeout)
+#
+# Sends $command ('show maps', 'add map <wwid>', ...) and returns the
+# reply text, or undef without an answer. A kept connection the daemon
+# closed meanwhile (restart) is reopened once.
+sub _multipathd_request {
+    my ( $ctx, $command, $timeout ) = @_;
+
+    $timeout //= MULTIPATHD_CMD_TIMEOUT_FAST;
+    for my $attempt ( 1 .. 2 ) {
+        my $sock = _multipathd_connect($ctx) // return undef;
+
+        my $reply = eval { _multipathd_exchange( $sock, $command, $timeout ) };
+        my $err = $@;
+        return $reply if defined($reply);
+
+        _multipathd_disconnect();
+        if ($err) {
+            # The reply may still arrive, the connection is out of step
+            debugmsg( $ctx, 'debug',
+                "multipathd request '${command}' failed: ${err}" );
+            return undef;
+        }
+    }
+    debugmsg( $ctx, 'debug',
+        "multipathd closed the connection on request '${command}'\n" );
+    return undef;
+}
+
+# Replies that mean the daemon did not run the command
+sub _multipathd_refused {
+    my ($reply) = @_;
+    return $reply =~ /^(?:fail|timeout|permission deny)/;
+}
+
+# Multipath maps multipathd holds, as wwid => { name, sysfs }, or undef
+# without an answer.
+sub _multipathd_maps {
+    my ($ctx) = @_;
+
+    my $reply = _multipathd_request( $ctx, 'show maps raw format "%w %n %d"' );
+    return undef if !defined($reply) || _multipathd_refused($reply);
+
+    my %maps;
+    for my $line ( split /\n/, $reply ) {
+        next if $line !~ /^\s*([\:\-\@\w.\/]+)\s+([\:\-\@\w.\/]+)\s+(dm-\d+)\s*$/;
+        $maps{$1} = { name => $2, sysfs => $3 };
+    }
+    return \%maps;
+}
+
+# Paths multipathd knows, as a list of { wwid, dev, dm_state, checker },
+# or undef without an answer. The checker state goes last and takes the
+# rest of the line: it can contain a space ("i/o pending").
+sub _multipathd_paths {
+    my ($ctx) = @_;
+
+    my $reply = _multipathd_request( $ctx, 'show paths raw format "%w %d %t %T"' );
+    return undef if !defined($reply) || _multipathd_refused($reply);
+
+    my @paths;
+    for my $line ( split /\n/, $reply ) {
+        next if $line !~ /^\s*([\:\-\@\w.\/]+)\s+(\S+)\s+(\S+)\s+(\S.*?)\s*$/;
+        push @paths,
+            { wwid => $1, dev => $2, dm_state => $3, checker => $4 };
+    }
+    return \@paths;
+}
+
+# _multipathd_cmd($ctx, $words, $timeout)
+#
+# One multipathd command that changes state ('add path sdb', 'del map
+# <wwid>', 'reconfigure'), sent over the socket under the multipath lock
+# and forked through multipath_cmd when the daemon does not answer there.
+# Returns 1 when multipathd reported success.
+sub _multipathd_cmd {
+    my ( $ctx, $words, $timeout ) = @_;
+
+    my $command = join( ' ', @$words );
+    my $reply;
+    OpenEJovianDSS::Lock::with_lock( $ctx, 'multipath', undef, undef, sub {
+        $reply = _multipathd_request( $ctx, $command, $timeout );
+    } );
+    if ( defined($reply) ) {
+        chomp( my $line = $reply );
+        debugmsg( $ctx, 'debug', "multipathd ${command}: ${line}\n" );
+        return _multipathd_refused($reply) ? 0 : 1;
+    }
+
+    return 0 if !$MULTIPATHD;
+    my $res = multipath_cmd( $ctx, [ $MULTIPATHD, @$words ], $timeout );
+    return ( defined( $res->{exitcode} ) && $res->{exitcode} == 0 ) ? 1 : 0;
+}
+
 # Returns a hash with the snapshot names as keys and the following data:
 # id           - Unique id to distinguish different snapshots even if the have the same name.
 # timestamp    - Creation time of the snapshot (seconds since epoch).
@@ -2217,6 +2467,57 @@ sub volume_publish {
     return \%tinfo;
 }
 
+# volumes_publish($ctx, $tgname, @volnames)
+#
+# volume_publish for several volumes of one target group in a single jdssc
+# run ('targets ensure-many'). Returns { volname => tinfo }, tinfo as
+# volume_publish returns it; a volume missing from the reply is missing
+# from the result.
+sub volumes_publish {
+    my ( $ctx, $tgname, @volnames ) = @_;
+
+    my $pool   = get_pool($ctx);
+    my $prefix = get_target_prefix($ctx);
+    my $luns_per_target = get_luns_per_target($ctx);
+
+    my $ensure_cmd = [
+        'pool',            $pool,   'targets',             'ensure-many',
+        '--target-prefix', $prefix, '--target-group-name', $tgname,
+        '--volumes', join( ',', @volnames ),
+        '--luns-per-target', $luns_per_target
+    ];
+
+    if ( get_chap_enabled($ctx) ) {
+        my $chap_user = get_chap_user_name($ctx);
+        die "chap_user_name is required when chap_enabled is set\n"
+            unless defined $chap_user && length($chap_user);
+        die "chap_user_password is required when chap_enabled is set\n"
+            unless defined get_chap_user_password($ctx);
+        push @$ensure_cmd, '--chap-user', $chap_user;
+    }
+
+    my $out = joviandss_cmd( $ctx, $ensure_cmd, 118, 15 );
+
+    my %tinfos;
+    for my $line ( split( /\n/, $out ) ) {
+        my ( $volname, $targetname, $lunid, $ips, $scsiid ) =
+          split( ' ', $line );
+        next unless defined($scsiid) && length($scsiid) > 1;
+
+        my @iplist = split /\s*,\s*/, clean_word($ips);
+        $tinfos{ clean_word($volname) } = {
+            target => clean_word($targetname),
+            lunid  => clean_word($lunid),
+            iplist => \@iplist,
+            scsiid => clean_word($scsiid),
+        };
+        debugmsg( $ctx, "debug",
+                "Publish volume ${volname} acquired target ${targetname} "
+              . "lun ${lunid} hosts @{iplist} scsiid ${scsiid}" );
+    }
+    return \%tinfos;
+}
+
 sub target_update_chap {
     my ($ctx, $targetname) = @_;
 
@@ -2427,108 +2728,373 @@ sub _scsi_bus_rescan_try {
 }
 
 
-# _rescan_target_hosts($ctx, $targetname, $lunid)
-#
-# Trigger a SCSI LUN rescan only on the hosts that carry an iSCSI session
-# for $targetname.  Reads the mapping from sysfs:
-#   /sys/class/iscsi_session/session{N}/targetname  -> IQN
-#   /sys/class/iscsi_session/session{N}/device      -> symlink -> host{H}
-#   /sys/class/scsi_host/host{H}/scan               -> write "- - {lun}"
+# sysfs classes of the iSCSI sessions and connections, subs so the tests
+# can point them elsewhere.
+sub _iscsi_session_dir    { '/sys/class/iscsi_session' }
+sub _iscsi_connection_dir { '/sys/class/iscsi_connection' }
+
+# _iscsi_sessions($ctx)
 #
-# Safe to call from multiple parallel processes: each touches only its own
-# session hosts, so there is no cross-VM interference.
+# The node's iSCSI sessions read straight from sysfs - no iscsiadm fork:
+#   /sys/class/iscsi_session/session{N}/targetname        -> IQN
+#   /sys/class/iscsi_session/session{N}/state             -> LOGGED_IN, ...
+#   /sys/class/iscsi_session/session{N}/device            -> .../host{H}/...
+#   /sys/class/iscsi_connection/connection{N}:0/persistent_address|port
 #
-# if targetd rescan is not possible will attempt brorad scsi scan for all targets
-# broad scan will happen only if no other scan scritps are going at the moment
-sub _rescan_target_hosts {
-    my ( $ctx, $targetname, $lunid ) = @_;
+# Returns an arrayref of { sid, target, address, port, host, state }; host
+# is undef for a session torn down mid-read. The snapshot is memoized in
+# $ctx for ISCSI_SESSIONS_CACHE_TTL seconds and dropped by
+# _iscsi_sessions_invalidate on every login and logout. A missing
+# iscsi_session class (transport module not loaded) means no sessions.
+sub _iscsi_sessions {
+    my ($ctx) = @_;
 
-    my $session_dir = '/sys/class/iscsi_session';
-    opendir( my $session_dir_desc, $session_dir ) or do {
-        debugmsg( $ctx, 'warn', "Cannot open $session_dir $!\n" );
+    my $cached = $ctx->{_iscsi_sessions};
+    if ( defined($cached)
+        && Time::HiRes::time() - $cached->{at} < ISCSI_SESSIONS_CACHE_TTL ) {
+        return $cached->{sessions};
+    }
 
-        # Unable to open iscsi_session folder containing mappings of
-        # iscsi sessions
-        # proceed will broad scan
+    my $read_attr = sub {
+        my ($path) = @_;
+        open( my $fh, '<', $path ) or return undef;
+        my $value = <$fh>;
+        close $fh;
+        return undef unless defined($value);
+        return clean_word($value);
+    };
 
-        _scsi_bus_rescan_try($ctx, $lunid);
-        return;
+    my $session_dir    = _iscsi_session_dir();
+    my $connection_dir = _iscsi_connection_dir();
+
+    my @sessions;
+    if ( opendir( my $dh, $session_dir ) ) {
+        my @entries = grep { /^session\d+$/ } readdir($dh);
+        closedir($dh);
+
+        for my $session (@entries) {
+            my ($sid) = $session =~ /^session(\d+)$/;
+            my $target = $read_attr->("${session_dir}/${session}/targetname");
+            # Vanished between readdir and read
+            next unless defined($target) && length($target);
+
+            my $conn = "${connection_dir}/connection${sid}:0";
+            my $address = $read_attr->("${conn}/persistent_address")
+                       // $read_attr->("${conn}/address");
+            my $port    = $read_attr->("${conn}/persistent_port")
+                       // $read_attr->("${conn}/port");
+
+            my $host;
+            my $device = Cwd::realpath("${session_dir}/${session}/device");
+            if ( defined($device) && $device =~ m{/(host\d+)/} ) {
+                $host = $1;
+            }
+
+            push @sessions, {
+                sid     => $sid,
+                target  => $target,
+                address => $address,
+                port    => $port,
+                host    => $host,
+                state   => $read_attr->("${session_dir}/${session}/state"),
+            };
+        }
+    } else {
+        debugmsg( $ctx, 'debug', "Cannot open ${session_dir}: $!\n" );
+    }
+
+    $ctx->{_iscsi_sessions} = {
+        at       => Time::HiRes::time(),
+        sessions => \@sessions,
     };
-    my @sessions = grep { /^session\d+$/ } readdir($session_dir_desc);
-    closedir($session_dir_desc);
+    return \@sessions;
+}
 
-    # Iterate over iscsi sessions projected in /sys/class/iscsi_session folder
-    # to identigy session related to target @targetname
+sub _iscsi_sessions_invalidate {
+    my ($ctx) = @_;
+    delete $ctx->{_iscsi_sessions};
+}
 
-    my $found_session = 0;
-    for my $session (@sessions) {
-        my $targetname_file_path = "$session_dir/$session/targetname";
+# Roots of the rescan spool and of the SCSI hosts' scan files, subs so the
+# tests can point them elsewhere.
+sub _scsi_rescan_dir { '/run/joviandss/scsi-rescan' }
+sub _scsi_host_dir   { '/sys/class/scsi_host' }
 
-        if ( !-f $targetname_file_path ) {
-            next;
+# _scsi_host_scan($ctx, $host, $lun)
+#
+# Ask SCSI host $host ('host7') to scan for $lun, '-' scanning every LUN:
+#   /sys/class/scsi_host/host{H}/scan               -> write "- - {lun}"
+# Returns 1 once the kernel took the request.
+sub _scsi_host_scan {
+    my ( $ctx, $host, $lun ) = @_;
+
+    my $scan_path = _scsi_host_dir() . "/${host}/scan";
+    if ( open( my $fh, '>', $scan_path ) ) {
+        print $fh "- - $lun\n";
+        if ( close $fh ) {
+            debugmsg( $ctx, 'debug', "Targeted rescan: ${host} lun ${lun}\n" );
+            return 1;
         }
+    }
+    debugmsg( $ctx, 'warn', "Cannot write to ${scan_path}: $!\n" );
+    return 0;
+}
 
-        open( my $targetfile_desc, '<', $targetname_file_path ) or next;
-
-        my $session_target = <$targetfile_desc>;
+# _scsi_rescan_request($ctx, @requests)
+#   @requests  [ host, lun ] pairs
+#
+# Node-wide rescan coordinator. Activations running at the same time queue
+# their scans in one spool file; the process that finds no pass in
+# progress becomes the leader, lets SCSI_RESCAN_COALESCE_WINDOW pass so the
+# others' requests arrive, and scans each distinct host once - a host
+# asked for several LUNs gets one full scan. Requests queued while a pass
+# runs are taken by the same leader in a further pass. Everybody else
+# returns at once: the staging waits already wake on the udev event of
+# their LUN appearing. Returns 0 when the spool can not be used and the
+# caller has to scan for itself.
+sub _scsi_rescan_request {
+    my ( $ctx, @requests ) = @_;
+
+    return 1 if !@requests;
+
+    my $dir = _scsi_rescan_dir();
+    my ( $pending, $leader );
+    eval { make_path($dir) };
+    unless ( sysopen( $pending, "${dir}/pending", O_RDWR | O_CREAT, 0600 )
+             && sysopen( $leader, "${dir}/leader", O_RDWR | O_CREAT, 0600 )
+             && flock( $pending, LOCK_EX ) ) {
+        debugmsg( $ctx, 'debug', "SCSI rescan spool ${dir} unusable: $!\n" );
+        return 0;
+    }
+    sysseek( $pending, 0, SEEK_END );
+    syswrite( $pending, join( '', map { "$_->[0] $_->[1]\n" } @requests ) );
+    flock( $pending, LOCK_UN );
 
-        $session_target = clean_word($session_target);
-        $session_target = safe_word($session_target);
+    # A pass is running or about to run - it takes our requests
+    return 1 if !flock( $leader, LOCK_EX | LOCK_NB );
 
-        close $targetfile_desc;
+    while (1) {
+        Time::HiRes::sleep(SCSI_RESCAN_COALESCE_WINDOW);
 
-        if ( !defined $session_target ) {
-            next;
+        flock( $pending, LOCK_EX );
+        my $batch = '';
+        sysseek( $pending, 0, SEEK_SET );
+        while ( sysread( $pending, my $buf, 65536 ) ) {
+            $batch .= $buf;
         }
+        truncate( $pending, 0 );
+        if ( $batch eq '' ) {
+            # Give up leadership while still holding the spool: a request
+            # queued after this point finds the leader lock free
+            flock( $leader, LOCK_UN );
+            flock( $pending, LOCK_UN );
+            last;
+        }
+        flock( $pending, LOCK_UN );
+
+        _scsi_rescan_pass( $ctx, $batch );
+    }
+    close($leader);
+    close($pending);
+    return 1;
+}
+
+# One coordinator pass over the spooled "host lun" lines of $batch.
+sub _scsi_rescan_pass {
+    my ( $ctx, $batch ) = @_;
+
+    my %luns;    # host -> { lun => 1 }
+    for my $line ( split /\n/, $batch ) {
+        next if $line !~ /^(host\d+) (\d+)$/;
+        $luns{$1}{$2} = 1;
+    }
+
+    for my $host ( sort keys %luns ) {
+        my @luns = sort { $a <=> $b } keys %{ $luns{$host} };
+        my $lun  = @luns > 1 ? '-' : $luns[0];
+        debugmsg( $ctx, 'debug',
+            "Coalesced rescan of ${host} for lun(s) @luns\n" );
+        next if _scsi_host_scan( $ctx, $host, $lun );
+
+        debugmsg( $ctx, 'debug',
+            "Because of inability to send targeted rescan for ${host} "
+          . "lun(s) @luns, try conducting General rescan across all targets\n" );
+        _scsi_bus_rescan_try( $ctx, $_ ) for @luns;
+    }
+}
+
+# _rescan_target_hosts($ctx, $targetname, $lunid)
+#
+# Trigger a SCSI LUN rescan only on the hosts that carry an iSCSI session
+# for $targetname, as reported by _iscsi_sessions. The scans go through
+# the node-wide coordinator (_scsi_rescan_request), so activations running
+# in parallel share one pass instead of rescanning one after another.
+#
+# if targetd rescan is not possible will attempt brorad scsi scan for all targets
+# broad scan will happen only if no other scan scritps are going at the moment
+sub _rescan_target_hosts {
+    my ( $ctx, $targetname, $lunid ) = @_;
+
+    _rescan_targets( $ctx, [ $targetname, $lunid ] );
+}
 
-        if ( $session_target ne $targetname ) {
+# _rescan_targets($ctx, @requests)
+#   @requests  [ targetname, lunid ] pairs
+#
+# _rescan_target_hosts for several LUNs at once, queued to the coordinator
+# as one request so they share a single pass.
+sub _rescan_targets {
+    my ( $ctx, @requests ) = @_;
+
+    # Iterate over the node's iscsi sessions to identify the ones related
+    # to the requested targets
+
+    my %target_hosts;    # targetname -> [ host, ... ]
+    for my $session ( @{ _iscsi_sessions($ctx) } ) {
+        my $hosts = $target_hosts{ $session->{target} } //= [];
+
+        # A session torn down mid-scan can resolve to a path with no
+        # /hostN/ component (review F-21): skip it cleanly instead of
+        # interpolating undef into the sysfs path and falling through
+        # to the expensive full-bus rescan.
+        my $session_host_name = $session->{host};
+        if ( !defined($session_host_name) ) {
             next;
         }
+        push @{$hosts}, $session_host_name;
+    }
 
-        $found_session = 1;
-
-        # iscsi $session is related to $targetname
-        my $session_rescan_completed = 0;
-        my $session_device_link = "$session_dir/$session/device";
-        if ( -l $session_device_link ) {
-            my $session_device_path = Cwd::realpath($session_device_link);
-            if ( defined( $session_device_path ) ) {
-                my ( $session_host_name ) = ( $session_device_path =~ m{/(host\d+)/} );
-
-                # A session torn down mid-scan can resolve to a path with no
-                # /hostN/ component (review F-21): skip it cleanly instead of
-                # interpolating undef into the sysfs path and falling through
-                # to the expensive full-bus rescan.
-                if ( !defined($session_host_name) ) {
-                    next;
-                }
+    my @scans;    # [ targetname, lunid, host ]
+    for my $request (@requests) {
+        my ( $targetname, $lunid ) = @{$request};
 
-                my $session_scan_path = "/sys/class/scsi_host/$session_host_name/scan";
-                if ( open( my $session_scan_desc, '>', $session_scan_path ) ) {
-                    print $session_scan_desc "- - $lunid\n";
-                    close $session_scan_desc;
-                    $session_rescan_completed = 1;
-                    debugmsg( $ctx, 'debug',
-                        "Targeted rescan: $session_device_path for target $targetname lun $lunid\n" );
-                } else {
-                    debugmsg( $ctx, 'warn', "Cannot write to $session_scan_path: $!\n" );
-                }
-            }
-        }
-        if ( $session_rescan_completed == 0) {
+        unless ( exists $target_hosts{$targetname} ) {
             debugmsg( $ctx, 'debug',
-                "Because of inability to send targeted rescan for target $targetname lun $lunid, try conducting General rescan across all targets\n" );
+                "No session found for target $targetname, conducting broad rescan\n" );
             _scsi_bus_rescan_try($ctx, $lunid);
+            next;
         }
+        push @scans, map { [ $targetname, $lunid, $_ ] }
+                     @{ $target_hosts{$targetname} };
     }
 
-    unless ($found_session) {
+    return if _scsi_rescan_request( $ctx, map { [ $_->[2], $_->[1] ] } @scans );
+
+    for my $scan (@scans) {
+        my ( $targetname, $lunid, $host ) = @{$scan};
+        next if _scsi_host_scan( $ctx, $host, $lunid );
         debugmsg( $ctx, 'debug',
-            "No session found for target $targetname, conducting broad rescan\n" );
+            "Because of inability to send targeted rescan for target $targetname lun $lunid, try conducting General rescan across all targets\n" );
         _scsi_bus_rescan_try($ctx, $lunid);
     }
 }
 
+# Device-arrival waiter: a udev netlink monitor the staging waits sleep on
+# instead of fixed ticks, so an activation wakes the moment the kernel and
+# udev finish with the device it waits for. Events are only a wake-up hint -
+# every wake re-checks the filesystem / sysfs, so a spoofed, dropped or
+# coalesced event costs at most one tick: the caller's tick stays the
+# polling fallback. Open the monitor BEFORE the action that produces the
+# device (login, whitelist) so its events cannot be missed.
+#
+# Returns the socket, or undef when netlink is unavailable (the waits then
+# degrade to plain sleeps).
+sub _uevent_monitor_open {
+    my ($ctx) = @_;
+
+    my $sock;
+    unless ( socket( $sock, UEVENT_AF_NETLINK, SOCK_DGRAM,
+                     UEVENT_NETLINK_KOBJECT_UEVENT ) ) {
+        debugmsg( $ctx, 'debug',
+            "uevent monitor unavailable, falling back to polling: $!\n" );
+        return undef;
+    }
+    # struct sockaddr_nl { sa_family, pad, nl_pid (0: kernel assigns),
+    # nl_groups }
+    unless ( bind( $sock, pack( 'S x2 L L', UEVENT_AF_NETLINK, 0,
+                                UEVENT_GROUP_UDEV ) ) ) {
+        debugmsg( $ctx, 'debug',
+            "uevent monitor bind failed, falling back to polling: $!\n" );
+        close($sock);
+        return undef;
+    }
+    return $sock;
+}
+
+# _uevent_wait($ctx, $monitor, $timeout, @subsystems)
+#
+# Sleeps up to $timeout seconds, returning 1 early once an event of one of
+# @subsystems (any event when none given) arrives, 0 on timeout. A receive
+# error (ENOBUFS after a burst overflowed the socket buffer) also returns 1:
+# events were lost, so the caller must look for itself.
+sub _uevent_wait {
+    my ( $ctx, $monitor, $timeout, @subsystems ) = @_;
+
+    unless ( defined($monitor) ) {
+        select( undef, undef, undef, $timeout ) if $timeout > 0;
+        return 0;
+    }
+
+    my %want = map { $_ => 1 } @subsystems;
+    my $deadline = Time::HiRes::time() + $timeout;
+
+    while (1) {
+        my $left = $deadline - Time::HiRes::time();
+        return 0 if $left <= 0;
+
+        my $rin = '';
+        vec( $rin, fileno($monitor), 1 ) = 1;
+        my $n = select( my $rout = $rin, undef, undef, $left );
+        next if $n < 0 && $!{EINTR};
+        return 0 if $n <= 0;
+
+        # Drain everything queued; one relevant event is enough.
+        my $hit = 0;
+        while (1) {
+            my $msg;
+            my $from = recv( $monitor, $msg, UEVENT_RECV_MAX, MSG_DONTWAIT );
+            unless ( defined($from) ) {
+                last if $!{EAGAIN} || $!{EWOULDBLOCK};
+                return 1;
+            }
+            last unless length($msg);
+            if ( !%want ) {
+                $hit = 1;
+            } elsif ( $msg =~ /SUBSYSTEM=([^\0]+)/ && $want{$1} ) {
+                $hit = 1;
+            }
+        }
+        return 1 if $hit;
+    }
+}
+
+# _block_device_wait($ctx, $monitor, $path, $timeout)
+#
+# One wait tick for $path to appear: returns 1 as soon as -e $path holds
+# after a block event, 0 once $timeout passes. A path already present
+# when the tick starts sleeps the whole tick - the caller is then waiting
+# on something else (capacity, active paths), which must not be re-probed
+# on every unrelated block event.
+sub _block_device_wait {
+    my ( $ctx, $monitor, $path, $timeout ) = @_;
+
+    if ( -e $path ) {
+        _uevent_wait( $ctx, undef, $timeout );
+        return 0;
+    }
+
+    my $deadline = Time::HiRes::time() + $timeout;
+    while (1) {
+        my $left = $deadline - Time::HiRes::time();
+        return ( -e $path ? 1 : 0 ) if $left <= 0;
+        if ( _uevent_wait( $ctx, $monitor, $left, 'block' ) ) {
+            return 1 if -e $path;
+        } else {
+            return -e $path ? 1 : 0;
+        }
+    }
+}
+
 # $expected_size (option A, finding #23): the authoritative control-plane
 # size. When given, the exit contract requires the exported LUN to report
 # this exact non-zero capacity (a fresh READ CAPACITY via rescan-then-read)
@@ -2545,32 +3111,27 @@ sub volume_stage_iscsi {
         return [$serial_path];
     }
 
-    # Helper: refresh %host_has_session from iscsiadm --mode session output.
+    # Opened before any login so no arrival event can slip past the waits.
+    my $monitor = _uevent_monitor_open($ctx);
+
+    # Helper: refresh %host_has_session from the sysfs session snapshot.
     my %host_has_session;
     my $refresh_sessions = sub {
-        eval {
-            my $cmd = [ $ISCSIADM, '--mode', 'session' ];
-            my @session_lines;
-            run_command(
-                $cmd,
-                outfunc => sub {
-                    my $line = shift;
-                    push @session_lines, $line;
-                    for my $host (@$hosts) {
-                        if ($line =~ /\Q$targetname\E/ && $line =~ /\Q$host\E/) {
-                            $host_has_session{$host} = 1;
-                        }
-                    }
-                },
-                errfunc => sub { cmd_log_output($ctx, 'error', $cmd, shift); },
-                noerr   => 1
-            );
-            debugmsg($ctx, 'debug',
-                "refresh_sessions: found " . scalar(@session_lines)
-                . " session(s): @{session_lines}, looking for target ${targetname} "
-                . "hosts [@$hosts]: "
-                . join(', ', map { "$_=" . ($host_has_session{$_} ? 'yes' : 'no') } @$hosts));
-        };
+        my $sessions = _iscsi_sessions($ctx);
+        for my $session (@$sessions) {
+            next unless $session->{target} eq $targetname;
+            for my $host (@$hosts) {
+                if ( defined( $session->{address} )
+                    && $session->{address} eq $host ) {
+                    $host_has_session{$host} = 1;
+                }
+            }
+        }
+        debugmsg($ctx, 'debug',
+            "refresh_sessions: found " . scalar(@$sessions)
+            . " session(s), looking for target ${targetname} "
+            . "hosts [@$hosts]: "
+            . join(', ', map { "$_=" . ($host_has_session{$_} ? 'yes' : 'no') } @$hosts));
     };
 
     $refresh_sessions->();
@@ -2605,7 +3166,11 @@ sub volume_stage_iscsi {
                 my @still_pending = grep { !$host_has_session{$_} } @$hosts;
                 last unless @still_pending;
                 last if $poll >= $max_session_polls;
-                sleep(2);
+                # Woken by the session's sysfs registration; the 2 s tick
+                # stays the fallback. An event outdates the memoized
+                # session snapshot.
+                _iscsi_sessions_invalidate($ctx)
+                    if _uevent_wait( $ctx, $monitor, 2, 'iscsi_session' );
             }
             for my $host (@$hosts) {
                 next unless $host_has_session{$host} && !$had_session{$host};
@@ -2711,6 +3276,7 @@ sub volume_stage_iscsi {
                 );
                 $host_has_session{$host} = 1;
             };
+            _iscsi_sessions_invalidate($ctx);
             if ($@) {
                 if ($already_present) {
                     debugmsg($ctx, 'debug',
@@ -2804,7 +3370,9 @@ sub volume_stage_iscsi {
         # held locks + hold-deadline check inside the 240 s device wait.
         OpenEJovianDSS::Lock::refresh_locks($ctx) if $i % 10 == 0;
 
-        sleep(1);
+        # Wakes early when the by-id link shows up; re-checked at loop top
+        # without waiting out the rest of the tick.
+        next if _block_device_wait( $ctx, $monitor, $serial_path, 1 );
 
         # Run rescan-scsi-bus only every 3rd attempt — under concurrent load
         # each rescan takes minutes and many concurrent rescans cause SCSI bus
@@ -2915,6 +3483,7 @@ sub volume_stage_multipath {
     # reacts to udev events on its own - so the VPD wait below overlaps
     # with the daemon already claiming paths as they appear instead of
     # being dead time.
+    my $monitor = _uevent_monitor_open($ctx);
     multipath_cmd( $ctx, [ $MULTIPATH, '-a', $scsiid ],
                    MULTIPATH_CMD_TIMEOUT );
 
@@ -2932,8 +3501,10 @@ sub volume_stage_multipath {
         debugmsg( $ctx, 'debug',
             "Waiting for SCSI device ${scsi_by_id} (${tick})" )
             if $tick == 1 || $tick % 10 == 0;
-        sleep(MULTIPATH_VPD_WAIT_SLEEP);
+        _block_device_wait( $ctx, $monitor, $scsi_by_id,
+                            MULTIPATH_VPD_WAIT_SLEEP );
     }
+    close($monitor) if defined($monitor);
     debugmsg( $ctx, 'warn',
         "SCSI device ${scsi_by_id} not found, attempting staging anyway" )
         if !-e $scsi_by_id;
@@ -3013,14 +3584,13 @@ sub _volume_stage_multipath {
     # Register the resolved sd paths with multipathd FIRST - under load
     # udev events lag and map creation fails unless the daemon is told its
     # paths explicitly.
-    multipath_cmd( $ctx, [ $MULTIPATHD, 'add', 'path', $_ ],
-                   MULTIPATH_CMD_TIMEOUT_MAX ) for @$sd_devnames;
+    _multipathd_cmd( $ctx, [ 'add', 'path', $_ ], MULTIPATH_CMD_TIMEOUT_MAX )
+        for @$sd_devnames;
 
     # Re-assert the whitelist (the driver did it once before its VPD wait).
     multipath_cmd( $ctx, [ $MULTIPATH, '-a', $scsiid ],
                    MULTIPATH_CMD_TIMEOUT );
-    multipath_cmd( $ctx, [ $MULTIPATHD, 'add', 'map', $scsiid ],
-                   MULTIPATH_CMD_TIMEOUT_MAX );
+    _multipathd_cmd( $ctx, [ 'add', 'map', $scsiid ], MULTIPATH_CMD_TIMEOUT_MAX );
     return $mpath if -b $mpath;
 
     # Escalations, cheapest first:
@@ -3043,8 +3613,7 @@ sub _volume_stage_multipath {
     }
 
     if ( $last || $attempt % 10 == 0 ) {             # daemon-wide re-read
-        multipath_cmd( $ctx, [ $MULTIPATHD, 'reconfigure' ],
-                       MULTIPATH_CMD_TIMEOUT_MAX );
+        _multipathd_cmd( $ctx, ['reconfigure'], MULTIPATH_CMD_TIMEOUT_MAX );
         return $mpath if -b $mpath;
     }
 
@@ -3069,6 +3638,22 @@ sub _volume_stage_multipath {
 sub _multipath_map_has_active_path {
     my ( $ctx, $scsiid ) = @_;
 
+    # multipathd's own path table first: dm state and checker verdict
+    # arrive as separate fields, no -ll scraping. Only an active path is
+    # final; checker states can be stale, so everything else falls through
+    # to the command probes below.
+    my $paths = _multipathd_paths($ctx);
+    if ( defined($paths) ) {
+        my @mine   = grep { $_->{wwid} eq $scsiid } @$paths;
+        my $active = grep {
+            $_->{dm_state} eq 'active' && $_->{checker} ne 'faulty'
+        } @mine;
+        debugmsg( $ctx, 'debug',
+            "Map active-path probe for ${scsiid} from multipathd: paths "
+          . scalar(@mine) . ", active ${active}" );
+        return 1 if $active;
+    }
+
     my $cmd    = [ $MULTIPATH, '-ll', $scsiid ];
     my $active = 0;
     my $lines  = 0;
@@ -3219,16 +3804,21 @@ sub get_device_mapper_name {
     if ( $wwid =~ /^([\:\-\@\w.\/]+)$/ ) {
         my $id = $1;
 
-        my $cmd = [ $MULTIPATH, '-ll', $id ];
-        multipath_cmd( $ctx, $cmd, MULTIPATH_CMD_TIMEOUT, sub {
-            my $line = shift;
-            chomp $line;
-            cmd_log_output( $ctx, 'debug', $cmd, $line );
-            if ( $line =~ /\b$wwid\b/ ) {
-                my @parts = split( /\s+/, $line );
-                $device_mapper_name = $parts[0];
-            }
-        } );
+        my $maps = _multipathd_maps($ctx);
+        if ( defined($maps) ) {
+            $device_mapper_name = $maps->{$id}{name} if $maps->{$id};
+        } else {
+            my $cmd = [ $MULTIPATH, '-ll', $id ];
+            multipath_cmd( $ctx, $cmd, MULTIPATH_CMD_TIMEOUT, sub {
+                my $line = shift;
+                chomp $line;
+                cmd_log_output( $ctx, 'debug', $cmd, $line );
+                if ( $line =~ /\b$wwid\b/ ) {
+                    my @parts = split( /\s+/, $line );
+                    $device_mapper_name = $parts[0];
+                }
+            } );
+        }
     } else {
         die "Invalid characters in wwid: ${wwid}\n";
     }
@@ -3524,6 +4114,7 @@ sub volume_unstage_iscsi {
             noerr   => 1
         );
     };
+    _iscsi_sessions_invalidate($ctx);
 
     eval {
         my $cmd =[ $ISCSIADM,
@@ -3560,14 +4151,19 @@ sub volume_unstage_multipath {
     # tick per call - the loop and the sleep live here, mirroring the
     # staging split; no post-loop recheck is needed (we proceed either
     # way), so the sleep is skipped on the last tick.
+    # The tick's sleep wakes early once the last opener closes the device:
+    # udev watches dm nodes and reports the close as a block change event.
+    my $monitor = _uevent_monitor_open($ctx);
     my $device_ready = 0;
     for my $tick ( 1 .. $attempts_wait_unused ) {
         $device_ready =
             _volume_unstage_multipath_wait_unused( $ctx, $scsiid, $tick );
         last if $device_ready;
-        sleep(MULTIPATH_UNSTAGE_WAIT_UNUSED_SLEEP)
+        _volume_unstage_multipath_wait_released( $ctx, $monitor, $scsiid,
+            MULTIPATH_UNSTAGE_WAIT_UNUSED_SLEEP )
             if $tick < $attempts_wait_unused;
     }
+    close($monitor) if $monitor;
     debugmsg( $ctx, 'warn',
         "Device ${scsiid} may still be in use, proceeding with cleanup" )
         unless $device_ready;
@@ -3613,24 +4209,35 @@ sub volume_unstage_multipath {
 sub _volume_unstage_multipath_wait_unused {
     my ( $ctx, $scsiid, $tick ) = @_;
 
-    my $mapper_name = get_device_mapper_name( $ctx, $scsiid );   # locked probe
-    return 1 if !defined $mapper_name;        # no map - nothing to wait on
-
-    if ( $mapper_name !~ /^([\:\-\@\w.\/]+)$/ ) {
-        debugmsg( $ctx, 'debug',
-            "Multipath device mapper name is incorrect: ${mapper_name}" );
-        return 1;                             # unusable name - proceed
-    }
-    my $mapper_path = "/dev/mapper/$1";       # mapper-NAME path - the one
-                                              # place the serial helper
-                                              # cannot build
+    my $mapper_path = _multipath_mapper_path( $ctx, $scsiid );
+    return 1 if !defined($mapper_path);       # no usable map - nothing to
+                                              # wait on
     return 1 if !-b $mapper_path;             # node gone - nothing to wait
                                               # on (the previous loop kept
                                               # waiting here)
 
-    # lsof/ps are read-only process queries - deliberately NOT under the
-    # lock. lsof -t exits non-zero when NOBODY holds the device - the
-    # success case - so noerr is required; an empty pid list means "free".
+    # In-process first: the openers from /proc/<pid>/fd and the kernel
+    # holders from sysfs - no fork per tick.
+    my $openers = _block_device_openers( $ctx, $mapper_path );
+    if ( defined($openers) ) {
+        my @holders = _block_device_holders($mapper_path);
+        return 1 if !@$openers && !@holders;  # free
+
+        if ( $tick == 1 || $tick % 10 == 0 ) {
+            my $warningmsg = "Multipath device with scsi id ${scsiid} is used by "
+              . join( ', ',
+                    ( map { _process_name($_) . " with pid $_" } @$openers ),
+                    ( map { "device ${_}" } @holders ) );
+            debugmsg( $ctx, 'warn', $warningmsg );
+            warn "${warningmsg}\n";
+        }
+        return 0;                             # still in use - wait another tick
+    }
+
+    # /proc could not be read - ask lsof. lsof/ps are read-only process
+    # queries - deliberately NOT under the lock. lsof -t exits non-zero
+    # when NOBODY holds the device - the success case - so noerr is
+    # required; an empty pid list means "free".
     my $pid;
     my $cmd = [ 'lsof', '-t', $mapper_path ];
     eval {
@@ -3670,6 +4277,132 @@ sub _volume_unstage_multipath_wait_unused {
     return 0;                                 # still in use - wait another tick
 }
 
+# /dev/mapper path of the multipath map of $scsiid, undef without a map or
+# with a name unfit for a path. The map lookup is the locked probe of
+# get_device_mapper_name (a multipathd socket query when it answers).
+sub _multipath_mapper_path {
+    my ( $ctx, $scsiid ) = @_;
+
+    my $mapper_name = get_device_mapper_name( $ctx, $scsiid );
+    return undef if !defined $mapper_name;
+
+    if ( $mapper_name !~ /^([\:\-\@\w.\/]+)$/ ) {
+        debugmsg( $ctx, 'debug',
+            "Multipath device mapper name is incorrect: ${mapper_name}" );
+        return undef;
+    }
+    return "/dev/mapper/$1";                  # mapper-NAME path - the one
+                                              # place the serial helper
+                                              # cannot build
+}
+
+# Roots of the process and block device tables the in-process busy checks
+# read, subs so the tests can point them elsewhere.
+sub _proc_dir      { '/proc' }
+sub _sys_block_dir { '/sys/class/block' }
+
+# Pids holding block device $devpath open, found the way lsof finds them -
+# a /proc/<pid>/fd entry of the same device number - without forking lsof.
+# The number, not the link text, is compared: an opener in another mount
+# namespace or a container names the device by its own node path.
+# Processes that exit or deny access meanwhile are skipped. Returns undef
+# when /proc or the device can not be read.
+sub _block_device_openers {
+    my ( $ctx, $devpath ) = @_;
+
+    my @dev = stat($devpath);
+    return undef if !@dev || !-b _;
+    my $rdev = $dev[6];
+
+    my $proc = _proc_dir();
+    opendir( my $dh, $proc ) or do {
+        debugmsg( $ctx, 'debug', "Unable to read ${proc}: $!" );
+        return undef;
+    };
+    my @pids = grep { /^\d+$/ } readdir($dh);
+    closedir($dh);
+
+    my @openers;
+    PID: for my $pid (@pids) {
+        my $fddir = "${proc}/${pid}/fd";
+        opendir( my $fdh, $fddir ) or next;
+        while ( defined( my $fd = readdir($fdh) ) ) {
+            # Sockets, pipes and anon inodes are no paths, skip their stat
+            my $target = readlink("${fddir}/${fd}");
+            next if !defined($target) || $target !~ m{^/};
+            my @st = stat("${fddir}/${fd}");
+            next if !@st || !-b _ || $st[6] != $rdev;
+            push @openers, $1 if $pid =~ /^(\d+)$/;
+            closedir($fdh);
+            next PID;
+        }
+        closedir($fdh);
+    }
+    return \@openers;
+}
+
+# Kernel level users of block device $devpath (LVM volumes, other maps
+# stacked on it) - the entries of its sysfs holders dir.
+sub _block_device_holders {
+    my ($devpath) = @_;
+
+    my $node = eval { Cwd::abs_path($devpath) } // return ();
+    my $holders = _sys_block_dir() . '/' . File::Basename::basename($node)
+      . '/holders';
+    opendir( my $dh, $holders ) or return ();
+    my @holders = grep { !/^\.\.?$/ } readdir($dh);
+    closedir($dh);
+    return @holders;
+}
+
+sub _process_name {
+    my ($pid) = @_;
+
+    open( my $fh, '<', _proc_dir() . "/${pid}/comm" ) or return 'unknown';
+    my $name = <$fh>;
+    close($fh);
+    return 'unknown' if !defined($name);
+    chomp $name;
+    return $name;
+}
+
+# Sleeps up to $timeout seconds between two wait-unused ticks, returning 1
+# early once the map of $scsiid has neither openers nor holders left. Block
+# events re-check in-process, at most once per
+# MULTIPATH_UNSTAGE_RELEASE_SCAN_INTERVAL; without a monitor, or when /proc
+# can not be read, it is the plain tick sleep.
+sub _volume_unstage_multipath_wait_released {
+    my ( $ctx, $monitor, $scsiid, $timeout ) = @_;
+
+    my $deadline = Time::HiRes::time() + $timeout;
+    my $mapper_path = $monitor ? _multipath_mapper_path( $ctx, $scsiid ) : undef;
+    $monitor = undef if !defined($mapper_path);
+    my $next_scan = 0;
+
+    while (1) {
+        my $left = $deadline - Time::HiRes::time();
+        return 0 if $left <= 0;
+        return 0 if !_uevent_wait( $ctx, $monitor, $left, 'block' );
+
+        # Events arriving meanwhile are drained by the next wait.
+        my $pause = $next_scan - Time::HiRes::time();
+        if ( $pause > 0 ) {
+            $left = $deadline - Time::HiRes::time();
+            return 0 if $left <= 0;
+            Time::HiRes::sleep( $pause < $left ? $pause : $left );
+        }
+        $next_scan = Time::HiRes::time()
+          + MULTIPATH_UNSTAGE_RELEASE_SCAN_INTERVAL;
+
+        return 1 if !-e $mapper_path;         # map removed meanwhile
+        my $openers = _block_device_openers( $ctx, $mapper_path );
+        $monitor = undef if !defined($openers);
+        return 1
+            if defined($openers) && !@$openers
+            && !_block_device_holders($mapper_path);
+    }
+}
+
 # ONE removal round - returns 1 when map and dm device are gone, 0 when
 # something still holds them (the caller retries; the deferred fallback
 # runs in the caller AFTER the rounds). $scsiid arrives sanitized by the
@@ -3687,13 +4420,13 @@ sub _volume_unstage_multipath_remove_device {
     # Step 2 - drop the map: daemon first, then flush (-f, never a bare
     # rescan, which would recreate the device), then daemon again if the
     # map survived. Order preserved from the previous code.
-    multipath_cmd( $ctx, [ $MULTIPATHD, 'del', 'map', $scsiid ],
-                   MULTIPATHD_CMD_TIMEOUT_FAST ) if $MULTIPATHD;
+    _multipathd_cmd( $ctx, [ 'del', 'map', $scsiid ],
+                     MULTIPATHD_CMD_TIMEOUT_FAST );
     multipath_cmd( $ctx, [ $MULTIPATH, '-f', $scsiid ],
                    MULTIPATH_CMD_TIMEOUT_MAX );
-    multipath_cmd( $ctx, [ $MULTIPATHD, 'del', 'map', $scsiid ],
-                   MULTIPATHD_CMD_TIMEOUT_FAST )
-        if $MULTIPATHD && _multipathd_map_exists( $ctx, $scsiid );
+    _multipathd_cmd( $ctx, [ 'del', 'map', $scsiid ],
+                     MULTIPATHD_CMD_TIMEOUT_FAST )
+        if _multipathd_map_exists( $ctx, $scsiid );
 
     # Step 3 - the flush can leave an orphaned dm device; probe with
     # dmsetup (multipath -ll only sees the multipath map) and remove it
@@ -3833,6 +4566,9 @@ sub _volume_unstage_multipath_get_blocker {
 sub _multipathd_map_exists {
     my ( $ctx, $wwid ) = @_;
 
+    my $maps = _multipathd_maps($ctx);
+    return exists( $maps->{$wwid} ) ? 1 : 0 if defined($maps);
+
     my $found = 0;
     my $cmd = [ $MULTIPATH, '-ll', $wwid ];
     multipath_cmd( $ctx, $cmd, MULTIPATH_CMD_TIMEOUT, sub {
@@ -3910,6 +4646,300 @@ sub volume_unpublish {
     1;
 }
 
+# Per-storeid index of the local lun records.
+#
+# Maps every volname to the list of { target, lun, snapname } entries that
+# hold a record for it, so a lookup opens only the records of the volume it
+# asks for instead of walking and decoding the whole state tree on every
+# activation and deactivation. The index lives next to the target dirs as
+# PLUGIN_LOCAL_STATE_DIR/<storeid>/.lun-record-index.json and is replaced
+# atomically (write + rename) under an flock on the neighbouring .lock file;
+# record writes and removals take the same lock.
+#
+# The index is kept a superset of the records on disk: an entry is added
+# before its record is written and dropped after its record is removed, and
+# lookups verify every record they read. A crash in between therefore leaves
+# at worst a stale entry that lookups skip and the next rebuild drops. A
+# missing or malformed index is rebuilt from the tree walk
+# (lun_record_local_index_rebuild), which stays the fsck path.
+use constant LUN_RECORD_INDEX_FILE => '.lun-record-index.json';
+
+# Root of the local lun record tree, a sub so tests can point it elsewhere.
+sub _local_state_dir { PLUGIN_LOCAL_STATE_DIR }
+
+sub _lun_record_index_path {
+    my ($ctx) = @_;
+
+    my $path = File::Spec->catfile( _local_state_dir(),
+                                    $ctx->{storeid}, LUN_RECORD_INDEX_FILE );
+    if ( $path =~ /^([\:\-\@\w.\/]+)$/ ) {
+        return $1;
+    }
+    die "Invalid character in lun record index path: ${path}\n";
+}
+
+sub _lun_record_index_read {
+    my ($ctx) = @_;
+
+    my $path = _lun_record_index_path($ctx);
+
+    open( my $fh, '<', $path ) or return undef;
+    local $/ = undef;
+    my $jsontext = <$fh>;
+    close $fh;
+
+    my $index = eval { JSON::decode_json($jsontext) };
+    if ( $@ || ref($index) ne 'HASH' || ref( $index->{volumes} ) ne 'HASH' ) {
+        debugmsg( $ctx, 'warn',
+            "Ignoring malformed lun record index ${path}\n" );
+        return undef;
+    }
+    return $index;
+}
+
+sub _lun_record_index_write {
+    my ( $ctx, $index ) = @_;
+
+    my $path = _lun_record_index_path($ctx);
+    my $tmp  = "${path}.tmp";
+
+    open( my $fh, '>', $tmp )
+      or die "Failed to create lun record index at '${tmp}': $!\n";
+    print {$fh} JSON::encode_json($index) . "\n";
+    unless ( close $fh ) {
+        my $err = $!;
+        unlink $tmp;
+        die "Failed to finish writing lun record index '${tmp}': ${err}\n";
+    }
+    unless ( rename( $tmp, $path ) ) {
+        my $err = $!;
+        unlink $tmp;
+        die "Failed to replace lun record index '${path}': ${err}\n";
+    }
+    return 1;
+}
+
+# The tree walk the index replaces: reads every record under the storeid
+# dir and returns a freshly built index.
+sub _lun_record_index_scan {
+    my ($ctx) = @_;
+    my $storeid = $ctx->{storeid};
+
+    my $ldir = File::Spec->catdir( _local_state_dir(), $storeid );
+    my %volumes;
+
+    eval {
+        File::Find::find(
+            {
+                no_chdir => 1,
+                wanted   => sub {
+                    my $full = $File::Find::name;
+
+                    # Expect path .../<storeid>/<target>/<lun_id>/<volname>
+                    unless ($full =~ m!^\Q$ldir\E/([^/]+)/(\d+)/([^/]+)$!) {
+                        return;
+                    }
+                    my ($targetname, $lunid, $name) = ($1, $2, $3);
+                    $targetname = clean_word($targetname);
+                    $lunid = clean_word($lunid);
+
+                    my $lunrec = eval {
+                        lun_record_local_get_by_path( $ctx, $full );
+                    };
+                    if ($@) {
+                        debugmsg( $ctx, 'warn',
+                            "Skipping unreadable lun record ${full}: $@" );
+                        return;
+                    }
+                    return unless $lunrec;
+                    return unless $lunrec->{volname} eq $name;
+
+                    push @{ $volumes{$name} }, {
+                        target   => $targetname,
+                        lun      => $lunid,
+                        snapname => $lunrec->{snapname},
+                    };
+                },
+            },
+            $ldir);
+    };
+    if ($@) {
+        debugmsg($ctx, 'warn',
+            "lun record index scan interrupted: $@"
+            . " (likely a concurrent deactivation removed a target directory)");
+    }
+
+    return { volumes => \%volumes };
+}
+
+# _lun_record_index_modify($ctx, $code)
+#
+# Runs $code->($index, $store) under the index lock and stores the index it
+# leaves behind. $code may also create or remove record files: holding the
+# lock keeps a concurrent rebuild from observing the index and the tree out
+# of step. Calling $store->() writes the index right away, before a record
+# is created, and then it is not written again. A missing index is rebuilt
+# first.
+sub _lun_record_index_modify {
+    my ( $ctx, $code ) = @_;
+
+    my $lockpath = _lun_record_index_path($ctx) . '.lock';
+
+    sysopen( my $lfh, $lockpath, O_RDWR | O_CREAT, 0600 )
+      or die "Failed to open lun record index lock '${lockpath}': $!\n";
+    unless ( flock( $lfh, LOCK_EX ) ) {
+        my $err = $!;
+        close $lfh;
+        die "Failed to lock lun record index '${lockpath}': ${err}\n";
+    }
+
+    my $res = eval {
+        my $index = _lun_record_index_read($ctx)
+                 // _lun_record_index_scan($ctx);
+        my $stored = 0;
+        my $store  = sub {
+            _lun_record_index_write( $ctx, $index );
+            $stored = 1;
+        };
+        my $ret = $code->( $index, $store );
+        _lun_record_index_write( $ctx, $index ) unless $stored;
+        $ret;
+    };
+    my $err = $@;
+
+    close $lfh;
+    die $err if $err;
+    return $res;
+}
+
+sub _lun_record_index_add {
+    my ( $index, $targetname, $lunid, $volname, $snapname ) = @_;
+
+    my $entries = $index->{volumes}{$volname} //= [];
+    foreach my $entry ( @{$entries} ) {
+        if ( $entry->{target} eq $targetname && $entry->{lun} eq $lunid ) {
+            $entry->{snapname} = $snapname;
+            return;
+        }
+    }
+    push @{$entries}, {
+        target   => $targetname,
+        lun      => "${lunid}",
+        snapname => $snapname,
+    };
+}
+
+sub _lun_record_index_remove {
+    my ( $index, $targetname, $lunid, $volname ) = @_;
+
+    my $entries = $index->{volumes}{$volname} or return;
+    @{$entries} = grep {
+        !( $_->{target} eq $targetname && $_->{lun} eq $lunid )
+    } @{$entries};
+    delete $index->{volumes}{$volname} unless @{$entries};
+}
+
+# lun_record_local_index_rebuild($ctx)
+#
+# Rebuilds the lun record index of the storage from the tree walk,
+# dropping stale entries left behind by an interrupted create or delete.
+# Returns the number of records indexed.
+sub lun_record_local_index_rebuild {
+    my ($ctx) = @_;
+
+    my $ldir = File::Spec->catdir( _local_state_dir(), $ctx->{storeid} );
+    unless ( -d $ldir ) {
+        die "Unable to locate folder containing ${ ldir } plugin state\n";
+    }
+
+    return _lun_record_index_modify( $ctx, sub {
+        my ($index) = @_;
+        my $scan = _lun_record_index_scan($ctx);
+        $index->{volumes} = $scan->{volumes};
+        my $count = 0;
+        $count += scalar( @{$_} ) for values %{ $index->{volumes} };
+        debugmsg( $ctx, 'debug',
+            "Rebuilt lun record index with ${count} records\n" );
+        return $count;
+    } );
+}
+
+# The index of the storage, rebuilt first when it is missing.
+sub _lun_record_index_load {
+    my ($ctx) = @_;
+
+    my $index = _lun_record_index_read($ctx);
+    unless ( defined($index) ) {
+        lun_record_local_index_rebuild($ctx);
+        $index = _lun_record_index_read($ctx) // { volumes => {} };
+    }
+    return $index;
+}
+
+# _lun_record_index_lookup($ctx, $volname, $want, $index)
+#
+# Returns [ targetname, lunid, path, lunrec ] for every indexed record of
+# $volname accepted by $want->($lunrec). Entries whose record is gone or no
+# longer matches are skipped. $index, when given, saves loading it again.
+sub _lun_record_index_lookup {
+    my ( $ctx, $volname, $want, $index ) = @_;
+
+    my $ldir = File::Spec->catdir( _local_state_dir(), $ctx->{storeid} );
+
+    $index //= _lun_record_index_load($ctx);
+
+    my @matches = ();
+    foreach my $entry ( @{ $index->{volumes}{$volname} // [] } ) {
+        my $targetname = $entry->{target} // '';
+        my $lunid      = $entry->{lun} // '';
+        unless ( $targetname =~ /^[\:\-\@\w.]+$/ && $lunid =~ /^\d+$/ ) {
+            debugmsg( $ctx, 'warn',
+                "Skipping malformed lun record index entry of ${volname}\n" );
+            next;
+        }
+        $targetname = clean_word($targetname);
+        $lunid      = clean_word($lunid);
+
+        my $full = File::Spec->catfile( $ldir, $targetname, $lunid, $volname );
+        my $lunrec = eval { lun_record_local_get_by_path( $ctx, $full ) };
+        if ($@) {
+            debugmsg( $ctx, 'warn', "Skipping unreadable lun record: $@" );
+            next;
+        }
+        unless ($lunrec) {
+            debugmsg( $ctx, 'debug',
+                "Skipping stale lun record index entry ${full}\n" );
+            next;
+        }
+        next unless $lunrec->{volname} eq $volname;
+        next unless $want->($lunrec);
+
+        push @matches, [ $targetname, $lunid, $full, $lunrec ];
+    }
+    return \@matches;
+}
+
+# lun_record_local_get_all($ctx)
+#
+# Returns [ targetname, lunid, path, lunrec ] for every lun record of the
+# storage, volumes and snapshots alike, from one read of the index.
+sub lun_record_local_get_all {
+    my ($ctx) = @_;
+
+    my $ldir = File::Spec->catdir( _local_state_dir(), $ctx->{storeid} );
+    return [] unless -d $ldir;
+
+    my $index = _lun_record_index_load($ctx);
+
+    my @records = ();
+    foreach my $volname ( sort keys %{ $index->{volumes} } ) {
+        push @records, @{
+            _lun_record_index_lookup( $ctx, $volname, sub { 1 }, $index )
+        };
+    }
+    return \@records;
+}
+
 sub lun_record_local_create {
     my (
         $ctx,
@@ -3920,7 +4950,7 @@ sub lun_record_local_create {
     ) = @_;
     my $storeid = $ctx->{storeid};
 
-    my $ltldir = File::Spec->catdir( PLUGIN_LOCAL_STATE_DIR,
+    my $ltldir = File::Spec->catdir( _local_state_dir(),
                                      $storeid, $targetname, $lunid );
     make_path $ltldir, { owner => 'root', group => 'root' };
 
@@ -3939,10 +4969,17 @@ sub lun_record_local_create {
     my $json_text = JSON::encode_json($record) . "\n";
 
     if ( $ltlfile =~ /^([\:\-\@\w.\/]+)$/ ) {
-        open my $fh, '>', $ltlfile
-          or die "Failed to create local lun record at '$ltlfile': $!\n";
-        print {$fh} $json_text;
-        close $fh or die "Failed to finish writing to local lun file '$ltlfile': $!\n";
+        _lun_record_index_modify( $ctx, sub {
+            my ( $index, $store ) = @_;
+            # Index first: the index must stay a superset of the records
+            _lun_record_index_add( $index, $targetname, $lunid,
+                                   $record->{volname}, $record->{snapname} );
+            $store->();
+            open my $fh, '>', $ltlfile
+              or die "Failed to create local lun record at '$ltlfile': $!\n";
+            print {$fh} $json_text;
+            close $fh or die "Failed to finish writing to local lun file '$ltlfile': $!\n";
+        } );
     } else {
         die "Incorrect local lun file path $ltlfile\n";
     }
@@ -3957,7 +4994,7 @@ sub lun_record_local_update {
     ) = @_;
     my $storeid = $ctx->{storeid};
 
-    my $ltldir = File::Spec->catdir( PLUGIN_LOCAL_STATE_DIR,
+    my $ltldir = File::Spec->catdir( _local_state_dir(),
                                      $storeid, $targetname, $lunid );
     $ltldir = clean_word($ltldir);
     unless ( -d $ltldir) {
@@ -3970,10 +5007,16 @@ sub lun_record_local_update {
 
     if ( $ltlfile =~ /^([\:\-\@\w.\/]+)$/ ) {
         my $filename = $1;
-        open my $fh, '>', $filename
-          or die "Failed to create local lun record at '$filename': $!\n";
-        print {$fh} $json_text;
-        close $fh or die "Failed to finish writing to local lun file '$filename': $!\n";
+        _lun_record_index_modify( $ctx, sub {
+            my ( $index, $store ) = @_;
+            _lun_record_index_add( $index, $targetname, $lunid, $volname,
+                                   $lunrec->{snapname} );
+            $store->();
+            open my $fh, '>', $filename
+              or die "Failed to create local lun record at '$filename': $!\n";
+            print {$fh} $json_text;
+            close $fh or die "Failed to finish writing to local lun file '$filename': $!\n";
+        } );
     } else {
         die "Invalid character in lun file path: ${ltlfile}\n";
     }
@@ -3992,63 +5035,31 @@ sub lun_record_local_get_info_list {
         . safe_var_print( "target group", $tgname )
         . "\n");
 
-    my @matches = ();
-
-    my $name = $volname;
-
-    my $ldir = File::Spec->catdir( PLUGIN_LOCAL_STATE_DIR, $storeid );
+    my $ldir = File::Spec->catdir( _local_state_dir(), $storeid );
 
     unless( -d $ldir ){
         die "Unable to locate folder containing ${ ldir } plugin state\n";
     }
 
-    eval {
-        File::Find::find(
-            {
-                no_chdir => 1,
-                wanted   => sub {
-                    my $full = $File::Find::name;
-
-                    # Expect path .../<storeid>/<target>/<lun_id>/$name
-                    unless ($full =~ m!^\Q$ldir\E/([^/]+)/(\d+)/\Q$name\E$!) {
-                        return;
-                    }
-                    my ($targetname, $lunid) = ($1, $2);
-                    $targetname = clean_word($targetname);
-                    $lunid = clean_word($lunid);
+    # TODO: consider using target group name
+    my $matches = _lun_record_index_lookup( $ctx, $volname, sub {
+        my ($lunrec) = @_;
+        if ( defined($snapname) ) {
+            return defined( $lunrec->{snapname} )
+                && $lunrec->{snapname} eq $snapname;
+        }
+        return !defined( $lunrec->{snapname} );
+    } );
 
-                    # TODO: consider using target group name
-                    my $lunrec = lun_record_local_get_by_path( $ctx, $full);
-                    if ($lunrec) {
-                        if ( $lunrec->{volname} eq $volname ) {
-                            if ( defined($snapname) ) {
-                                if ( defined($lunrec->{snapname}) &&
-                                    ( $lunrec->{snapname} eq $snapname ) ) {
-                                    push @matches, [ $targetname, $lunid, $full, $lunrec ];
-                                }
-                            } else {
-                                unless( defined($lunrec->{snapname}) ) {
-                                    push @matches, [ $targetname, $lunid, $full, $lunrec ];
-                                    debugmsg( $ctx, "debug", "Found lun record of volume ${volname} "
-                                        . safe_var_print( "snapshot", $snapname )
-                                        . safe_var_print( "target group", $tgname )
-                                        . " targetname ${targetname}"
-                                        . " lunid ${lunid}\n");
-                                }
-                            }
-                        }
-                    }
-                },
-            },
-            $ldir);
-    };
-    if ($@) {
-        debugmsg($ctx, 'warn',
-            "lun record search interrupted: $@"
-            . " (likely a concurrent deactivation removed a target directory)");
+    foreach my $match ( @{$matches} ) {
+        debugmsg( $ctx, "debug", "Found lun record of volume ${volname} "
+            . safe_var_print( "snapshot", $snapname )
+            . safe_var_print( "target group", $tgname )
+            . " targetname $match->[0]"
+            . " lunid $match->[1]\n");
     }
 
-    return \@matches;
+    return $matches;
 }
 
 sub lun_record_local_get_snapshot_list {
@@ -4060,46 +5071,16 @@ sub lun_record_local_get_snapshot_list {
     # Used by volume_deactivate to clean up snapshot state without calling
     # jdssc to discover which snapshots were activated on this node.
 
-    my @matches = ();
-
-    my $ldir = File::Spec->catdir( PLUGIN_LOCAL_STATE_DIR, $storeid );
+    my $ldir = File::Spec->catdir( _local_state_dir(), $storeid );
 
     unless ( -d $ldir ) {
         die "Unable to locate folder containing plugin state\n";
     }
 
-    eval {
-        File::Find::find(
-            {
-                no_chdir => 1,
-                wanted   => sub {
-                    my $full = $File::Find::name;
-
-                    unless ($full =~ m!^\Q$ldir\E/([^/]+)/(\d+)/\Q$volname\E$!) {
-                        return;
-                    }
-                    my ($targetname, $lunid) = ($1, $2);
-                    $targetname = clean_word($targetname);
-                    $lunid      = clean_word($lunid);
-
-                    my $lunrec = lun_record_local_get_by_path($ctx, $full);
-                    return unless $lunrec;
-                    return unless $lunrec->{volname} eq $volname;
-                    return unless defined($lunrec->{snapname});
-
-                    push @matches, [ $targetname, $lunid, $full, $lunrec ];
-                },
-            },
-            $ldir
-        );
-    };
-    if ($@) {
-        debugmsg($ctx, 'warn',
-            "snapshot lun record search interrupted: $@"
-            . " (likely a concurrent deactivation removed a target directory)");
-    }
-
-    return \@matches;
+    return _lun_record_index_lookup( $ctx, $volname, sub {
+        my ($lunrec) = @_;
+        return defined( $lunrec->{snapname} );
+    } );
 }
 
 sub lun_record_local_get_by_target {
@@ -4108,7 +5089,7 @@ sub lun_record_local_get_by_target {
     ) = @_;
     my $storeid = $ctx->{storeid};
 
-    my $ltldir = File::Spec->catfile( PLUGIN_LOCAL_STATE_DIR,
+    my $ltldir = File::Spec->catfile( _local_state_dir(),
                                       $storeid, $targetname, $lunid, $volname);
     unless ( -d $ltldir ) {
         return undef;
@@ -4185,7 +5166,7 @@ sub _lun_record_other_storeids {
     my $storeid = $ctx->{storeid};
 
     my $sdh;
-    unless ( opendir( $sdh, PLUGIN_LOCAL_STATE_DIR ) ) {
+    unless ( opendir( $sdh, _local_state_dir() ) ) {
         # No state root at all means no records anywhere.
         return ();
     }
@@ -4246,7 +5227,7 @@ sub lun_record_local_search_by_target {
     my ( $ctx, $targetname ) = @_;
 
     foreach my $other_storeid ( _lun_record_other_storeids($ctx) ) {
-        my $other_target_dir = File::Spec->catdir( PLUGIN_LOCAL_STATE_DIR,
+        my $other_target_dir = File::Spec->catdir( _local_state_dir(),
                                                    $other_storeid,
                                                    $targetname );
         if ( _lun_record_target_dir_in_use($other_target_dir) ) {
@@ -4317,7 +5298,7 @@ sub lun_record_local_delete {
         . "\n");
 
     debugmsg($ctx, 'debug', "delete lun record check\n");
-    my $ltdir = File::Spec->catdir( PLUGIN_LOCAL_STATE_DIR,
+    my $ltdir = File::Spec->catdir( _local_state_dir(),
                                     $storeid, $targetname );
     if ( $ltdir =~ /^([\:\-\@\w.\/]+)$/ ) {
         $ltdir = $1;
@@ -4351,7 +5332,7 @@ sub lun_record_local_delete {
     }
 
     # Local Target Lun Directory
-    my $ltldir = File::Spec->catdir( PLUGIN_LOCAL_STATE_DIR,
+    my $ltldir = File::Spec->catdir( _local_state_dir(),
                                      $storeid, $targetname, $lunid );
     if ( $ltldir =~ /^([\:\-\@\w.\/]+)$/ ) {
         $ltldir = $1;
@@ -4362,11 +5343,16 @@ sub lun_record_local_delete {
     my $ltlfile = File::Spec->catfile( $ltldir, $volname );
     if ( $ltlfile =~ /^([\:\-\@\w.\/]+)$/ ) {
         my $file = $1;
-        if ( -f $file ) {
-            unless ( unlink($file) ) {
-                die "Unable to remove lun file ${file} because $!\n";
+        _lun_record_index_modify( $ctx, sub {
+            my ($index) = @_;
+            # Record first: the index must stay a superset of the records
+            if ( -f $file ) {
+                unless ( unlink($file) ) {
+                    die "Unable to remove lun file ${file} because $!\n";
+                }
             }
-        }
+            _lun_record_index_remove( $index, $targetname, $lunid, $volname );
+        } );
     } else {
         die "Invalid character in lun file path: ${ltlfile}\n";
     }
@@ -4785,6 +5771,119 @@ sub _volume_activate_attempt {
     return $block_devs;
 }
 
+# volume_activate_bulk($ctx, $vmid, $records)
+#   $records  [ targetname, lunid, path, lunrec ] of volumes of VM $vmid
+#             whose block devices are gone, as lun_record_local_get_all
+#             lists them
+#
+# Boot-time reactivation of the volumes of one VM: one jdssc run publishes
+# all of them, each target is logged in once, the rescans for the other
+# LUNs go out as one request and the multipath maps are added after. Only
+# volumes the backend still publishes at their recorded target and LUN are
+# staged here; those and any volume whose staging fails are left to the
+# regular volume_activate of their next activate_volume. Returns the
+# number of volumes reactivated.
+sub volume_activate_bulk {
+    my ( $ctx, $vmid, $records ) = @_;
+
+    return 0 if !@{$records};
+
+    my $tgname    = get_vm_target_group_name( $ctx, $vmid );
+    my $multipath = get_multipath($ctx);
+
+    my %record_of = map { $_->[3]{volname} => $_ } @{$records};
+    my @volnames  = sort keys %record_of;
+
+    debugmsg( $ctx, 'debug',
+        "Bulk activation of VM ${vmid} volumes @volnames\n" );
+
+    my $tinfos = volumes_publish( $ctx, $tgname, @volnames );
+
+    my @first;    # the first volume of every target, its staging logs in
+    my @rest;
+    my %target_seen;
+    foreach my $volname (@volnames) {
+        my ( $targetname, $lunid, undef, $lunrec ) =
+          @{ $record_of{$volname} };
+        my $tinfo = $tinfos->{$volname};
+        unless ( $tinfo
+                 && $tinfo->{target} eq $targetname
+                 && $tinfo->{lunid} eq $lunid
+                 && $tinfo->{scsiid} eq ( $lunrec->{scsiid} // '' ) ) {
+            debugmsg( $ctx, 'debug',
+                "Bulk activation leaves volume ${volname} to its own "
+              . "activation: not published at target ${targetname} "
+              . "lun ${lunid} any more\n" );
+            next;
+        }
+        my $vol = { volname => $volname, tinfo => $tinfo,
+                    lunrec  => $lunrec };
+        if ( $target_seen{$targetname}++ ) {
+            push @rest, $vol;
+        } else {
+            push @first, $vol;
+        }
+    }
+
+    # Best-effort per volume: a failure drops the volume from the bulk
+    # path, a fatal lock error ends it.
+    my $try = sub {
+        my ( $vol, $code ) = @_;
+        eval { $code->(); };
+        if ($@) {
+            die $@ if OpenEJovianDSS::Lock::lock_error_fatal($@);
+            debugmsg( $ctx, 'warn',
+                "Bulk activation of volume $vol->{volname} failed: $@" );
+            $vol->{failed} = 1;
+        }
+    };
+    my $stage_iscsi = sub {
+        my ($vol) = @_;
+        my $tinfo = $vol->{tinfo};
+        $try->( $vol, sub {
+            my $block_devs = volume_stage_iscsi( $ctx,
+                $tinfo->{target}, $tinfo->{lunid}, $tinfo->{iplist},
+                $tinfo->{scsiid}, undef );
+            die "Unable to connect to any storage address\n"
+                if !( $block_devs && @$block_devs );
+            $vol->{block_devs} = $block_devs;
+        } );
+    };
+
+    # Logins; each login scans its target, so the other LUNs mostly show
+    # up with it and the one rescan pass below only catches stragglers.
+    $stage_iscsi->($_) for @first;
+    my @pending = grep {
+        !-b block_device_path_from_serial( $ctx, $_->{tinfo}{scsiid}, 0 )
+    } @rest;
+    _rescan_targets( $ctx,
+        map { [ $_->{tinfo}{target}, $_->{tinfo}{lunid} ] } @pending )
+        if @pending;
+    $stage_iscsi->($_) for @rest;
+
+    my $count = 0;
+    foreach my $vol ( grep { !$_->{failed} } @first, @rest ) {
+        $try->( $vol, sub {
+            if ($multipath) {
+                volume_stage_multipath( $ctx, $vol->{tinfo}{scsiid},
+                                        $vol->{block_devs}, undef, 1 );
+            }
+            my $lunrec = $vol->{lunrec};
+            $lunrec->{hosts}     = $vol->{tinfo}{iplist};
+            $lunrec->{multipath} = $multipath ? \1 : \0;
+            lun_record_local_update( $ctx,
+                $vol->{tinfo}{target}, $vol->{tinfo}{lunid},
+                $vol->{volname}, undef, $lunrec );
+        } );
+        $count++ if !$vol->{failed};
+    }
+
+    debugmsg( $ctx, 'debug',
+        "Bulk activation of VM ${vmid} reactivated ${count} of "
+      . scalar(@volnames) . " volumes\n" );
+    return $count;
+}
+
 # The complete inverse of one activation attempt. Each step is best-effort
 # (eval + warn) so one failed step never blocks the rest - EXCEPT a fatal
 # lock error, which rethrows (lock_error_fatal: a step must not continue
@@ -5107,8 +6206,8 @@ sub lun_record_update_device {
                 # Heavy daemon-wide re-read on a sparse schedule only (the
                 # previous `multipath reconfigure` was an invalid
                 # invocation - a silent no-op).
-                multipath_cmd( $ctx, [ $MULTIPATHD, 'reconfigure' ],
-                               MULTIPATH_CMD_TIMEOUT_MAX )
+                _multipathd_cmd( $ctx, ['reconfigure'],
+                                 MULTIPATH_CMD_TIMEOUT_MAX )
                     if $round % 5 == 0;
             }
         }
@@ -5259,7 +6358,7 @@ sub store_setup {
 
     my $path = get_content_path($ctx);
 
-    my $lldir = File::Spec->catdir( PLUGIN_LOCAL_STATE_DIR, $storeid );
+    my $lldir = File::Spec->catdir( _local_state_dir(), $storeid );
 
     unless ( -d $lldir) {
         make_path $lldir, { owner => 'root', group => 'root' };
@@ -25,7 +25,10 @@ package OpenEJovianDSS::Lock;
 # scope comes from its class's <class>_lock_type storage.cfg property (per-class
 # default otherwise); two backends implement it: pmxcfs mkdir (cluster reach,
 # CFS_LOCK_TIMEOUT idle expiry) and node-local flock (never expires, freed on
-# process death). All held locks share one registry in $ctx->{_held_locks} —
+# process death). Each class also has a mode: 'exclusive', or 'shared' for the
+# read tier, whose holders run concurrently and only exclude exclusive holders
+# of the same lock (flock LOCK_SH on the node backend, reader marker dirs on
+# pmxcfs). All held locks share one registry in $ctx->{_held_locks} —
 # the re-entry guard, the keep-alive refresh and the hold-cap deadline all
 # operate on it, which is why one $ctx must thread through a whole locked
 # operation (never new_ctx under a held lock).
@@ -36,10 +39,11 @@ use warnings;
 use Carp ();
 use Exporter 'import';
 
-use Fcntl          qw(LOCK_EX);
+use Fcntl          qw(LOCK_EX LOCK_SH O_WRONLY O_APPEND O_CREAT);
 use File::Basename ();
 use File::Path     qw(make_path);
 use File::stat     ();
+use Sys::Hostname  ();
 use Time::HiRes    ();
 use PVE::Cluster   ();
 use PVE::Tools     ();   # run_with_timeout bounds the node flock wait
@@ -61,6 +65,18 @@ sub _cluster_lockdir {
     return "/etc/pve/priv/lock";
 }
 
+# Node-local waiting room in front of the cluster locks: one queue dir per
+# cluster lock name, on tmpfs so a reboot clears it — see _lock_queue_enter.
+sub _lock_queue_dir {
+    return "/run/lock/joviandss-queue";
+}
+
+# Per-node lock statistics: one line per _lock_exec, appended by
+# _lock_stats_record and summarized by tools/joviandss-lock-stats.
+sub _lock_stats_file {
+    return "/var/log/joviandss/lock-stats.log";
+}
+
 # ---------------------------------------------------------------------------
 # Per-class constants
 # ---------------------------------------------------------------------------
@@ -78,6 +94,16 @@ use constant LOCK_CLASS_MULTIPATH_DEFAULT_TYPE     => 'node';
 use constant LOCK_CLASS_VM_DEFAULT_TYPE            => 'vm';
 use constant LOCK_CLASS_STORAGE_DEFAULT_TYPE       => 'storage';
 
+# default mode per class: 'shared' holders of a lock run concurrently and only
+# exclude 'exclusive' holders of the same lock. jdssc_info guards read-only
+# jdssc commands (status polls, listings), which have nothing to serialize
+# among themselves.
+use constant LOCK_CLASS_JDSSC_GENERAL_DEFAULT_MODE => 'exclusive';
+use constant LOCK_CLASS_JDSSC_INFO_DEFAULT_MODE    => 'shared';
+use constant LOCK_CLASS_MULTIPATH_DEFAULT_MODE     => 'exclusive';
+use constant LOCK_CLASS_VM_DEFAULT_MODE            => 'exclusive';
+use constant LOCK_CLASS_STORAGE_DEFAULT_MODE       => 'exclusive';
+
 # seconds to WAIT to acquire, per class
 use constant LOCK_CLASS_JDSSC_GENERAL_ACQUIRE_TIMEOUT => 1200;    # = PROXMOX_CLUSTER_LOCK_ACQUIRE_TIMEOUT_MAX
 use constant LOCK_CLASS_JDSSC_INFO_ACQUIRE_TIMEOUT    => 40;
@@ -119,6 +145,13 @@ use constant LOCK_DEFAULT_TYPE => {
     vm            => LOCK_CLASS_VM_DEFAULT_TYPE,
     storage       => LOCK_CLASS_STORAGE_DEFAULT_TYPE,
 };
+use constant LOCK_DEFAULT_MODE => {
+    jdssc_general => LOCK_CLASS_JDSSC_GENERAL_DEFAULT_MODE,
+    jdssc_info    => LOCK_CLASS_JDSSC_INFO_DEFAULT_MODE,
+    multipath     => LOCK_CLASS_MULTIPATH_DEFAULT_MODE,
+    vm            => LOCK_CLASS_VM_DEFAULT_MODE,
+    storage       => LOCK_CLASS_STORAGE_DEFAULT_MODE,
+};
 use constant LOCK_CLASS_ACQUIRE_TIMEOUT => {
     jdssc_general => LOCK_CLASS_JDSSC_GENERAL_ACQUIRE_TIMEOUT,
     jdssc_info    => LOCK_CLASS_JDSSC_INFO_ACQUIRE_TIMEOUT,
@@ -137,12 +170,14 @@ use constant LOCK_CLASS_HOLD_TIMEOUT => {
 # Explicit lock-class property names — NO runtime "${class}_lock_*" key
 # building. Every storage.cfg property a class understands is spelled out here,
 # so each name is greppable and adding a class is a deliberate row, not a key
-# conjured from string interpolation.
+# conjured from string interpolation. Only the read tier exposes its mode: a
+# mutating class must never be switched to shared.
 use constant LOCK_CLASS_PROPERTY => {
     jdssc_general => { type => 'jdssc_general_lock_type', dir => 'jdssc_general_lock_path',
                        acquire => 'jdssc_general_lock_acquire_timeout', hold => 'jdssc_general_lock_hold_timeout' },
     jdssc_info    => { type => 'jdssc_info_lock_type',    dir => 'jdssc_info_lock_path',
-                       acquire => 'jdssc_info_lock_acquire_timeout',    hold => 'jdssc_info_lock_hold_timeout' },
+                       acquire => 'jdssc_info_lock_acquire_timeout',    hold => 'jdssc_info_lock_hold_timeout',
+                       mode => 'jdssc_info_lock_mode' },
     multipath     => { type => 'multipath_lock_type',     dir => 'multipath_lock_path',
                        acquire => 'multipath_lock_acquire_timeout',     hold => 'multipath_lock_hold_timeout' },
     vm            => { type => 'vm_lock_type',            dir => 'vm_lock_path',
@@ -165,6 +200,17 @@ use constant LOCK_FATAL_ERROR_MARKER => 'joviandss-lock-fatal:';
 # the waiters' normal utime(0,0) stale reclaim. (Table 9 in the design doc.)
 use constant LOCK_DIVEST_GUARD_TIMEOUT => 5;
 
+# Longest blocking flock on the node-local queue predecessor before the
+# waiter wakes to refresh its other held locks (pmxcfs expires an idle lock
+# dir after 120 s, so any slice well below that keeps outer locks alive).
+# Handoff itself is immediate: the flock is granted the moment the
+# predecessor leaves.
+use constant LOCK_QUEUE_WAIT_SLICE => 5;
+
+# The stats file is moved to <file>.1 once it outgrows this, so a node keeps
+# at most about twice this much lock history.
+use constant LOCK_STATS_MAX_SIZE => 16 * 1024 * 1024;
+
 # ---------------------------------------------------------------------------
 # Per-class property getters
 # ---------------------------------------------------------------------------
@@ -202,6 +248,18 @@ sub get_lock_class_type {
     return $type;
 }
 
+sub get_lock_class_mode {
+    my ($ctx, $lock_class) = @_;
+
+    my $mode = _lock_class_scfg($ctx, $lock_class, 'mode')
+            // LOCK_DEFAULT_MODE->{$lock_class};
+
+    die "invalid ${lock_class}_lock_mode '$mode'\n"
+        unless $mode eq 'exclusive' || $mode eq 'shared';
+
+    return $mode;
+}
+
 sub get_lock_class_dir {
     my ($ctx, $lock_class) = @_;
 
@@ -261,8 +319,8 @@ sub _lock_resolve {
 # lock, the single store every phase enriches: _lock_ctx_commission freezes
 # the timing policy BEFORE acquisition (the cluster poll loop needs the
 # in-flight target registered), _lock_acquire flips owned / parks the node fh
-# / arms the deadline, _lock_divest clears them, _lock_ctx_decommission
-# removes the record — BY PATH, never a LIFO pop.
+# or the held pmxcfs dir / arms the deadline, _lock_divest clears them,
+# _lock_ctx_decommission removes the record — BY PATH, never a LIFO pop.
 
 # The registry record for a commissioned lock id (undef when none).
 sub _lock_record {
@@ -274,7 +332,8 @@ sub _lock_record {
     return undef;
 }
 
-# _lock_ctx_commission($ctx, $backend, $path, $timeout, $max_hold) → $lock_id
+# _lock_ctx_commission($ctx, $backend, $path, $mode, $timeout, $max_hold)
+#     → $lock_id
 #
 # Commissioned = REGISTERED + GUARDED, NOT owned: the record must exist
 # before the acquisition wait so the re-entry guard can fire and the poll
@@ -292,7 +351,7 @@ sub _lock_record {
 # CFS_LOCK_TIMEOUT; a pmxcfs-correctness invariant, not a class property).
 # Downstream phases read the record and are never handed a number.
 sub _lock_ctx_commission {
-    my ($ctx, $backend, $path, $timeout, $max_hold) = @_;
+    my ($ctx, $backend, $path, $mode, $timeout, $max_hold) = @_;
 
     for my $lock (@{ $ctx->{_held_locks} }) {
         next if $lock->{path} ne $path;
@@ -312,11 +371,13 @@ sub _lock_ctx_commission {
     push @{ $ctx->{_held_locks} },
         { backend         => $backend,
           path            => $path,
+          mode            => $mode,
           acquire_timeout => $timeout,
           max_hold        => $max_hold,
           alarm_cap       => $alarm_cap,
           owned           => 0,
           fh              => undef,   # node backend: parked by _lock_acquire
+          held            => undef,   # cluster backend: the dir actually held
           deadline        => undef,   # armed by _lock_acquire at ownership
           acquired_at     => Carp::longmess("commissioned '$path'") };
 
@@ -367,7 +428,7 @@ sub refresh_locks {
             if $lock->{deadline} && time() > $lock->{deadline};
 
         if ($lock->{backend} eq 'cluster') {
-            utime(undef, undef, $lock->{path});    # pmxcfs: reset the CFS_LOCK_TIMEOUT idle timer
+            utime(undef, undef, $lock->{held});    # pmxcfs: reset the CFS_LOCK_TIMEOUT idle timer
         }
         # 'node' (flock): no-op — never expires
     }
@@ -528,10 +589,10 @@ sub lock_deadline_remaining {
 
 # _lock_acquire($ctx, $lock_id) → $lock_id
 #
-# Blocks up to the record's acquire budget taking exclusive ownership; DIES
-# on any failure — it never returns undef/false. On success, and only then,
-# it sets owned=1 and arms the hold deadline as its final act: ownership and
-# its wall-clock clock start together. Requires a commissioned record
+# Blocks up to the record's acquire budget taking ownership in the record's
+# mode; DIES on any failure — it never returns undef/false. On success, and
+# only then, it sets owned=1 and arms the hold deadline as its final act:
+# ownership and its wall-clock clock start together. Requires a commissioned record
 # (confess otherwise: an unregistered cluster lock would never be refreshed,
 # and a waiter would stale-reclaim it while held). Acquisition errors
 # originate here, in a frame where no caller code has ever run — no
@@ -579,6 +640,15 @@ sub _lock_acquire {
 # skipped) so queueing never lets an already-held outer lock go stale; and
 # no execution alarm — the body is not run here at all.
 #
+# Modes: the lock dir itself is the GATE. An exclusive holder takes the gate,
+# then waits (same budget) until no reader markers remain, and holds the gate
+# for the whole body. A shared holder takes the gate only long enough to
+# mkdir its own reader marker — a sibling dir under priv/lock, so pmxcfs
+# tracks and stale-expires it like any lock — and releases the gate at once;
+# the marker is what it holds and refreshes. The reader count is the number
+# of markers. A waiting writer holding the gate keeps new readers out, so
+# writers are not starved by a steady stream of status polls.
+#
 # Dies with the canonical "got lock request timeout" (machinery-prefixed).
 # Deliberately NOT the literal "got timeout": cluster contention must stay
 # out of joviandss_cmd's timeout-retry class and fail loud instead.
@@ -590,78 +660,73 @@ sub _lock_acquire_cluster {
     my $lockid   = File::Basename::basename($lockpath);
 
     my $prev_alarm = alarm(0);    # suspend the enclosing alarm for the WAIT only
-    my $got_lock   = 0;
+    my $queue;
 
     my $ok = eval {
         make_path($lockdir);
         die "pve cluster filesystem not online\n" if !-d $lockdir;
 
-        my $timeout_err = sub { die "got lock request timeout\n" };
-        local $SIG{ALRM} = $timeout_err;
+        local $SIG{ALRM} = sub { die "got lock request timeout\n" };
 
         my $deadline = time() + $lock->{acquire_timeout};
-        my $base     = OpenEJovianDSS::Common::PROXMOX_CLUSTER_POLL_BASE_SLEEP();
-
-        while (1) {
-            my $remaining = $deadline - time();
-            $timeout_err->() if $remaining <= 0;
 
-            alarm( int($remaining) + 1 );    # guard a wedged FUSE mkdir
-            $got_lock = mkdir($lockpath);    # atomic on pmxcfs
-            alarm(0);
-
-            if ($got_lock) {
-                $lock->{owned} = 1;    # ownership recorded at the syscall's
-                last;                  # success — see _lock_acquire
-            }
-
-            OpenEJovianDSS::Common::debugmsg($ctx, 'debug',
-                "waiting for joviandss lock '$lockid'");
-
-            utime(0, 0, $lockpath);          # signal pmxcfs to release a stale lock
-            refresh_locks($ctx, $lockpath);  # keep our held outer locks alive
-
-            # Deadline-aware pacing, jittered in EVERY case so contending
-            # nodes never poll in lockstep. Far from the deadline: linear
-            # backoff with a fixed jitter bound (desynchronises a long wait).
-            # Inside the final window: HALVE the interval each iteration down
-            # to the floor, with a jitter proportional to the (shrinking)
-            # interval, converging on aggressive polling that grabs the lock
-            # the instant it frees.
-            if ( $remaining
-                <= OpenEJovianDSS::Common::PROXMOX_CLUSTER_POLL_FINAL_WINDOW() )
-            {
-                Time::HiRes::sleep( $base );
-                $base = $base / 2;
-                $base = OpenEJovianDSS::Common::PROXMOX_CLUSTER_POLL_FINAL_SLEEP()
-                    if $base < OpenEJovianDSS::Common::PROXMOX_CLUSTER_POLL_FINAL_SLEEP();
-            }
-            else {
-                Time::HiRes::sleep(
-                    $base + rand(OpenEJovianDSS::Common::PROXMOX_CLUSTER_POLL_JITTER_MAX()) );
-                $base += OpenEJovianDSS::Common::PROXMOX_CLUSTER_POLL_BACKOFF_STEP();
-                $base  = OpenEJovianDSS::Common::PROXMOX_CLUSTER_POLL_SLEEP_CAP()
-                    if $base > OpenEJovianDSS::Common::PROXMOX_CLUSTER_POLL_SLEEP_CAP();
-            }
+        # Only the head of this node's queue polls pmxcfs; the rest block
+        # on a local flock until it has the lock (or gave up).
+        $queue = _lock_queue_enter( $ctx, $lock, $deadline );
+
+        _lock_cluster_poll( $ctx, $lock, $deadline, "joviandss lock '$lockid'",
+            sub {
+                mkdir($lockpath) or return 0;    # atomic on pmxcfs
+                $lock->{held}  = $lockpath;    # ownership recorded at the
+                $lock->{owned} = 1;            # syscall's success — see
+                return 1;                      # _lock_acquire
+            },
+            sub { utime(0, 0, $lockpath) } );  # signal pmxcfs to release a stale lock
+
+        if ( $lock->{mode} eq 'shared' ) {
+            my $marker = _lock_cluster_reader_marker($lockpath);
+            mkdir($marker) or -d $marker
+                or die "can't create reader marker '$marker' - $!\n";
+            $lock->{held} = $marker;    # ownership moves to the marker
+            rmdir($lockpath)
+                or OpenEJovianDSS::Common::debugmsg($ctx, 'warning',
+                       "rmdir of lock gate '$lockpath' failed — left for "
+                     . "stale reclaim");
+        }
+        else {
+            my @readers;
+            _lock_cluster_poll( $ctx, $lock, $deadline,
+                "readers of joviandss lock '$lockid'",
+                sub {
+                    @readers = _lock_cluster_readers($lockpath);
+                    return !@readers;
+                },
+                sub {
+                    utime(undef, undef, $lockpath);  # keep the gate alive
+                    utime(0, 0, @readers);            # reclaim dead readers
+                } );
         }
 
+        _lock_queue_leave($queue);           # hand off to the next local waiter
         PVE::Cluster::cfs_update();          # fresh cluster view for the body
         1;
     };
     my $err = $@;
+    _lock_queue_leave($queue) if $queue;     # failed while at the head
     alarm(0);
     alarm($prev_alarm) if $prev_alarm;       # wait over — enclosing alarm resumes
 
     if (!$ok) {
-        if (!$got_lock) {
+        if (!$lock->{owned}) {
             # Never acquired: distinguish quorum loss from plain contention.
             # Ref: PVE::Cluster::check_cfs_quorum (pve-cluster/src/PVE/Cluster.pm:116)
             my $st = File::stat::lstat("/etc/pve/local");
             $err = "no quorum!\n" if !($st && (($st->mode & 0200) != 0));
         }
-        # else: cfs_update died AFTER mkdir — owned is already set, so the
-        # sequencer's unconditional _lock_divest releases the dir; no local
-        # rollback needed.
+        # else: the reader wait, the marker mkdir or cfs_update died AFTER
+        # the gate mkdir — owned is already set and held names the dir to
+        # remove, so the sequencer's unconditional _lock_divest releases it;
+        # no local rollback needed.
         #
         # PVE::Exception objects re-raised as-is (mirrors $cfs_lock,
         # pve-cluster/src/PVE/Cluster.pm:662); plain machinery errors are
@@ -671,7 +736,181 @@ sub _lock_acquire_cluster {
     return;
 }
 
-# Node backend: exclusive flock, taken directly (decision 2026-07-05:
+# _lock_cluster_poll($ctx, $lock, $deadline, $what, $try, $poke)
+#
+# The cluster backend's wait loop: calls $try (under an alarm guarding a
+# wedged FUSE call) until it returns true, dying "got lock request timeout"
+# at $deadline. Between attempts $poke runs, every OTHER held lock is
+# refreshed, and the loop sleeps with deadline-aware jittered pacing. The
+# caller installs the SIGALRM handler.
+sub _lock_cluster_poll {
+    my ($ctx, $lock, $deadline, $what, $try, $poke) = @_;
+
+    my $base = OpenEJovianDSS::Common::PROXMOX_CLUSTER_POLL_BASE_SLEEP();
+
+    while (1) {
+        my $remaining = $deadline - time();
+        die "got lock request timeout\n" if $remaining <= 0;
+
+        alarm( int($remaining) + 1 );    # guard a wedged FUSE call
+        my $done = $try->();
+        alarm(0);
+        return if $done;
+
+        OpenEJovianDSS::Common::debugmsg($ctx, 'debug', "waiting for $what");
+
+        $poke->();
+        refresh_locks($ctx, $lock->{path});  # keep our held outer locks alive
+
+        # Deadline-aware pacing, jittered in EVERY case so contending
+        # nodes never poll in lockstep. Far from the deadline: linear
+        # backoff with a fixed jitter bound (desynchronises a long wait).
+        # Inside the final window: HALVE the interval each iteration down
+        # to the floor, with a jitter proportional to the (shrinking)
+        # interval, converging on aggressive polling that grabs the lock
+        # the instant it frees.
+        if ( $remaining
+            <= OpenEJovianDSS::Common::PROXMOX_CLUSTER_POLL_FINAL_WINDOW() )
+        {
+            Time::HiRes::sleep( $base );
+            $base = $base / 2;
+            $base = OpenEJovianDSS::Common::PROXMOX_CLUSTER_POLL_FINAL_SLEEP()
+                if $base < OpenEJovianDSS::Common::PROXMOX_CLUSTER_POLL_FINAL_SLEEP();
+        }
+        else {
+            Time::HiRes::sleep(
+                $base + rand(OpenEJovianDSS::Common::PROXMOX_CLUSTER_POLL_JITTER_MAX()) );
+            $base += OpenEJovianDSS::Common::PROXMOX_CLUSTER_POLL_BACKOFF_STEP();
+            $base  = OpenEJovianDSS::Common::PROXMOX_CLUSTER_POLL_SLEEP_CAP()
+                if $base > OpenEJovianDSS::Common::PROXMOX_CLUSTER_POLL_SLEEP_CAP();
+        }
+    }
+}
+
+# Reader marker of this process for a cluster lock: unique per host and pid,
+# and a direct child of the lock dir's parent so pmxcfs tracks its ltime.
+sub _lock_cluster_reader_marker {
+    my ($lockpath) = @_;
+
+    my ($host) = Sys::Hostname::hostname() =~ /^([\w\-]+)/;    # short name, untainted
+    $host //= 'localhost';
+    return "${lockpath}.reader.${host}.$$";
+}
+
+# Reader markers currently registered for a cluster lock (full paths).
+sub _lock_cluster_readers {
+    my ($lockpath) = @_;
+
+    my $lockdir = File::Basename::dirname($lockpath);
+    my $prefix  = File::Basename::basename($lockpath) . '.reader.';
+
+    opendir( my $dh, $lockdir ) or return ();
+    my @readers = map { "$lockdir/$_" }
+                  grep { index( $_, $prefix ) == 0 } readdir($dh);
+    closedir($dh);
+    return @readers;
+}
+
+# _lock_queue_enter($ctx, $lock, $deadline) -> $queue
+#
+# Node-local FIFO in front of a cluster lock, so N local waiters put one
+# poller on pmxcfs instead of N. Each waiter draws a ticket from the queue's
+# .seq counter and parks an flock-held entry file named after it; it then
+# blocks on an flock of its predecessor's entry, which the kernel grants
+# the moment that waiter leaves — or dies, which is why a granted
+# predecessor is unlinked here rather than trusted to clean up. The entry
+# is created and locked under the .seq lock, so a successor can never see
+# it unlocked. Returns once no predecessor is left; the caller then owns
+# the pmxcfs poll and must _lock_queue_leave when done either way. Dies
+# "got lock request timeout" at $deadline, like the poll it fronts.
+sub _lock_queue_enter {
+    my ($ctx, $lock, $deadline) = @_;
+
+    my $qdir = _lock_queue_dir() . '/'
+             . File::Basename::basename( $lock->{path} );
+    make_path($qdir);
+
+    open( my $seq_fh, '+>>', "$qdir/.seq" )
+        or die "can't open lock queue '$qdir' - $!\n";
+    flock( $seq_fh, LOCK_EX ) or die "can't lock queue '$qdir' - $!\n";
+    seek( $seq_fh, 0, 0 );
+    my ($last) = ( <$seq_fh> // '' ) =~ /^(\d+)/;    # untainted
+    my $ticket = ( $last // 0 ) + 1;
+
+    my $entry = sprintf( "%s/%012d.%d", $qdir, $ticket, $$ );
+    open( my $fh, '>', $entry )
+        or die "can't create lock queue entry '$entry' - $!\n";
+    flock( $fh, LOCK_EX ) or die "can't lock queue entry '$entry' - $!\n";
+
+    truncate( $seq_fh, 0 );
+    print {$seq_fh} "$ticket\n";
+    close($seq_fh);                                 # flushes, then unlocks
+
+    my $queue = { entry => $entry, fh => $fh };
+    my $ok = eval {
+        while ( defined( my $pred = _lock_queue_predecessor( $qdir, $entry ) ) ) {
+            my $remaining = $deadline - time();
+            die "got lock request timeout\n" if $remaining <= 0;
+
+            open( my $pfh, '<', $pred ) or next;    # left meanwhile
+            my $slice = $remaining < LOCK_QUEUE_WAIT_SLICE
+                      ? $remaining : LOCK_QUEUE_WAIT_SLICE;
+            my $granted = eval {
+                PVE::Tools::run_with_timeout( $slice,
+                    sub { flock( $pfh, LOCK_SH ) or die "flock failed - $!\n" } );
+                1;
+            };
+            my $err = $@;
+            close($pfh);
+            if ($granted) {
+                unlink($pred);    # left (already gone) or died (stale)
+                next;
+            }
+            die $err if $err !~ /got timeout/;
+
+            OpenEJovianDSS::Common::debugmsg( $ctx, 'debug',
+                "waiting in node queue for joviandss lock '"
+              . File::Basename::basename( $lock->{path} ) . "'" );
+            refresh_locks( $ctx, $lock->{path} );  # keep our held outer locks alive
+        }
+        1;
+    };
+    if ( !$ok ) {
+        my $err = $@;
+        _lock_queue_leave($queue);
+        die $err;
+    }
+    return $queue;
+}
+
+# Leave the node queue: the unlink comes first so a successor woken by the
+# close never finds the entry. Never dies; idempotent.
+sub _lock_queue_leave {
+    my ($queue) = @_;
+
+    my $fh = delete $queue->{fh} or return;
+    unlink( $queue->{entry} );
+    close($fh);
+    return;
+}
+
+# Entry just ahead of $entry in its queue dir (full path), or undef when
+# $entry is the head. Ticket names are zero-padded, so string order is
+# queue order.
+sub _lock_queue_predecessor {
+    my ($qdir, $entry) = @_;
+
+    my $mine = File::Basename::basename($entry);
+    opendir( my $dh, $qdir ) or return undef;
+    my ($pred) = sort { $b cmp $a }
+                 grep { $_ lt $mine }
+                 map  { /^(\d{12}\.\d+)$/ ? $1 : () } readdir($dh);    # untainted
+    closedir($dh);
+    return defined($pred) ? "$qdir/$pred" : undef;
+}
+
+# Node backend: flock — LOCK_EX, or LOCK_SH for a shared record — taken
+# directly (decision 2026-07-05:
 # PVE::Tools::lock_file is a run-callback wrapper and cannot express a
 # separable acquire; its per-PID re-entry counter is unreachable behind our
 # guard, and its internal 10 s timeout default is unreachable behind
@@ -692,7 +931,8 @@ sub _lock_acquire_node {
 
     my $ok = eval {
         PVE::Tools::run_with_timeout( $lock->{acquire_timeout},
-            sub { flock( $fh, LOCK_EX ) or die "flock failed - $!\n" } );
+            sub { flock( $fh, $lock->{mode} eq 'shared' ? LOCK_SH : LOCK_EX )
+                      or die "flock failed - $!\n" } );
         1;
     };
     if (!$ok) {
@@ -706,7 +946,58 @@ sub _lock_acquire_node {
     return;
 }
 
-# _lock_divest($ctx, $lock_id) — end exclusive ownership. NEVER dies (it
+# Class and caller of the with_lock in progress, for _lock_stats_record
+# (localized per call; undef when _lock_exec is entered directly).
+our $_lock_stats_label;
+
+# _lock_stats_record($backend, $mode, $t_start, $t_acquired, $t_end, $outcome)
+#
+# Append one tab-separated line per lock to the node's stats file:
+#
+#   epoch pid class backend mode outcome wait_s hold_s caller
+#
+# wait_s is commission to acquisition (or to the failed acquire), hold_s
+# acquisition to release, '-' if the lock was never acquired. outcome is
+# ok, failed (the body died), timeout (acquire contention) or error. A
+# single O_APPEND write keeps concurrent writers' lines whole. NEVER dies:
+# statistics must not fail a lock.
+sub _lock_stats_record {
+    my ($backend, $mode, $t_start, $t_acquired, $t_end, $outcome) = @_;
+
+    my $label = $_lock_stats_label // {};
+    my $line  = sprintf( "%d\t%d\t%s\t%s\t%s\t%s\t%.3f\t%s\t%s\n",
+        $t_start, $$, $label->{class} // '-', $backend, $mode, $outcome,
+        ( $t_acquired // $t_end ) - $t_start,
+        defined($t_acquired) ? sprintf( "%.3f", $t_end - $t_acquired ) : '-',
+        $label->{caller} // '-' );
+
+    eval {
+        my $file = _lock_stats_file();
+        make_path( File::Basename::dirname($file) );
+        rename( $file, "$file.1" )
+            if ( -s $file // 0 ) > LOCK_STATS_MAX_SIZE;
+        sysopen( my $fh, $file, O_WRONLY | O_APPEND | O_CREAT, 0644 ) or return;
+        syswrite( $fh, $line );
+        close($fh);
+    };
+    return;
+}
+
+# Name the code a lock is taken for: the outermost plugin method on the
+# stack (e.g. OpenEJovianDSSPlugin::activate_volume), else the sub that
+# called with_lock.
+sub _lock_stats_caller {
+    my ($first, $method);
+    for ( my $i = 1; my @frame = caller($i); $i++ ) {
+        my $sub = $frame[3];
+        next if $sub =~ /^OpenEJovianDSS::Lock::|::__ANON__$|^\(eval\)$/;
+        $first //= $sub;
+        $method = "$1::$2" if $sub =~ /::(OpenEJovianDSS\w*Plugin)::(\w+)$/;
+    }
+    return $method // $first // 'main';
+}
+
+# _lock_divest($ctx, $lock_id) — end ownership. NEVER dies (it
 # runs on unwind paths where a die would mask the original error): failures
 # are warned and the artifact is left to the backend's own recovery — a
 # leftover pmxcfs dir is stale-reclaimed via waiters' utime(0,0) pokes, a
@@ -725,15 +1016,16 @@ sub _lock_divest {
         my $ok = eval {
             local $SIG{ALRM} = sub { die "got timeout\n" };
             alarm( LOCK_DIVEST_GUARD_TIMEOUT );
-            rmdir $lock->{path};
+            rmdir $lock->{held};
             alarm(0);
             1;
         };
         alarm(0);
         alarm($prev) if $prev;
         eval { OpenEJovianDSS::Common::debugmsg($ctx, 'warning',
-            "rmdir of lock '$lock->{path}' failed — left for stale reclaim") }
-            if !$ok || -d $lock->{path};
+            "rmdir of lock '$lock->{held}' failed — left for stale reclaim") }
+            if !$ok || -d $lock->{held};
+        $lock->{held} = undef;
     }
     else {
         close( $lock->{fh} ) if $lock->{fh};    # kernel drops the flock
@@ -749,8 +1041,8 @@ sub _lock_divest {
 # The explicit-path lock primitive — the phase sequencer
 # ---------------------------------------------------------------------------
 
-# _lock_exec($ctx, $backend, $path, $timeout, $max_hold, $code, @param)
-# Exclusive only. Two nested brackets, each with a single owner: OUTER
+# _lock_exec($ctx, $backend, $path, $mode, $timeout, $max_hold, $code, @param)
+# Two nested brackets, each with a single owner: OUTER
 # bookkeeping (commission → decommission, the latter a never-dying finalizer
 # that runs on every path) and INNER ownership (acquire → divest — divest
 # runs explicitly for both anticipated outcomes, success and body death, so
@@ -758,11 +1050,14 @@ sub _lock_divest {
 # policy is frozen into the registry record at commission; every later phase
 # reads the record and is never handed a number.
 sub _lock_exec {
-    my ($ctx, $backend, $path, $timeout, $max_hold, $code, @param) = @_;
+    my ($ctx, $backend, $path, $mode, $timeout, $max_hold, $code, @param) = @_;
 
     # registry + re-entry guard; commissioned = registered, NOT owned
-    my $lock_id = _lock_ctx_commission($ctx, $backend, $path, $timeout, $max_hold);
+    my $lock_id = _lock_ctx_commission($ctx, $backend, $path, $mode,
+                                       $timeout, $max_hold);
 
+    my $t_start = Time::HiRes::time();
+    my $t_acquired;
     my $res;
     my $ok = eval {
         # blocks per the record; dies on failure; the backend flips owned=1
@@ -774,6 +1069,7 @@ sub _lock_exec {
         Carp::confess( "LOCK BUG: acquired '" . ( $lock_id_acquired // 'undef' )
                      . "' != commissioned '$lock_id'" )
             if !defined($lock_id_acquired) || $lock_id_acquired ne $lock_id;
+        $t_acquired = Time::HiRes::time();
 
         $res = run_bounded($ctx, $lock_id,
                  sub { run_refreshed($ctx, $code, @param) });
@@ -786,6 +1082,13 @@ sub _lock_exec {
     # it must be (the lock dir/flock belongs to the CURRENT holder).
     _lock_divest($ctx, $lock_id);
 
+    _lock_stats_record( $backend, $mode, $t_start, $t_acquired,
+        Time::HiRes::time(),
+          $ok                         ? 'ok'
+        : defined($t_acquired)        ? 'failed'     # the body died
+        : lock_error_acquire($err)    ? 'timeout'
+        :                               'error' );
+
     _lock_ctx_decommission($ctx, $lock_id);   # FINALIZER — never dies; a
                                               # divest in there means an
                                               # impossible path executed
@@ -809,9 +1112,10 @@ sub _lock_exec {
 #                auto-refreshed around it — the caller never refreshes manually)
 #   @param       trailing args forwarded to $code
 #
-# All locks are exclusive. Returns the result of $code; dies on failure
-# (acquisition or $code). The lock is always released before an error
-# propagates.
+# The lock is taken in its class's mode (<lock_class>_lock_mode → per-class
+# default): exclusive, or shared for the read tier. Returns the result of
+# $code; dies on failure (acquisition or $code). The lock is always released
+# before an error propagates.
 sub with_lock {
     my ($ctx, $lock_class, $id, $timeout, $code, @param) = @_;
 
@@ -819,10 +1123,15 @@ sub with_lock {
         if !exists LOCK_DEFAULT_TYPE->{$lock_class};
 
     my $type     = get_lock_class_type($ctx, $lock_class);              # scope
+    my $mode     = get_lock_class_mode($ctx, $lock_class);              # exclusive / shared
     $timeout   //= get_lock_class_acquire_timeout($ctx, $lock_class);   # wait-to-acquire
     my $max_hold = get_lock_class_hold_timeout($ctx, $lock_class);      # hold cap (alarm + deadline)
     my ($backend, $path) = _lock_resolve($ctx, $type, $lock_class, $id);
-    return _lock_exec($ctx, $backend, $path, $timeout, $max_hold, $code, @param);
+
+    local $_lock_stats_label = { class  => $lock_class,
+                                 caller => _lock_stats_caller() };
+    return _lock_exec($ctx, $backend, $path, $mode, $timeout, $max_hold,
+                      $code, @param);
 }
 
 1;
@@ -50,10 +50,18 @@ our @EXPORT_OK = qw(
     snapshot_unpublish
     snapshot_deactivate_unpublish
     all_snapshots_deactivate_unpublish
+    snapshot_mount_activate
+    snapshot_mount_get
+    snapshot_mount_put
+    snapshot_mount_release
+    snapshot_mounts_idle
+    snapshot_mount_reap
 
     mount
     umount
     path_is_mnt
+    mountinfo
+    mountinfo_invalidate
     parse_export_path
     nas_private_mounts_volname_snapname
 
@@ -121,13 +129,14 @@ sub snapshots_info {
     my $pool = pool_name_get( $scfg );
 
     # Use -d flag because dataset name from export property is the exact dataset name on JovianDSS
-    my $output = OpenEJovianDSS::Common::joviandss_cmd(
-        $ctx,
-        [
-            'pool', $pool, 'nas_volume', '-d', $dataset,
-            'snapshots', 'list', '--guid', '--creation'
-        ]
-    );
+    my $cmd = [
+        'pool', $pool, 'nas_volume', '-d', $dataset,
+        'snapshots', 'list', '--guid', '--creation'
+    ];
+    # Let the appliance list only this VM's snapshots
+    push @$cmd, '--prefix', "${vmid}_" if defined($vmid);
+
+    my $output = OpenEJovianDSS::Common::joviandss_cmd( $ctx, $cmd );
 
     my $snapshots = {};
     my @lines = split( /\n/, $output );
@@ -220,6 +229,7 @@ sub snapshot_activate {
         "snapshot_activate: mounting ${server}:${sharepath}"
         . " at ${snapmntpath} options='${optstr}'\n" );
 
+    mountinfo_invalidate($ctx);
     run_command( $nfs_mount_cmd,
                 outfunc => sub {},
                 errfunc => sub { cmd_log_output($ctx, 'error', $nfs_mount_cmd, shift); }
@@ -322,11 +332,200 @@ sub snapshot_deactivate_unpublish {
         }
     }
     if ($no_error == 1) {
+        unlink( _snapshot_mount_entry_path( $ctx, $vmid, $volname, $snapname ) );
         return 1;
     }
     die "Failed to detach deactivate snapshot: ${err}\n";
 }
 
+# Published and mounted snapshot clones are kept in a per node registry,
+# one file per clone holding "<refs> <last use epoch> <share path>", with
+# " activated" appended while activate_volume has it in use.
+# snapshot_mount_get/snapshot_mount_put count the rollbacks using a clone.
+# Activations are not counted, PVE does not pair activate_volume with
+# deactivate_volume: snapshot_mount_activate marks the clone and
+# snapshot_mount_release removes it whatever the count. A clone that
+# nobody uses stays in place for snapshot_mount_idle_timeout seconds and is
+# then removed by snapshot_mount_reap. Callers hold the vm lock.
+sub _snapshot_mounts_dir { '/run/joviandss/nfs-snapshot-mounts' }
+
+sub _snapshot_mount_entry_path {
+    my ( $ctx, $vmid, $volname, $snapname ) = @_;
+
+    return OpenEJovianDSS::Common::safe_word(
+        join( '/', _snapshot_mounts_dir(), $ctx->{storeid},
+            $vmid, $volname, $snapname ),
+        'snapshot mount registry path' );
+}
+
+sub _snapshot_mount_entry_read {
+    my ($file) = @_;
+
+    open( my $fh, '<', $file ) or return undef;
+    my $line = <$fh>;
+    close($fh);
+
+    return undef
+        if !defined($line) || $line !~ /^(\d+) (\d+) (\S+)( activated)?$/;
+    return { refs => $1, last_used => $2, sharepath => $3,
+             activated => $4 ? 1 : 0 };
+}
+
+sub _snapshot_mount_entry_write {
+    my ( $file, $entry ) = @_;
+
+    make_path( dirname($file) );
+    my $tmp = "${file}.tmp.$$";
+    open( my $fh, '>', $tmp ) or die "Unable to write ${tmp}: $!\n";
+    print $fh "$entry->{refs} $entry->{last_used} $entry->{sharepath}"
+        . ( $entry->{activated} ? ' activated' : '' ) . "\n";
+    close($fh) or die "Unable to write ${tmp}: $!\n";
+    rename( $tmp, $file ) or die "Unable to rename ${tmp} to ${file}: $!\n";
+}
+
+# Publish and mount snapshot, or reuse the clone mounted earlier, and
+# record $update (refs or activated) in its registry entry. Returns the
+# mount path and the share path.
+sub _snapshot_mount_take {
+    my ( $ctx, $pool, $datname, $vmid, $volname, $snapname, $update ) = @_;
+
+    my $file  = _snapshot_mount_entry_path( $ctx, $vmid, $volname, $snapname );
+    my $entry = _snapshot_mount_entry_read($file);
+
+    if ( defined($entry) ) {
+        my $snapmntpath = OpenEJovianDSS::Common::safe_word(
+            OpenEJovianDSS::Common::get_path($ctx) . '/'
+              . nas_private_mounts_volname_snapname( $vmid, $volname, $snapname ),
+            'snapshot mount path' );
+        my $server = OpenEJovianDSS::Common::get_data_address($ctx);
+
+        if ( -d $snapmntpath
+            && path_is_nfs( $ctx, $snapmntpath, $entry->{sharepath}, $server ) )
+        {
+            OpenEJovianDSS::Common::debugmsg( $ctx, "debug",
+                "Reusing volume ${volname} snapshot ${snapname} mounted at "
+                . "${snapmntpath}, users $entry->{refs}\n" );
+            _snapshot_mount_entry_write( $file,
+                { %$entry, $update->($entry), last_used => time() } );
+            return ( $snapmntpath, $entry->{sharepath} );
+        }
+        OpenEJovianDSS::Common::debugmsg( $ctx, "debug",
+            "Volume ${volname} snapshot ${snapname} is no longer mounted, "
+            . "publishing it again\n" );
+    }
+    $entry //= { refs => 0, activated => 0 };
+
+    my $sharepath = snapshot_publish( $ctx, $datname, $volname, $snapname );
+    my $snapmntpath = eval {
+        snapshot_activate( $ctx, $pool, $datname, $vmid, $volname, $snapname,
+            $sharepath );
+    };
+    my $err = $@;
+    if ($err) {
+        unlink($file);
+        eval { snapshot_unpublish( $ctx, $datname, $volname, $snapname ); };
+        my $errup = $@;
+        if ($errup) {
+            die "Failed to activate volume ${volname} snapshot ${snapname}: ${err}"
+                . "Recovery failed: ${errup}"
+                . "Remove share ${sharepath} manually\n";
+        }
+        die "Failed to activate volume ${volname} snapshot ${snapname}: ${err}";
+    }
+
+    _snapshot_mount_entry_write( $file,
+        { %$entry, $update->($entry), last_used => time(),
+          sharepath => $sharepath } );
+    return ( $snapmntpath, $sharepath );
+}
+
+# Take the clone for a rollback, counted until snapshot_mount_put.
+sub snapshot_mount_get {
+    my ( $ctx, $pool, $datname, $vmid, $volname, $snapname ) = @_;
+
+    return _snapshot_mount_take( $ctx, $pool, $datname, $vmid, $volname,
+        $snapname, sub { refs => $_[0]{refs} + 1 } );
+}
+
+# Take the clone for activate_volume. Repeated activations reuse it and
+# count nothing; snapshot_mount_release removes it.
+sub snapshot_mount_activate {
+    my ( $ctx, $pool, $datname, $vmid, $volname, $snapname ) = @_;
+
+    return _snapshot_mount_take( $ctx, $pool, $datname, $vmid, $volname,
+        $snapname, sub { activated => 1 } );
+}
+
+# Release a clone taken with snapshot_mount_get. The last user unmounts and
+# unpublishes it right away unless it is activated or
+# snapshot_mount_idle_timeout is set.
+sub snapshot_mount_put {
+    my ( $ctx, $datname, $vmid, $volname, $snapname ) = @_;
+
+    my $file  = _snapshot_mount_entry_path( $ctx, $vmid, $volname, $snapname );
+    my $entry = _snapshot_mount_entry_read($file);
+
+    if ( defined($entry) ) {
+        $entry->{refs}-- if $entry->{refs} > 0;
+        $entry->{last_used} = time();
+        if ( $entry->{refs} > 0 || $entry->{activated}
+            || OpenEJovianDSS::Common::get_snapshot_mount_idle_timeout($ctx) > 0 )
+        {
+            _snapshot_mount_entry_write( $file, $entry );
+            return 1;
+        }
+    }
+    return snapshot_deactivate_unpublish( $ctx, $datname, $vmid, $volname,
+        $snapname );
+}
+
+# Release a clone for deactivate_volume: unmount and unpublish it however
+# many times it was activated.
+sub snapshot_mount_release {
+    my ( $ctx, $datname, $vmid, $volname, $snapname ) = @_;
+
+    return snapshot_deactivate_unpublish( $ctx, $datname, $vmid, $volname,
+        $snapname );
+}
+
+# Clones of this storage that nobody uses and that were idle for longer
+# than snapshot_mount_idle_timeout, as [ vmid, volname, snapname ] lists.
+sub snapshot_mounts_idle {
+    my ($ctx) = @_;
+
+    my $idle = OpenEJovianDSS::Common::get_snapshot_mount_idle_timeout($ctx);
+    my $now  = time();
+    my @idle;
+    for my $file ( glob( _snapshot_mounts_dir() . "/$ctx->{storeid}/*/*/*" ) ) {
+        next if $file !~ m{/([-\w.]+)/([-\w.]+)/([-\w.]+)$};
+        my ( $vmid, $volname, $snapname ) = ( $1, $2, $3 );
+        next if $snapname =~ /\.tmp\.\d+$/;
+
+        my $entry = _snapshot_mount_entry_read($file);
+        next if !defined($entry);
+        next if $entry->{refs} > 0 || $entry->{activated}
+            || $entry->{last_used} + $idle > $now;
+        push @idle, [ $vmid, $volname, $snapname ];
+    }
+    return @idle;
+}
+
+# Unmount and unpublish clone if it is still idle. Returns 1 if it was
+# removed.
+sub snapshot_mount_reap {
+    my ( $ctx, $datname, $vmid, $volname, $snapname ) = @_;
+
+    my $still_idle = grep {
+        $_->[0] eq $vmid && $_->[1] eq $volname && $_->[2] eq $snapname
+    } snapshot_mounts_idle($ctx);
+    return 0 if !$still_idle;
+
+    OpenEJovianDSS::Common::debugmsg( $ctx, "debug",
+        "Removing idle volume ${volname} snapshot ${snapname} clone\n" );
+    snapshot_deactivate_unpublish( $ctx, $datname, $vmid, $volname, $snapname );
+    return 1;
+}
+
 # NAS volume deactivation for NFS snapshot rollback cleanup
 # Unmounts share and unpublishes snapshot (deletes share and clone)
 sub all_snapshots_deactivate_unpublish {
@@ -380,6 +579,73 @@ sub all_snapshots_deactivate_unpublish {
 }
 
 
+sub _mountinfo_file { '/proc/self/mountinfo' }
+
+# Undo the octal escapes the kernel puts in mountinfo paths (\040 for a
+# space, \011, \012, \134).
+sub _mountinfo_unescape {
+    my ($field) = @_;
+
+    $field =~ s/\\([0-7]{3})/chr(oct($1))/ge;
+    return $field;
+}
+
+# The mount table of this process as { <mount point> => { fstype, source } },
+# read from /proc/self/mountinfo once per $ctx and kept until
+# mountinfo_invalidate(). Of mounts stacked on one point the last, visible
+# one is kept. Returns undef if the table can not be read, callers then
+# fall back to findmnt/mountpoint.
+sub mountinfo {
+    my ($ctx) = @_;
+
+    return $ctx->{_mountinfo} if defined( $ctx->{_mountinfo} );
+
+    my $fh;
+    if ( !open( $fh, '<', _mountinfo_file() ) ) {
+        OpenEJovianDSS::Common::debugmsg( $ctx, "debug",
+            "Unable to read " . _mountinfo_file() . ": $!\n" );
+        return undef;
+    }
+
+    my $table = {};
+    while ( my $line = <$fh> ) {
+        chomp $line;
+        # <id> <parent> <maj:min> <root> <mount point> <options>
+        # [<optional fields>...] - <fstype> <source> <super options>
+        my ( $mounted, $fs ) = split( / - /, $line, 2 );
+        next if !defined($fs);
+        my @m = split( / /, $mounted );
+        my ( $fstype, $source ) = split( / /, $fs );
+        next if @m < 6 || !defined($source);
+
+        $table->{ _mountinfo_unescape( $m[4] ) } = {
+            fstype => $fstype,
+            source => _mountinfo_unescape($source),
+        };
+    }
+    close($fh);
+
+    $ctx->{_mountinfo} = $table;
+    return $table;
+}
+
+sub mountinfo_invalidate {
+    my ($ctx) = @_;
+
+    delete $ctx->{_mountinfo};
+}
+
+# Mount table entry of path, undef if path is not a mount point, or the
+# empty list if the table can not be read.
+sub _mountinfo_entry {
+    my ( $ctx, $path ) = @_;
+
+    my $table = mountinfo($ctx);
+    return () if !defined($table);
+
+    return $table->{ File::Spec->canonpath($path) };
+}
+
 sub path_is_mnt {
     my ( $ctx, $path ) = @_;
 
@@ -387,6 +653,9 @@ sub path_is_mnt {
 
     return 0 if ( ! -d $path_safe );
 
+    my @entry = _mountinfo_entry( $ctx, $path_safe );
+    return defined( $entry[0] ) ? 1 : 0 if @entry;
+
     my $findmnt_cmd;
     my $rc = 1;
 
@@ -460,6 +729,12 @@ sub path_is_nfs {
 
     # TODO: consider extending this function with check for IP
     # and share name
+    my @entry = _mountinfo_entry( $ctx, $snapmntpath );
+    if (@entry) {
+        return 0 if !defined( $entry[0] );
+        return _nfs_fs_matches( $entry[0], $sharepath, $shareip );
+    }
+
     my $json_out = '';
 
     my $cmd = [ '/usr/bin/findmnt',
@@ -487,7 +762,15 @@ sub path_is_nfs {
 
     return 0 if ( $@ || ref($j) ne 'HASH' || ref($j->{filesystems}) ne 'ARRAY' );
     return 0 if ( !@{ $j->{filesystems} } );
-    my $fs = $j->{filesystems}[0];
+
+    return _nfs_fs_matches( $j->{filesystems}[0], $sharepath, $shareip );
+}
+
+# Check that the filesystem { fstype, source } is an NFS mount of
+# $shareip:$sharepath; either of those is only checked when defined.
+sub _nfs_fs_matches {
+    my ( $fs, $sharepath, $shareip ) = @_;
+
     return 0 if ( !defined($fs->{fstype}) || $fs->{fstype} !~ /^nfs/ );
 
     if ( defined( $sharepath ) || defined( $shareip ) ) {
@@ -535,6 +818,7 @@ sub mount {
     push @$cmd, $source;
     push @$cmd, OpenEJovianDSS::Common::safe_word($sharemntpath, 'Share storage path');
 
+    mountinfo_invalidate($ctx);
     run_command($cmd, errmsg => "mount error");
 }
 
@@ -567,6 +851,7 @@ sub umount {
     for (my $i = 0; $i < 3; $i++) {
         my $cmd = [ '/bin/umount', $mntclean ];
         my $exitcode;
+        mountinfo_invalidate($ctx);
         eval {
             $exitcode = run_command(
                 $cmd,
@@ -601,6 +886,7 @@ sub umount {
     }
     my $cmd = [ '/bin/umount', '-l', $mntclean ];
 
+    mountinfo_invalidate($ctx);
     eval {
         my $exitcode = run_command(
             $cmd,
@@ -129,6 +129,8 @@ sub options {
         jdssc_info_lock_path               => { optional => 1 },
         jdssc_info_lock_acquire_timeout    => { optional => 1 },
         jdssc_info_lock_hold_timeout       => { optional => 1 },
+        jdssc_info_lock_mode               => { optional => 1 },
+        snapshot_mount_idle_timeout        => { optional => 1 },
         ssl_cert_verify         => { optional => 1 },
         debug                   => { optional => 1 },
         log_file                => { optional => 1 },
@@ -233,9 +235,38 @@ sub status {
     return undef
       if !OpenEJovianDSS::NFSCommon::path_is_nfs($ctx, $path, $export, $server );
 
+    _snapshot_mounts_reap( $class, $ctx );
+
     return $class->SUPER::status($storeid, $scfg, $cache);
 }
 
+# Remove snapshot clones kept mounted past snapshot_mount_idle_timeout.
+# Runs with the periodic status check, so a busy vm lock is skipped rather
+# than waited for.
+sub _snapshot_mounts_reap {
+    my ( $class, $ctx ) = @_;
+
+    my @idle = OpenEJovianDSS::NFSCommon::snapshot_mounts_idle($ctx);
+    return if !@idle;
+
+    my $datname = OpenEJovianDSS::NFSCommon::dataset_name_get( $ctx->{scfg} );
+    for my $clone (@idle) {
+        my ( $vmid, $name, $snapname ) = @$clone;
+        eval {
+            OpenEJovianDSS::Lock::with_lock(
+                $ctx, 'vm', $vmid, 1,
+                sub {
+                    OpenEJovianDSS::NFSCommon::snapshot_mount_reap( $ctx,
+                        $datname, $vmid, $name, $snapname );
+                },
+            );
+        };
+        OpenEJovianDSS::Common::debugmsg( $ctx, "debug",
+            "Removing idle volume ${name} snapshot ${snapname} clone "
+            . "postponed: $@" ) if $@;
+    }
+}
+
 sub get_identity {
     my ($class, $scfg, $storeid) = @_;
 
@@ -453,6 +484,10 @@ sub _volume_snapshot_rollback_lock {
     return $res;
 }
 
+# Path of the parallel sparse copy tool, a sub so the tests can point it
+# elsewhere.
+sub _snapshot_copy_tool { '/usr/sbin/joviandss-copy' }
+
 sub _volume_snapshot_rollback {
     my ( $class, $ctx, $volname, $snapname ) = @_;
 
@@ -467,34 +502,14 @@ sub _volume_snapshot_rollback {
     OpenEJovianDSS::Common::debugmsg( $ctx, "debug",
         "Rolling back volume ${name} volname ${volname} to snapshot ${snapname}\n" );
 
-    my $sharepath = OpenEJovianDSS::NFSCommon::snapshot_publish($ctx,
-            $datname, $name, $snapname );
+    # Publish snapshot and mount it, or reuse the clone still mounted
+    # by an earlier rollback
+    my ( $snapmntpath, $sharepath ) =
+        OpenEJovianDSS::NFSCommon::snapshot_mount_get( $ctx,
+            $pool, $datname, $vmid, $name, $snapname );
 
     OpenEJovianDSS::Common::debugmsg( $ctx, "debug",
-        "Snapshot ${snapname} published as NFS share: '${sharepath}'\n" );
-
-    # Activate snapshot and mount it
-    my $snapmntpath;
-    eval {
-        $snapmntpath = OpenEJovianDSS::NFSCommon::snapshot_activate($ctx,
-            $pool, $datname, $vmid, $name, $snapname, $sharepath );
-    };
-    my $err = $@;
-    if ( $err ) {
-        eval{
-           OpenEJovianDSS::NFSCommon::snapshot_unpublish( $ctx,
-               $datname, $name, $snapname );
-        };
-        my $errup = $@;
-        if ($errup) {
-            die "Fail to unpublish: ${errup} after failed activation ${err}\n";
-        } else {
-            die "Failed to activate: $err\n";
-        }
-    }
-
-    OpenEJovianDSS::Common::debugmsg( $ctx, "debug",
-        "Snapshot ${snapname} NFS share mounted at: '${snapmntpath}'\n" );
+        "Snapshot ${snapname} NFS share '${sharepath}' mounted at: '${snapmntpath}'\n" );
 
     # Here we have share active and mounted
 
@@ -620,11 +635,16 @@ sub _volume_snapshot_rollback {
 
         my $copy_cmd;
         if ( !defined($format) || $format eq 'raw' ) {
-            # Raw image: block-level sparse copy
+            # Raw image: sparse copy in parallel streams, skipped if the
+            # image did not change since the snapshot. Where the tool is
+            # not installed dd does a block-level sparse copy.
+            my $copy_tool = _snapshot_copy_tool();
             $copy_cmd = [
                 'systemd-run', '--scope', '-p', 'IOWeight=10',
-                'dd', "if=${snap_path}", "of=${vol_path}",
-                'bs=1M', 'conv=sparse', 'status=progress',
+                -x $copy_tool
+                  ? ( $copy_tool, $snap_path, $vol_path )
+                  : ( 'dd', "if=${snap_path}", "of=${vol_path}",
+                      'bs=1M', 'conv=sparse', 'status=progress' ),
             ];
         } else {
             # Structured format (qcow2, vmdk): use qemu-img to preserve
@@ -646,36 +666,22 @@ sub _volume_snapshot_rollback {
     };
     my $copy_err = $@;
 
+    # Unmounts and unpublishes the clone, unless it is kept for reuse
     eval {
-        OpenEJovianDSS::NFSCommon::snapshot_deactivate( $ctx,
+        OpenEJovianDSS::NFSCommon::snapshot_mount_put( $ctx,
                 $datname, $vmid, $name, $snapname );
     };
-    my $deactivate_err = $@;
+    my $release_err = $@;
 
-    if ($deactivate_err) {
+    if ($release_err) {
         if ($copy_err) {
-            die "Failed to umount volume ${volname} snapshot ${snapname} from ${snapmntpath} err: ${deactivate_err} "
+            die "Failed to release volume ${volname} snapshot ${snapname} mounted at ${snapmntpath} err: ${release_err} "
                 . "After failed volume rollback: ${copy_err}. "
-                . "Please conduct manual unmounting of folder ${snapmntpath} "
-                . "Please conduct manual share ${sharepath} removal on the side JovianDSS storage.\n";
-        } else {
-            die "Failed to umount volume ${volname} snapshot ${snapname} from ${snapmntpath} "
                 . "Please conduct manual unmounting of folder ${snapmntpath}. "
                 . "Please conduct manual share ${sharepath} removal on the side JovianDSS storage.\n";
-        }
-    }
-    eval{
-       OpenEJovianDSS::NFSCommon::snapshot_unpublish( $ctx,
-           $datname, $name, $snapname );
-    };
-    my $errup = $@;
-    if ($errup) {
-        if ($copy_err) {
-            die "Failed to remove share ${sharepath} representing volume ${volname} snapshot ${snapname}: ${errup}, "
-                . "after failed restore operation: ${copy_err}. "
-                . "Please conduct manual share ${sharepath} removal on the side JovianDSS storage.\n";
         } else {
-            die "Failed to remove share ${sharepath} representing volume ${volname} snapshot ${snapname}: ${errup}. "
+            die "Failed to release volume ${volname} snapshot ${snapname} mounted at ${snapmntpath} err: ${release_err} "
+                . "Please conduct manual unmounting of folder ${snapmntpath}. "
                 . "Please conduct manual share ${sharepath} removal on the side JovianDSS storage.\n";
         }
     }
@@ -805,30 +811,8 @@ sub _activate_volume {
         return 1;
     }
 
-    my $sharepath = OpenEJovianDSS::NFSCommon::snapshot_publish( $ctx,
-                        $datname, $name, $snapname );
-    eval {
-        OpenEJovianDSS::NFSCommon::snapshot_activate( $ctx,
-            $pool, $datname, $vmid, $name, $snapname, $sharepath );
-    };
-
-    my $err = $@;
-
-    if ( $err ) {
-        warn "NAS volume activation failed: $err";
-        eval {
-            OpenEJovianDSS::NFSCommon::snapshot_unpublish( $ctx,
-                $datname, $name, $snapname );
-        };
-        my $errdeactivate = $@;
-
-        if ( $errdeactivate ) {
-            die "Failed to attach ${volname} snapshot ${snapname} error: ${err}\n"
-                . "Recovery failed: ${errdeactivate}\n"
-                . "Remove share ${sharepath} manually\n";
-        }
-        die "Failed to publish ${volname} snapshot ${snapname} error: ${err}\n";
-    }
+    OpenEJovianDSS::NFSCommon::snapshot_mount_activate( $ctx,
+        $pool, $datname, $vmid, $name, $snapname );
     return 1;
 }
 
@@ -876,7 +860,7 @@ sub _deactivate_volume {
 
     if ( defined($snapname) ) {
         if ($snapname ne '') {
-            OpenEJovianDSS::NFSCommon::snapshot_deactivate_unpublish( $ctx, $datname, $vmid, $name, $snapname );
+            OpenEJovianDSS::NFSCommon::snapshot_mount_release( $ctx, $datname, $vmid, $name, $snapname );
             return 1;
         }
         OpenEJovianDSS::Common::debugmsg( $ctx, "debug",
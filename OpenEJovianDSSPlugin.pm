@@ -27,6 +27,8 @@ use File::Path qw(make_path);
 
 #use File::Temp qw(tempfile);
 use File::Basename;
+use Fcntl qw(:flock O_WRONLY O_CREAT);
+use POSIX ();
 
 use Time::HiRes qw(gettimeofday);
 
@@ -201,11 +203,22 @@ sub properties {
             type    => 'int',
             default => 600,
         },
+        snapshot_mount_idle_timeout => {
+            description =>
+              "Seconds an NFS snapshot clone stays published and mounted "
+              . "after its last use, so that further rollbacks and file "
+              . "restores from the snapshot reuse it (default 0, unmounted "
+              . "and unpublished right away).",
+            type    => 'integer',
+            minimum => 0,
+            default => 0,
+        },
         data_copy_bs => {
             description =>
-              "dd block size for offline volume export/import streams "
-              . "(default 64K). On import this is also the zero-detection "
-              . "granularity for sparse writes.",
+              "Zero-detection granularity for offline volume import "
+              . "streams, all-zero parts of this size are not written "
+              . "(default 64K). Also the dd block size where "
+              . "joviandss-data-copy is not installed.",
             type    => 'string',
             default => '64K',
         },
@@ -301,6 +314,7 @@ sub options {
         jdssc_info_lock_path               => { optional => 1 },
         jdssc_info_lock_acquire_timeout    => { optional => 1 },
         jdssc_info_lock_hold_timeout       => { optional => 1 },
+        jdssc_info_lock_mode               => { optional => 1 },
         multipath_lock_type                => { optional => 1 },
         multipath_lock_path                => { optional => 1 },
         multipath_lock_acquire_timeout     => { optional => 1 },
@@ -1752,9 +1766,232 @@ sub activate_storage {
         }
     }
 
+    if ( $enabled_content->{images} && _reactivation_pending($ctx) ) {
+        _reactivate_storage_detached( $class, $ctx );
+    }
+
     return 1;
 }
 
+# Directory of the once-per-boot reactivation markers, a sub so the tests
+# can point it elsewhere. /run is emptied by every reboot.
+sub _reactivation_dir { '/run/joviandss/reactivated' }
+
+# Configuration directory of this node, a sub so the tests can point it
+# elsewhere.
+sub _node_config_dir { '/etc/pve/nodes/' . PVE::INotify::nodename() }
+
+sub _reactivation_marker {
+    my ($ctx) = @_;
+    return _reactivation_dir() . '/' . safe_word( $ctx->{storeid}, 'storeid' );
+}
+
+# True until a reactivation pass of the storage completed since the node
+# booted.
+sub _reactivation_pending {
+    my ($ctx) = @_;
+    return !-e _reactivation_marker($ctx);
+}
+
+sub _reactivation_done {
+    my ($ctx) = @_;
+
+    my $marker = _reactivation_marker($ctx);
+    sysopen( my $fh, $marker, O_WRONLY | O_CREAT, 0600 )
+        or die "Unable to create ${marker}: $!\n";
+    close($fh);
+}
+
+# Closes every fd above STDERR a forked process inherited: the caller's
+# listening and IPC sockets, and the lock files whose flocks a copy of
+# the fd would keep held after the caller releases them.
+sub _close_inherited_fds {
+    my @fds;
+    if ( opendir( my $dh, '/proc/self/fd' ) ) {
+        @fds = grep { /^\d+$/ && $_ > 2 } readdir($dh);
+        closedir($dh);
+    } else {
+        my $max = POSIX::sysconf( POSIX::_SC_OPEN_MAX() ) || 1024;
+        @fds = ( 3 .. $max - 1 );
+    }
+    POSIX::close($_) for @fds;
+}
+
+# Runs the pending reactivation pass of the storage in a daemonized
+# process, so activate_storage returns without waiting for it. The pass
+# holds an flock on the marker's .lock file: callers that come while it
+# runs leave, and the marker is written only once it completed, so a
+# failed pass is retried by the next activate_storage.
+sub _reactivate_storage_detached {
+    my ( $class, $ctx ) = @_;
+
+    my $pid = fork();
+    if ( !defined($pid) ) {
+        debugmsg( $ctx, 'warn',
+            "Unable to start bulk reactivation of storage "
+          . "$ctx->{storeid}: $!\n" );
+        return;
+    }
+    if ( $pid > 0 ) {
+        waitpid( $pid, 0 );
+        return;
+    }
+
+    # The intermediate child exits at once, the pass is reparented to init
+    my $ok = eval {
+        POSIX::setsid();
+        my $pass = fork() // die "fork failed: $!\n";
+        POSIX::_exit(0) if $pass > 0;
+
+        open( STDIN,  '<', '/dev/null' );
+        open( STDOUT, '>', '/dev/null' );
+        open( STDERR, '>', '/dev/null' );
+        _close_inherited_fds();
+
+        make_path( _reactivation_dir() );
+        my $lockfile = _reactivation_marker($ctx) . '.lock';
+        open( my $lock, '>>', $lockfile )
+            or die "Unable to open ${lockfile}: $!\n";
+        if ( flock( $lock, LOCK_EX | LOCK_NB ) ) {
+            # Recheck: a pass may have completed since the caller looked
+            if ( _reactivation_pending($ctx) ) {
+                _reactivate_storage( $class, $ctx );
+                _reactivation_done($ctx);
+            }
+        }
+        close($lock);
+        1;
+    };
+    if ( !$ok ) {
+        debugmsg( $ctx, 'warn',
+            "Bulk reactivation of storage $ctx->{storeid} failed: $@" );
+    }
+    POSIX::_exit( $ok ? 0 : 1 );
+}
+
+# Bulk reactivation after a node boot or an HA failover: the VM volumes
+# this node holds lun records for but has no block devices of, and whose
+# VM is configured on this node, are brought back ahead of their
+# activate_volume calls, one worker per VM and up to
+# BULK_ACTIVATE_WORKERS VMs at a time (volume_activate_bulk). Run in the
+# background by activate_storage until it completes once per boot, and by
+# joviandss-reactivate. Returns the number of VMs whose volumes all came
+# back and the number of VMs tried; whatever is left is activated by
+# activate_volume as usual.
+sub reactivate_storage {
+    my ( $class, $storeid, $scfg ) = @_;
+    my $ctx = new_ctx( $scfg, $storeid );
+    return _reactivate_storage( $class, $ctx );
+}
+
+sub _reactivate_storage {
+    my ( $class, $ctx ) = @_;
+
+    # Without the cluster file system every VM would look foreign
+    my $confdir = _node_config_dir();
+    die "Configuration of node VMs missing at ${confdir}\n"
+        if !-d $confdir;
+
+    my $multipath = get_multipath($ctx);
+
+    my %records_of;    # vmid -> [ lun records ]
+    my %foreign;       # vmid -> 1 for VMs configured on other nodes
+    foreach my $record ( @{ lun_record_local_get_all($ctx) } ) {
+        my $lunrec = $record->[3];
+        next if defined( $lunrec->{snapname} );
+
+        my $volname = volume_name_unclustered( $ctx, $lunrec->{volname} );
+        next if !defined($volname);
+        my ( $vtype, undef, $vmid ) = eval { $class->parse_volname($volname) };
+        next if !defined($vmid) || ( $vtype // '' ) ne 'images';
+
+        my $path = eval {
+            OpenEJovianDSS::Common::block_device_path_from_serial( $ctx,
+                $lunrec->{scsiid}, $multipath );
+        };
+        next if !defined($path) || -b $path;
+
+        # Records of a VM that moved while the node was down are stale. They
+        # are left in place: a VM migrating here activates its volumes before
+        # its configuration moves.
+        if ( !-f "${confdir}/qemu-server/${vmid}.conf"
+            && !-f "${confdir}/lxc/${vmid}.conf" )
+        {
+            $foreign{$vmid} = 1;
+            next;
+        }
+
+        push @{ $records_of{$vmid} }, $record;
+    }
+    if (%foreign) {
+        debugmsg( $ctx, 'info',
+            "Bulk reactivation of storage $ctx->{storeid} skips VMs "
+          . join( ' ', sort { $a <=> $b } keys %foreign )
+          . " not configured on this node\n" );
+    }
+
+    my @vmids = sort { $a <=> $b } keys %records_of;
+    return ( 0, 0 ) if !@vmids;
+
+    debugmsg( $ctx, 'info',
+        "Bulk reactivation of storage $ctx->{storeid} for VMs @vmids\n" );
+
+    my %running;    # pid -> vmid
+    my $done = 0;
+    my $reap = sub {
+        my $pid = waitpid( -1, 0 );
+        if ( $pid <= 0 ) {
+            %running = ();
+            return;
+        }
+        return if !exists $running{$pid};
+        my $vmid = delete $running{$pid};
+        if ( $? == 0 ) {
+            $done++;
+        } else {
+            debugmsg( $ctx, 'warn',
+                "Bulk reactivation left volumes of VM ${vmid} to their "
+              . "activation\n" );
+        }
+    };
+
+    foreach my $vmid (@vmids) {
+        $reap->() while scalar( keys %running )
+            >= OpenEJovianDSS::Common::BULK_ACTIVATE_WORKERS;
+
+        my $pid = fork();
+        if ( !defined($pid) ) {
+            debugmsg( $ctx, 'warn',
+                "Unable to start bulk reactivation of VM ${vmid}: $!\n" );
+            next;
+        }
+        if ( $pid == 0 ) {
+            my $records = $records_of{$vmid};
+            my $ok = eval {
+                OpenEJovianDSS::Lock::with_lock(
+                    $ctx, 'vm', $vmid, undef,
+                    sub {
+                        volume_activate_bulk( $ctx, $vmid, $records )
+                            == scalar( @{$records} );
+                    },
+                );
+            };
+            if ($@) {
+                debugmsg( $ctx, 'warn',
+                    "Bulk reactivation of VM ${vmid} failed: $@" );
+            }
+            POSIX::_exit( $ok ? 0 : 1 );
+        }
+        $running{$pid} = $vmid;
+    }
+    $reap->() while %running;
+
+    debugmsg( $ctx, 'info',
+        "Bulk reactivation of storage $ctx->{storeid} done for ${done} of "
+      . scalar(@vmids) . " VMs\n" );
+    return ( $done, scalar(@vmids) );
+}
+
 sub deactivate_storage {
     my ( $class, $storeid, $scfg, $cache ) = @_;
     my $ctx = new_ctx($scfg, $storeid);
@@ -13,7 +13,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from concurrent import futures
 import datetime
+import functools
 import logging
 from oslo_utils import units as o_units
 import math
@@ -33,6 +35,23 @@ LOG = logging.getLogger(__name__)
 Size_Pattern = re.compile(r"^(\d+[GgMmKk]?)$")
 Allowed_ISCSI_Symbols = re.compile(r"^[a-z\-\.\:\d]+$")
 
+# Cascade deletion plans made before giving up on a volume whose clone
+# graph keeps changing under the plan.
+DELETE_PLAN_ATTEMPTS = 3
+
+
+def memoized_operation(func):
+    """Run a driver operation with its REST GETs memoized
+
+    Operations re-read the same volumes, snapshots and targets many times
+    between writes, see JovianRESTAPI.memoized.
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with self.ra.memoized():
+            return func(self, *args, **kwargs)
+    return wrapper
+
 
 class JovianDSSDriver(object):
 
@@ -148,52 +167,32 @@ class JovianDSSDriver(object):
 
         This function deletes volume.
         It will promote volume if needed before deletion.
+        The clone graph is read once, see _plan_volume_delete with promote.
 
         :param str vname: physical volume id
         :param list snapshots: snapshot data list (default None)
 
-        :return: None
+        :return: executed plan, None if the volume was already deleted
         '''
 
-        if snapshots is None:
-            try:
-                snapshots = self.ra.get_snapshots(vname)
-            except jexc.JDSSResourceNotFoundException:
-                LOG.debug('volume %s do not exists, it was already '
-                          'deleted', vname)
-                return
-
-        bsnaps = self._list_busy_snapshots(vname, snapshots)
-
-        if len(bsnaps) != 0:
-
-            promote_target = None
-
-            sname = jcom.get_newest_snapshot_name(bsnaps)
-
-            for snap in bsnaps:
-                if snap['name'] == sname:
-                    cvnames = self._list_snapshot_clones_names(vname,
-                                                               snap['name'])
-                    for cvname in cvnames:
-                        if jcom.is_volume(cvname):
-                            promote_target = cvname
-                        if jcom.is_snapshot(cvname):
-                            self._promote_newest_delete(cvname,
-                                                        cascade=True)
-                        if jcom.is_hidden(cvname):
-                            try:
-                                self._promote_newest_delete(cvname,
-                                                            cascade=cascade)
-                            except jexc.JDSSResourceIsBusyException:
-                                continue
-                    break
-            if promote_target is not None:
-                self.ra.promote(vname, sname, promote_target)
+        try:
+            plan = self._plan_volume_delete(vname, promote=True,
+                                            snapshots=snapshots)
+        except jexc.JDSSResourceNotFoundException:
+            LOG.debug('volume %s do not exists, it was already '
+                      'deleted', vname)
+            return None
 
-            self._promote_newest_delete(vname, cascade=cascade)
+        if len(plan['blockers']) > 0:
+            msg = (("Volume %(volume_name)s is busy, delete dependent "
+                    "volumes first:")
+                   % {'volume_name': jcom.idname(vname)})
+            jcom.dependency_error(msg, [jcom.idname(vn)
+                                        for vn in plan['blockers']])
+            raise jexc.JDSSResourceIsBusyException(vname)
 
-        self._delete_vol_with_source_snap(vname, recursive=cascade)
+        self._execute_volume_delete(plan, cascade)
+        return plan
 
     def _delete_vol_with_source_snap(self, vname, recursive=False):
         '''Delete volume and its source snapshot if required
@@ -252,21 +251,30 @@ class JovianDSSDriver(object):
         if vol is not None and \
                 'origin' in vol and \
                 vol['origin'] is not None:
-            if jcom.is_volume(jcom.origin_snapshot(vol)) or \
-                    jcom.is_hidden(jcom.origin_snapshot(vol)) or \
-                    (jcom.vid_from_sname(jcom.origin_snapshot(vol)) ==
-                     jcom.idname(vname)):
+            if self._source_snap_goes_with(vname, jcom.origin_snapshot(vol)):
                 self.ra.delete_snapshot(jcom.origin_volume(vol),
                                         jcom.origin_snapshot(vol),
                                         recursively_children=True,
                                         force_umount=False)
 
+    @staticmethod
+    def _source_snap_goes_with(vname, sname):
+        '''Tell if source snapshot sname is deleted along with clone vname
+
+        Intermediate snapshots, named after a volume or hidden, and
+        snapshots made for vname itself have no use once vname is gone.
+        '''
+        return (jcom.is_volume(sname) or
+                jcom.is_hidden(sname) or
+                jcom.vid_from_sname(sname) == jcom.idname(vname))
+
     def _clean_garbage_resources(self, vname, snapshots=None):
         '''Removes resources that is not related to volume
 
         Goes through volume snapshots and it clones to identify one
         that is clearly not related to vname volume and therefore
-        have to be deleted.
+        have to be deleted. The snapshots that go along with them are
+        dropped from the list instead of listing the snapshots again.
 
         :param str vname: physical volume id
         :param list snapshots: list of snapshot info dictionaries
@@ -281,26 +289,35 @@ class JovianDSSDriver(object):
                 LOG.debug('volume %s do not exists, it was already '
                           'deleted', vname)
                 return
-        update = False
+        out = []
         for snap in snapshots:
-            if jcom.is_volume(jcom.sname_from_snap(snap)):
-                cvnames = self._list_snapshot_clones_names(vname, snap['name'])
+            sname = jcom.sname_from_snap(snap)
+            if jcom.is_volume(sname):
+                cvnames = self._list_snapshot_clones_names(vname, sname)
                 if len(cvnames) == 0:
-                    self._delete_snapshot(vname, jcom.sname_from_snap(snap))
-                    update = True
-            if jcom.is_snapshot(jcom.sname_from_snap(snap)):
-                cvnames = self._list_snapshot_clones_names(vname, snap['name'])
+                    self._delete_snapshot(vname, sname)
+                    continue
+            if jcom.is_snapshot(sname):
+                cvnames = self._list_snapshot_clones_names(vname, sname)
+                gone = False
                 for cvname in cvnames:
                     if jcom.is_hidden(cvname):
-                        self._promote_newest_delete(cvname, cascade=False)
-                        update = True
-                    if jcom.is_snapshot(cvname):
-                        if jcom.idname(vname) != jcom.vid_from_sname(cvname):
-                            self._promote_newest_delete(cvname, cascade=True)
-                            update = True
-        if update:
-            snapshots = self.ra.get_snapshots(vname)
-        return snapshots
+                        plan = self._promote_newest_delete(cvname,
+                                                           cascade=False)
+                    elif jcom.is_snapshot(cvname) and \
+                            jcom.idname(vname) != jcom.vid_from_sname(cvname):
+                        plan = self._promote_newest_delete(cvname,
+                                                           cascade=True)
+                    else:
+                        continue
+                    # A promoted clone takes the source snapshot over
+                    if plan is not None and len(plan['promotions']) == 0 \
+                            and self._source_snap_goes_with(cvname, sname):
+                        gone = True
+                if gone:
+                    continue
+            out.append(snap)
+        return out
 
     def _list_snapshot_clones_names(self, vname, sname):
         """Lists all snapshot clones
@@ -369,25 +386,6 @@ class JovianDSSDriver(object):
 
         return out
 
-    def _clean_volume_snapshots_mount_points(self, vname, snapshots):
-        """_clean_volume_snapshots_mount_point
-
-        :param str vname: physical volume id
-        :param list snapshots: list of volume snapshots
-
-        :return: None
-        """
-        LOG.debug("Cleaning volume snapshot mount points")
-        for s in snapshots:
-            LOG.debug("%s", s['name'])
-
-        for snap in snapshots:
-            clones = self._list_snapshot_clones_names(vname, snap['name'])
-            for cname in [c for c in clones if jcom.is_snapshot(c)]:
-                # self._remove_target_volume(jcom.idname(cname), cname)
-                LOG.debug("Delete snapshot mount point %s", cname)
-                self._delete_volume(cname, cascade=True)
-
     def _volume_busy_error(self, vname, snapshots):
 
         cnames = []
@@ -455,40 +453,219 @@ class JovianDSSDriver(object):
             LOG.debug('in place deletion suceeded')
             return
 
-        def vsnap_filter(snap):
-            if jcom.is_snapshot(snap['name']):
-                return True
-            return False
+        last_err = None
+        for attempt in range(DELETE_PLAN_ATTEMPTS):
+            try:
+                plan = self._plan_volume_delete(vname)
+            except jexc.JDSSResourceNotFoundException:
+                LOG.debug('volume %s do not exists, it was already '
+                          'deleted', vname)
+                return
 
-        snapshots = []
-        try:
-            snapshots = self._list_all_volume_snapshots(vname, None)
-        except jexc.JDSSResourceNotFoundException:
-            LOG.debug('volume %s do not exists, it was already '
-                      'deleted', vname)
-            return
+            # TODO: make sure that in case there are volume clones and
+            # snapshots mount points, we show user only clones as dependency
+            if len(plan['blockers']) > 0:
+                volume_names = [jcom.idname(vn) for vn in plan['dependents']]
+                raise jexc.JDSSResourceVolumeIsBusyException(
+                    jcom.idname(vname), volume_names)
 
-        bsnaps = self._list_busy_snapshots(vname,
-                                           snapshots,
-                                           exclude_dedicated_snapshots=True)
-        # TODO: make sure that in case there are volume clones and snapshots
-        # mount points, we show user only clones as dependency
-        if len(bsnaps) > 0:
-            cnames = []
-            for s in snapshots:
-                cnames.extend(
-                    self._list_snapshot_clones_names(vname, s['name']))
-            volume_names = [jcom.idname(vn) for vn in cnames]
-            raise jexc.JDSSResourceVolumeIsBusyException(jcom.idname(vname),
-                                                         volume_names)
-
-        LOG.debug("All snapshots len %d %s", len(snapshots), str(snapshots))
-        self._clean_volume_snapshots_mount_points(vname, snapshots)
-
-        self._delete_volume(vname, cascade=cascade)
+            try:
+                self._execute_volume_delete(plan, cascade)
+                return
+            except jexc.JDSSResourceNotFoundException:
+                LOG.debug('volume %s do not exists, it was already '
+                          'deleted', vname)
+                return
+            except jexc.JDSSException as jerr:
+                # The graph changed under the plan, a new clone or mount
+                # point appeared: plan again from a fresh read.
+                LOG.warning("Deletion of volume %(vol)s did not go as "
+                            "planned, replanning (attempt %(a)d/%(n)d): "
+                            "%(err)s", {'vol': vname, 'a': attempt + 1,
+                                        'n': DELETE_PLAN_ATTEMPTS,
+                                        'err': jerr})
+                last_err = jerr
+        raise last_err
+
+    def _plan_volume_delete(self, vname, promote=False, snapshots=None):
+        """Plan cascade deletion of vname from one read of its clone graph
+
+        Walks the snapshots of vname and, through the snapshot mount
+        points (snapshot clones exported for reading), their own
+        snapshots, recording the targets each mount point is attached
+        to. Mount points go in stages: a stage only depends on the ones
+        before it, so its members can be deleted concurrently. Volume
+        and hidden clones cannot go along with vname and are reported
+        as blockers.
+
+        With promote, the busy snapshots of vname are taken newest first
+        instead, as _promote_newest_delete used to do one read at a time.
+        Mount points of such a snapshot are staged, hidden clones get a
+        plan of their own, and the first snapshot with a volume clone
+        ends the walk: that clone is promoted, which re-parents the
+        snapshot and all older ones to it, so they stay in place.
+
+        :param str vname: physical volume id
+        :param bool promote: plan promotions instead of blockers
+        :param list snapshots: snapshots of vname, listed if not given
+        :return: dict with keys:
+                    volume str: vname, deleted after all stages
+                    stages list(list(str)): mount points, stage by stage
+                    targets dict: mount point -> list of target names
+                    hidden list(dict): plans of hidden clones, executed
+                        after the stages
+                    promotions list(tuple): (volume, snapshot, clone)
+                        promoted after the hidden clones
+                    reparented list(str): snapshots the promotion moves
+                        to the promoted clone
+                    dependents list(str): clones of vname snapshots
+                    blockers list(str): clones that keep vname in place
+                    requests int: REST calls made for planning
+                    execute_requests int: REST calls the plan needs at least
+        """
+        plan = {'volume': vname,
+                'stages': [],
+                'targets': {},
+                'hidden': [],
+                'promotions': [],
+                'reparented': [],
+                'dependents': [],
+                'blockers': [],
+                'requests': 0,
+                'execute_requests': 2}
+
+        def snapshots_of(name):
+            snaps = []
+            i = 0
+            while True:
+                plan['requests'] += 1
+                spage = self.ra.get_volume_snapshots_page(name, i)
+                if len(spage) == 0:
+                    return snaps
+                snaps.extend(spage)
+                i += 1
+
+        def clones_of(name, snap):
+            plan['requests'] += 1
+            return self._list_snapshot_clones_names(name, snap['name'])
+
+        def targets_of(name):
+            plan['requests'] += 1
+            return [e['iscsi_target']['name']
+                    for e in self.ra.get_target_by_lun_name(name)
+                    if e.get('pool') == self._pool and
+                    e.get('iscsi_target', {}).get('name')]
+
+        def stage(cname):
+            clevel = walk(cname) + 1
+            while len(plan['stages']) <= clevel:
+                plan['stages'].append([])
+            plan['stages'][clevel].append(cname)
+            plan['targets'][cname] = targets_of(cname)
+            plan['execute_requests'] += (
+                2 + 2 * len(plan['targets'][cname]))
+            return clevel
+
+        def walk(name):
+            # Stage of the mount points under name: 0 for those with
+            # no mount points of their own
+            level = -1
+            for snap in snapshots_of(name):
+                for cname in clones_of(name, snap):
+                    if name == vname:
+                        plan['dependents'].append(cname)
+                    if not jcom.is_snapshot(cname):
+                        plan['blockers'].append(cname)
+                        continue
+                    level = max(level, stage(cname))
+            return level
+
+        if not promote:
+            walk(vname)
+            return plan
+
+        if snapshots is None:
+            snapshots = snapshots_of(vname)
+        clones = {}
+        for snap in snapshots:
+            clones[snap['name']] = clones_of(vname, snap)
+            plan['dependents'].extend(clones[snap['name']])
+
+        newest_first = sorted(
+            [snap for snap in snapshots if len(clones[snap['name']]) > 0],
+            key=lambda snap: jcom.time_to_epoch(snap.get('creation')),
+            reverse=True)
+        for snap in newest_first:
+            promote_target = None
+            for cname in clones[snap['name']]:
+                if jcom.is_volume(cname):
+                    promote_target = cname
+                if jcom.is_snapshot(cname):
+                    stage(cname)
+                if jcom.is_hidden(cname):
+                    hplan = self._plan_volume_delete(cname, promote=True)
+                    plan['hidden'].append(hplan)
+                    plan['requests'] += hplan['requests']
+                    plan['execute_requests'] += hplan['execute_requests']
+            if promote_target is not None:
+                plan['promotions'].append((vname, snap['name'],
+                                           promote_target))
+                plan['execute_requests'] += 1
+                created = jcom.time_to_epoch(snap.get('creation'))
+                plan['reparented'] = [
+                    s['name'] for s in snapshots
+                    if jcom.time_to_epoch(s.get('creation')) <= created]
+                break
+        return plan
+
+    def _execute_volume_delete(self, plan, cascade, max_workers=8):
+        """Delete the mount points of plan stage by stage, then its volume
+
+        Members of a stage are deleted concurrently. A mount point that is
+        already gone counts as deleted. Hidden clones and promotions of a
+        plan made with promote go after the stages, before the volume; a
+        hidden clone that is still busy is left in place.
+
+        :param dict plan: plan from _plan_volume_delete
+        :param bool cascade: delete the volume together with its snapshots
+        :raises JDSSException: first failure of a stage, once every member
+            of the stage was tried
+        """
+        def delete_mount_point(cname):
+            for tname in plan['targets'].get(cname, []):
+                try:
+                    self._detach_target_volume(tname, cname)
+                except jexc.JDSSResourceNotFoundException:
+                    pass
+            self._delete_vol_with_source_snap(cname, recursive=True)
+
+        for stage in plan['stages']:
+            workers = max(1, min(int(max_workers), len(stage)))
+            with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                requests = [executor.submit(delete_mount_point, c)
+                            for c in stage]
+            for request in requests:
+                try:
+                    request.result()
+                except jexc.JDSSResourceNotFoundException:
+                    pass
+
+        for hplan in plan.get('hidden', []):
+            try:
+                self._execute_volume_delete(hplan, cascade,
+                                            max_workers=max_workers)
+            except jexc.JDSSResourceIsBusyException:
+                LOG.debug('hidden volume %s is busy, leaving it',
+                          hplan['volume'])
+
+        for ovname, sname, cvname in plan.get('promotions', []):
+            self.ra.promote(ovname, sname, cvname)
 
+        self._delete_vol_with_source_snap(plan['volume'], recursive=cascade)
+
+    @memoized_operation
     def delete_volume(self, volume_name, cascade=False, print_and_exit=False,
-                      target_name=None):
+                      target_name=None, dry_run=False):
         """Delete volume
 
         :param volume: volume reference
@@ -496,6 +673,8 @@ class JovianDSSDriver(object):
         :param target_name: optional target group name hint (e.g. 'vm-999').
             When provided, the detach scan is limited to targets belonging
             to this group instead of scanning the entire pool.
+        :param dry_run: delete nothing, return the plan of a cascade
+            deletion instead, see _plan_volume_delete
         """
         vname = jcom.vname(volume_name)
 
@@ -508,6 +687,9 @@ class JovianDSSDriver(object):
         if not self.ra.is_lun(vname):
             raise jexc.JDSSVolumeNotFoundException(volume=volume_name)
 
+        if dry_run:
+            return self._plan_volume_delete(vname)
+
         return self._delete_volume(vname, cascade=cascade,
                                    target_name=target_name)
 
@@ -671,6 +853,7 @@ class JovianDSSDriver(object):
             vname = volume_name
         self.ra.extend_lun(vname, new_size)
 
+    @memoized_operation
     def create_cloned_volume(self,
                              clone_name,
                              volume_name,
@@ -737,6 +920,9 @@ class JovianDSSDriver(object):
     def create_snapshot(self, snapshot_name, volume_name):
         """Create snapshot of existing volume.
 
+        The snapshot is requested directly, the appliance itself refuses
+        a name that is already taken.
+
         :param str snapshot_name: new snapshot id
         :param str volume_name: original volume id
         """
@@ -747,16 +933,73 @@ class JovianDSSDriver(object):
         vname = jcom.vname(volume_name)
         sname = jcom.sname(snapshot_name, None)
 
-        snaps = self._list_volume_snapshots(volume_name, vname)
+        try:
+            self.ra.create_snapshot(vname, sname)
+        except jexc.JDSSSnapshotExistsException:
+            LOG.error("Snapshot %(snapshot)s of volume %(volume)s "
+                      "already exists",
+                      {"snapshot": sname,
+                       "volume": vname})
+            raise jexc.JDSSSnapshotExistsException(snapshot_name,
+                                                   volume_name)
+
+    def create_snapshot_group(self, snapshot_name, volume_names,
+                              max_workers=8):
+        """Create snapshot with the same name on several volumes.
+
+        JovianDSS provides no single request creating snapshots of several
+        volumes, so the requests are issued concurrently, back to back, to
+        keep the snapshots of one VM as close in time as possible.
+        If any of them fails, the snapshots created by this call are
+        deleted again; snapshots that existed before are left untouched.
 
-        for snap in snaps:
-            if snap['name'] == sname:
-                LOG.error("Snapshot %(snapshot)s exists at volume %(volume)s",
-                          {"snapshot": sname,
-                           "volume": snap['volume_name']})
-                raise jexc.JDSSSnapshotExistsException(snapshot_name,
-                                                       volume_name)
-        self.ra.create_snapshot(vname, sname)
+        :param str snapshot_name: new snapshot id
+        :param list volume_names: volume ids
+        :param int max_workers: maximum number of concurrent requests
+        :return: list of (volume_name, status, error) tuples in the order
+            of volume_names, status being one of 'created', 'exists',
+            'failed' or 'rolledback'
+        """
+        LOG.debug('create snapshot %(snap)s for volumes %(vols)s', {
+            'snap': snapshot_name,
+            'vols': ', '.join(volume_names)})
+
+        sname = jcom.sname(snapshot_name, None)
+
+        def create(volume_name):
+            self.ra.create_snapshot(jcom.vname(volume_name), sname)
+
+        workers = max(1, min(int(max_workers), len(volume_names)))
+        with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            requests = [executor.submit(create, v) for v in volume_names]
+
+        results = []
+        for volume_name, request in zip(volume_names, requests):
+            try:
+                request.result()
+                results.append([volume_name, 'created', None])
+            except jexc.JDSSSnapshotExistsException as err:
+                results.append([volume_name, 'exists', err])
+            except Exception as err:
+                # Whatever the failure, the created snapshots roll back
+                results.append([volume_name, 'failed', err])
+
+        if all(status == 'created' for _, status, _ in results):
+            return [tuple(r) for r in results]
+
+        for result in results:
+            volume_name, status, _ = result
+            if status != 'created':
+                continue
+            try:
+                self.ra.delete_snapshot(jcom.vname(volume_name), sname,
+                                        force_umount=False)
+                result[1] = 'rolledback'
+            except Exception as err:
+                LOG.error("Unable to roll back snapshot %(snap)s of volume "
+                          "%(vol)s: %(err)s",
+                          {'snap': sname, 'vol': volume_name, 'err': err})
+        return [tuple(r) for r in results]
 
     def create_export_snapshot(self,
                                target_prefix,
@@ -818,6 +1061,7 @@ class JovianDSSDriver(object):
             self._delete_volume(scname, cascade=True)
             raise err
 
+    @memoized_operation
     def remove_export(self, target_prefix, target_name, volume_name,
                       direct_mode=False):
         """Remove iscsi target created to make volume attachable
@@ -846,6 +1090,7 @@ class JovianDSSDriver(object):
         if random.randint(1, 100) == 7:
             self._delete_zombie_targets(target_prefix, target_name)
 
+    @memoized_operation
     def remove_export_snapshot(self,
                                target_prefix,
                                target_name,
@@ -964,6 +1209,7 @@ class JovianDSSDriver(object):
                 LOG.debug('Snapshot %s not found', sname)
                 return
 
+    @memoized_operation
     def delete_snapshot(self, volume_name, snapshot_name):
         """Delete snapshot of existing volume.
 
@@ -1054,21 +1300,20 @@ class JovianDSSDriver(object):
         """
         LOG.debug("detach volume %s (target_name hint: %s)", vname, target_name)
 
-        all_targets = self.ra.get_targets()
-
-        # Build a filtered candidate list when we have a group hint so we
+        # With a group hint only that group's targets are listed, so we
         # avoid iterating over every target in the pool (~60+ REST calls).
-        candidates = all_targets
         if target_name is not None:
             tprefix = self.jovian_target_prefix
             tname = tprefix + target_name
             if tprefix[-1] != ':':
                 tname = tprefix + ':' + target_name
             target_re = re.compile(fr'^{re.escape(tname)}-\d+$')
-            candidates = [t for t in all_targets
+            candidates = [t for t in self.iter_targets(tname + '-')
                           if target_re.match(t['name'])]
-            LOG.debug("Filtered detach scan to %d/%d targets matching %s",
-                      len(candidates), len(all_targets), tname)
+            LOG.debug("Filtered detach scan to %d targets matching %s",
+                      len(candidates), tname)
+        else:
+            candidates = self.ra.get_targets()
 
         for t in [target['name'] for target in candidates]:
             try:
@@ -1120,7 +1365,7 @@ class JovianDSSDriver(object):
         target_re = re.compile(fr'^{re.escape(tname)}-(?P<id>\d+)$')
 
         try:
-            tlist = self.list_targets()
+            tlist = self.list_targets(tname + '-')
         except jexc.JDSSException as jerr:
             LOG.warning("Could not list targets to check for zombies: %s", jerr)
             return
@@ -1268,13 +1513,7 @@ class JovianDSSDriver(object):
         # Ensure vips are set
         # Here expected vips is a set of vip by name
         expected_vips = self._get_conforming_vips()
-        if (('vip_allowed_portals' in target_data) and
-                (set(target_data['vip_allowed_portals']['assigned_vips']) ==
-                 set(expected_vips.keys()))):
-            pass
-        else:
-            self.ra.set_target_assigned_vips(tname,
-                                             list(expected_vips.keys()))
+        self._ensure_target_vips(tname, target_data, expected_vips)
 
         volume_publication_info['vips'] = list(expected_vips.values())
 
@@ -1305,23 +1544,49 @@ class JovianDSSDriver(object):
         volume_publication_info['lun'] = lid
 
         if provider_auth is not None:
-
             (__, auth_username, auth_secret) = provider_auth.split()
             volume_publication_info['username'] = auth_username
             volume_publication_info['password'] = auth_secret
 
+        self._ensure_target_auth(tname, target_data, provider_auth)
+
+        return volume_publication_info
+
+    def _ensure_target_vips(self, tname, target_data, expected_vips):
+        """Assign expected vips to existing target unless already assigned
+
+        :param str tname: target name
+        :param dict target_data: target description as returned by get_target
+        :param dict expected_vips: vip name to ip address mapping
+        """
+        if (('vip_allowed_portals' in target_data) and
+                (set(target_data['vip_allowed_portals']['assigned_vips']) ==
+                 set(expected_vips.keys()))):
+            return
+        self.ra.set_target_assigned_vips(tname, list(expected_vips.keys()))
+
+    def _ensure_target_auth(self, tname, target_data, provider_auth):
+        """Bring CHAP configuration of existing target in line with request
+
+        :param str tname: target name
+        :param dict target_data: target description as returned by get_target
+        :param str provider_auth: space-separated triple
+              '<auth method> <auth username> <auth password>' or None
+              to disable CHAP
+        """
+        if provider_auth is not None:
+
+            (__, auth_username, auth_secret) = provider_auth.split()
+
             chap_cred = {"name": auth_username,
                          "password": auth_secret}
 
-            try:
-                users = self.ra.get_target_user(tname)
-                if not (len(users) == 1 and
-                        users[0]['name'] == chap_cred['name']):
-                    for user in users:
-                        self.ra.delete_target_user(tname, user['name'])
-                    self._set_target_credentials(tname, chap_cred)
-            except jexc.JDSSException:
-                raise
+            users = self.ra.get_target_user(tname)
+            if not (len(users) == 1 and
+                    users[0]['name'] == chap_cred['name']):
+                for user in users:
+                    self.ra.delete_target_user(tname, user['name'])
+                self._set_target_credentials(tname, chap_cred)
 
             if not target_data.get('incoming_users_active', False):
                 self.ra.set_target_incoming_users_active(tname, True)
@@ -1335,8 +1600,6 @@ class JovianDSSDriver(object):
             except jexc.JDSSResourceNotFoundException:
                 pass
 
-        return volume_publication_info
-
     def _acquire_taget_volume_lun(self, target_prefix, target_name, vname,
                                   luns_per_target=8, current=False):
         """Get target name and lun number for given volume.
@@ -1357,8 +1620,36 @@ class JovianDSSDriver(object):
         if target_prefix[-1] != ':':
             tname = target_prefix + ':' + target_name
 
-        # Fast path: ask the array directly which target+lun carries this
-        # volume.  Filters by pool so results from other pools are ignored.
+        attached = self._attached_target_volume_lun(tname, vname,
+                                                    current=current)
+        if attached is not None:
+            (target, lun_id, scsi_id) = attached
+            return (target, lun_id, True, False, scsi_id)
+
+        if current:
+            return (None, None, False, None, None)
+
+        slots = self._plan_target_luns(tname, 1, luns_per_target)
+        if slots:
+            (target, lun_id, new_target) = slots[0]
+            return (target, lun_id, False, new_target, None)
+        return ('-'.join([tname, '0']), 0, False, True, None)
+
+    def _attached_target_volume_lun(self, tname, vname, current=False):
+        """Find target and lun volume is attached to in this pool
+
+        Volume attached to a target that does not belong to target group
+        tname is detached so that it can be re-published under the group,
+        unless current is set or the target has active sessions.
+
+        :param str tname: target group name, target prefix included
+        :param str vname: physical volume id
+        :param bool current: report attachment as is, never detach
+        :return: (<target_name>, <lun_id>, <scsi_id>) or None if volume is
+            not attached
+        """
+        # Ask the array directly which target+lun carries this volume.
+        # Filters by pool so results from other pools are ignored.
         # This also handles the case where the volume was attached under a
         # different target_prefix (supersedes the old TODO comment).
         for entry in self.ra.get_target_by_lun_name(vname):
@@ -1388,8 +1679,8 @@ class JovianDSSDriver(object):
                 scsi_id = lun_info.get('scsi_id') if lun_info else None
 
             # The volume is attached. If it sits on a target that does NOT
-            # comply with the requested target_prefix (tname is built from it
-            # above) - e.g. the prefix was changed in the storage config -
+            # comply with the requested target_prefix (tname is built from
+            # it) - e.g. the prefix was changed in the storage config -
             # re-home it under the new prefix, but only when it is safe:
             #   * a read-only lookup (current=True) never mutates: report it;
             #   * a target with live iSCSI sessions is left in place and
@@ -1409,23 +1700,46 @@ class JovianDSSDriver(object):
                     LOG.info("Volume %s is on target %s which does not match "
                              "the configured target_prefix, but it has active "
                              "sessions - keeping it in place", vname, target)
-                    return (target, lun_id, True, False, scsi_id)
+                    return (target, lun_id, scsi_id)
                 LOG.info("Volume %s is on target %s which does not match the "
                          "configured target_prefix and is idle - detaching to "
                          "re-home it under the new prefix", vname, target)
                 self._detach_target_volume(target, vname)
-                break
+                return None
 
             LOG.debug("Volume %s already attached: target %s lun %s",
                       vname, target, lun_id)
-            return (target, lun_id, True, False, scsi_id)
+            return (target, lun_id, scsi_id)
 
-        if current:
-            return (None, None, False, None, None)
+        return None
+
+    def _plan_target_luns(self, tname, count, luns_per_target,
+                          filtered=True):
+        """Pick free lun slots for count volumes in target group tname
 
-        # Volume is not attached — find a free lun slot in an existing
-        # related target, scanning in sorted order.
-        tlist = self.list_targets()
+        Free luns of existing targets are used first, scanning targets in
+        sorted order, then new targets are allocated at the lowest unused
+        indexes. Targets are listed once for the whole plan.
+
+        Each new target is confirmed absent with a direct lookup; a hit the
+        filtered listing missed means the server side filter cannot be
+        trusted, and the plan is made again from the full listing.
+
+        :param str tname: target group name, target prefix included
+        :param int count: number of lun slots needed
+        :param int luns_per_target: maximal number of luns per target
+        :param bool filtered: list only targets named after tname
+        :return: list of (<target_name>, <lun_id>, <new_target>) tuples,
+            shorter than count if no more targets could be allocated
+        """
+        slots = []
+
+        # Find free lun slots in existing related targets, scanning in
+        # sorted order.
+        if filtered:
+            tlist = self.list_targets(tname + '-')
+        else:
+            tlist = self.list_targets()
         # re.escape is load-bearing (review S-04): IQN prefixes are
         # dot-heavy, and an unescaped '.' matches any character — a
         # foreign/legacy target differing only at dot positions would be
@@ -1445,6 +1759,8 @@ class JovianDSSDriver(object):
 
         related_targets.sort()
         for target in related_targets:
+            if len(slots) >= count:
+                break
             try:
                 luns = self.ra.get_target_luns(target)
             except jexc.JDSSResourceNotFoundException:
@@ -1459,20 +1775,34 @@ class JovianDSSDriver(object):
                 if i not in taken_luns:
                     LOG.debug("Found empty lun at target %s lun %d",
                               target, i)
-                    return (target, i, False, False, None)
+                    slots.append((target, i, False))
+                    if len(slots) >= count:
+                        break
 
-        # No existing target has a free slot — pick the lowest unused index
-        # and signal the caller to create a new target.
+        # No existing target has a free slot — pick the lowest unused indexes
+        # and signal the caller to create new targets.
         existing_indexes = {int(idx) for idx in related_targets_indexes}
-        for i in range(len(existing_indexes) + 1):
-            if i not in existing_indexes:
-                tcandidate = '-'.join([tname, str(i)])
-                try:
-                    self.ra.get_target(tcandidate)
-                except jexc.JDSSResourceNotFoundException:
-                    return (tcandidate, 0, False, True, None)
-        return ('-'.join([tname, '0']), 0, False, True, None)
-
+        new_targets = -(-(count - len(slots)) // luns_per_target)
+        for i in range(len(existing_indexes) + new_targets):
+            if len(slots) >= count:
+                break
+            if i in existing_indexes:
+                continue
+            tcandidate = '-'.join([tname, str(i)])
+            try:
+                self.ra.get_target(tcandidate)
+            except jexc.JDSSResourceNotFoundException:
+                for lun_id in range(min(luns_per_target, count - len(slots))):
+                    slots.append((tcandidate, lun_id, True))
+                continue
+            if filtered:
+                LOG.debug("Target %s missing from the filtered listing, "
+                          "planning from the full one", tcandidate)
+                return self._plan_target_luns(tname, count, luns_per_target,
+                                              filtered=False)
+        return slots
+
+    @memoized_operation
     def ensure_target_volume(self,
                              target_prefix,
                              target_name,
@@ -1518,29 +1848,180 @@ class JovianDSSDriver(object):
         if not self.ra.is_lun(vname):
             raise jexc.JDSSVolumeNotFoundException(vname)
 
-        max_retries = 5
-        for attempt in range(max_retries):
-            try:
-                # target volume lun descriptor of form
-                # (<target_name>, <lun_id>, <volume attached>, <new target>, <scsi_id>)
-                tvld = self._acquire_taget_volume_lun(
-                    target_prefix,
-                    target_name,
-                    vname,
-                    luns_per_target=luns_per_target)
-                (tname, lun_id, volume_attached_flag, new_target_flag, acq_scsi_id) = tvld
-
-                if new_target_flag:
-                    return self._create_target_volume_lun(tname,
-                                                          vname,
-                                                          lun_id,
-                                                          provider_auth)
+        def ensure():
+            # target volume lun descriptor of form
+            # (<target_name>, <lun_id>, <volume attached>, <new target>, <scsi_id>)
+            tvld = self._acquire_taget_volume_lun(
+                target_prefix,
+                target_name,
+                vname,
+                luns_per_target=luns_per_target)
+            (tname, lun_id, volume_attached_flag, new_target_flag, acq_scsi_id) = tvld
 
-                return self._ensure_target_volume_lun(tname,
+            if new_target_flag:
+                return self._create_target_volume_lun(tname,
                                                       vname,
                                                       lun_id,
                                                       provider_auth)
 
+            return self._ensure_target_volume_lun(tname,
+                                                  vname,
+                                                  lun_id,
+                                                  provider_auth)
+
+        return self._retry_on_cfg_parser_error(ensure)
+
+    @memoized_operation
+    def ensure_target_volumes(self,
+                              target_prefix,
+                              target_name,
+                              volume_names,
+                              provider_auth,
+                              direct_mode=False,
+                              luns_per_target=8):
+        """Ensures that given volumes are attached to target group
+
+        Bulk version of ensure_target_volume for all volumes of a single
+        target group: conforming vips are resolved once, lun slots for
+        volumes that are not attached yet are planned from a single scan
+        of the group, and every target is created or configured once.
+
+        :return: list of dicts in the order of volume_names, each with
+            the keys returned by ensure_target_volume
+        """
+        LOG.debug(("ensure volumes %(volumes)s are assigned to targets "
+                   "with prefix %(prefix)s "
+                   "group name %(group)s "
+                   "luns per target %(lpt)s"), {
+                        'prefix': target_prefix,
+                        'group': target_name,
+                        'volumes': ', '.join(volume_names),
+                        'lpt': luns_per_target})
+        luns_per_target = int(luns_per_target)
+
+        vnames = []
+        for volume_name in volume_names:
+            vname = volume_name if direct_mode else jcom.vname(volume_name)
+            if not self.ra.is_lun(vname):
+                raise jexc.JDSSVolumeNotFoundException(vname)
+            vnames.append(vname)
+
+        tname = target_prefix + target_name
+        if target_prefix[-1] != ':':
+            tname = target_prefix + ':' + target_name
+
+        def ensure():
+            return self._ensure_target_volumes(tname, vnames, provider_auth,
+                                               luns_per_target)
+
+        return self._retry_on_cfg_parser_error(ensure)
+
+    def _ensure_target_volumes(self, tname, vnames, provider_auth,
+                               luns_per_target):
+        """Attach volumes to targets of group tname
+
+        :param str tname: target group name, target prefix included
+        :param list vnames: physical volume ids
+        :param str provider_auth: space-separated triple
+              '<auth method> <auth username> <auth password>'
+        :param int luns_per_target: maximal number of luns per target
+        :return: list of volume publication dicts in the order of vnames
+        """
+        conforming_vips = self._get_conforming_vips()
+
+        # volume id -> (target name, lun id, scsi id, new target)
+        placement = dict()
+        pending = []
+        for vname in vnames:
+            attached = self._attached_target_volume_lun(tname, vname)
+            if attached is None:
+                pending.append(vname)
+                continue
+            (target, lun_id, scsi_id) = attached
+            placement[vname] = (target, lun_id, scsi_id, False)
+
+        if pending:
+            slots = self._plan_target_luns(tname, len(pending),
+                                           luns_per_target)
+            if len(slots) < len(pending):
+                raise jexc.JDSSException(
+                    "Unable to find free luns for volumes %(vols)s "
+                    "in target group %(target)s" % {
+                        'vols': ', '.join(pending[len(slots):]),
+                        'target': tname})
+            for vname, (target, lun_id, new_target) in zip(pending, slots):
+                placement[vname] = (target, lun_id, None, new_target)
+
+        # Create or configure every target once, attach volumes after
+        targets = []
+        for vname in vnames:
+            target, __, __, new_target = placement[vname]
+            if (target, new_target) not in targets:
+                targets.append((target, new_target))
+
+        for target, new_target in targets:
+            if new_target:
+                try:
+                    self.ra.create_target(
+                        target,
+                        list(conforming_vips.keys()),
+                        use_chap=(provider_auth is not None))
+                except jexc.JDSSResourceExistsException:
+                    # Target may have been created by a prior timed-out
+                    # request.
+                    LOG.info("Target %s already exists, proceeding with "
+                             "volume attachment", target)
+                continue
+            target_data = self.ra.get_target(target)
+            self._ensure_target_vips(target, target_data, conforming_vips)
+            self._ensure_target_auth(target, target_data, provider_auth)
+
+        publications = []
+        for vname in vnames:
+            target, lun_id, scsi_id, __ = placement[vname]
+            if not scsi_id:
+                lun_data = self._attach_target_volume_lun(target, vname,
+                                                          lun_id)
+                scsi_id = lun_data.get('scsi_id') if lun_data else None
+            if not scsi_id:
+                lun_info = self.ra.get_target_lun(target, vname)
+                scsi_id = lun_info.get('scsi_id') if lun_info else None
+            if not scsi_id:
+                raise jexc.JDSSException(
+                    "Unable to acquire scsi_id for volume %(vol)s "
+                    "on target %(target)s" % {'vol': vname, 'target': target})
+
+            volume_publication_info = {
+                'target': target,
+                'lun': lun_id,
+                'vips': list(conforming_vips.values()),
+                'scsi_id': scsi_id}
+            if provider_auth is not None:
+                (__, auth_username, auth_secret) = provider_auth.split()
+                volume_publication_info['username'] = auth_username
+                volume_publication_info['password'] = auth_secret
+            publications.append(volume_publication_info)
+
+        if provider_auth is not None:
+            (__, auth_username, auth_secret) = provider_auth.split()
+            chap_cred = {"name": auth_username,
+                         "password": auth_secret}
+            for target, new_target in targets:
+                if new_target:
+                    self._set_target_credentials(target, chap_cred)
+
+        return publications
+
+    def _retry_on_cfg_parser_error(self, func):
+        """Call func, retrying while JovianDSS reports config parser errors
+
+        Concurrent target updates make the appliance fail with
+        CfgParserError, such requests are retried with randomized delay.
+        """
+        max_retries = 5
+        for attempt in range(max_retries):
+            try:
+                return func()
             except jexc.JDSSException as err:
                 if 'CfgParserError' not in str(err):
                     raise
@@ -1593,6 +2074,7 @@ class JovianDSSDriver(object):
                 reason = str(err)
 
             if attempt < retries - 1:
+                self.ra.memo_clear()
                 LOG.warning("VIP lookup failed: %s "
                             "(attempt %d/%d, retrying in %ds)",
                             reason,
@@ -1666,35 +2148,58 @@ class JovianDSSDriver(object):
 
         return volume_publication_info
 
-    def _list_targets(self):
-        """List targets
+    def iter_targets(self, name_prefix=None):
+        """Iterate over targets page by page
+
+        With name_prefix only targets whose name starts with it are
+        requested and yielded; names are re-checked here in case the
+        filter was not applied, and a rejected filter falls back to the
+        unpaged listing. A target seen on two pages, as happens when
+        targets come and go during the scan, is yielded once, and a page
+        bringing nothing new ends the scan, so an appliance that ignores
+        paging cannot loop it forever.
+
+        :param str name_prefix: optional target name prefix
+        :return: iterator over target data dicts
         """
-        targets = []
+        seen = set()
         i = 0
-        # First we list all volume snapshots page by page
-        try:
-            while True:
-                tpage = self.ra.get_targets_page(i)
+        while True:
+            try:
+                tpage = self.ra.get_targets_page(i, name_prefix=name_prefix)
+            except jexc.JDSSCommunicationFailure:
+                raise
+            except jexc.JDSSException as err:
+                if name_prefix is None or i > 0:
+                    raise
+                LOG.debug("Prefix filtered target listing failed, "
+                          "listing all targets: %s", err)
+                for t in self.ra.get_targets():
+                    if t['name'].startswith(name_prefix):
+                        yield t
+                return
 
-                if len(tpage) > 0:
-                    LOG.debug("Page: %s", str(tpage))
+            fresh = [t for t in tpage if t['name'] not in seen]
+            if len(fresh) == 0:
+                return
 
-                    targets.extend(tpage)
-                    i += 1
-                else:
-                    break
+            for t in fresh:
+                seen.add(t['name'])
+                if name_prefix is None or t['name'].startswith(name_prefix):
+                    yield t
+            i += 1
 
-        except jexc.JDSSException as ex:
-            LOG.error("List targets error. Because %(err)s",
-                      {"err": ex})
+    def list_targets(self, name_prefix=None):
+        """List target names
 
-        return targets
+        :param str name_prefix: optional target name prefix; when given
+            only matching targets are requested, page by page
+        :return: list of target names
+        """
+        if name_prefix is not None:
+            return [t['name'] for t in self.iter_targets(name_prefix)]
 
-    def list_targets(self):
         targets_data=self.ra.get_targets()
-        # TODO: switch to target listing with pages once
-        # it is supported with jovian
-        # self._list_targets()
         target_names=[]
         for t in targets_data:
             target_names.append(t['name'])
@@ -1955,6 +2460,65 @@ class JovianDSSDriver(object):
                 pass
         return ret
 
+    def _list_volume_ids(self, prefix, filtered=True):
+        """Ids of volumes whose id starts with prefix.
+
+        With filtered set the listing asks JovianDSS for matching names
+        only, so the work is proportional to the matches, not to the pool.
+        Names are re-checked here in case the filter was not applied, and
+        a rejected filter falls back to the full listing.
+
+        :return: set of volume ids
+        """
+        pname = jcom.vname(prefix)
+        if filtered and pname == "v_" + prefix:
+            try:
+                data = self._list_all_pages(
+                    lambda i: self.ra.get_volumes_page_by_prefix(i, pname))
+                return {jcom.idname(r['name']) for r in data
+                        if r['name'].startswith(pname)}
+            except jexc.JDSSCommunicationFailure:
+                raise
+            except jexc.JDSSException as err:
+                LOG.debug("Prefix filtered volume listing failed, "
+                          "listing all volumes: %s", err)
+
+        return {v['name'] for v in self.list_volumes()
+                if v['name'].startswith(prefix)}
+
+    def get_free_volume_name(self, prefix, suffix=None):
+        """Lowest index free volume id of the form <prefix><i><suffix>.
+
+        Only volumes under prefix are listed. The chosen id is confirmed
+        with a direct lookup; a hit the listing missed means the server
+        side filter cannot be trusted, and the pool is listed in full once.
+
+        :param prefix: volume id prefix, e.g. 'vm-100-disk-'
+        :param suffix: optional volume id suffix
+        :return: volume id
+        """
+        suffix = suffix or ''
+        present = self._list_volume_ids(prefix)
+        filtered = True
+
+        i = 0
+        while True:
+            name = "{}{}{}".format(prefix, i, suffix)
+            if name in present:
+                i += 1
+                continue
+            try:
+                self.get_volume({'id': name})
+            except (jexc.JDSSVolumeNotFoundException,
+                    jexc.JDSSResourceNotFoundException):
+                return name
+
+            present.add(name)
+            if filtered:
+                filtered = False
+                present |= self._list_volume_ids(prefix, filtered=False)
+            i += 1
+
     def get_volume(self, volume, direct_mode=False):
         """Get volume information.
 
@@ -2000,16 +2564,33 @@ class JovianDSSDriver(object):
 
         return ret
 
-    def list_nas_volumes(self):
+    def iter_nas_volumes(self, name_prefix=None):
+        """Iterate over NAS volumes (datasets) in the pool page by page
+
+        :param str name_prefix: optional NAS volume name prefix
+        :return: iterator over NAS volume data dicts
+        """
+        def unpaged():
+            data = self.ra.get_nas_volumes()
+            if isinstance(data, dict):
+                return data.get('entries', [])
+            return data
+
+        return self._iter_pages(
+            lambda i, prefix: self.ra.get_nas_volumes_page(
+                i, name_prefix=prefix),
+            name_prefix=name_prefix,
+            fallback=unpaged)
+
+    def list_nas_volumes(self, name_prefix=None):
         """List all NAS volumes (datasets) in the pool.
 
+        :param str name_prefix: optional NAS volume name prefix
         :return: list of NAS volumes
         """
         LOG.debug('list all nas volumes')
 
-        data = self.ra.get_nas_volumes()
-
-        return data
+        return list(self.iter_nas_volumes(name_prefix=name_prefix))
 
     def create_nas_snapshot(self, snapshot_name, dataset_name,
                             nas_volume_direct_mode=False,
@@ -2104,28 +2685,50 @@ class JovianDSSDriver(object):
         self._delete_nas_snapshot(dname, sname)
 
     def list_nas_snapshots(self, dataset_name, nas_volume_direct_mode=False,
-                           proxmox_volume=None):
+                           proxmox_volume=None, snapshot_prefix=None):
         """List snapshots for NAS volume (dataset).
 
         :param str dataset_name: dataset name
         :param bool nas_volume_direct_mode: use dataset name without
                                             transformation
         :param str proxmox_volume: name of proxmox volume
+        :param str snapshot_prefix: only snapshots whose name starts with it
         :return: list of snapshots
         """
+        return list(self.iter_nas_snapshots(
+            dataset_name,
+            nas_volume_direct_mode=nas_volume_direct_mode,
+            proxmox_volume=proxmox_volume,
+            snapshot_prefix=snapshot_prefix))
+
+    def iter_nas_snapshots(self, dataset_name, nas_volume_direct_mode=False,
+                           proxmox_volume=None, snapshot_prefix=None):
+        """Iterate over snapshots of NAS volume (dataset) page by page
+
+        Only snapshots of the proxmox volume or with the snapshot prefix
+        are requested from the appliance, see jcom.sname_prefix.
+
+        :param str dataset_name: dataset name
+        :param bool nas_volume_direct_mode: use dataset name without
+                                            transformation
+        :param str proxmox_volume: name of proxmox volume
+        :param str snapshot_prefix: only snapshots whose name starts with it
+        :return: iterator over snapshot dicts, as list_nas_snapshots
+        """
         if nas_volume_direct_mode:
             dname = dataset_name
         else:
             dname = jcom.vname(dataset_name)
-        try:
-            data = self._list_nas_volume_snapshots(dname, dname)
-        except jexc.JDSSException as ex:
-            LOG.error("List NAS snapshots error. Because %(err)s",
-                      {"err": ex})
-            raise
-
-        out = []
-        for d in data:
+        name_prefix = jcom.sname_prefix(snapshot_prefix or '', dataset_name,
+                                        proxmox_volume=proxmox_volume)
+        plain = snapshot_prefix and jcom.allowedPattern.match(snapshot_prefix)
+        if not proxmox_volume and not plain:
+            # Ids outside allowedPattern are stored in the hashed form,
+            # which the prefix of the plain form does not match
+            name_prefix = None
+
+        for d in self._iter_nas_volume_snapshots(dname, dname,
+                                                 name_prefix=name_prefix):
             # Identify the entry format first: some appliance versions
             # nest the snapshot attributes (guid, creation) under
             # 'properties', others keep them at the top level of the
@@ -2139,12 +2742,14 @@ class JovianDSSDriver(object):
                  'guid': properties.get('guid'),
                  'creation': jcom.time_to_epoch(
                      properties.get('creation')) or None}
+            if snapshot_prefix and \
+                    not r['snapshot_name'].startswith(snapshot_prefix):
+                continue
             if proxmox_volume:
                 if proxmox_volume == jcom.proxid_from_sname(d['name']):
-                    out.append(r)
+                    yield r
             else:
-                out.append(r)
-        return out
+                yield r
 
     def get_nas_snapshot(self, dataset_name, snapshot_name,
                          nas_volume_direct_mode=False,
@@ -2230,7 +2835,10 @@ class JovianDSSDriver(object):
         sname = jcom.sname(snapshot_name, dataset_name)
 
         try:
-            data = self.ra.get_nas_clones(dname, sname)
+            data = list(self._iter_pages(
+                lambda i, prefix: self.ra.get_nas_clones_page(dname, sname,
+                                                              i),
+                fallback=lambda: self.ra.get_nas_clones(dname, sname)))
         except jexc.JDSSException as ex:
             LOG.error("List NAS clones error. Because %(err)s",
                       {"err": ex})
@@ -2268,10 +2876,7 @@ class JovianDSSDriver(object):
         :return: raw share dict from the API, or None if not found
         """
         try:
-            shares = self._list_all_pages(self.ra.get_shares_page)
-            for share in shares:
-                if share.get('real_path') == real_path:
-                    return share
+            return self.ra.find_share(real_path=real_path)
         except Exception:
             LOG.debug('Unable to list shares while searching for %s',
                       real_path)
@@ -2679,6 +3284,64 @@ class JovianDSSDriver(object):
 
         return resp
 
+    def _iter_pages(self, get_page, name_prefix=None, fallback=None):
+        """Iterate over a paged listing
+
+        Entries are yielded once by name and a page bringing nothing new
+        ends the scan, as in iter_targets. If the first page is refused,
+        or a page brings entries outside the prefix, the name filter is
+        applied here instead of on the appliance, and without a filter
+        the unpaged listing from fallback is used.
+
+        :param get_page: get_page(page_id, name_prefix) -> list of entries
+        :param str name_prefix: optional entry name prefix
+        :param fallback: optional callable returning the unpaged listing
+        :return: iterator over entries
+        """
+        seen = set()
+        i = 0
+        while True:
+            try:
+                page = get_page(i, name_prefix)
+            except (jexc.JDSSCommunicationFailure,
+                    jexc.JDSSResourceNotFoundException):
+                raise
+            except jexc.JDSSException as err:
+                if i > 0 or (name_prefix is None and fallback is None):
+                    raise
+                if name_prefix is not None:
+                    LOG.debug("Prefix filtered listing failed, "
+                              "filtering the full listing: %s", err)
+                    for e in self._iter_pages(get_page, fallback=fallback):
+                        if e['name'].startswith(name_prefix):
+                            yield e
+                    return
+                LOG.debug("Paged listing failed, "
+                          "using the unpaged one: %s", err)
+                yield from fallback()
+                return
+
+            fresh = [e for e in page if e['name'] not in seen]
+            if len(fresh) == 0:
+                return
+
+            if name_prefix is not None and any(
+                    not e['name'].startswith(name_prefix) for e in fresh):
+                # The appliance did not apply the filter as asked, so the
+                # filtered pages may be missing entries as well
+                LOG.debug("Prefix filter %s was not applied, "
+                          "filtering the full listing", name_prefix)
+                for e in self._iter_pages(get_page, fallback=fallback):
+                    if e['name'].startswith(name_prefix) and \
+                            e['name'] not in seen:
+                        yield e
+                return
+
+            for e in fresh:
+                seen.add(e['name'])
+                yield e
+            i += 1
+
     def _list_all_pages(self, resource_getter, f=None):
         resp=[]
         i=0
@@ -2772,9 +3435,7 @@ class JovianDSSDriver(object):
             if jcom.is_snapshot(snap['name']):
                 vid = jcom.vid_from_sname(snap['name'])
                 if vid is None or vid == ovolume_name:
-                    # That is used in create_snapshot function
-                    # to provide detailed
-                    # info in case volume already have snapshot
+                    # Report the volume that actually holds the snapshot
                     snap['volume_name'] = vname
 
                     out.append(snap)
@@ -2793,59 +3454,48 @@ class JovianDSSDriver(object):
 
         return out
 
-    def _list_nas_volume_snapshots(self, ovolume_name, vname, all=False):
-        """List volume snapshots
+    def _iter_nas_volume_snapshots(self, ovolume_name, vname, all=False,
+                                   name_prefix=None):
+        """Iterate over volume snapshots page by page
 
-        :return: list of volume related snapshots
+        :param str name_prefix: optional snapshot name prefix
+        :return: iterator over volume related snapshots
         """
-        out = []
-        snapshots = []
-        i = 0
-        # First we list all volume snapshots page by page
+        snapshots = self._iter_pages(
+            lambda i, prefix: self.ra.get_nas_volume_snapshots_page(
+                vname, i, name_prefix=prefix),
+            name_prefix=name_prefix)
         try:
-            while True:
-                spage = self.ra.get_nas_volume_snapshots_page(vname, i)
+            # Each snapshot we check
+            for snap in snapshots:
+                # if that is a linked clone one we might not
+                # want to list it for specific volume
+                if jcom.is_volume(snap['name']):
+                    if all:
+                        snap['volume_name'] = vname
+                        yield snap
+                    else:
+                        LOG.warning("Linked clone present among volumes")
+                    continue
 
-                if len(spage) > 0:
-                    LOG.debug("Page: %s", str(spage))
+                if jcom.is_snapshot(snap['name']):
+                    vid = jcom.vid_from_sname(snap['name'])
+                    if vid is None or vid == ovolume_name:
+                        # That is used in create_snapshot function
+                        # to provide detailed
+                        # info in case volume already have snapshot
+                        snap['volume_name'] = vname
 
-                    snapshots.extend(spage)
-                    i += 1
-                else:
-                    break
+                        yield snap
+                        continue
+                if all:
+                    snap['volume_name'] = vname
+                    yield snap
 
         except jexc.JDSSException as ex:
             LOG.error("List snapshots error. Because %(err)s",
                       {"err": ex})
 
-        # Each snapshot we check
-        for snap in snapshots:
-            # if that is a linked clone one we might not
-            # want to list it for specific volume
-            if jcom.is_volume(snap['name']):
-                if all:
-                    snap['volume_name'] = vname
-                    out.append(snap)
-                else:
-                    LOG.warning("Linked clone present among volumes")
-                continue
-
-            if jcom.is_snapshot(snap['name']):
-                vid = jcom.vid_from_sname(snap['name'])
-                if vid is None or vid == ovolume_name:
-                    # That is used in create_snapshot function
-                    # to provide detailed
-                    # info in case volume already have snapshot
-                    snap['volume_name'] = vname
-
-                    out.append(snap)
-                    continue
-            if all:
-                snap['volume_name'] = vname
-                out.append(snap)
-
-        return out
-
     def list_snapshots(self, volume_name, volsize=False):
         """List snapshots related to this volume.
 
@@ -3124,6 +3774,7 @@ class JovianDSSDriver(object):
                'clones': clone_names}
         return out
 
+    @memoized_operation
     def rollback_check(self, volume_name, snapshot_name):
         """Rollback check if volume can be rolled back to specific snapshot
 
@@ -3174,6 +3825,7 @@ class JovianDSSDriver(object):
 
         return out
 
+    @memoized_operation
     def rollback(self, volume_name, snapshot_name, force_snapshots=False):
         """Rollback volume to specific snapshot
 
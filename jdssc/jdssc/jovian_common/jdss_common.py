@@ -261,6 +261,27 @@ def sname(sid, vid, proxmox_volume=None):
     return out
 
 
+def sname_prefix(sid_prefix, vid, proxmox_volume=None):
+    """Name prefix shared by the names sname gives to snapshot ids
+    starting with sid_prefix
+
+    Only names of ids matching allowedPattern share it, others are
+    stored in the hashed form.
+
+    :param: sid_prefix: snapshot id prefix
+    :param: vid: volume id
+    """
+    sanitized_sid_prefix = re.sub(r'[^A-Za-z0-9_-]', '_', sid_prefix)
+    if proxmox_volume:
+        sanitized_proxmox_volume_name = re.sub(r'[^A-Za-z0-9_-]', '_',
+                                               proxmox_volume)
+        return "sp_{spvn}_{spsn}".format(spvn=sanitized_proxmox_volume_name,
+                                         spsn=sanitized_sid_prefix)
+    if vid is None:
+        return 's_' + sanitized_sid_prefix
+    return 'se_' + sanitized_sid_prefix
+
+
 def sname_from_snap(snapshot_struct):
     return snapshot_struct['name']
 
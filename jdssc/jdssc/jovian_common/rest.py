@@ -15,6 +15,7 @@
 
 
 """REST cmd interoperation class for Open-E JovianDSS driver."""
+import contextlib
 import re
 import time
 import random
@@ -50,6 +51,9 @@ class JovianRESTAPI(object):
         self.configuration = config
         self.rproxy = rest_proxy.JovianDSSRESTProxy(config)
 
+        # Shares by name and by real_path, see get_share_index
+        self._share_index = None
+
         self.resource_dne_msg = (
             re.compile(r'^Zfs resource: .* not found in this collection\.$'))
 
@@ -112,6 +116,25 @@ class JovianRESTAPI(object):
         self.message_vip_allowed_portals_not_supported = (
             re.compile((r"^Additional properties are not allowed \('vip_allowed_portals' was unexpected\)$")))
 
+    @contextlib.contextmanager
+    def memoized(self):
+        """Serve repeated GETs from memory for the duration of the block
+
+        Meant to span one driver operation. A mutating request drops the
+        memoized GETs it can affect before it is sent, so reads after
+        writes stay correct. Blocks nest.
+        """
+        self.rproxy.memo_begin()
+        try:
+            yield
+        finally:
+            self.rproxy.memo_end()
+
+    def memo_clear(self):
+        """Forget memoized GETs, for loops polling for an outside change"""
+        self.rproxy.memo_clear()
+        self._share_index = None
+
     def _general_error(self, url, resp):
         reason = "Request %s failure" % url
         LOG.debug("error resp %s", resp)
@@ -204,6 +227,37 @@ class JovianRESTAPI(object):
 
             self._general_error(req, resp)
 
+    def get_volumes_page_by_prefix(self, page_id, name_prefix):
+        """get_volumes_page_by_prefix
+
+        GET
+        /pools/<string:poolname>/volumes?page=<page_id>&where=name==<prefix>*
+
+        Single attempt, unlike get_volumes_page: the caller falls back to
+        the unfiltered listing if the filter is rejected, so retrying a
+        rejected request would only delay that.
+
+        :param page_id: page number
+        :param name_prefix: physical volume name prefix to match
+        :return: list of volumes at page page_id whose name starts with
+            name_prefix (a server ignoring the filter may return more)
+        """
+        req = '/volumes?page=%s&per_page=100&where=name==%s*' % (
+            str(page_id), name_prefix)
+
+        LOG.debug("get page %d of volumes starting with %s",
+                  page_id, name_prefix)
+
+        resp = self.rproxy.pool_request('GET', req)
+
+        if not resp["error"] and resp["code"] == 200:
+            if isinstance(resp["data"], dict) and "entries" in resp["data"]:
+                return resp["data"]["entries"]
+            raise jexc.JDSSException(
+                "Unexpected volume listing format: %s" % str(resp["data"]))
+
+        self._general_error(req, resp)
+
     def create_lun(self, volume_name, volume_size, sparse=False,
                    block_size=None):
         """create_volume.
@@ -1488,13 +1542,16 @@ class JovianRESTAPI(object):
 
         self._general_error(req, resp)
 
-    def get_nas_volume_snapshots_page(self, vname, page_id):
+    def get_nas_volume_snapshots_page(self, vname, page_id,
+                                      name_prefix=None):
         """get_snapshots_page
 
         GET
         /nas-volumes/<nas-vol vname>snapshots?page=<int:page_id>
+            &where=name==<name_prefix>*
 
         :param page_id: page number
+        :param name_prefix: optional snapshot name prefix to match
         :return:
         {
             "data":
@@ -1524,6 +1581,8 @@ class JovianRESTAPI(object):
         """
         req = (('/nas-volumes/%(vname)s/snapshots?page=%(page)s') %
                {'vname': vname, 'page': str(page_id)})
+        if name_prefix is not None:
+            req += '&where=name==%s*' % name_prefix
 
         LOG.debug("get page %d of volume %s snapshots", page_id, vname)
 
@@ -1701,6 +1760,30 @@ class JovianRESTAPI(object):
             return resp['data']
         self._general_error(req, resp)
 
+    def get_nas_volumes_page(self, page_id, name_prefix=None):
+        """get_nas_volumes_page
+
+        GET
+        /nas-volumes?page=<page_id>&where=name==<name_prefix>*
+        :param page_id: page number
+        :param name_prefix: optional NAS volume name prefix to match
+        :return list of NAS volumes at page page_id
+        """
+        req = '/nas-volumes?page=%s&per_page=100' % str(page_id)
+        if name_prefix is not None:
+            req += '&where=name==%s*' % name_prefix
+
+        LOG.debug("get 100 nas volumes from page %s", page_id)
+        resp = self.rproxy.pool_request('GET', req)
+
+        if not resp["error"] and resp["code"] == 200:
+            if isinstance(resp['data'], dict) and 'entries' in resp['data']:
+                return resp['data']['entries']
+            # Unpaged reply: the whole listing
+            if isinstance(resp['data'], list):
+                return resp['data']
+        self._general_error(req, resp)
+
     def create_nas_volume(self, volume_name, quota,
                           reservation=None):
         """create_nas_volumes.
@@ -1824,6 +1907,7 @@ class JovianRESTAPI(object):
                                  "visible": True,
                                  "access_mode": "user"}}
 
+        self._share_index = None
         resp = self.rproxy.request('POST', req, json_data=json_data)
 
         if resp["code"] == 409:
@@ -1841,6 +1925,7 @@ class JovianRESTAPI(object):
 
         LOG.info("delete share %s", sharename)
 
+        self._share_index = None
         resp = self.rproxy.request('DELETE', req)
 
         if resp['code'] == 204:
@@ -2073,6 +2158,44 @@ class JovianRESTAPI(object):
                 raise jexc.JDSSResourceNotFoundException(clone_name)
         self._general_error(req, resp)
 
+    def get_nas_clones_page(self, dataset_name, snapshot_name, page_id):
+        """get_nas_clones_page
+
+        GET /pools/<poolname>/nas-volumes/<datasetname>/
+            snapshots/<snapshotname>/clones?page=<page_id>
+        :param dataset_name: NAS volume (dataset) name
+        :param snapshot_name: snapshot name
+        :param page_id: page number
+        :return: list of clones at page page_id
+        """
+        req = ('/nas-volumes/%(vol)s/snapshots/%(snap)s/clones'
+               '?page=%(page)s&per_page=100') % {
+            'vol': dataset_name,
+            'snap': snapshot_name,
+            'page': str(page_id)}
+
+        LOG.debug("get page %s of clones for snapshot %s of NAS volume %s",
+                  page_id, snapshot_name, dataset_name)
+
+        resp = self.rproxy.pool_request('GET', req)
+
+        if not resp["error"] and resp["code"] == 200:
+            if isinstance(resp['data'], dict) and 'entries' in resp['data']:
+                return resp['data']['entries']
+            # Unpaged reply: the whole listing
+            if isinstance(resp['data'], list):
+                return resp['data']
+
+        if resp['code'] == 500:
+            if 'message' in resp.get('error', {}):
+                if self.resource_dne_msg.match(resp['error']['message']):
+                    raise jexc.JDSSResourceNotFoundException(
+                        "%(vol)s@%(snap)s" % {
+                            'vol': dataset_name,
+                            'snap': snapshot_name})
+
+        self._general_error(req, resp)
+
     def get_nas_clones(self, dataset_name, snapshot_name):
         """get_nas_clones.
 
@@ -2121,23 +2244,77 @@ class JovianRESTAPI(object):
             return resp['data']['entries']
         self._general_error(req, resp)
 
-    def get_targets_page(self, page_id):
-        """get_all_pool_volumes.
+    def get_share_index(self):
+        """get_share_index
+
+        Shares of the pool indexed by name and by real_path, built from one
+        paged listing and kept until a share is created or deleted through
+        this object, or memo_clear is called. Where several shares carry
+        the same key the first one listed is kept.
+
+        :return dict: {'name': {name: share}, 'real_path': {path: share}}
+        """
+        if self._share_index is None:
+            index = {'name': {}, 'real_path': {}}
+            page_id = 0
+            while True:
+                shares = self.get_shares_page(page_id)
+                if len(shares) == 0:
+                    break
+                for share in shares:
+                    if 'name' in share:
+                        index['name'].setdefault(share['name'], share)
+                    if 'real_path' in share:
+                        index['real_path'].setdefault(share['real_path'],
+                                                      share)
+                page_id += 1
+            self._share_index = index
+        return self._share_index
+
+    def find_share(self, name=None, real_path=None):
+        """find_share
+
+        Look a share up in the share index. A miss rebuilds an index that
+        was built before, the share may come from another host since.
+
+        :param name: share name
+        :param real_path: full export path, e.g. /Pools/Pool-0/dataset
+        :return: share data, or None if there is no such share
+        """
+        key, value = ('name', name) if name is not None else \
+            ('real_path', real_path)
+
+        fresh = self._share_index is None
+        share = self.get_share_index()[key].get(value)
+        if share is None and not fresh:
+            self._share_index = None
+            share = self.get_share_index()[key].get(value)
+        return share
+
+    def get_targets_page(self, page_id, name_prefix=None):
+        """get_targets_page
 
         GET
-        /pools/<string:poolname>/volumes
-        :param pool_name
-        :return list of all pool volumes
+        /san/iscsi/targets?page=<page_id>&where=name==<name_prefix>*
+        :param page_id: page number
+        :param name_prefix: optional target name prefix to match
+        :return list of targets at page page_id, only those whose name
+            starts with name_prefix when given (a server ignoring the
+            filter may return more)
         """
-        # TODO: cehck page=0&per_page=0&sort_by=name&order=asc
-        req = '/san/iscsi/targets?page=%s&per_page=25' % str(page_id)
+        req = '/san/iscsi/targets?page=%s&per_page=100' % str(page_id)
+        if name_prefix is not None:
+            req += '&where=name==%s*' % name_prefix
 
         LOG.debug("get 100 targets from page %s", page_id)
         resp = self.rproxy.pool_request('GET', req, apiv=4)
 
         if resp['error'] is None and resp['code'] == 200:
-            if 'data' in resp:
+            if isinstance(resp['data'], dict) and 'entries' in resp['data']:
                 return resp['data']['entries']
+            # Unpaged reply: the whole listing
+            if isinstance(resp['data'], list):
+                return resp['data']
         self._general_error(req, resp)
 
     def extend_nas_volume(self, nas_volume, nas_volume_quota):
@@ -15,11 +15,13 @@
 
 """Network connection handling class for JovianDSS driver."""
 
+import copy
 import json
 
 import logging
 from oslo_utils import netutils as o_netutils
 import requests
+import threading
 import time
 import urllib3
 
@@ -31,6 +33,16 @@ from jdssc.jovian_common import exception as jexc
 
 LOG = logging.getLogger(__name__)
 
+# Resource collections whose state one mutating call can change together,
+# for GET memo invalidation: deleting, cloning or promoting a zvol rewrites
+# origin and clone links of other zvols and drops their iSCSI LUNs, and NAS
+# snapshot publishing ties shares to nas-volumes. Collections not listed
+# here form a domain of their own.
+MEMO_DOMAINS = {'volumes': 'zvol',
+                'san': 'zvol',
+                'nas-volumes': 'nas',
+                'shares': 'nas'}
+
 
 class JovianDSSRESTProxy(object):
     """Jovian REST API proxy"""
@@ -70,6 +82,71 @@ class JovianDSSRESTProxy(object):
 
         self.session = self._get_session()
 
+        self._memo = None
+        self._memo_depth = 0
+        # Requests of one memo scope may run on several threads: the lock
+        # guards the memo, the generation counts its invalidations
+        self._memo_lock = threading.Lock()
+        self._memo_generation = 0
+
+    def memo_begin(self):
+        """Start serving repeated GETs from memory
+
+        Calls nest, the memo lives until the outermost memo_end.
+        """
+        with self._memo_lock:
+            if self._memo_depth == 0:
+                self._memo = {}
+            self._memo_depth += 1
+
+    def memo_end(self):
+        """End the memo scope opened by the matching memo_begin"""
+        with self._memo_lock:
+            self._memo_depth -= 1
+            if self._memo_depth == 0:
+                self._memo = None
+                self._memo_generation += 1
+
+    def memo_clear(self):
+        """Forget every memoized GET, for callers polling for a change"""
+        with self._memo_lock:
+            if self._memo is not None:
+                self._memo.clear()
+            self._memo_generation += 1
+
+    @staticmethod
+    def _memo_path(req):
+        """Split request into its path components, query dropped"""
+        return [p for p in req.split('?', 1)[0].split('/') if p]
+
+    @staticmethod
+    def _memo_domain(path):
+        """Memo invalidation domain of a request path, see MEMO_DOMAINS"""
+        if len(path) >= 2 and path[0] == 'pools':
+            path = path[2:]
+        if len(path) == 0:
+            return None
+        return MEMO_DOMAINS.get(path[0], path[0])
+
+    def _memo_invalidate(self, req):
+        """Drop memoized GETs that a mutating call on req can change
+
+        Those are the GETs of the same domain and of the ancestors of req,
+        such as the pool itself.
+        """
+        path = self._memo_path(req)
+        domain = self._memo_domain(path)
+        with self._memo_lock:
+            # GETs in flight now may carry data from before the change
+            self._memo_generation += 1
+            if self._memo is None:
+                return
+            for key in list(self._memo):
+                kpath = self._memo_path(key[1])
+                if (self._memo_domain(kpath) == domain or
+                        kpath == path[:len(kpath)]):
+                    self._memo.pop(key, None)
+
     def _get_session(self):
         """Create and init new session object"""
 
@@ -106,6 +183,45 @@ class JovianDSSRESTProxy(object):
     def request(self, request_method, req, json_data=None, apiv=4):
         """Send request to the specific url.
 
+        While a memo is active (see memo_begin) a successful GET is
+        answered from memory when repeated, and any other method first
+        invalidates the GETs it can affect. A GET reply is memoized only
+        if no invalidation happened while it was in flight.
+
+        :param request_method: GET, POST, DELETE
+        :param req: where to send
+        :param json_data: data
+        """
+        memo = self._memo
+        if memo is None:
+            return self._request(request_method, req, json_data, apiv)
+
+        if request_method != 'GET':
+            self._memo_invalidate(req)
+            try:
+                return self._request(request_method, req, json_data, apiv)
+            finally:
+                # Also drop what concurrent GETs cached meanwhile
+                self._memo_invalidate(req)
+
+        key = (apiv, req)
+        with self._memo_lock:
+            if key in memo:
+                LOG.debug("GET %(req)s served from memo", {'req': req})
+                return copy.deepcopy(memo[key])
+            generation = self._memo_generation
+
+        out = self._request(request_method, req, json_data, apiv)
+        if out.get('code') == 200 and out.get('error') is None:
+            with self._memo_lock:
+                if (self._memo is memo and
+                        self._memo_generation == generation):
+                    memo[key] = copy.deepcopy(out)
+        return out
+
+    def _request(self, request_method, req, json_data=None, apiv=4):
+        """Send request to the specific url, retrying over all hosts
+
         :param request_method: GET, POST, DELETE
         :param req: where to send
         :param json_data: data
@@ -80,6 +80,12 @@ class NASSnapshots():
                           action='store_true',
                           default=False,
                           help='Add guid to output')
+        list.add_argument('--prefix',
+                          dest='snapshot_prefix',
+                          default=None,
+                          help='List only snapshots whose name starts with '
+                               'this prefix, e.g. "102_" for the snapshots '
+                               'of VM 102')
 
         kargs, ukargs = parser.parse_known_args(args)
 
@@ -117,10 +123,12 @@ class NASSnapshots():
             'nas_volume_direct_mode', False)
         proxmox_volume = self.args.get('proxmox_volume', None)
 
-        data = self.jdss.list_nas_snapshots(
+        # Snapshots are written out as their pages arrive
+        data = self.jdss.iter_nas_snapshots(
             dataset,
             nas_volume_direct_mode=nas_volume_direct_mode,
-            proxmox_volume=proxmox_volume)
+            proxmox_volume=proxmox_volume,
+            snapshot_prefix=self.args.get('snapshot_prefix'))
 
         if self.args.get('with_clones', False):
             # Filter to only snapshots with clones
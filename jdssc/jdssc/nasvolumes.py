@@ -118,10 +118,9 @@ class NASVolumes():
     def list(self):
         """List all NAS volumes in the pool."""
 
-        data = self.jdss.list_nas_volumes()
-
-        if 'entries' in data:
-            for volume in data['entries']:
+        # Volumes are printed as their pages arrive
+        for volume in self.jdss.iter_nas_volumes():
+            if isinstance(volume, dict):
                 name = volume.get('name', volume.get('full_name', ''))
                 if self.args.get('vmid', False):
                     # Only show volumes with VM ID pattern
@@ -129,15 +128,5 @@ class NASVolumes():
                         print(name)
                 else:
                     print(name)
-        else:
-            # If data is already a list
-            for volume in data:
-                if isinstance(volume, dict):
-                    name = volume.get('name', volume.get('full_name', ''))
-                    if self.args.get('vmid', False):
-                        if 'vm-' in name:
-                            print(name)
-                    else:
-                        print(name)
-                else:
-                    print(volume)
+            else:
+                print(volume)
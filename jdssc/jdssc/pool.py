@@ -21,6 +21,7 @@ from jdssc.jovian_common import driver
 import jdssc.cifs as cifs
 import jdssc.nasvolume as nasvolume
 import jdssc.nasvolumes as nasvolumes
+import jdssc.pool_snapshots as pool_snapshots
 import jdssc.shares as shares
 import jdssc.share as share
 import jdssc.target as target
@@ -45,6 +46,7 @@ class Pools():
                    'nas_volumes': self.nasvolumes,
                    'share': self.share,
                    'shares': self.shares,
+                   'snapshots': self.snapshots,
                    'target': self.target,
                    'targets': self.targets,
                    'volume': self.volume,
@@ -78,6 +80,7 @@ class Pools():
         parsers.add_parser('nas_volumes', add_help=False)
         parsers.add_parser('share', add_help=False)
         parsers.add_parser('shares', add_help=False)
+        parsers.add_parser('snapshots', add_help=False)
         parsers.add_parser('target', add_help=False)
         parsers.add_parser('targets', add_help=False)
         parsers.add_parser('volume', add_help=False)
@@ -124,6 +127,9 @@ class Pools():
     def shares(self):
         shares.Shares(self.args, self.uargs, self.jdss)
 
+    def snapshots(self):
+        pool_snapshots.PoolSnapshots(self.args, self.uargs, self.jdss)
+
     def nasvolume(self):
         nasvolume.NASVolume(self.args, self.uargs, self.jdss)
 
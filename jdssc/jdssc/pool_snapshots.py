@@ -0,0 +1,96 @@
+#    Copyright (c) 2024 Open-E, Inc.
+#    All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import argparse
+import logging
+import sys
+
+
+from jdssc.jovian_common import exception as jexc
+
+
+"""Snapshot commands spanning several volumes of a pool."""
+
+LOG = logging.getLogger(__name__)
+
+
+class PoolSnapshots():
+    def __init__(self, args, uargs, jdss):
+
+        self.psa = {'create-group': self.create_group}
+
+        self.args = args
+        args, uargs = self.__parse(uargs)
+        self.args.update(vars(args))
+        self.uargs = uargs
+        self.jdss = jdss
+
+        if 'pool_snapshots_action' in self.args:
+            self.psa[self.args.pop('pool_snapshots_action')]()
+
+    def __parse(self, args):
+
+        parser = argparse.ArgumentParser(prog="Snapshots")
+
+        parsers = parser.add_subparsers(dest='pool_snapshots_action')
+
+        create = parsers.add_parser('create-group')
+        create.add_argument('--volumes',
+                            dest='volumes',
+                            type=str,
+                            required=True,
+                            help='Comma separated list of volume names')
+        create.add_argument('--name',
+                            dest='snapshot_name',
+                            type=str,
+                            required=True,
+                            help='New snapshot name')
+
+        kargs, ukargs = parser.parse_known_args(args)
+
+        if kargs.pool_snapshots_action is None:
+            parser.print_help()
+            sys.exit(1)
+
+        return kargs, ukargs
+
+    def create_group(self):
+
+        volumes = [v for v in self.args['volumes'].split(',') if v]
+        if len(volumes) == 0:
+            LOG.error("No volumes given")
+            exit(1)
+        if len(set(volumes)) != len(volumes):
+            LOG.error("Volume list contains duplicates")
+            exit(1)
+
+        try:
+            results = self.jdss.create_snapshot_group(
+                self.args['snapshot_name'], volumes)
+        except jexc.JDSSException as err:
+            LOG.error(err)
+            exit(1)
+
+        failed = False
+        for volume, status, err in results:
+            if status != 'created':
+                failed = True
+            if err is not None:
+                LOG.error("Volume %(vol)s: %(err)s", {'vol': volume,
+                                                     'err': err})
+            sys.stdout.write("{} {}\n".format(volume, status))
+
+        if failed:
+            exit(1)
@@ -41,10 +41,26 @@ def _resolve_chap_password(args):
     return chap_pass
 
 
+def _publication_line(tinfo):
+    """Format volume publication record as '<target> <lun> <hosts> <wwid>'"""
+    raw_scsi_id = tinfo.get('scsi_id', '')
+    if raw_scsi_id:
+        wwid = '2' + ''.join('{:x}'.format(ord(c))
+                             for c in raw_scsi_id[:8])
+    else:
+        wwid = ''
+    return ('%(target)s %(lun)d %(hosts)s %(wwid)s' % {
+        'target': tinfo['target'],
+        'lun': tinfo['lun'],
+        'hosts': ','.join(tinfo['vips']),
+        'wwid': wwid})
+
+
 class Targets():
     def __init__(self, args, uargs, jdss):
 
         self.tsa = {'create': self.create,
+                    'ensure-many': self.ensure_many,
                     'get': self.get,
                     'delete': self.delete,
                     'list': self.list}
@@ -128,6 +144,50 @@ class Targets():
                             default=None,
                             help='CHAP initiator password')
 
+        ensure_many = parsers.add_parser('ensure-many')
+        ensure_many.add_argument('--volumes',
+                                 dest='volumes',
+                                 type=str,
+                                 required=True,
+                                 help='Comma separated list of volume names')
+        ensure_many.add_argument('--target-prefix',
+                                 dest='target_prefix',
+                                 default=None,
+                                 required=True,
+                                 help='''
+                                 Pattern for target name prefix.
+                                 User can specify plain text or template
+                                 in python strftime format.
+                                 ''')
+        ensure_many.add_argument('--target-group-name',
+                                 dest='target_group_name',
+                                 required=True,
+                                 default=None,
+                                 help='''
+                                 Target name.
+                                 It will be added to target prefix"
+                                 ''')
+        ensure_many.add_argument('--luns-per-target',
+                                 dest='luns_per_target',
+                                 type=int,
+                                 default=8,
+                                 help='''Maximal number of luns that can be
+                                 assigned to single target
+                                 ''')
+        ensure_many.add_argument('-d',
+                                 dest='direct_mode',
+                                 action='store_true',
+                                 default=False,
+                                 help='Use real volume names')
+        ensure_many.add_argument('--chap-user',
+                                 dest='chap_user',
+                                 default=None,
+                                 help='CHAP initiator username')
+        ensure_many.add_argument('--chap-password',
+                                 dest='chap_password',
+                                 default=None,
+                                 help='CHAP initiator password')
+
         delete = parsers.add_parser('delete')
         delete.add_argument('--target-prefix',
                             dest='target_prefix',
@@ -217,15 +277,11 @@ class Targets():
 
         return kargs, ukargs
 
-    def create(self):
-        tinfo = None
-
-        self.jdss.set_target_prefix(self.args['target_prefix'])
-
-        target_prefix = self.args['target_prefix']
-
-        target_group_name = self.args['target_group_name']
+    def _provider_auth(self):
+        """Validate CHAP arguments and build provider auth string
 
+        Exits on invalid or incomplete CHAP configuration.
+        """
         chap_user = self.args.get('chap_user')
         chap_pass = _resolve_chap_password(self.args)
 
@@ -243,35 +299,19 @@ class Targets():
                 LOG.error("Both chap user name and password have to be "
                           " provided to enable CHAP for target")
                 exit(1)
-        try:
-            if self.args['snapshot_name']:
+        return provider_auth
 
-                tinfo = self.jdss.create_export_snapshot(
-                    target_prefix,
-                    target_group_name,
-                    self.args['snapshot_name'],
-                    self.args['volume_name'],
-                    provider_auth,
-                    luns_per_target=self.args['luns_per_target'])
-            else:
-                tinfo = self.jdss.ensure_target_volume(
-                    target_prefix,
-                    target_group_name,
-                    self.args['volume_name'],
-                    provider_auth,
-                    direct_mode=self.args['direct_mode'],
-                    luns_per_target=self.args['luns_per_target'])
-        except jexc.JDSSVIPNotFoundException as jerr:
+    def _activation_failed(self, err, volume_name):
+        """Report volume activation error and exit"""
+        if isinstance(err, jexc.JDSSVIPNotFoundException):
             LOG.error(
                 "%s. Please make sure that VIP are assigned to the Pool",
-                jerr.message)
-            exit(1)
-        except jexc.JDSSOutdated:
+                err.message)
+        elif isinstance(err, jexc.JDSSOutdated):
             LOG.error("It looks like your version of JovianDSS do not"
                       " support VIP white listing for targets. Please update "
                       "JovianDSS to the newest version.")
-            exit(1)
-        except jexc.JDSSTargetInUseException as inuse_err:
+        elif isinstance(err, jexc.JDSSTargetInUseException):
             # Activating this volume here would require detaching an iSCSI
             # target that other initiator(s) are actively connected to,
             # dropping their device. Refuse. The message is prefixed with a
@@ -279,18 +319,17 @@ class Targets():
             # immediately without retrying (LOG.error is routed to stderr,
             # which the plugin captures). Naming the target and the
             # initiator IP(s) tells the operator exactly what is holding it.
-            addr = ', '.join(inuse_err.addresses) or 'unknown address'
+            addr = ', '.join(err.addresses) or 'unknown address'
             LOG.error(
                 "joviandss-target-in-use: cannot activate volume %(vol)s "
                 "because iSCSI target %(target)s is in use by initiator(s) "
                 "at %(addr)s. Refusing to detach it and disrupt the live "
                 "session; make sure the volume is deactivated everywhere "
                 "first, or give this storage its own target_prefix." % {
-                    'vol': self.args['volume_name'],
-                    'target': inuse_err.target,
+                    'vol': volume_name,
+                    'target': err.target,
                     'addr': addr})
-            exit(1)
-        except jexc.JDSSTargetPoolConflictException as pool_err:
+        elif isinstance(err, jexc.JDSSTargetPoolConflictException):
             # The target name we need is owned by another pool. This is a
             # permanent misconfiguration retrying cannot fix, so the message
             # carries the same kind of marker the Perl plugin recognises to
@@ -301,26 +340,72 @@ class Targets():
                 "%(pool)s. Two pools must not share a target name; give this "
                 "storage its own target_prefix and delete the duplicate "
                 "target." % {
-                    'vol': self.args['volume_name'],
-                    'target': pool_err.target,
-                    'pool': pool_err.other_pool})
+                    'vol': volume_name,
+                    'target': err.target,
+                    'pool': err.other_pool})
+        else:
+            LOG.error(err.message)
+        exit(1)
+
+    def create(self):
+        tinfo = None
+
+        self.jdss.set_target_prefix(self.args['target_prefix'])
+
+        target_prefix = self.args['target_prefix']
+
+        target_group_name = self.args['target_group_name']
+
+        provider_auth = self._provider_auth()
+        try:
+            if self.args['snapshot_name']:
+
+                tinfo = self.jdss.create_export_snapshot(
+                    target_prefix,
+                    target_group_name,
+                    self.args['snapshot_name'],
+                    self.args['volume_name'],
+                    provider_auth,
+                    luns_per_target=self.args['luns_per_target'])
+            else:
+                tinfo = self.jdss.ensure_target_volume(
+                    target_prefix,
+                    target_group_name,
+                    self.args['volume_name'],
+                    provider_auth,
+                    direct_mode=self.args['direct_mode'],
+                    luns_per_target=self.args['luns_per_target'])
+        except jexc.JDSSException as err:
+            self._activation_failed(err, self.args['volume_name'])
+
+        print(_publication_line(tinfo))
+
+    def ensure_many(self):
+
+        self.jdss.set_target_prefix(self.args['target_prefix'])
+
+        volumes = [v for v in self.args['volumes'].split(',') if v]
+        if len(volumes) == 0:
+            LOG.error("No volumes given")
             exit(1)
-        except jexc.JDSSException as jgerr:
-            LOG.error(jgerr.message)
+        if len(set(volumes)) != len(volumes):
+            LOG.error("Volume list contains duplicates")
             exit(1)
 
-        raw_scsi_id = tinfo.get('scsi_id', '')
-        if raw_scsi_id:
-            wwid = '2' + ''.join('{:x}'.format(ord(c))
-                                 for c in raw_scsi_id[:8])
-        else:
-            wwid = ''
-        out = ('%(target)s %(lun)d %(hosts)s %(wwid)s' % {
-            'target': tinfo['target'],
-            'lun': tinfo['lun'],
-            'hosts': ','.join(tinfo['vips']),
-            'wwid': wwid})
-        print(out)
+        provider_auth = self._provider_auth()
+        try:
+            tinfos = self.jdss.ensure_target_volumes(
+                self.args['target_prefix'],
+                self.args['target_group_name'],
+                volumes,
+                provider_auth,
+                direct_mode=self.args['direct_mode'],
+                luns_per_target=self.args['luns_per_target'])
+        except jexc.JDSSException as err:
+            self._activation_failed(err, ', '.join(volumes))
+
+        for volume, tinfo in zip(volumes, tinfos):
+            print('{} {}'.format(volume, _publication_line(tinfo)))
 
     def delete(self):
 
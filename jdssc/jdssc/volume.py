@@ -21,6 +21,7 @@ import time
 import jdssc.snapshot as snapshot
 import jdssc.snapshots as snapshots
 from jdssc.jovian_common import exception as jexc
+from jdssc.jovian_common import jdss_common as jcom
 
 """Volume related commands."""
 
@@ -130,6 +131,13 @@ class Volume():
                             action='store_true',
                             default=False,
                             help='Print resources that would be deleted')
+        delete.add_argument('--dry-run', dest='dry_run',
+                            action='store_true',
+                            default=False,
+                            help='''
+                            Print the cascade deletion plan, stage by stage,
+                            and the number of REST calls it takes
+                            ''')
 
         rename = parsers.add_parser('rename')
         rename.add_argument('new_name', type=str, help='New volume name')
@@ -262,15 +270,35 @@ class Volume():
             res = self.jdss.delete_volume(self.args['volume_name'],
                                           cascade=self.args['cascade'],
                                           print_and_exit=self.args['print'],
-                                          target_name=self.args.get('target_group_name'))
+                                          target_name=self.args.get('target_group_name'),
+                                          dry_run=self.args.get('dry_run'))
         except jexc.JDSSException as err:
             LOG.error(err.message)
             exit(1)
 
+        if self.args.get('dry_run') and not self.args['print']:
+            self._print_delete_plan(res)
+            return
+
         if res is not None and len(res) > 0:
             for r in res:
                 print(r)
 
+    @staticmethod
+    def _print_delete_plan(plan):
+        for i, stage in enumerate(plan['stages']):
+            print("stage %d: %s" % (i, ' '.join(
+                jcom.idname(c) for c in stage)))
+            for c in stage:
+                for t in plan['targets'].get(c, []):
+                    print("  detach %s from %s" % (jcom.idname(c), t))
+        print("volume: %s" % jcom.idname(plan['volume']))
+        if plan['blockers']:
+            print("blocked by: %s" % ' '.join(
+                jcom.idname(c) for c in plan['blockers']))
+        print("rest calls: %d planning, %d deleting" % (
+            plan['requests'], plan['execute_requests']))
+
     def snapshot(self):
         snapshot.Snapshot(self.args, self.uargs, self.jdss)
 
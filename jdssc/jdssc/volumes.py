@@ -244,37 +244,22 @@ class Volumes():
 
         volume_suffix = self.args.get('volume_suffix')
 
-        present_volumes = []
-        data = self.jdss.list_volumes()
+        # Look up using the stored (clustered) idname so existing volumes
+        # are detected, but return the bare name.
+        try:
+            nname = self.jdss.get_free_volume_name(search_prefix,
+                                                   volume_suffix)
+        except jexc.JDSSCommunicationFailure as jerr:
+            LOG.error(("Unable to communicate with JovianDSS over given "
+                       "interfaces %(interfaces)s. "
+                       "Please make sure that addresses are correct and "
+                       "REST API is enabled for JovianDSS") %
+                      {'interfaces': ', '.join(jerr.interfaces)})
+            exit(jerr.errcode)
 
-        for v in data:
-            if v['name'].startswith(search_prefix):
-                present_volumes.append(v['name'])
-                continue
-
-        for i in range(0, sys.maxsize):
-            nname = volume_prefix + str(i)
-            if volume_suffix:
-                nname = nname + volume_suffix
-
-            # Compare and look up using the stored (clustered) idname so
-            # existing volumes are detected, but return the bare name below.
-            nname_stored = nname
-            if cluster_prefix:
-                nname_stored = "{0}_{1}".format(cluster_prefix, nname)
-
-            if nname_stored not in present_volumes:
-
-                vd = {'id': nname_stored}
-                try:
-                    data = self.jdss.get_volume(vd)
-                except jexc.JDSSVolumeNotFoundException:
-                    print(nname)
-                    return
-                except jexc.JDSSResourceNotFoundException:
-                    print(nname)
-                    return
-        raise Exception("Unable to find free volume name")
+        if cluster_prefix:
+            nname = volume_prefix + nname[len(search_prefix):]
+        print(nname)
 
     def list(self):
         data = None
@@ -38,8 +38,14 @@ def _set_not_attached(driver):
     driver.ra.get_target_by_lun_name.return_value = []
 
 
+def _set_targets(driver, targets):
+    """Serve targets as one page; the name filter is left to the driver."""
+    driver.ra.get_targets_page.side_effect = (
+        lambda page, name_prefix=None: list(targets) if page == 0 else [])
+
+
 def _set_no_targets(driver):
-    driver.ra.get_targets.return_value = []
+    _set_targets(driver, [])
 
 
 class TestAcquireTargetVolumeLun:
@@ -73,7 +79,7 @@ class TestAcquireTargetVolumeLun:
         driver.ra.get_target_by_lun_name.return_value = [
             _global_lun_entry(target, 0, pool="Pool-99"),
         ]
-        driver.ra.get_targets.return_value = []
+        _set_targets(driver, [])
         driver.ra.get_target.side_effect = jexc.JDSSResourceNotFoundException(
             res=TBASE + "-0",
         )
@@ -196,7 +202,7 @@ class TestAcquireTargetVolumeLun:
     def test_free_slot_in_only_target_returned(self, driver):
         target = TBASE + "-0"
         _set_not_attached(driver)
-        driver.ra.get_targets.return_value = [{"name": target}]
+        _set_targets(driver, [{"name": target}])
         driver.ra.get_target_luns.return_value = [_target_lun("v_other", 0)]
 
         result = driver._acquire_taget_volume_lun(PREFIX, GROUP, VOL)
@@ -206,7 +212,7 @@ class TestAcquireTargetVolumeLun:
     def test_first_free_lun_is_zero_when_target_is_empty(self, driver):
         target = TBASE + "-0"
         _set_not_attached(driver)
-        driver.ra.get_targets.return_value = [{"name": target}]
+        _set_targets(driver, [{"name": target}])
         driver.ra.get_target_luns.return_value = []
 
         result = driver._acquire_taget_volume_lun(PREFIX, GROUP, VOL)
@@ -216,7 +222,7 @@ class TestAcquireTargetVolumeLun:
     def test_first_gap_in_lun_ids_is_chosen(self, driver):
         target = TBASE + "-0"
         _set_not_attached(driver)
-        driver.ra.get_targets.return_value = [{"name": target}]
+        _set_targets(driver, [{"name": target}])
         # luns 0 and 2 are taken; slot 1 is the first gap
         driver.ra.get_target_luns.return_value = [
             _target_lun("v_disk-a", 0),
@@ -230,7 +236,7 @@ class TestAcquireTargetVolumeLun:
     def test_full_target_skipped_free_slot_in_second_target_used(self, driver):
         t0, t1 = TBASE + "-0", TBASE + "-1"
         _set_not_attached(driver)
-        driver.ra.get_targets.return_value = [{"name": t0}, {"name": t1}]
+        _set_targets(driver, [{"name": t0}, {"name": t1}])
         driver.ra.get_target_luns.side_effect = [
             [_target_lun(f"v_disk-{i}", i) for i in range(8)],  # t0 full
             [_target_lun("v_disk-x", 0)],                        # t1 has room
@@ -245,7 +251,7 @@ class TestAcquireTargetVolumeLun:
     def test_target_vanishing_during_scan_is_skipped(self, driver):
         t0, t1 = TBASE + "-0", TBASE + "-1"
         _set_not_attached(driver)
-        driver.ra.get_targets.return_value = [{"name": t0}, {"name": t1}]
+        _set_targets(driver, [{"name": t0}, {"name": t1}])
         driver.ra.get_target_luns.side_effect = [
             jexc.JDSSResourceNotFoundException(res=t0),
             [_target_lun("v_disk-x", 0)],
@@ -258,7 +264,7 @@ class TestAcquireTargetVolumeLun:
     def test_unrelated_targets_not_scanned_for_luns(self, driver):
         unrelated = "iqn.2025-01.com.other:different-0"
         _set_not_attached(driver)
-        driver.ra.get_targets.return_value = [{"name": unrelated}]
+        _set_targets(driver, [{"name": unrelated}])
         driver.ra.get_target.side_effect = jexc.JDSSResourceNotFoundException(
             res=TBASE + "-0",
         )
@@ -285,7 +291,7 @@ class TestAcquireTargetVolumeLun:
     def test_all_targets_full_returns_next_available_index(self, driver):
         target = TBASE + "-0"
         _set_not_attached(driver)
-        driver.ra.get_targets.return_value = [{"name": target}]
+        _set_targets(driver, [{"name": target}])
         driver.ra.get_target_luns.return_value = [
             _target_lun(f"v_disk-{i}", i) for i in range(8)
         ]
@@ -303,7 +309,7 @@ class TestAcquireTargetVolumeLun:
         # Targets 0 and 2 exist and are full; index 1 should be chosen.
         t0, t2 = TBASE + "-0", TBASE + "-2"
         _set_not_attached(driver)
-        driver.ra.get_targets.return_value = [{"name": t0}, {"name": t2}]
+        _set_targets(driver, [{"name": t0}, {"name": t2}])
         driver.ra.get_target_luns.return_value = [
             _target_lun(f"v_disk-{i}", i) for i in range(8)
         ]
@@ -470,6 +476,120 @@ class TestCreateTargetVolumeLun:
             driver._create_target_volume_lun(TARGET0, VOL, 0, None)
 
 
+def _setup_ensure_many(driver, vols):
+    """Mocks for ensure_target_volumes: vols exist and are not attached."""
+    driver.ra.is_lun.return_value = True
+    driver.ra.get_target_by_lun_name.return_value = []
+    driver._get_conforming_vips = MagicMock(
+        return_value={"vip-0": "192.168.0.10"})
+    driver._attach_target_volume_lun = MagicMock(
+        side_effect=lambda t, v, lun: {"scsi_id": SCSI + v[-1]})
+    driver._set_target_credentials = MagicMock()
+    return ["vm-100-disk-%d" % i for i in range(vols)]
+
+
+class TestEnsureTargetVolumes:
+
+    def test_new_target_created_once_for_all_volumes(self, driver):
+        vols = _setup_ensure_many(driver, 3)
+        _set_targets(driver, [])
+        driver.ra.get_target.side_effect = (
+            jexc.JDSSResourceNotFoundException(res=TARGET0))
+
+        res = driver.ensure_target_volumes(PREFIX, GROUP, vols, None)
+
+        driver.ra.create_target.assert_called_once_with(
+            TARGET0, ["vip-0"], use_chap=False)
+        driver._get_conforming_vips.assert_called_once_with()
+        driver.ra.get_targets_page.assert_called_once_with(
+            0, name_prefix=TBASE + "-")
+        assert [(r['target'], r['lun']) for r in res] == [
+            (TARGET0, 0), (TARGET0, 1), (TARGET0, 2)]
+        assert [r['scsi_id'] for r in res] == [SCSI + "0", SCSI + "1",
+                                               SCSI + "2"]
+        assert all(r['vips'] == ["192.168.0.10"] for r in res)
+
+    def test_free_luns_filled_then_new_target(self, driver):
+        vols = _setup_ensure_many(driver, 3)
+        _set_targets(driver, [{"name": TARGET0}])
+        driver.ra.get_target_luns.return_value = [
+            _target_lun("v_other", i) for i in range(7)]
+
+        def get_target(tname):
+            if tname != TARGET0:
+                raise jexc.JDSSResourceNotFoundException(res=tname)
+            return {}
+        driver.ra.get_target.side_effect = get_target
+        driver.ra.get_target_user.return_value = []
+
+        res = driver.ensure_target_volumes(PREFIX, GROUP, vols, None)
+
+        assert [(r['target'], r['lun']) for r in res] == [
+            (TARGET0, 7), (TBASE + "-1", 0), (TBASE + "-1", 1)]
+        driver.ra.create_target.assert_called_once_with(
+            TBASE + "-1", ["vip-0"], use_chap=False)
+        driver.ra.set_target_assigned_vips.assert_called_once_with(
+            TARGET0, ["vip-0"])
+
+    def test_ignored_filter_detected_by_lookup(self, driver):
+        # The filtered listing is empty but target 0 exists with a free
+        # lun: the full listing is consulted and the lun is used.
+        vols = _setup_ensure_many(driver, 1)
+        _set_targets(driver, [])
+        driver.ra.get_targets.return_value = [{"name": TARGET0},
+                                              {"name": "iqn.other:vm-1-0"}]
+        driver.ra.get_target_luns.return_value = [_target_lun("v_other", 0)]
+        driver.ra.get_target.return_value = {}
+        driver.ra.get_target_user.return_value = []
+
+        res = driver.ensure_target_volumes(PREFIX, GROUP, vols, None)
+
+        assert [(r['target'], r['lun']) for r in res] == [(TARGET0, 1)]
+        driver.ra.get_targets.assert_called_once_with()
+        driver.ra.create_target.assert_not_called()
+
+    def test_attached_volume_is_not_reattached(self, driver):
+        vols = _setup_ensure_many(driver, 2)
+        driver.ra.get_target_by_lun_name.side_effect = lambda v: (
+            [_global_lun_entry(TARGET0, 3)] if v == "v_vm-100-disk-0"
+            else [])
+        _set_targets(driver, [{"name": TARGET0}])
+        driver.ra.get_target_luns.return_value = [_target_lun(VOL, 3)]
+        driver.ra.get_target.return_value = {}
+        driver.ra.get_target_user.return_value = []
+
+        res = driver.ensure_target_volumes(PREFIX, GROUP, vols, None)
+
+        assert res[0]['lun'] == 3 and res[0]['scsi_id'] == SCSI
+        assert res[1]['lun'] == 0
+        driver._attach_target_volume_lun.assert_called_once_with(
+            TARGET0, "v_vm-100-disk-1", 0)
+        driver.ra.get_target.assert_called_once_with(TARGET0)
+
+    def test_chap_set_once_per_new_target(self, driver):
+        vols = _setup_ensure_many(driver, 2)
+        _set_targets(driver, [])
+        driver.ra.get_target.side_effect = (
+            jexc.JDSSResourceNotFoundException(res=TARGET0))
+
+        res = driver.ensure_target_volumes(PREFIX, GROUP, vols,
+                                           "CHAP user password12345")
+
+        driver._set_target_credentials.assert_called_once_with(
+            TARGET0, {"name": "user", "password": "password12345"})
+        assert all(r['username'] == "user" for r in res)
+
+    def test_missing_volume_raises_before_any_change(self, driver):
+        vols = _setup_ensure_many(driver, 2)
+        driver.ra.is_lun.side_effect = lambda v: v != "v_vm-100-disk-1"
+
+        with pytest.raises(jexc.JDSSVolumeNotFoundException):
+            driver.ensure_target_volumes(PREFIX, GROUP, vols, None)
+
+        driver.ra.create_target.assert_not_called()
+        driver._attach_target_volume_lun.assert_not_called()
+
+
 class TestRenameVolume:
     """rename_volume exit contract (review F-03): every path must end in an
     explicit success or a raise - a probe failure must never fall off the
@@ -714,3 +834,457 @@ class TestAttachTargetVolumeLunBusy:
 
         with pytest.raises(jexc.JDSSResourceIsBusyException):
             driver._attach_target_volume_lun(TARGET0, VOL, 0)
+
+
+class TestCreateSnapshot:
+
+    def test_snapshot_created_without_listing(self, driver):
+        driver.create_snapshot("snap1", "vm-100-disk-0")
+
+        driver.ra.create_snapshot.assert_called_once_with(
+            "v_vm-100-disk-0", "s_snap1")
+        driver.ra.get_volume_snapshots_page.assert_not_called()
+        driver.ra.get_snapshot_clones.assert_not_called()
+        driver.ra.get_snapshot.assert_not_called()
+
+    def test_existing_name_raises_without_lookup(self, driver):
+        driver.ra.create_snapshot.side_effect = (
+            jexc.JDSSSnapshotExistsException("s_snap1", "v_vm-100-disk-0"))
+
+        with pytest.raises(jexc.JDSSSnapshotExistsException):
+            driver.create_snapshot("snap1", "vm-100-disk-0")
+
+        driver.ra.get_snapshot.assert_not_called()
+        driver.ra.get_volume_snapshots_page.assert_not_called()
+
+    def test_missing_volume_propagates(self, driver):
+        driver.ra.create_snapshot.side_effect = (
+            jexc.JDSSVolumeNotFoundException(volume="v_vm-100-disk-0"))
+
+        with pytest.raises(jexc.JDSSVolumeNotFoundException):
+            driver.create_snapshot("snap1", "vm-100-disk-0")
+
+
+class TestCreateSnapshotGroup:
+
+    VOLS = ["vm-100-disk-0", "vm-100-disk-1", "vm-100-disk-2"]
+
+    def test_all_created(self, driver):
+        res = driver.create_snapshot_group("snap1", self.VOLS)
+
+        assert res == [(v, 'created', None) for v in self.VOLS]
+        created = sorted(c.args for c in
+                         driver.ra.create_snapshot.call_args_list)
+        assert created == [("v_" + v, "s_snap1") for v in self.VOLS]
+        driver.ra.delete_snapshot.assert_not_called()
+
+    def test_partial_failure_rolls_back_created(self, driver):
+        err = jexc.JDSSVolumeNotFoundException(volume="v_vm-100-disk-1")
+
+        def create(vname, sname):
+            if vname == "v_vm-100-disk-1":
+                raise err
+        driver.ra.create_snapshot.side_effect = create
+
+        res = driver.create_snapshot_group("snap1", self.VOLS)
+
+        assert res == [("vm-100-disk-0", 'rolledback', None),
+                       ("vm-100-disk-1", 'failed', err),
+                       ("vm-100-disk-2", 'rolledback', None)]
+        deleted = sorted(c.args for c in
+                         driver.ra.delete_snapshot.call_args_list)
+        assert deleted == [("v_vm-100-disk-0", "s_snap1"),
+                           ("v_vm-100-disk-2", "s_snap1")]
+
+    def test_unexpected_error_rolls_back_created(self, driver):
+        err = ConnectionResetError("reset by peer")
+
+        def create(vname, sname):
+            if vname == "v_vm-100-disk-0":
+                raise err
+        driver.ra.create_snapshot.side_effect = create
+
+        res = driver.create_snapshot_group("snap1", self.VOLS[:2])
+
+        assert res == [("vm-100-disk-0", 'failed', err),
+                       ("vm-100-disk-1", 'rolledback', None)]
+        driver.ra.delete_snapshot.assert_called_once_with(
+            "v_vm-100-disk-1", "s_snap1", force_umount=False)
+
+    def test_existing_snapshot_is_kept(self, driver):
+        err = jexc.JDSSSnapshotExistsException("s_snap1", "v_vm-100-disk-0")
+
+        def create(vname, sname):
+            if vname == "v_vm-100-disk-0":
+                raise err
+        driver.ra.create_snapshot.side_effect = create
+
+        res = driver.create_snapshot_group("snap1", self.VOLS[:2])
+
+        assert res == [("vm-100-disk-0", 'exists', err),
+                       ("vm-100-disk-1", 'rolledback', None)]
+        driver.ra.delete_snapshot.assert_called_once_with(
+            "v_vm-100-disk-1", "s_snap1", force_umount=False)
+
+    def test_failed_rollback_reports_created(self, driver):
+        err = jexc.JDSSVolumeNotFoundException(volume="v_vm-100-disk-1")
+
+        def create(vname, sname):
+            if vname == "v_vm-100-disk-1":
+                raise err
+        driver.ra.create_snapshot.side_effect = create
+        driver.ra.delete_snapshot.side_effect = jexc.JDSSException("busy")
+
+        res = driver.create_snapshot_group("snap1", self.VOLS[:2])
+
+        assert res[0] == ("vm-100-disk-0", 'created', None)
+
+
+def _vol_entry(name):
+    return {"name": name, "volsize": 1024, "creation": "0"}
+
+
+class TestGetFreeVolumeName:
+
+    PFX = "vm-100-disk-"
+
+    def _pages(self, *names):
+        return [[_vol_entry(n) for n in names], []]
+
+    def test_lowest_gap_from_prefix_listing(self, driver):
+        driver.ra.get_volumes_page_by_prefix.side_effect = self._pages(
+            "v_vm-100-disk-0", "v_vm-100-disk-2")
+        driver.ra.get_lun.side_effect = jexc.JDSSResourceNotFoundException(
+            "v_vm-100-disk-1")
+
+        assert driver.get_free_volume_name(self.PFX) == "vm-100-disk-1"
+        driver.ra.get_volumes_page_by_prefix.assert_any_call(
+            0, "v_vm-100-disk-")
+        driver.ra.get_volumes_page.assert_not_called()
+        driver.ra.get_lun.assert_called_once_with("v_vm-100-disk-1")
+
+    def test_suffix(self, driver):
+        driver.ra.get_volumes_page_by_prefix.side_effect = self._pages(
+            "v_vm-100-disk-0.raw", "v_vm-100-disk-1")
+        driver.ra.get_lun.side_effect = jexc.JDSSVolumeNotFoundException(
+            volume="v_vm-100-disk-1.raw")
+
+        assert driver.get_free_volume_name(self.PFX, ".raw") == \
+            "vm-100-disk-1.raw"
+
+    def test_rejected_filter_falls_back_to_full_listing(self, driver):
+        driver.ra.get_volumes_page_by_prefix.side_effect = (
+            jexc.JDSSException("bad where"))
+        driver.ra.get_volumes_page.side_effect = self._pages(
+            "v_vm-100-disk-0", "v_vm-101-disk-1")
+        driver.ra.get_lun.side_effect = jexc.JDSSResourceNotFoundException(
+            "v_vm-100-disk-1")
+
+        assert driver.get_free_volume_name(self.PFX) == "vm-100-disk-1"
+
+    def test_ignored_filter_detected_by_lookup(self, driver):
+        # The filter matched nothing, but disk-0 exists: the full listing
+        # is consulted once and its names are skipped without lookups.
+        driver.ra.get_volumes_page_by_prefix.side_effect = [[]]
+        driver.ra.get_volumes_page.side_effect = self._pages(
+            "v_vm-100-disk-0", "v_vm-100-disk-1")
+        driver.ra.get_lun.side_effect = [
+            {"volsize": 1024},
+            jexc.JDSSResourceNotFoundException("v_vm-100-disk-2")]
+
+        assert driver.get_free_volume_name(self.PFX) == "vm-100-disk-2"
+        assert driver.ra.get_volumes_page.call_count == 2
+        assert driver.ra.get_lun.call_count == 2
+
+    def test_unfilterable_prefix_lists_pool(self, driver):
+        # Names outside the plain pattern are stored hashed, so a name
+        # prefix cannot be matched on the server.
+        driver.ra.get_volumes_page.side_effect = self._pages()
+        driver.ra.get_lun.side_effect = jexc.JDSSResourceNotFoundException(
+            "x")
+
+        assert driver.get_free_volume_name("vm 100.") == "vm 100.0"
+        driver.ra.get_volumes_page_by_prefix.assert_not_called()
+
+
+class TestIterTargets:
+
+    T = TBASE + "-"
+
+    def test_pages_until_empty(self, driver):
+        pages = [[{"name": self.T + "0"}, {"name": self.T + "1"}],
+                 [{"name": self.T + "2"}], []]
+        driver.ra.get_targets_page.side_effect = (
+            lambda page, name_prefix=None: pages[page])
+
+        names = [t["name"] for t in driver.iter_targets(self.T)]
+
+        assert names == [self.T + "0", self.T + "1", self.T + "2"]
+        driver.ra.get_targets_page.assert_any_call(2, name_prefix=self.T)
+        driver.ra.get_targets.assert_not_called()
+
+    def test_unfiltered_names_are_dropped(self, driver):
+        _set_targets(driver, [{"name": self.T + "0"},
+                              {"name": "iqn.other:vm-1-0"}])
+
+        assert driver.list_targets(self.T) == [self.T + "0"]
+
+    def test_ignored_paging_ends_on_repeated_page(self, driver):
+        page = [{"name": self.T + "0"}, {"name": self.T + "1"}]
+        driver.ra.get_targets_page.side_effect = (
+            lambda page_id, name_prefix=None: page)
+
+        assert len(list(driver.iter_targets(self.T))) == 2
+        assert driver.ra.get_targets_page.call_count == 2
+
+    def test_rejected_filter_falls_back_to_full_listing(self, driver):
+        driver.ra.get_targets_page.side_effect = jexc.JDSSException("where")
+        driver.ra.get_targets.return_value = [{"name": self.T + "0"},
+                                              {"name": "iqn.other:vm-1-0"}]
+
+        assert driver.list_targets(self.T) == [self.T + "0"]
+
+    def test_detach_with_hint_scans_group_only(self, driver):
+        driver.jovian_target_prefix = PREFIX
+        _set_targets(driver, [{"name": TBASE + "-0"}])
+        driver.ra.get_target_luns.return_value = [_target_lun(VOL, 0),
+                                                  _target_lun("v_x", 1)]
+
+        driver._detach_volume(VOL, target_name=GROUP)
+
+        driver.ra.get_targets.assert_not_called()
+        driver.ra.detach_target_vol.assert_called_once_with(TBASE + "-0", VOL)
+
+
+class TestMemoizedOperations:
+
+    def test_ensure_target_volume_runs_memoized(self, driver):
+        driver.ra.is_lun.return_value = False
+
+        with pytest.raises(jexc.JDSSVolumeNotFoundException):
+            driver.ensure_target_volume(PREFIX, GROUP, "vm-100-disk-0", None)
+
+        driver.ra.memoized.assert_called_once_with()
+        driver.ra.memoized.return_value.__exit__.assert_called_once()
+
+    def test_vip_retry_forgets_memoized_reply(self, driver, monkeypatch):
+        monkeypatch.setattr("time.sleep", lambda s: None)
+        driver.jovian_iscsi_vip_addresses = ["192.0.2.10"]
+        driver.ra.get_pool_vips.side_effect = [
+            [], [{"name": "vip-0", "address": "192.0.2.10"}]]
+
+        assert driver._get_conforming_vips() == {"vip-0": "192.0.2.10"}
+        driver.ra.memo_clear.assert_called_once_with()
+
+
+def _set_clone_graph(driver, graph, targets=None, created=None):
+    """Serve a clone graph: volume -> {snapshot: [clone, ...]}.
+
+    targets maps a clone to the target names it is attached to, created
+    maps a snapshot to its creation time.
+    """
+    targets = targets or {}
+    created = created or {}
+
+    def snapshots_page(vname, page):
+        if vname not in graph:
+            raise jexc.JDSSResourceNotFoundException(res=vname)
+        return [{"name": s, "creation": created.get(s)}
+                for s in graph[vname]] if page == 0 else []
+
+    driver.ra.get_volume_snapshots_page.side_effect = snapshots_page
+    driver.ra.get_snapshot_clones.side_effect = (
+        lambda vname, sname: [{"name": c} for c in graph[vname][sname]])
+    driver.ra.get_target_by_lun_name.side_effect = (
+        lambda name: [{"iscsi_target": {"name": t}, "pool": POOL}
+                      for t in targets.get(name, [])])
+
+
+class TestPlanVolumeDelete:
+
+    def test_stages_leaves_first(self, driver):
+        _set_clone_graph(driver, {
+            VOL: {"snap-a": ["se_a"], "snap-b": ["se_b"]},
+            "se_a": {"snap-c": ["se_c"]},
+            "se_b": {},
+            "se_c": {},
+        }, targets={"se_a": [TBASE + "-0"]})
+
+        plan = driver._plan_volume_delete(VOL)
+
+        assert [sorted(s) for s in plan["stages"]] == [["se_b", "se_c"],
+                                                       ["se_a"]]
+        assert plan["targets"] == {"se_a": [TBASE + "-0"], "se_b": [],
+                                   "se_c": []}
+        assert plan["blockers"] == []
+        assert plan["dependents"] == ["se_a", "se_b"]
+        # 6 snapshot pages (the empty last one included), 3 clone
+        # listings, 3 target lookups
+        assert plan["requests"] == 6 + 3 + 3
+        assert plan["execute_requests"] == 2 + 3 * 2 + 2
+
+    def test_volume_clone_blocks(self, driver):
+        _set_clone_graph(driver, {
+            VOL: {"snap-a": ["se_a", "v_vm-101-disk-0"]},
+            "se_a": {},
+        })
+
+        plan = driver._plan_volume_delete(VOL)
+
+        assert plan["blockers"] == ["v_vm-101-disk-0"]
+        assert plan["dependents"] == ["se_a", "v_vm-101-disk-0"]
+
+    def test_other_pool_targets_are_ignored(self, driver):
+        _set_clone_graph(driver, {VOL: {"snap-a": ["se_a"]}, "se_a": {}})
+        driver.ra.get_target_by_lun_name.side_effect = None
+        driver.ra.get_target_by_lun_name.return_value = [
+            {"iscsi_target": {"name": TBASE + "-0"}, "pool": "Pool-1"}]
+
+        assert driver._plan_volume_delete(VOL)["targets"] == {"se_a": []}
+
+
+class TestPromoteNewestDelete:
+
+    CLONE = "v_vm-101-disk-0"
+
+    def _setup(self, driver, graph):
+        _set_clone_graph(driver, graph, created={
+            "s_old": "2025-1-2 3:4:5",
+            "s_mid": "2025-1-2 10:0:0",
+            "s_new": "2025-2-1 0:0:0"})
+        driver.ra.get_lun.return_value = {}
+        calls = []
+        driver.ra.promote.side_effect = (
+            lambda v, s, c: calls.append(("promote", v, s, c)))
+        driver.ra.delete_lun.side_effect = (
+            lambda v, **kw: calls.append(("delete", v)))
+        return calls
+
+    def test_newest_volume_clone_promoted(self, driver):
+        self._setup(driver, {
+            VOL: {"s_old": ["se_o"], "s_mid": [self.CLONE, "se_m"],
+                  "s_new": ["se_n"]},
+            "se_o": {}, "se_m": {}, "se_n": {},
+        })
+
+        plan = driver._plan_volume_delete(VOL, promote=True)
+
+        assert plan["promotions"] == [(VOL, "s_mid", self.CLONE)]
+        assert sorted(plan["reparented"]) == ["s_mid", "s_old"]
+        # the mount point of the re-parented older snapshot stays
+        assert plan["stages"] == [["se_n", "se_m"]]
+        assert plan["blockers"] == []
+
+    def test_hidden_clone_planned_on_its_own(self, driver):
+        self._setup(driver, {
+            VOL: {"s_new": ["t_vm-100-disk-0_1"]},
+            "t_vm-100-disk-0_1": {"s_old": ["se_h"]},
+            "se_h": {},
+        })
+
+        plan = driver._plan_volume_delete(VOL, promote=True)
+
+        assert plan["promotions"] == []
+        assert [h["volume"] for h in plan["hidden"]] == ["t_vm-100-disk-0_1"]
+        assert plan["hidden"][0]["stages"] == [["se_h"]]
+
+    def test_executed_from_one_read(self, driver):
+        calls = self._setup(driver, {
+            VOL: {"s_old": [], "s_mid": [self.CLONE, "se_m"]},
+            "se_m": {},
+        })
+
+        driver._promote_newest_delete(VOL, cascade=True)
+
+        assert calls == [("delete", "se_m"),
+                         ("promote", VOL, "s_mid", self.CLONE),
+                         ("delete", VOL)]
+        # two pages of VOL snapshots, one of se_m, nothing listed again
+        assert driver.ra.get_volume_snapshots_page.call_count == 3
+
+    def test_garbage_cleaning_does_not_list_again(self, driver):
+        self._setup(driver, {
+            VOL: {"s_mid": ["t_vm-100-disk-0_1"]},
+            "t_vm-100-disk-0_1": {},
+        })
+        driver.ra.get_lun.side_effect = lambda v: (
+            {"origin": "Pool-0/%s@s_mid" % VOL}
+            if v == "t_vm-100-disk-0_1" else {})
+        snaps = [{"name": "s_mid"}]
+
+        assert driver._clean_garbage_resources(VOL, snaps) == snaps
+        driver.ra.get_snapshots.assert_not_called()
+
+
+class TestCascadeDelete:
+
+    def _setup(self, driver, monkeypatch, graph, targets=None):
+        _set_clone_graph(driver, graph, targets)
+        driver.ra.get_lun.return_value = {}
+        deleted = []
+
+        def delete_lun(vname, force_umount=False,
+                       recursively_children=False):
+            if vname == VOL and len(deleted) < len(graph) - 1:
+                # what the appliance answers while VOL still has clones
+                raise jexc.JDSSRESTException("delete", "dataset is busy")
+            deleted.append(vname)
+        driver.ra.delete_lun.side_effect = delete_lun
+        detached = []
+        monkeypatch.setattr(driver, "_detach_target_volume",
+                            lambda t, v: detached.append((t, v)))
+        monkeypatch.setattr(driver, "_detach_volume",
+                            lambda v, target_name=None: None)
+        return deleted, detached
+
+    def test_mount_points_go_before_the_volume(self, driver, monkeypatch):
+        deleted, detached = self._setup(driver, monkeypatch, {
+            VOL: {"snap-a": ["se_a"]},
+            "se_a": {"snap-c": ["se_c"]},
+            "se_c": {},
+        }, targets={"se_a": [TBASE + "-0"]})
+
+        driver._delete_volume(VOL, cascade=True)
+
+        assert deleted == ["se_c", "se_a", VOL]
+        assert detached == [(TBASE + "-0", "se_a")]
+
+    def test_volume_clone_raises_busy(self, driver, monkeypatch):
+        deleted, _ = self._setup(driver, monkeypatch, {
+            VOL: {"snap-a": ["v_vm-101-disk-0"]},
+            "v_vm-101-disk-0": {},
+        })
+
+        with pytest.raises(jexc.JDSSResourceVolumeIsBusyException):
+            driver._delete_volume(VOL, cascade=True)
+        assert deleted == []
+
+    def test_replans_when_the_graph_changed(self, driver, monkeypatch):
+        deleted, _ = self._setup(driver, monkeypatch, {
+            VOL: {"snap-a": ["se_a"]},
+            "se_a": {},
+        })
+        calls = []
+        real = driver._execute_volume_delete
+
+        def execute(plan, cascade):
+            calls.append(plan)
+            if len(calls) == 1:
+                raise jexc.JDSSRESTException("delete", "new clone")
+            return real(plan, cascade)
+        monkeypatch.setattr(driver, "_execute_volume_delete", execute)
+
+        driver._delete_volume(VOL, cascade=True)
+
+        assert len(calls) == 2
+        assert deleted == ["se_a", VOL]
+
+    def test_dry_run_deletes_nothing(self, driver):
+        _set_clone_graph(driver, {VOL: {"snap-a": ["se_a"]}, "se_a": {}})
+        driver.ra.is_lun.return_value = True
+
+        plan = driver.delete_volume("vm-100-disk-0", cascade=True,
+                                    dry_run=True)
+
+        assert plan["stages"] == [["se_a"]]
+        driver.ra.delete_lun.assert_not_called()
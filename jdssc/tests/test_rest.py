@@ -2,6 +2,7 @@ import pytest
 from unittest.mock import MagicMock
 
 from jdssc.jovian_common import rest
+from jdssc.jovian_common import rest_proxy
 from jdssc.jovian_common import exception as jexc
 
 
@@ -134,3 +135,216 @@ class TestGetTargetByLunName:
         ra.get_target_by_lun_name(VOL)
         url = ra.rproxy.request.call_args[0][1]
         assert VOL in url
+
+
+class TestGetVolumesPageByPrefix:
+
+    def test_returns_entries_on_200(self, ra):
+        ra.rproxy.pool_request.return_value = _resp_ok(
+            {'entries': [{'name': VOL}]})
+        assert ra.get_volumes_page_by_prefix(0, 'v_vm-100-') == [
+            {'name': VOL}]
+
+    def test_url_filters_by_name_prefix(self, ra):
+        ra.rproxy.pool_request.return_value = _resp_ok({'entries': []})
+        ra.get_volumes_page_by_prefix(3, 'v_vm-100-')
+        url = ra.rproxy.pool_request.call_args[0][1]
+        assert 'page=3' in url
+        assert 'where=name==v_vm-100-*' in url
+
+    def test_raises_without_retry_on_error(self, ra):
+        ra.rproxy.pool_request.return_value = _resp_error(400)
+        with pytest.raises(jexc.JDSSException):
+            ra.get_volumes_page_by_prefix(0, 'v_vm-100-')
+        assert ra.rproxy.pool_request.call_count == 1
+
+
+class TestGetTargetsPage:
+
+    def test_url_filters_by_name_prefix(self, ra):
+        ra.rproxy.pool_request.return_value = _resp_ok({'entries': []})
+        ra.get_targets_page(1, name_prefix=TARGET[:-1])
+        url = ra.rproxy.pool_request.call_args[0][1]
+        assert 'page=1' in url
+        assert 'where=name==%s*' % TARGET[:-1] in url
+
+    def test_no_filter_without_prefix(self, ra):
+        ra.rproxy.pool_request.return_value = _resp_ok({'entries': []})
+        ra.get_targets_page(0)
+        assert 'where' not in ra.rproxy.pool_request.call_args[0][1]
+
+    def test_unpaged_reply_returned_whole(self, ra):
+        ra.rproxy.pool_request.return_value = _resp_ok([{'name': TARGET}])
+        assert ra.get_targets_page(0) == [{'name': TARGET}]
+
+
+class TestNasPages:
+
+    def test_volumes_page_filters_by_name_prefix(self, ra):
+        ra.rproxy.pool_request.return_value = _resp_ok({'entries': []})
+        ra.get_nas_volumes_page(2, name_prefix='v_nfs-')
+        url = ra.rproxy.pool_request.call_args[0][1]
+        assert 'page=2' in url
+        assert 'where=name==v_nfs-*' in url
+
+    def test_volumes_unpaged_reply_returned_whole(self, ra):
+        ra.rproxy.pool_request.return_value = _resp_ok([{'name': 'v_nfs'}])
+        assert ra.get_nas_volumes_page(0) == [{'name': 'v_nfs'}]
+
+    def test_snapshots_page_filters_by_name_prefix(self, ra):
+        ra.rproxy.pool_request.return_value = _resp_ok({'entries': []})
+        ra.get_nas_volume_snapshots_page('nfs', 0, name_prefix='se_102_')
+        url = ra.rproxy.pool_request.call_args[0][1]
+        assert 'where=name==se_102_*' in url
+
+    def test_snapshots_page_no_filter_without_prefix(self, ra):
+        ra.rproxy.pool_request.return_value = _resp_ok({'entries': []})
+        ra.get_nas_volume_snapshots_page('nfs', 0)
+        assert 'where' not in ra.rproxy.pool_request.call_args[0][1]
+
+
+SHARE_A = {'name': 'v_nfs-a', 'real_path': '/Pools/Pool-0/v_nfs-a'}
+SHARE_B = {'name': 'v_nfs-b', 'real_path': '/Pools/Pool-0/v_nfs-b'}
+
+
+def _share_pages(*pages):
+    """Serve shares page by page, an empty page after the last one."""
+    replies = [_resp_ok({'entries': list(p)}) for p in pages]
+    replies.append(_resp_ok({'entries': []}))
+    return replies
+
+
+class TestShareIndex:
+
+    def test_one_listing_serves_both_keys(self, ra):
+        ra.rproxy.request.side_effect = _share_pages([SHARE_A], [SHARE_B])
+
+        assert ra.find_share(real_path=SHARE_B['real_path']) == SHARE_B
+        assert ra.find_share(name='v_nfs-a') == SHARE_A
+        assert ra.rproxy.request.call_count == 3
+
+    def test_first_listed_share_wins(self, ra):
+        dup = dict(SHARE_B, real_path=SHARE_A['real_path'])
+        ra.rproxy.request.side_effect = _share_pages([SHARE_A], [dup])
+
+        assert ra.find_share(real_path=SHARE_A['real_path']) == SHARE_A
+        assert ra.find_share(name='v_nfs-b') == dup
+
+    def test_miss_rebuilds_an_old_index_once(self, ra):
+        ra.rproxy.request.side_effect = (
+            _share_pages([SHARE_A]) + _share_pages([SHARE_A, SHARE_B]))
+
+        ra.get_share_index()
+        assert ra.find_share(name='v_nfs-b') == SHARE_B
+        assert ra.rproxy.request.call_count == 4
+
+    def test_miss_on_a_fresh_index_is_final(self, ra):
+        ra.rproxy.request.side_effect = _share_pages([SHARE_A])
+
+        assert ra.find_share(name='v_nfs-b') is None
+        assert ra.rproxy.request.call_count == 2
+
+    def test_share_changes_drop_the_index(self, ra):
+        ra.rproxy.request.side_effect = _share_pages([SHARE_A])
+        ra.get_share_index()
+
+        ra.rproxy.request.side_effect = None
+        ra.rproxy.request.return_value = {'error': None, 'code': 204}
+        ra.delete_share('v_nfs-a')
+
+        assert ra._share_index is None
+
+
+@pytest.fixture
+def proxy():
+    p = rest_proxy.JovianDSSRESTProxy({'jovian_pool': 'Pool-0',
+                                       'san_hosts': ['192.0.2.1']})
+    p._request = MagicMock(
+        side_effect=lambda method, req, json_data=None, apiv=4:
+            _resp_ok({'req': req}))
+    return p
+
+
+class TestMemo:
+
+    VOL_REQ = '/pools/Pool-0/volumes/' + VOL
+
+    def test_no_memo_outside_scope(self, proxy):
+        proxy.request('GET', self.VOL_REQ)
+        proxy.request('GET', self.VOL_REQ)
+        assert proxy._request.call_count == 2
+
+    def test_repeated_get_served_from_memo(self, proxy):
+        proxy.memo_begin()
+        first = proxy.request('GET', self.VOL_REQ)
+        first['data']['req'] = 'changed by caller'
+        second = proxy.request('GET', self.VOL_REQ)
+        proxy.memo_end()
+
+        assert proxy._request.call_count == 1
+        assert second['data']['req'] == self.VOL_REQ
+
+    def test_errors_are_not_memoized(self, proxy):
+        proxy._request.side_effect = None
+        proxy._request.return_value = _resp_404()
+        proxy.memo_begin()
+        proxy.request('GET', self.VOL_REQ)
+        proxy.request('GET', self.VOL_REQ)
+        assert proxy._request.call_count == 2
+
+    def test_mutation_invalidates_its_domain_and_ancestors(self, proxy):
+        other_vol = '/pools/Pool-0/volumes/v_vm-101-disk-0'
+        luns = '/san/iscsi/luns?where=name==' + VOL
+        pool = '/pools/Pool-0'
+        share = '/pools/Pool-0/shares/share-0'
+        proxy.memo_begin()
+        for req in (other_vol, luns, pool, share):
+            proxy.request('GET', req)
+        proxy.request('DELETE', self.VOL_REQ)
+        proxy._request.reset_mock()
+        for req in (other_vol, luns, pool, share):
+            proxy.request('GET', req)
+
+        fetched = [c[0][1] for c in proxy._request.call_args_list]
+        assert fetched == [other_vol, luns, pool]
+
+    def test_get_overtaken_by_a_write_is_not_memoized(self, proxy):
+        def request(method, req, json_data=None, apiv=4):
+            if method == 'GET' and proxy._request.call_count == 1:
+                # A concurrent write lands while this GET is in flight
+                proxy.request('DELETE', '/pools/Pool-0/volumes/other')
+            return _resp_ok({'req': req})
+        proxy._request.side_effect = request
+        proxy.memo_begin()
+        proxy.request('GET', self.VOL_REQ)
+        proxy.request('GET', self.VOL_REQ)
+
+        fetched = [c[0][1] for c in proxy._request.call_args_list
+                   if c[0][0] == 'GET']
+        assert fetched == [self.VOL_REQ, self.VOL_REQ]
+
+    def test_scopes_nest(self, proxy):
+        proxy.memo_begin()
+        proxy.memo_begin()
+        proxy.memo_end()
+        proxy.request('GET', self.VOL_REQ)
+        proxy.request('GET', self.VOL_REQ)
+        proxy.memo_end()
+        proxy.request('GET', self.VOL_REQ)
+        assert proxy._request.call_count == 2
+
+    def test_memo_clear(self, proxy):
+        proxy.memo_begin()
+        proxy.request('GET', self.VOL_REQ)
+        proxy.memo_clear()
+        proxy.request('GET', self.VOL_REQ)
+        assert proxy._request.call_count == 2
+
+    def test_memoized_context_manager(self, proxy):
+        api = rest.JovianRESTAPI({'jovian_pool': 'Pool-0', 'san_hosts': []})
+        api.rproxy = proxy
+        with api.memoized():
+            api.rproxy.request('GET', self.VOL_REQ)
+            api.rproxy.request('GET', self.VOL_REQ)
+        assert proxy._memo is None
+        assert proxy._request.call_count == 1
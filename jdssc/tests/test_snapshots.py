@@ -5,6 +5,7 @@ from unittest.mock import MagicMock
 
 from jdssc.jovian_common.driver import JovianDSSDriver
 from jdssc.jovian_common import exception as jexc
+from jdssc.jovian_common import jdss_common as jcom
 from jdssc.jovian_common.jdss_common import time_to_epoch
 
 
@@ -138,3 +139,117 @@ class TestListSnapshots:
         # A transient REST failure is (pre-existing behavior) absorbed by
         # the page loop and yields an empty listing, not an error.
         assert driver.list_snapshots(VOL) == []
+
+
+DATASET = "nfs-data"
+
+
+class TestIterNasSnapshots:
+
+    def _entry(self, sid):
+        return {"name": jcom.sname(sid, DATASET),
+                "properties": {"guid": "1", "creation": 1753900000}}
+
+    def test_prefix_is_pushed_to_the_appliance(self, driver):
+        driver.ra.get_nas_volume_snapshots_page.side_effect = [
+            [self._entry("102_daily")], []]
+
+        snaps = list(driver.iter_nas_snapshots(
+            DATASET, nas_volume_direct_mode=True, snapshot_prefix="102_"))
+
+        assert [s["snapshot_name"] for s in snaps] == ["102_daily"]
+        driver.ra.get_nas_volume_snapshots_page.assert_called_with(
+            DATASET, 1, name_prefix="se_102_")
+
+    def test_prefix_rechecked_when_filter_is_ignored(self, driver):
+        driver.ra.get_nas_volume_snapshots_page.side_effect = [
+            [self._entry("102_daily"), self._entry("1020_daily")],
+            [self._entry("102_daily"), self._entry("1020_daily")], []]
+
+        snaps = list(driver.iter_nas_snapshots(
+            DATASET, nas_volume_direct_mode=True, snapshot_prefix="102_"))
+
+        assert [s["snapshot_name"] for s in snaps] == ["102_daily"]
+        driver.ra.get_nas_volume_snapshots_page.assert_called_with(
+            DATASET, 1, name_prefix=None)
+
+    def test_misapplied_filter_falls_back_to_full_listing(self, driver):
+        # The filtered page is missing 102_weekly and brings an entry
+        # outside the prefix, so the filtered result is not trusted.
+        full = [self._entry("102_daily"), self._entry("102_weekly"),
+                self._entry("103_daily")]
+
+        def page(vname, i, name_prefix=None):
+            if i > 0:
+                return []
+            if name_prefix is not None:
+                return [self._entry("102_daily"), self._entry("103_daily")]
+            return full
+        driver.ra.get_nas_volume_snapshots_page.side_effect = page
+
+        snaps = list(driver.iter_nas_snapshots(
+            DATASET, nas_volume_direct_mode=True, snapshot_prefix="102_"))
+
+        assert sorted(s["snapshot_name"] for s in snaps) == [
+            "102_daily", "102_weekly"]
+
+    def test_hashed_prefix_is_not_pushed_to_the_appliance(self, driver):
+        driver.ra.get_nas_volume_snapshots_page.side_effect = [
+            [self._entry("nightly.1"), self._entry("nightly.2"),
+             self._entry("weekly.1")], []]
+
+        snaps = list(driver.iter_nas_snapshots(
+            DATASET, nas_volume_direct_mode=True, snapshot_prefix="nightly."))
+
+        assert [s["snapshot_name"] for s in snaps] == ["nightly.1",
+                                                       "nightly.2"]
+        driver.ra.get_nas_volume_snapshots_page.assert_called_with(
+            DATASET, 1, name_prefix=None)
+
+    def test_rejected_filter_lists_all_and_filters(self, driver):
+        pages = {0: [self._entry("102_daily"), self._entry("103_daily")]}
+
+        def page(vname, i, name_prefix=None):
+            if name_prefix is not None:
+                raise jexc.JDSSException("where not supported")
+            return pages.get(i, [])
+        driver.ra.get_nas_volume_snapshots_page.side_effect = page
+
+        snaps = list(driver.iter_nas_snapshots(
+            DATASET, nas_volume_direct_mode=True, snapshot_prefix="103_"))
+
+        assert [s["snapshot_name"] for s in snaps] == ["103_daily"]
+
+    def test_no_filter_without_prefix(self, driver):
+        driver.ra.get_nas_volume_snapshots_page.side_effect = [
+            [self._entry("102_daily")], []]
+
+        assert len(driver.list_nas_snapshots(
+            DATASET, nas_volume_direct_mode=True)) == 1
+        driver.ra.get_nas_volume_snapshots_page.assert_called_with(
+            DATASET, 1, name_prefix=None)
+
+    def test_page_repeated_by_the_appliance_ends_the_scan(self, driver):
+        driver.ra.get_nas_volume_snapshots_page.return_value = [
+            self._entry("102_daily")]
+
+        assert len(driver.list_nas_snapshots(
+            DATASET, nas_volume_direct_mode=True)) == 1
+
+
+class TestIterNasVolumes:
+
+    def test_unpaged_fallback(self, driver):
+        driver.ra.get_nas_volumes_page.side_effect = \
+            jexc.JDSSException("paging not supported")
+        driver.ra.get_nas_volumes.return_value = {
+            "entries": [{"name": "v_nfs-a"}]}
+
+        assert driver.list_nas_volumes() == [{"name": "v_nfs-a"}]
+
+    def test_pages(self, driver):
+        driver.ra.get_nas_volumes_page.side_effect = [
+            [{"name": "v_nfs-a"}], [{"name": "v_nfs-b"}], []]
+
+        assert [v["name"] for v in driver.iter_nas_volumes()] == [
+            "v_nfs-a", "v_nfs-b"]
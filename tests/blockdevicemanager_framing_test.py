@@ -0,0 +1,148 @@
+#!/usr/bin/python3
+# Tests for the control socket framing of blockdevicemanager: a batch of
+# request lines ends with an empty line, a shut down write side or a bare
+# legacy SYNC, an oversized batch is refused, and a client that goes
+# silent is disconnected after REQUEST_TIMEOUT instead of holding its
+# serving thread forever.
+#
+# Self-contained: toml and inotify_simple are stubbed where they are not
+# installed, socket pairs stand in for control connections. The daemon
+# needs Python 3.12 or later. From the repo root:
+#
+#     python3 tests/blockdevicemanager_framing_test.py
+
+import importlib.machinery
+import importlib.util
+import json
+import os
+import socket
+import sys
+import threading
+import types
+import unittest
+
+DAEMON = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                      'blockdevicemanager', 'blockdevicemanager')
+
+
+def load_daemon():
+    for name in ('toml', 'inotify_simple'):
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            stub = types.ModuleType(name)
+            stub.INotify = stub.flags = stub.load = None
+            sys.modules[name] = stub
+    loader = importlib.machinery.SourceFileLoader('blockdevicemanager',
+                                                  DAEMON)
+    spec = importlib.util.spec_from_loader(loader.name, loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+
+try:
+    bdm = load_daemon()
+except SyntaxError:
+    bdm = None
+
+
+class State:
+
+    def __init__(self):
+        self.runs = []
+
+    def run(self, storeid=None, target=None):
+        self.runs.append((storeid, target))
+
+    def status(self):
+        return {'runs': len(self.runs)}
+
+
+@unittest.skipIf(bdm is None, "blockdevicemanager needs Python 3.12")
+class TestReadRequests(unittest.TestCase):
+
+    def setUp(self):
+        self.server, self.client = socket.socketpair()
+
+    def tearDown(self):
+        self.server.close()
+        self.client.close()
+
+    def test_batch_ends_with_empty_line(self):
+        self.client.sendall(b'sync\nstatus\n\nstatus\n')
+        self.assertEqual(bdm.read_requests(self.server), ['sync', 'status'])
+
+    def test_batch_ends_with_shutdown(self):
+        self.client.sendall(b'sync store-1/iqn.x\nstatus')
+        self.client.shutdown(socket.SHUT_WR)
+        self.assertEqual(bdm.read_requests(self.server),
+                         ['sync store-1/iqn.x', 'status'])
+
+    def test_legacy_sync(self):
+        self.client.sendall(b'SYNC')
+        self.assertEqual(bdm.read_requests(self.server), ['SYNC'])
+
+    def test_oversized_batch_refused(self):
+        line = b'status ' + b'x' * 4089 + b'\n'
+
+        def feed():
+            try:
+                for _ in range(bdm.REQUEST_MAX_SIZE // len(line) + 1):
+                    self.client.sendall(line)
+            except OSError:
+                pass
+        writer = threading.Thread(target=feed)
+        writer.start()
+        with self.assertRaises(ValueError):
+            bdm.read_requests(self.server)
+        self.server.close()
+        writer.join()
+
+
+@unittest.skipIf(bdm is None, "blockdevicemanager needs Python 3.12")
+class TestServeConnection(unittest.TestCase):
+
+    def setUp(self):
+        self.timeout = bdm.REQUEST_TIMEOUT
+        bdm.REQUEST_TIMEOUT = 0.2
+        self.server, self.client = socket.socketpair()
+        self.client.settimeout(5)
+
+    def tearDown(self):
+        bdm.REQUEST_TIMEOUT = self.timeout
+        self.server.close()
+        self.client.close()
+
+    def serve(self, state):
+        thread = threading.Thread(target=bdm.serve_connection,
+                                  args=(state, self.server))
+        thread.start()
+        return thread
+
+    def test_replies_line_per_request(self):
+        state = State()
+        thread = self.serve(state)
+        self.client.sendall(b'sync\nstatus\n\n')
+        thread.join(5)
+
+        replies = [json.loads(line) for line in
+                   self.client.makefile('rb').read().splitlines()]
+        self.assertEqual([r['status'] for r in replies], ['ok', 'ok'])
+        self.assertEqual(replies[1]['result'], {'runs': 1})
+        self.assertEqual(state.runs, [(None, None)])
+
+    def test_silent_client_disconnected(self):
+        state = State()
+        thread = self.serve(state)
+        self.client.sendall(b'sync\n')
+        thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(self.server.fileno(), -1)
+        self.assertEqual(self.client.recv(1), b'')
+        self.assertEqual(state.runs, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,385 @@
+#!/usr/bin/perl
+# Unit tests for the boot-time bulk reactivation: volume_activate_bulk
+# publishes the volumes of a VM in one jdssc run, logs in to each target
+# once, sends the rescans of the remaining LUNs as one request and leaves
+# volumes published elsewhere to their own activation; the plugin's
+# reactivate_storage picks the VM volumes without block devices from the
+# lun records, skips VMs configured on other nodes and runs one worker per
+# VM, in the background from activate_storage until a pass completed.
+#
+# Self-contained: PVE modules, String::Util and JSON are stubbed and the
+# jdssc, iSCSI and multipath steps are replaced by recorders; forked workers
+# report through a log file in a temp dir.  From the repo root:
+#
+#     perl tests/bulk_reactivation_test.pl
+
+use strict;
+use warnings;
+
+use Fcntl qw(:flock);
+use File::Path qw(make_path);
+use File::Temp ();
+use FindBin ();
+use lib "$FindBin::Bin/..";
+
+BEGIN {
+    $INC{'String/Util.pm'}        = __FILE__;
+    $INC{'PVE/INotify.pm'}        = __FILE__;
+    $INC{'PVE/Tools.pm'}          = __FILE__;
+    $INC{'PVE/Cluster.pm'}        = __FILE__;
+    $INC{'PVE/Storage.pm'}        = __FILE__;
+    $INC{'PVE/Storage/Plugin.pm'} = __FILE__;
+    $INC{'JSON.pm'}               = __FILE__;
+}
+{
+    # Imported but unused on the paths under test.
+    package String::Util;
+    sub import { }
+}
+{
+    package PVE::INotify;
+    sub import   { }
+    sub nodename { 'testnode' }
+}
+{
+    package PVE::Cluster;
+    sub import     { }
+    sub cfs_update { }
+}
+{
+    package PVE::Tools;
+    our $IPV4RE = qr/\d+\.\d+\.\d+\.\d+/;
+    our $IPV6RE = qr/[0-9a-fA-F:]+/;
+
+    sub run_command       { die "unexpected run_command: @{ $_[0] }\n" }
+    sub file_set_contents { }
+    sub run_with_timeout  { my ( $t, $code, @a ) = @_; return $code->(@a) }
+
+    sub import {
+        my $caller = caller;
+        no strict 'refs';
+        no warnings 'once';
+        *{"${caller}::run_command"}       = \&run_command;
+        *{"${caller}::file_set_contents"} = \&file_set_contents;
+        ${"${caller}::IPV4RE"}            = $IPV4RE;
+        ${"${caller}::IPV6RE"}            = $IPV6RE;
+    }
+}
+{
+    package JSON;
+    use JSON::PP ();
+
+    sub import {
+        my $caller = caller;
+        no strict 'refs';
+        *{"${caller}::decode_json"} = \&JSON::PP::decode_json;
+        *{"${caller}::from_json"}   = \&JSON::PP::decode_json;
+        *{"${caller}::to_json"}     = \&JSON::PP::encode_json;
+    }
+}
+{
+    package PVE::Storage;
+    use constant APIVER => 15;
+    use constant APIAGE => 6;
+    sub import { }
+}
+{
+    package PVE::Storage::Plugin;
+    sub import { }
+}
+
+# The plugin lives at the repo root but declares a PVE::Storage::Custom::
+# package, so it is loaded by path rather than by module name.
+BEGIN { require "$FindBin::Bin/../OpenEJovianDSSPlugin.pm"; }
+
+my $C      = 'OpenEJovianDSS::Common';
+my $PLUGIN = 'PVE::Storage::Custom::OpenEJovianDSSPlugin';
+my $tmp    = File::Temp->newdir();
+my $LOG    = "$tmp/calls.log";
+
+# A block device of the test host stands in for the devices that are present.
+my ($BLOCK) = grep { -b } glob('/dev/vd? /dev/sd? /dev/nvme?n? /dev/zram? /dev/loop?');
+
+# Every stubbed step is appended to one log, so forked workers count too.
+sub record {
+    open( my $fh, '>>', $LOG ) or die "$LOG: $!\n";
+    print $fh "@_\n";
+    close $fh;
+}
+
+sub logged {
+    open( my $fh, '<', $LOG ) or return ();
+    chomp( my @lines = <$fh> );
+    close $fh;
+    unlink $LOG;
+    return @lines;
+}
+
+# The backend's answer to ensure-many: volume -> "target lun ips scsiid".
+our %PUBLISHED;
+our %PRESENT;    # scsiid -> 1 for block devices the node already has
+{
+    no warnings qw(redefine once);
+    *OpenEJovianDSS::Common::joviandss_cmd = sub {
+        my ( $ctx, $cmd ) = @_;
+        record( 'jdssc', @$cmd );
+        my %args = @$cmd;
+        return join( '', map { "$_ $main::PUBLISHED{$_}\n" }
+                         grep { exists $main::PUBLISHED{$_} }
+                         split( /,/, $args{'--volumes'} ) );
+    };
+    *OpenEJovianDSS::Common::volume_stage_iscsi = sub {
+        my ( $ctx, $target, $lun, $hosts, $scsiid ) = @_;
+        record( 'stage', $target, $lun );
+        die "login failed\n" if $scsiid eq 'broken';
+        return ["/dev/disk/by-id/scsi-${scsiid}"];
+    };
+    *OpenEJovianDSS::Common::volume_stage_multipath = sub {
+        record( 'multipath', $_[1] );
+        return "/dev/mapper/$_[1]";
+    };
+    *OpenEJovianDSS::Common::_iscsi_sessions = sub {
+        [ { target => 'iqn.t1', host => 'host3' },
+          { target => 'iqn.t2', host => 'host4' } ]
+    };
+    *OpenEJovianDSS::Common::_scsi_rescan_request = sub {
+        my ( $ctx, @requests ) = @_;
+        record( 'rescan', map { "$_->[0]:$_->[1]" } @requests );
+        return 1;
+    };
+    *OpenEJovianDSS::Common::block_device_path_from_serial = sub {
+        my ( $ctx, $scsiid, $multipath ) = @_;
+        return $main::PRESENT{$scsiid} ? $BLOCK : "$tmp/missing-$scsiid";
+    };
+    *OpenEJovianDSS::Common::lun_record_local_update = sub {
+        my ( $ctx, $target, $lun, $volname, $snapname, $lunrec ) = @_;
+        record( 'record', $target, $lun, $volname,
+                "@{ $lunrec->{hosts} }", ${ $lunrec->{multipath} } );
+    };
+    *OpenEJovianDSS::Common::debugmsg = sub { };
+}
+
+# ---------------------------------------------------------------------------
+# Test harness
+# ---------------------------------------------------------------------------
+
+my ( $tests, $failures ) = ( 0, 0 );
+
+sub ok {
+    my ( $cond, $desc ) = @_;
+    $tests++;
+    if ($cond) {
+        print "ok $tests - $desc\n";
+        return 1;
+    }
+    $failures++;
+    print "NOT OK $tests - $desc\n";
+    return 0;
+}
+
+sub lunrec {
+    my ( $target, $lun, $volname, $scsiid, $snapname ) = @_;
+    return [ $target, $lun, "/state/$target/$lun/$volname",
+             { volname => $volname, scsiid => $scsiid, snapname => $snapname,
+               hosts => ['192.0.2.1'], multipath => \0 } ];
+}
+
+my $SCFG = { pool_name => 'Pool-0', multipath => 1 };
+
+# ---------------------------------------------------------------------------
+# One VM: one jdssc run, one login per target, one rescan request.
+# ---------------------------------------------------------------------------
+{
+    local %PUBLISHED = (
+        'vm-101-disk-0' => 'iqn.t1 0 192.0.2.1,192.0.2.2 id0',
+        'vm-101-disk-1' => 'iqn.t1 1 192.0.2.1,192.0.2.2 id1',
+        'vm-101-disk-2' => 'iqn.t1 2 192.0.2.1,192.0.2.2 id2',
+        'vm-101-disk-3' => 'iqn.t2 0 192.0.2.1,192.0.2.2 id3',
+    );
+    local %PRESENT = ( id1 => 1 );
+    my $records = [
+        lunrec( 'iqn.t1', 0, 'vm-101-disk-0', 'id0' ),
+        lunrec( 'iqn.t1', 1, 'vm-101-disk-1', 'id1' ),
+        lunrec( 'iqn.t1', 2, 'vm-101-disk-2', 'id2' ),
+        lunrec( 'iqn.t2', 0, 'vm-101-disk-3', 'id3' ),
+    ];
+    my $ctx   = { scfg => $SCFG, storeid => 'jdss', _held_locks => [] };
+    my $count = $C->can('volume_activate_bulk')->( $ctx, 101, $records );
+    my @log   = logged();
+
+    ok( $count == 4, 'bulk: every volume reactivated' );
+    my @jdssc = grep { /^jdssc / } @log;
+    ok( @jdssc == 1
+          && $jdssc[0] =~ /targets ensure-many .*--target-group-name vm-101 /
+          && $jdssc[0] =~ /--volumes vm-101-disk-0,vm-101-disk-1,vm-101-disk-2,vm-101-disk-3 /,
+        'bulk: one ensure-many for the VM target group' );
+    my @stages = grep { /^stage / } @log;
+    ok( "@stages[0,1]" eq 'stage iqn.t1 0 stage iqn.t2 0',
+        'bulk: first LUN of each target staged (logged in) first' );
+    my @rescans = grep { /^rescan / } @log;
+    ok( @rescans == 1 && $rescans[0] eq 'rescan host3:2',
+        'bulk: one rescan request for the LUNs still missing' );
+    ok( ( grep { /^multipath / } @log ) == 4, 'bulk: a map per volume' );
+    ok( ( grep { $_ eq 'record iqn.t1 2 vm-101-disk-2 192.0.2.1 192.0.2.2 1' } @log ) == 1,
+        'bulk: record updated with the current addresses' );
+}
+
+# ---------------------------------------------------------------------------
+# Moved or unpublished volumes and failed logins are left alone.
+# ---------------------------------------------------------------------------
+{
+    local %PUBLISHED = (
+        'vm-102-disk-0' => 'iqn.t1 5 192.0.2.1 id5',
+        'vm-102-disk-1' => 'iqn.t1 7 192.0.2.1 id6',
+        'vm-102-disk-3' => 'iqn.t2 1 192.0.2.1 broken',
+    );
+    my $records = [
+        lunrec( 'iqn.t1', 5, 'vm-102-disk-0', 'id5' ),
+        lunrec( 'iqn.t1', 6, 'vm-102-disk-1', 'id6' ),
+        lunrec( 'iqn.t1', 8, 'vm-102-disk-2', 'id8' ),
+        lunrec( 'iqn.t2', 1, 'vm-102-disk-3', 'broken' ),
+    ];
+    my $ctx   = { scfg => $SCFG, storeid => 'jdss', _held_locks => [] };
+    my $count = $C->can('volume_activate_bulk')->( $ctx, 102, $records );
+    my @log   = logged();
+
+    ok( $count == 1, 'skip: only the volume at its recorded LUN' );
+    ok( !grep( { /^stage iqn\.t1 7|^record .*vm-102-disk-[12]/ } @log ),
+        'skip: moved and unpublished volumes untouched' );
+    ok( !grep( { /^multipath broken/ } @log ), 'skip: failed login gets no map' );
+}
+
+# ---------------------------------------------------------------------------
+# reactivate_storage: VM volumes without block devices, one worker per VM.
+# ---------------------------------------------------------------------------
+{
+    no warnings qw(redefine once);
+    local %PRESENT = ( id20 => 1 );
+    my $NODE = "$tmp/nodes/testnode";
+    make_path( "$NODE/qemu-server", "$NODE/lxc" );
+    for my $conf (qw(qemu-server/201 qemu-server/202 lxc/203 qemu-server/204)) {
+        open( my $fh, '>', "$NODE/${conf}.conf" ) or die "$conf: $!\n";
+        close $fh;
+    }
+    local *PVE::Storage::Custom::OpenEJovianDSSPlugin::_node_config_dir =
+      sub { $NODE };
+    local *PVE::Storage::Custom::OpenEJovianDSSPlugin::lun_record_local_get_all = sub {
+        [ lunrec( 'iqn.a', 0, 'vm-201-disk-0', 'id10' ),
+          lunrec( 'iqn.a', 1, 'vm-201-disk-1', 'id11' ),
+          lunrec( 'iqn.b', 0, 'vm-202-disk-0', 'id20' ),
+          lunrec( 'iqn.c', 0, 'vm-203-disk-0', 'id30' ),
+          lunrec( 'iqn.c', 1, 'vm-203-disk-0', 'id31', 'snap1' ),
+          lunrec( 'iqn.d', 0, 'vm-204-disk-0', 'id40' ),
+          lunrec( 'iqn.e', 0, 'vm-205-disk-0', 'id50' ) ]
+    };
+    local *PVE::Storage::Custom::OpenEJovianDSSPlugin::volume_activate_bulk = sub {
+        my ( $ctx, $vmid, $records ) = @_;
+        record( 'worker', $vmid, $$, map { $_->[3]{volname} } @$records );
+        return $vmid == 204 ? 0 : scalar(@$records);
+    };
+    local *OpenEJovianDSS::Lock::with_lock = sub {
+        my ( $ctx, $class, $id, $timeout, $code ) = @_;
+        record( 'lock', $class, $id );
+        return $code->();
+    };
+
+    my ( $done, $total ) =
+      $PLUGIN->reactivate_storage( 'jdss', { pool_name => 'Pool-0' } );
+    my @log     = logged();
+    my @workers = sort grep { /^worker / } @log;
+
+    SKIP: {
+        last SKIP if !defined($BLOCK);    # no block device to stand in
+        ok( $total == 3 && $done == 2, "storage: 2 of 3 VMs done ($done/$total)" );
+        ok( @workers == 3
+              && $workers[0] =~ /^worker 201 \d+ vm-201-disk-0 vm-201-disk-1$/
+              && $workers[1] =~ /^worker 203 \d+ vm-203-disk-0$/,
+            'storage: present devices, snapshots and foreign VMs skipped' );
+        my %pids = map { ( split / / )[2] => 1 } @workers;
+        ok( keys(%pids) == 3 && !$pids{$$}, 'storage: a forked worker per VM' );
+    }
+    ok( ( grep { /^lock vm (201|203|204)$/ } @log ) == 3,
+        'storage: workers hold the VM lock' );
+
+    # Without the node's configuration nothing is reactivated
+    {
+        local *PVE::Storage::Custom::OpenEJovianDSSPlugin::_node_config_dir =
+          sub { "$tmp/nodes/unmounted" };
+        eval { $PLUGIN->reactivate_storage( 'jdss', { pool_name => 'P' } ) };
+        ok( $@ =~ /missing/ && !grep( { /^worker / } logged() ),
+            'storage: refused without the node configuration' );
+    }
+
+    # activate_storage runs it in the background until it completes once
+    no warnings qw(redefine once);
+    local *PVE::Storage::Custom::OpenEJovianDSSPlugin::_reactivation_dir =
+      sub { "$tmp/reactivated" };
+    local *PVE::Storage::Custom::OpenEJovianDSSPlugin::store_setup = sub { };
+    my $scfg = { pool_name => 'Pool-0', path => "$tmp/base",
+                 content => { images => 1 } };
+    my $marker = "$tmp/reactivated/jdss";
+
+    # Waits for the detached pass, which leaves its lock when done
+    my $settled = sub {
+        for ( 1 .. 100 ) {
+            open( my $lock, '>>', "${marker}.lock" ) or die "lock: $!\n";
+            return 1 if flock( $lock, LOCK_EX | LOCK_NB );
+            select( undef, undef, undef, 0.05 );
+        }
+        return 0;
+    };
+
+    {
+        local *PVE::Storage::Custom::OpenEJovianDSSPlugin::_node_config_dir =
+          sub { "$tmp/nodes/unmounted" };
+        $PLUGIN->activate_storage( 'jdss', $scfg );
+        select( undef, undef, undef, 0.2 );
+        ok( $settled->() && !-e $marker,
+            'activate_storage: no marker after a failed pass' );
+    }
+
+    {
+        # An fd of the caller, which the pass must not keep open
+        open( my $canary, '>', "$tmp/canary" ) or die "canary: $!\n";
+        my $fd = fileno($canary);
+        local *PVE::Storage::Custom::OpenEJovianDSSPlugin::volume_activate_bulk
+          = sub {
+            my $inherited = ( readlink("/proc/self/fd/${fd}") // '' )
+                eq "$tmp/canary";
+            select( undef, undef, undef, 0.5 );
+            record( 'worker', $_[1], $inherited ? 'inherited' : 'closed' );
+            return scalar( @{ $_[2] } );
+        };
+        $PLUGIN->activate_storage( 'jdss', $scfg );
+        ok( !-e $marker && !grep( { /^worker / } logged() ),
+            'activate_storage: returns without waiting for the pass' );
+
+        # A caller that comes while the pass runs starts no second one
+        select( undef, undef, undef, 0.2 );
+        $PLUGIN->activate_storage( 'jdss', $scfg );
+        for ( 1 .. 100 ) {
+            last if -e $marker;
+            select( undef, undef, undef, 0.05 );
+        }
+        ok( $settled->() && -e $marker,
+            'activate_storage: marker written once the pass completed' );
+        my @workers = grep { /^worker / } logged();
+        ok( @workers == 3,
+            'activate_storage: a failed pass is retried, once at a time' );
+        ok( !grep( { / inherited$/ } @workers ),
+            "activate_storage: the caller's fds are closed in the pass" );
+        close($canary);
+    }
+
+    $PLUGIN->activate_storage( 'jdss', $scfg );
+    select( undef, undef, undef, 0.2 );
+    ok( !grep( { /^worker / } logged() ), 'activate_storage: only once per boot' );
+}
+
+print "1..$tests\n";
+if ($failures) {
+    print "FAILED $failures/$tests\n";
+    exit 1;
+}
+print "PASSED $tests/$tests\n";
+exit 0;
@@ -0,0 +1,123 @@
+#!/usr/bin/perl
+# Tests for tools/joviandss-copy, the parallel copy used by NFS snapshot
+# rollback: sparse files are copied chunk by chunk with their holes kept,
+# a file of unchanged size and mtime is skipped, and directory trees are
+# copied with their symlinks.
+#
+# Self-contained, works on temp files. Run from the repo root:
+#
+#     perl tests/copy_tool_test.pl
+
+use strict;
+use warnings;
+
+use FindBin ();
+use File::Path qw(make_path);
+use File::Temp ();
+
+my $tool = "$FindBin::Bin/../tools/joviandss-copy";
+my $tmp  = File::Temp::tempdir( CLEANUP => 1 );
+my $MIB  = 1024 * 1024;
+
+my $tests  = 0;
+my $failed = 0;
+
+sub ok {
+    my ( $cond, $name ) = @_;
+    $tests++;
+    print( ( $cond ? "ok" : "NOT ok" ) . " $tests - $name\n" );
+    $failed++ unless $cond;
+}
+
+sub slurp {
+    my ($path) = @_;
+    open( my $fh, '<:raw', $path ) or return undef;
+    local $/;
+    my $data = <$fh>;
+    close $fh;
+    return $data;
+}
+
+# Write $data at each offset of %parts into a file of $size bytes, leaving
+# the rest a hole.
+sub sparse_file {
+    my ( $path, $size, %parts ) = @_;
+    open( my $fh, '>:raw', $path ) or die "$path: $!\n";
+    truncate( $fh, $size ) or die "$path: $!\n";
+    for my $offset ( keys %parts ) {
+        seek( $fh, $offset, 0 );
+        print $fh $parts{$offset};
+    }
+    close $fh;
+}
+
+sub run_tool {
+    my (@args) = @_;
+    my $out = qx{'$tool' --progress 0 --chunk-size 1 --streams 3 @args 2>&1};
+    return ( $? == 0, $out );
+}
+
+# --- a sparse image is copied, holes and all ------------------------------
+my $src = "$tmp/src.raw";
+my $dst = "$tmp/dst.raw";
+sparse_file( $src, 16 * $MIB,
+    0           => 'A' x ( 3 * $MIB + 5 ),
+    10 * $MIB   => 'B' x 4096,
+    16 * $MIB - 7 => 'tail!!!' );
+{
+    sparse_file( $dst, 20 * $MIB, 0 => 'old data' );
+    my ( $ok, $out ) = run_tool( $src, $dst );
+    ok( $ok, "image: copy succeeds" ) or print $out;
+    ok( slurp($dst) eq slurp($src), "image: content matches" );
+    ok( ( stat($dst) )[12] * 512 < 8 * $MIB, "image: holes stay holes" );
+    ok( ( stat($dst) )[9] == ( stat($src) )[9], "image: mtime carried over" );
+    ok( $out =~ /copied .* in 1 files, 0 unchanged skipped/,
+        "image: summary reported" );
+}
+
+# --- an unchanged image is skipped, --no-skip copies anyway ---------------
+{
+    my ( $ok, $out ) = run_tool( $src, $dst );
+    ok( $ok && $out =~ /in 0 files, 1 unchanged skipped/,
+        "skip: unchanged image not copied" );
+
+    open( my $fh, '+<:raw', $dst ) or die;
+    print $fh 'X';
+    close $fh;
+    utime( ( stat($src) )[8], ( stat($src) )[9], $dst );
+    ( $ok, $out ) = run_tool( '--no-skip', $src, $dst );
+    ok( $ok && slurp($dst) eq slurp($src), "skip: --no-skip copies again" );
+
+    utime( undef, undef, $dst );
+    open( $fh, '+<:raw', $dst ) or die;
+    print $fh 'X';
+    close $fh;
+    ( $ok, $out ) = run_tool( $src, $dst );
+    ok( $ok && slurp($dst) eq slurp($src), "skip: changed mtime is copied" );
+}
+
+# --- trees are copied with their symlinks ---------------------------------
+{
+    make_path( "$tmp/tree/images/102", "$tmp/copy" );
+    sparse_file( "$tmp/tree/images/102/vm-102-disk-0.raw", 2 * $MIB,
+        $MIB => 'C' x 100 );
+    sparse_file( "$tmp/tree/images/102/vm-102-disk-1.raw", 100, 0 => 'D' x 100 );
+    symlink( 'vm-102-disk-1.raw', "$tmp/tree/images/102/link" );
+    my ( $ok, $out ) = run_tool( "$tmp/tree", "$tmp/copy" );
+    ok( $ok, "tree: copy succeeds" ) or print $out;
+    ok( slurp("$tmp/copy/images/102/vm-102-disk-0.raw")
+          eq slurp("$tmp/tree/images/102/vm-102-disk-0.raw")
+          && slurp("$tmp/copy/images/102/vm-102-disk-1.raw") eq 'D' x 100,
+        "tree: files copied" );
+    ok( readlink("$tmp/copy/images/102/link") eq 'vm-102-disk-1.raw',
+        "tree: symlink recreated" );
+}
+
+# --- failures are reported ------------------------------------------------
+{
+    my ( $ok, $out ) = run_tool( "$tmp/missing.raw", $dst );
+    ok( !$ok && $out =~ /failed/, "missing source fails" );
+}
+
+print $failed ? "FAILED: $failed of $tests\n" : "PASS: all $tests tests\n";
+exit( $failed ? 1 : 0 );
@@ -0,0 +1,229 @@
+#!/usr/bin/perl
+# Tests for tools/joviandss-data-copy, the export/import stream copy of the
+# iSCSI plugin: a device is streamed out byte for byte, an imported stream
+# lands byte for byte with its all-zero parts left unwritten (or zeroed on
+# request), and Common::data_copy uses the tool instead of dd where it is
+# installed.
+#
+# Self-contained: files in a temp dir stand in for the block devices, PVE
+# modules are stubbed with a run_command that runs the tool. From the repo
+# root:
+#
+#     perl tests/data_copy_tool_test.pl
+
+use strict;
+use warnings;
+
+use FindBin ();
+use lib "$FindBin::Bin/..";
+use File::Temp ();
+use POSIX ();
+
+BEGIN {
+    $INC{'String/Util.pm'} = __FILE__;
+    $INC{'PVE/INotify.pm'} = __FILE__;
+    $INC{'PVE/Tools.pm'}   = __FILE__;
+    $INC{'PVE/Cluster.pm'} = __FILE__;
+    $INC{'JSON.pm'}        = __FILE__;
+}
+{
+    # Imported but unused on the paths under test.
+    package String::Util;
+    sub import { }
+}
+{
+    package PVE::INotify;
+    sub import   { }
+    sub nodename { 'testnode' }
+}
+{
+    package PVE::Cluster;
+    sub import     { }
+    sub cfs_update { }
+}
+{
+    # Runs the command with the input/output redirections data_copy asks
+    # for; stderr lines go to errfunc.
+    package PVE::Tools;
+    our @COMMANDS;
+
+    sub run_command {
+        my ( $cmd, %param ) = @_;
+        push @COMMANDS, [@$cmd];
+        my $err = File::Temp->new();
+        my $pid = fork() // die "fork failed\n";
+        if ( !$pid ) {
+            if ( ( $param{input} // '' ) =~ /^<&(\d+)$/ ) {
+                POSIX::dup2( $1, 0 );
+            }
+            if ( ( $param{output} // '' ) =~ /^>&(\d+)$/ ) {
+                POSIX::dup2( $1, 1 );
+            }
+            open( STDERR, '>', $err->filename );
+            exec(@$cmd) or POSIX::_exit(127);
+        }
+        waitpid( $pid, 0 );
+        my $status = $?;
+        seek( $err, 0, 0 );
+        while ( my $line = <$err> ) {
+            chomp $line;
+            $param{errfunc}->($line) if $param{errfunc};
+        }
+        die "command '@$cmd' failed: exit code " . ( $status >> 8 ) . "\n"
+            if $status;
+        return 0;
+    }
+    sub file_set_contents { }
+    sub run_with_timeout  { my ( $t, $code, @a ) = @_; return $code->(@a) }
+
+    sub import {
+        my $caller = caller;
+        no strict 'refs';
+        *{"${caller}::run_command"}       = \&run_command;
+        *{"${caller}::file_set_contents"} = \&file_set_contents;
+    }
+}
+{
+    package JSON;
+    use JSON::PP ();
+
+    sub import {
+        my $caller = caller;
+        no strict 'refs';
+        *{"${caller}::decode_json"} = \&JSON::PP::decode_json;
+        *{"${caller}::from_json"}   = \&JSON::PP::decode_json;
+        *{"${caller}::to_json"}     = \&JSON::PP::encode_json;
+    }
+}
+
+use OpenEJovianDSS::Common;
+
+my $tool = "$FindBin::Bin/../tools/joviandss-data-copy";
+my $tmp  = File::Temp::tempdir( CLEANUP => 1 );
+my $MIB  = 1024 * 1024;
+
+{
+    no warnings qw(redefine once);
+    *OpenEJovianDSS::Common::debugmsg = sub { };
+}
+
+my $tests  = 0;
+my $failed = 0;
+
+sub ok {
+    my ( $cond, $name ) = @_;
+    $tests++;
+    print( ( $cond ? "ok" : "NOT ok" ) . " $tests - $name\n" );
+    $failed++ unless $cond;
+}
+
+sub slurp {
+    my ($path) = @_;
+    open( my $fh, '<:raw', $path ) or return undef;
+    local $/;
+    my $data = <$fh>;
+    close $fh;
+    return $data;
+}
+
+# Write $data at each offset of %parts into a file of $size bytes, leaving
+# the rest a hole.
+sub sparse_file {
+    my ( $path, $size, %parts ) = @_;
+    open( my $fh, '>:raw', $path ) or die "$path: $!\n";
+    truncate( $fh, $size ) or die "$path: $!\n";
+    for my $offset ( keys %parts ) {
+        seek( $fh, $offset, 0 );
+        print $fh $parts{$offset};
+    }
+    close $fh;
+}
+
+sub allocated { ( stat( $_[0] ) )[12] * 512 }
+
+sub run_tool {
+    my ( $args, $in, $out ) = @_;
+    my $cmd = "'$tool' --progress 0 --queue-depth 3 --block-size 1M $args 2>&1";
+    $cmd .= " < '$in'"  if defined $in;
+    $cmd .= " > '$out'" if defined $out;
+    my $err = qx{$cmd};
+    return ( $? == 0, $err );
+}
+
+my $dev = "$tmp/dev.raw";
+sparse_file( $dev, 16 * $MIB,
+    0                => 'A' x ( 3 * $MIB + 5 ),
+    10 * $MIB + 4096 => 'B' x 100,
+    16 * $MIB - 7    => 'tail!!!' );
+
+# --- export streams every byte --------------------------------------------
+{
+    my ( $ok, $err ) = run_tool( "export '$dev'", undef, "$tmp/stream" );
+    ok( $ok, "export: succeeds" ) or print $err;
+    ok( slurp("$tmp/stream") eq slurp($dev), "export: stream is the device" );
+    ok( scalar( $err =~ /exported 16\.0 MiB, took .* seconds, .*\/s/ ),
+        "export: throughput reported" );
+}
+
+# --- import writes the data and leaves the zeroes -------------------------
+{
+    sparse_file( "$tmp/new.raw", 16 * $MIB );
+    my ( $ok, $err ) = run_tool( "import '$tmp/new.raw'", "$tmp/stream" );
+    ok( $ok, "import: succeeds" ) or print $err;
+    ok( slurp("$tmp/new.raw") eq slurp($dev), "import: device matches" );
+    ok( allocated("$tmp/new.raw") < 5 * $MIB, "import: zeroes not written" );
+    ok( scalar( $err =~ /imported 16\.0 MiB \(12\.\d MiB zeroes, skip\)/ ),
+        "import: zeroes reported" );
+}
+
+# --- zeroout clears stale data where the stream has zeroes ----------------
+{
+    sparse_file( "$tmp/old.raw", 16 * $MIB, 8 * $MIB => 'stale' x 1000 );
+    my ( $ok, $err ) =
+      run_tool( "--zeroes zeroout import '$tmp/old.raw'", "$tmp/stream" );
+    ok( $ok && slurp("$tmp/old.raw") eq slurp($dev),
+        "zeroout: stale data cleared" ) or print $err;
+}
+
+# --- sizes that fit no buffer --------------------------------------------
+{
+    sparse_file( "$tmp/odd.raw", 1_000_003, 999_000 => 'odd' );
+    sparse_file( "$tmp/odd-copy.raw", 1_000_003 );
+    my ( $ok ) = run_tool( "export '$tmp/odd.raw'", undef, "$tmp/odd.stream" );
+    ( $ok ) = run_tool( "--zero-size 3K import '$tmp/odd-copy.raw'",
+        "$tmp/odd.stream" ) if $ok;
+    ok( $ok && slurp("$tmp/odd-copy.raw") eq slurp("$tmp/odd.raw"),
+        "odd size: copied exactly" );
+}
+
+# --- failures are reported ------------------------------------------------
+{
+    my ( $ok, $err ) = run_tool( "export '$tmp/missing.raw'", undef,
+        "$tmp/none" );
+    ok( !$ok && $err =~ /export of .* failed/ ? 1 : 0, "missing device fails" );
+}
+
+# --- data_copy runs the tool where it is installed ------------------------
+{
+    no warnings qw(redefine once);
+    local *OpenEJovianDSS::Common::_data_copy_tool = sub { $tool };
+    my $ctx = { scfg => { data_copy_bs => '128K' } };
+
+    open( my $out, '>:raw', "$tmp/dc.stream" ) or die;
+    OpenEJovianDSS::Common::data_copy( $ctx, $dev, $out );
+    close $out;
+    ok( slurp("$tmp/dc.stream") eq slurp($dev), "data_copy: export" );
+
+    sparse_file( "$tmp/dc.raw", 16 * $MIB );
+    open( my $in, '<:raw', "$tmp/dc.stream" ) or die;
+    OpenEJovianDSS::Common::data_copy( $ctx, $in, "$tmp/dc.raw" );
+    close $in;
+    ok( slurp("$tmp/dc.raw") eq slurp($dev), "data_copy: import" );
+
+    ok( !grep( { $_->[0] eq 'dd' } @PVE::Tools::COMMANDS )
+          && ( grep { "@$_" =~ /--zero-size 128K import/ } @PVE::Tools::COMMANDS ),
+        "data_copy: tool instead of dd, data_copy_bs as zero size" );
+}
+
+print $failed ? "FAILED: $failed of $tests\n" : "PASS: all $tests tests\n";
+exit( $failed ? 1 : 0 );
@@ -0,0 +1,253 @@
+#!/usr/bin/perl
+# Unit tests for the sysfs iSCSI session reader: _iscsi_sessions parses the
+# session and connection attributes and the SCSI host of every session,
+# memoizes the snapshot in the ctx for ISCSI_SESSIONS_CACHE_TTL, and drops
+# it on invalidation, which iSCSI login and logout do; volume_stage_iscsi
+# counts a portal as logged in only on an exact address match.
+#
+# Self-contained: PVE modules, String::Util and JSON are stubbed, a temp dir
+# stands in for /sys/class, and iscsiadm is replaced by a recorder that
+# adds and removes sessions in it.  From the repo root:
+#
+#     perl tests/iscsi_sessions_test.pl
+
+use strict;
+use warnings;
+
+use File::Path qw(make_path remove_tree);
+use File::Temp ();
+use FindBin ();
+use lib "$FindBin::Bin/..";
+
+BEGIN {
+    $INC{'String/Util.pm'} = __FILE__;
+    $INC{'PVE/INotify.pm'} = __FILE__;
+    $INC{'PVE/Tools.pm'}   = __FILE__;
+    $INC{'PVE/Cluster.pm'} = __FILE__;
+    $INC{'JSON.pm'}        = __FILE__;
+}
+{
+    # Imported but unused on the paths under test.
+    package String::Util;
+    sub import { }
+}
+{
+    package PVE::INotify;
+    sub import   { }
+    sub nodename { 'testnode' }
+}
+{
+    package PVE::Cluster;
+    sub import     { }
+    sub cfs_update { }
+}
+{
+    package PVE::Tools;
+    sub run_command       { main::iscsiadm(@_) }
+    sub file_set_contents { }
+    sub run_with_timeout  { my ( $t, $code, @a ) = @_; return $code->(@a) }
+
+    sub import {
+        my $caller = caller;
+        no strict 'refs';
+        *{"${caller}::run_command"}       = \&run_command;
+        *{"${caller}::file_set_contents"} = \&file_set_contents;
+    }
+}
+{
+    package JSON;
+    use JSON::PP ();
+
+    sub import {
+        my $caller = caller;
+        no strict 'refs';
+        *{"${caller}::decode_json"} = \&JSON::PP::decode_json;
+        *{"${caller}::from_json"}   = \&JSON::PP::decode_json;
+        *{"${caller}::to_json"}     = \&JSON::PP::encode_json;
+    }
+}
+
+use OpenEJovianDSS::Common;
+
+my $C   = 'OpenEJovianDSS::Common';
+my $tmp = File::Temp->newdir();
+my $SYS = "$tmp/sys";
+my $DEV = "$tmp/dev/scsi-id0";
+make_path("$tmp/dev");
+
+# A block device of the test host stands in for the staged LUN.
+my ($BLOCK) = grep { -b }
+    glob('/dev/vd? /dev/sd? /dev/nvme?n? /dev/zram? /dev/loop?');
+
+sub add_session {
+    my ( $sid, $target, $address, $host, %opt ) = @_;
+    my $sdir = "$SYS/iscsi_session/session${sid}";
+    my $cdir = "$SYS/iscsi_connection/connection${sid}:0";
+    my $hdir = "$SYS/devices/platform/${host}/session${sid}";
+    make_path( $sdir, $cdir, $hdir );
+    my %attrs = (
+        "$sdir/targetname" => $target,
+        "$sdir/state"      => 'LOGGED_IN',
+        ( $opt{legacy} ? "$cdir/address" : "$cdir/persistent_address" )
+            => $address,
+        ( $opt{legacy} ? "$cdir/port" : "$cdir/persistent_port" ) => 3260,
+    );
+    while ( my ( $path, $value ) = each %attrs ) {
+        open( my $fh, '>', $path ) or die "$path: $!\n";
+        print $fh "${value}\n";
+        close $fh;
+    }
+    symlink( $hdir, "$sdir/device" ) or die "symlink: $!\n";
+}
+
+sub drop_session {
+    my ($sid) = @_;
+    remove_tree( "$SYS/iscsi_session/session${sid}",
+                 "$SYS/iscsi_connection/connection${sid}:0" );
+}
+
+# iscsiadm: logins add a session and the LUN's device link, logouts drop
+# every session of the target.
+our @ISCSIADM;
+our $NEXT_SID = 10;
+sub iscsiadm {
+    my ($cmd) = @_;
+    my @argv = map { $_ // '' } @$cmd;
+    my %arg;
+    for my $i ( 0 .. $#argv - 1 ) {
+        $arg{ $argv[$i] } = $argv[ $i + 1 ] if $argv[$i] =~ /^-/;
+    }
+    if ( grep { $_ eq '--login' } @argv ) {
+        push @ISCSIADM, "login $arg{'-p'}";
+        add_session( $NEXT_SID++, $arg{'--targetname'}, $arg{'-p'}, 'host5' );
+        symlink( $BLOCK, $DEV ) unless -l $DEV;
+    } elsif ( grep { $_ eq '--logout' } @argv ) {
+        push @ISCSIADM, 'logout';
+        for my $s ( glob("$SYS/iscsi_session/session*") ) {
+            my ($sid) = $s =~ /session(\d+)$/;
+            drop_session($sid);
+        }
+    }
+    return 0;
+}
+
+{
+    no warnings qw(redefine once);
+    *OpenEJovianDSS::Common::_iscsi_session_dir =
+        sub { "$SYS/iscsi_session" };
+    *OpenEJovianDSS::Common::_iscsi_connection_dir =
+        sub { "$SYS/iscsi_connection" };
+    *OpenEJovianDSS::Common::debugmsg              = sub { };
+    *OpenEJovianDSS::Common::cmd_log_output        = sub { };
+    *OpenEJovianDSS::Common::get_chap_enabled      = sub { 0 };
+    *OpenEJovianDSS::Common::_iscsiadm_clear_chap  = sub { };
+    *OpenEJovianDSS::Common::_uevent_monitor_open  = sub { undef };
+    *OpenEJovianDSS::Common::_uevent_wait          = sub { 0 };
+    *OpenEJovianDSS::Common::_block_device_wait    = sub { 0 };
+    *OpenEJovianDSS::Common::_iscsi_capacity_ok    = sub { 1 };
+    *OpenEJovianDSS::Common::_rescan_target_hosts  = sub { };
+    *OpenEJovianDSS::Common::block_device_path_from_serial = sub { $DEV };
+    *OpenEJovianDSS::Lock::refresh_locks           = sub { };
+}
+
+# ---------------------------------------------------------------------------
+# Test harness
+# ---------------------------------------------------------------------------
+
+my ( $tests, $failures ) = ( 0, 0 );
+
+sub ok {
+    my ( $cond, $desc ) = @_;
+    $tests++;
+    if ($cond) {
+        print "ok $tests - $desc\n";
+        return 1;
+    }
+    $failures++;
+    print "NOT OK $tests - $desc\n";
+    return 0;
+}
+
+my $sessions = $C->can('_iscsi_sessions');
+
+sub summary {
+    my ($list) = @_;
+    return join( ' ',
+        map { "$_->{sid}:$_->{target}\@$_->{address}:$_->{port}/"
+              . ( $_->{host} // '-' ) }
+        sort { $a->{sid} <=> $b->{sid} } @$list );
+}
+
+# ---------------------------------------------------------------------------
+# Parsing
+# ---------------------------------------------------------------------------
+{
+    ok( summary( $sessions->( {} ) ) eq '', 'parse: no session class, none' );
+
+    add_session( 1, 'iqn.t1', '192.0.2.1', 'host3' );
+    add_session( 2, 'iqn.t2', '192.0.2.2', 'host4', legacy => 1 );
+    make_path("$SYS/iscsi_session/session3");    # torn down mid-read
+    my $list = $sessions->( {} );
+    ok( summary($list) eq
+          '1:iqn.t1@192.0.2.1:3260/host3 2:iqn.t2@192.0.2.2:3260/host4',
+        'parse: target, portal and SCSI host of each session' );
+    ok( $list->[0]{state} eq 'LOGGED_IN', 'parse: session state' );
+    remove_tree("$SYS/iscsi_session/session3");
+}
+
+# ---------------------------------------------------------------------------
+# Memo window and invalidation
+# ---------------------------------------------------------------------------
+{
+    my $ctx = {};
+    my $first = $sessions->($ctx);
+    add_session( 4, 'iqn.t4', '192.0.2.4', 'host6' );
+    ok( $sessions->($ctx) == $first, 'memo: reused within the TTL' );
+
+    $ctx->{_iscsi_sessions}{at} -= 2;
+    ok( summary( $sessions->($ctx) ) =~ /4:iqn\.t4/,
+        'memo: re-read after the TTL' );
+
+    drop_session(4);
+    $C->can('_iscsi_sessions_invalidate')->($ctx);
+    ok( summary( $sessions->($ctx) ) !~ /iqn\.t4/,
+        'memo: invalidate drops it' );
+}
+
+# ---------------------------------------------------------------------------
+# Logins and logouts drop the snapshot; portals match exactly.
+# ---------------------------------------------------------------------------
+SKIP: {
+    unless ($BLOCK) {
+        ok( 1, "skip: no block device on this host" ) for 1 .. 5;
+        last SKIP;
+    }
+
+    # 192.0.2.1 has its session; 192.0.2.2 only a look-alike at 192.0.2.20
+    add_session( 5, 'iqn.t9', '192.0.2.1', 'host7' );
+    add_session( 6, 'iqn.t9', '192.0.2.20', 'host7' );
+    my $ctx    = {};
+    my $before = $sessions->($ctx);
+
+    local @ISCSIADM;
+    my $paths = $C->can('volume_stage_iscsi')->(
+        $ctx, 'iqn.t9', 0, [ '192.0.2.1', '192.0.2.2' ], 'id0' );
+    ok( "@ISCSIADM" eq 'login 192.0.2.2',
+        'stage: only the portal without an exact match logs in' );
+    ok( $paths->[0] eq $DEV, 'stage: device staged' );
+    ok( $sessions->($ctx) != $before, 'stage: login dropped the snapshot' );
+    ok( summary( $sessions->($ctx) ) =~ /iqn\.t9\@192\.0\.2\.2:/,
+        'stage: new session seen on the next read' );
+
+    $C->can('volume_unstage_iscsi')->( $ctx, 'iqn.t9' );
+    ok( !exists $ctx->{_iscsi_sessions},
+        'unstage: logout dropped the snapshot' );
+}
+
+print "1..$tests\n";
+if ($failures) {
+    print "FAILED $failures/$tests\n";
+    exit 1;
+}
+print "PASSED $tests/$tests\n";
+exit 0;
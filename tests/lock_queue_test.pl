@@ -0,0 +1,231 @@
+#!/usr/bin/perl
+# Functional tests for OpenEJovianDSS::Lock's node-local queue in front of
+# cluster locks: local waiters for one pmxcfs lock line up FIFO on flocked
+# entry files and only the head polls the lock dir; a waiter that dies in
+# the queue or times out does not stall the ones behind it. A temp dir
+# stands in for /etc/pve/priv/lock and for /run/lock.
+#
+# Self-contained: PVE modules are stubbed, forked children provide the
+# contention. Run from the repo root:
+#
+#     perl tests/lock_queue_test.pl        (~10 s wall time)
+
+use strict;
+use warnings;
+
+use FindBin ();
+use lib "$FindBin::Bin/..";
+
+use Fcntl ();
+use File::Temp ();
+use POSIX ();
+use Time::HiRes ();
+
+BEGIN {
+    $INC{'PVE/Cluster.pm'} = __FILE__;
+    $INC{'PVE/Tools.pm'}   = __FILE__;
+}
+{
+    package PVE::Cluster;
+    sub import     { }
+    sub cfs_update { }
+}
+{
+    package PVE::Tools;
+    sub import { }
+    sub run_with_timeout {
+        my ($timeout, $code, @param) = @_;
+        die "got timeout\n" if $timeout <= 0;
+        my $prev = alarm(0);
+        my $res;
+        my $ok = eval {
+            local $SIG{ALRM} = sub { die "got timeout\n" };
+            alarm($timeout);
+            $res = $code->(@param);
+            alarm(0);
+            1;
+        };
+        my $err = $@;
+        alarm(0);
+        alarm($prev) if $prev;
+        die $err if !$ok;
+        return $res;
+    }
+}
+
+use OpenEJovianDSS::Lock;
+
+my $tmpdir = File::Temp::tempdir( CLEANUP => 1 );
+my $log    = "$tmpdir/debug.log";
+
+{
+    package OpenEJovianDSS::Common;
+    no warnings 'redefine';
+    sub PROXMOX_CLUSTER_LOCK_TIMEOUT_MAX  { 117 }
+    sub PROXMOX_CLUSTER_POLL_BASE_SLEEP   { 0.05 }
+    sub PROXMOX_CLUSTER_POLL_BACKOFF_STEP { 0.05 }
+    sub PROXMOX_CLUSTER_POLL_JITTER_MAX   { 0.05 }
+    sub PROXMOX_CLUSTER_POLL_SLEEP_CAP    { 0.1 }
+    sub PROXMOX_CLUSTER_POLL_FINAL_WINDOW { 0.5 }
+    sub PROXMOX_CLUSTER_POLL_FINAL_SLEEP  { 0.05 }
+
+    # Every poll iteration logs "waiting for ..." — the log tells which
+    # processes are hitting the lock dir.
+    sub debugmsg {
+        my ( $ctx, $level, $msg ) = @_;
+        open( my $fh, '>>', $log ) or return;
+        flock( $fh, Fcntl::LOCK_EX );
+        print {$fh} "$$ $msg\n";
+        close $fh;
+    }
+}
+{
+    no warnings 'redefine';
+    *OpenEJovianDSS::Lock::_lock_queue_dir = sub { "$tmpdir/queue" };
+    *OpenEJovianDSS::Lock::_lock_stats_file = sub { "$tmpdir/lock-stats.log" };
+}
+
+my $L      = 'OpenEJovianDSS::Lock';
+my $tests  = 0;
+my $failed = 0;
+
+sub ok {
+    my ( $cond, $name ) = @_;
+    $tests++;
+    print( ( $cond ? "ok" : "NOT ok" ) . " $tests - $name\n" );
+    $failed++ unless $cond;
+}
+
+sub new_test_ctx { return { _held_locks => [] } }
+
+# Child taking the cluster lock at $path for $hold seconds; on entry to the
+# body it appends its tag to $order.
+sub locker {
+    my ( $path, $tag, $hold, $order, $timeout ) = @_;
+    my $pid = fork() // die "fork failed\n";
+    if ( !$pid ) {
+        my $ok = eval {
+            $L->can('_lock_exec')->( new_test_ctx(), 'cluster', $path,
+                'exclusive', $timeout // 10, 30, sub {
+                    open( my $fh, '>>', $order ) or die "$order: $!\n";
+                    print {$fh} "$tag\n";
+                    close $fh;
+                    Time::HiRes::sleep($hold);
+                } );
+            1;
+        };
+        POSIX::_exit( $ok ? 0 : 1 );
+    }
+    return $pid;
+}
+
+sub slurp {
+    my ($file) = @_;
+    open( my $fh, '<', $file ) or return ();
+    chomp( my @lines = <$fh> );
+    return @lines;
+}
+
+sub wait_for_lines {
+    my ( $file, $n ) = @_;
+    for ( 1 .. 200 ) {
+        my @lines = slurp($file);
+        return 1 if @lines >= $n;
+        Time::HiRes::sleep(0.05);
+    }
+    return 0;
+}
+
+sub queue_entries {
+    my ($name) = @_;
+    opendir( my $dh, "$tmpdir/queue/$name" ) or return ();
+    my @e = grep { /^\d{12}\.\d+$/ } readdir($dh);
+    closedir($dh);
+    return @e;
+}
+
+# --- FIFO handoff, one pmxcfs poller per node ---------------------------------
+{
+    my $path  = "$tmpdir/joviandss-lock-fifo";
+    my $order = "$tmpdir/fifo.order";
+    my @pids  = ( locker( $path, 'holder', 2, $order ) );
+    wait_for_lines( $order, 1 );
+    for my $tag (qw(w1 w2 w3)) {
+        push @pids, locker( $path, $tag, 0.2, $order );
+        Time::HiRes::sleep(0.2);
+    }
+    Time::HiRes::sleep(0.5);
+    unlink($log);
+    Time::HiRes::sleep(0.5);    # the holder still has ~0.4 s to go
+
+    my %pollers = map { /^(\d+) waiting for joviandss lock/ ? ( $1 => 1 ) : () }
+                  slurp($log);
+    ok( keys(%pollers) == 1, "only the queue head polls pmxcfs ("
+          . scalar( keys %pollers ) . " poller(s))" );
+    ok( queue_entries('joviandss-lock-fifo') == 3,
+        "the waiters are parked in the node queue" );
+
+    waitpid( $_, 0 ) for @pids;
+    ok( join( ',', slurp($order) ) eq 'holder,w1,w2,w3',
+        "waiters get the lock in arrival order" );
+    ok( !queue_entries('joviandss-lock-fifo'), "queue is empty afterwards" );
+    ok( !-e $path, "lock dir released" );
+}
+
+# --- a waiter killed in the queue does not stall its successor ---------------
+{
+    my $path  = "$tmpdir/joviandss-lock-dead";
+    my $order = "$tmpdir/dead.order";
+    my $holder = locker( $path, 'holder', 1.5, $order );
+    wait_for_lines( $order, 1 );
+    my $doomed = locker( $path, 'doomed', 0.1, $order );
+    Time::HiRes::sleep(0.2);
+    my $next = locker( $path, 'next', 0.1, $order );
+    Time::HiRes::sleep(0.2);
+    kill( 'KILL', $doomed );
+    waitpid( $_, 0 ) for $holder, $doomed, $next;
+
+    ok( join( ',', slurp($order) ) eq 'holder,next',
+        "successor of a dead waiter gets the lock" );
+    ok( !queue_entries('joviandss-lock-dead'),
+        "dead waiter's entry is reclaimed" );
+}
+
+# --- a waiter times out in the queue with the acquire error ------------------
+{
+    my $path   = "$tmpdir/joviandss-lock-timeout";
+    my $order  = "$tmpdir/timeout.order";
+    my $holder = locker( $path, 'holder', 3, $order );
+    wait_for_lines( $order, 1 );
+    my $head = locker( $path, 'head', 0.1, $order );
+    Time::HiRes::sleep(0.2);
+
+    # A never-acquired cluster lock is reported as quorum loss unless
+    # /etc/pve/local is writable; stand in for a quorate node.
+    no warnings qw(redefine once);
+    local *File::stat::lstat = sub {
+        bless( { mode => 0750 }, 'QuorateStat' );
+    };
+    local *QuorateStat::mode = sub { $_[0]{mode} };
+
+    my $start = Time::HiRes::time();
+    my $ok    = eval {
+        $L->can('_lock_exec')->( new_test_ctx(), 'cluster', $path,
+            'exclusive', 1, 30, sub { 1 } );
+        1;
+    };
+    my $err  = $@;
+    my $took = Time::HiRes::time() - $start;
+    ok( !$ok && $L->can('lock_error_acquire')->($err),
+        "queue timeout classifies as acquire contention" );
+    ok( $took < 2.5, sprintf( "queue wait honours the deadline (%.1fs)", $took ) );
+    ok( queue_entries('joviandss-lock-timeout') == 1,
+        "timed-out waiter left the queue" );
+
+    waitpid( $_, 0 ) for $holder, $head;
+    ok( join( ',', slurp($order) ) eq 'holder,head',
+        "waiter ahead of the timed-out one still gets the lock" );
+}
+
+print $failed ? "FAILED: $failed of $tests\n" : "PASS: all $tests tests\n";
+exit( $failed ? 1 : 0 );
@@ -71,6 +71,10 @@ use OpenEJovianDSS::Lock;
 }
 
 my $tmpdir = File::Temp::tempdir( CLEANUP => 1 );
+{
+    no warnings 'redefine';
+    *OpenEJovianDSS::Lock::_lock_stats_file = sub { "$tmpdir/lock-stats.log" };
+}
 my $tests  = 0;
 my $failed = 0;
 
@@ -86,7 +90,7 @@ sub new_test_ctx { return { _held_locks => [] } }
 sub commission_node {
     my ( $ctx, $name, %over ) = @_;
     return OpenEJovianDSS::Lock::_lock_ctx_commission(
-        $ctx, 'node', "$tmpdir/$name",
+        $ctx, 'node', "$tmpdir/$name", 'exclusive',
         $over{timeout} // 5, exists $over{hold} ? $over{hold} : 4 );
 }
 
@@ -129,7 +133,7 @@ sub commission_node {
     sleep 1;          # let the child take it
 
     my $ctx = new_test_ctx();
-    my $id  = OpenEJovianDSS::Lock::_lock_ctx_commission( $ctx, 'node', $lockpath, 2, 4 );
+    my $id  = OpenEJovianDSS::Lock::_lock_ctx_commission( $ctx, 'node', $lockpath, 'exclusive', 2, 4 );
     my $start = time();
     my $ok    = eval { OpenEJovianDSS::Lock::_lock_acquire( $ctx, $id ); 1 };
     my $err     = $@;
@@ -300,7 +304,7 @@ sub commission_node {
     OpenEJovianDSS::Lock::_lock_acquire( $ctx, $outer );
     OpenEJovianDSS::Lock::_lock_record( $ctx, $outer )->{deadline} = time() - 1;
 
-    my $inner = OpenEJovianDSS::Lock::_lock_ctx_commission( $ctx, 'node', $lockpath, 4, 4 );
+    my $inner = OpenEJovianDSS::Lock::_lock_ctx_commission( $ctx, 'node', $lockpath, 'exclusive', 4, 4 );
     my $start = time();
     my $ok    = eval { OpenEJovianDSS::Lock::_lock_acquire( $ctx, $inner ); 1 };
     my $err     = $@;
@@ -320,14 +324,14 @@ sub commission_node {
 {
     my $path = "$tmpdir/exec-happy";
     my $ctx1 = new_test_ctx();
-    my $out  = OpenEJovianDSS::Lock::_lock_exec( $ctx1, 'node', $path, 2, 4,
+    my $out  = OpenEJovianDSS::Lock::_lock_exec( $ctx1, 'node', $path, 'exclusive', 2, 4,
         sub { 'sequencer-ok' } );
     ok( $out eq 'sequencer-ok' && !@{ $ctx1->{_held_locks} },
         "_lock_exec returns the body result; registry empty after" );
 
     my $ctx2  = new_test_ctx();
     my $start = time();
-    my $out2  = OpenEJovianDSS::Lock::_lock_exec( $ctx2, 'node', $path, 2, 4,
+    my $out2  = OpenEJovianDSS::Lock::_lock_exec( $ctx2, 'node', $path, 'exclusive', 2, 4,
         sub { 'again' } );
     ok( $out2 eq 'again' && time() - $start <= 1,
         "released: a fresh ctx re-acquires the same path instantly" );
@@ -339,7 +343,7 @@ sub commission_node {
     my $path = "$tmpdir/exec-die";
     my $ctx1 = new_test_ctx();
     my $ok   = eval {
-        OpenEJovianDSS::Lock::_lock_exec( $ctx1, 'node', $path, 2, 4,
+        OpenEJovianDSS::Lock::_lock_exec( $ctx1, 'node', $path, 'exclusive', 2, 4,
             sub { die "body exploded\n" } );
         1;
     };
@@ -348,7 +352,7 @@ sub commission_node {
 
     my $ctx2  = new_test_ctx();
     my $start = time();
-    OpenEJovianDSS::Lock::_lock_exec( $ctx2, 'node', $path, 2, 4, sub { 1 } );
+    OpenEJovianDSS::Lock::_lock_exec( $ctx2, 'node', $path, 'exclusive', 2, 4, sub { 1 } );
     ok( time() - $start <= 1,
         "released on the die path: instant re-acquisition" );
 }
@@ -0,0 +1,209 @@
+#!/usr/bin/perl
+# Functional tests for OpenEJovianDSS::Lock's shared mode: shared holders of
+# one lock run concurrently and exclude exclusive holders, on both backends —
+# flock LOCK_SH on the node backend, the gate dir plus per-process reader
+# marker dirs on the cluster backend (exercised on a temp dir standing in for
+# /etc/pve/priv/lock).
+#
+# Self-contained: PVE modules are stubbed, forked children provide the
+# contention. Run from the repo root:
+#
+#     perl tests/lock_shared_test.pl        (~16 s wall time)
+
+use strict;
+use warnings;
+
+use FindBin ();
+use lib "$FindBin::Bin/..";
+
+use File::Temp ();
+use POSIX ();
+use Time::HiRes ();
+
+BEGIN {
+    $INC{'PVE/Cluster.pm'} = __FILE__;
+    $INC{'PVE/Tools.pm'}   = __FILE__;
+}
+{
+    package PVE::Cluster;
+    sub import     { }
+    sub cfs_update { }
+}
+{
+    package PVE::Tools;
+    sub import { }
+    sub run_with_timeout {
+        my ($timeout, $code, @param) = @_;
+        die "got timeout\n" if $timeout <= 0;
+        my $prev = alarm(0);
+        my $res;
+        my $ok = eval {
+            local $SIG{ALRM} = sub { die "got timeout\n" };
+            alarm($timeout);
+            $res = $code->(@param);
+            alarm(0);
+            1;
+        };
+        my $err = $@;
+        alarm(0);
+        alarm($prev) if $prev;
+        die $err if !$ok;
+        return $res;
+    }
+}
+
+use OpenEJovianDSS::Lock;
+
+{
+    package OpenEJovianDSS::Common;
+    no warnings 'redefine';
+    sub PROXMOX_CLUSTER_LOCK_TIMEOUT_MAX  { 117 }
+    sub PROXMOX_CLUSTER_POLL_BASE_SLEEP   { 0.05 }
+    sub PROXMOX_CLUSTER_POLL_BACKOFF_STEP { 0.05 }
+    sub PROXMOX_CLUSTER_POLL_JITTER_MAX   { 0.05 }
+    sub PROXMOX_CLUSTER_POLL_SLEEP_CAP    { 0.1 }
+    sub PROXMOX_CLUSTER_POLL_FINAL_WINDOW { 0.5 }
+    sub PROXMOX_CLUSTER_POLL_FINAL_SLEEP  { 0.05 }
+    sub debugmsg { }
+}
+
+my $L      = 'OpenEJovianDSS::Lock';
+my $tmpdir = File::Temp::tempdir( CLEANUP => 1 );
+{
+    no warnings 'redefine';
+    *OpenEJovianDSS::Lock::_lock_queue_dir = sub { "$tmpdir/queue" };
+    *OpenEJovianDSS::Lock::_lock_stats_file = sub { "$tmpdir/lock-stats.log" };
+}
+my $tests  = 0;
+my $failed = 0;
+
+sub ok {
+    my ( $cond, $name ) = @_;
+    $tests++;
+    print( ( $cond ? "ok" : "NOT ok" ) . " $tests - $name\n" );
+    $failed++ unless $cond;
+}
+
+sub new_test_ctx { return { _held_locks => [] } }
+
+# Run _lock_exec in a child that holds the lock for $hold seconds; the child
+# touches $ready once it owns the lock.
+sub holder {
+    my ( $backend, $path, $mode, $hold, $ready ) = @_;
+    my $pid = fork() // die "fork failed\n";
+    if ( !$pid ) {
+        my $ok = eval {
+            $L->can('_lock_exec')->( new_test_ctx(), $backend, $path, $mode,
+                5, 30, sub {
+                    open( my $fh, '>', $ready ) or die "$ready: $!\n";
+                    close $fh;
+                    Time::HiRes::sleep($hold);
+                } );
+            1;
+        };
+        POSIX::_exit( $ok ? 0 : 1 );
+    }
+    return $pid;
+}
+
+sub wait_for {
+    my ($file) = @_;
+    for ( 1 .. 100 ) {
+        return 1 if -e $file;
+        Time::HiRes::sleep(0.05);
+    }
+    return 0;
+}
+
+sub timed_exec {
+    my ( $backend, $path, $mode, $timeout ) = @_;
+    my $start = Time::HiRes::time();
+    my $ok    = eval {
+        $L->can('_lock_exec')->( new_test_ctx(), $backend, $path, $mode,
+            $timeout, 30, sub { 1 } );
+        1;
+    };
+    return ( $ok, $@, Time::HiRes::time() - $start );
+}
+
+# --- mode resolution: read tier shared by default, operator can opt out ----
+{
+    my $ctx = { scfg => {} };
+    ok( $L->can('get_lock_class_mode')->( $ctx, 'jdssc_info' ) eq 'shared',
+        "jdssc_info defaults to shared" );
+    ok( $L->can('get_lock_class_mode')->( $ctx, 'jdssc_general' ) eq 'exclusive',
+        "jdssc_general stays exclusive" );
+    $ctx->{scfg}{jdssc_info_lock_mode} = 'exclusive';
+    ok( $L->can('get_lock_class_mode')->( $ctx, 'jdssc_info' ) eq 'exclusive',
+        "jdssc_info_lock_mode overrides the default" );
+}
+
+for my $backend (qw(node cluster)) {
+    my $path = "$tmpdir/joviandss-lock-$backend";
+
+    # --- readers share ------------------------------------------------------
+    {
+        my $pid = holder( $backend, $path, 'shared', 2, "$tmpdir/$backend-r1" );
+        ok( wait_for("$tmpdir/$backend-r1"), "$backend: first reader holds" );
+        my ( $ok, $err, $took ) = timed_exec( $backend, $path, 'shared', 1 );
+        ok( $ok && $took < 1, "$backend: second reader enters at once" );
+        waitpid( $pid, 0 );
+    }
+
+    # --- a writer waits for the reader --------------------------------------
+    {
+        my $pid = holder( $backend, $path, 'shared', 1.5, "$tmpdir/$backend-r2" );
+        wait_for("$tmpdir/$backend-r2");
+        my ( $ok, $err, $took ) = timed_exec( $backend, $path, 'exclusive', 5 );
+        ok( $ok && $took >= 1, "$backend: writer waits for the reader"
+              . sprintf( " (%.1fs)", $took ) );
+        waitpid( $pid, 0 );
+    }
+
+    # --- a reader waits for the writer --------------------------------------
+    {
+        my $pid = holder( $backend, $path, 'exclusive', 1.5, "$tmpdir/$backend-w1" );
+        wait_for("$tmpdir/$backend-w1");
+        my ( $ok, $err, $took ) = timed_exec( $backend, $path, 'shared', 5 );
+        ok( $ok && $took >= 1, "$backend: reader waits for the writer"
+              . sprintf( " (%.1fs)", $took ) );
+        waitpid( $pid, 0 );
+    }
+
+    # --- a writer times out behind a long reader with the acquire error -----
+    {
+        my $pid = holder( $backend, $path, 'shared', 3, "$tmpdir/$backend-r3" );
+        wait_for("$tmpdir/$backend-r3");
+        my ( $ok, $err, $took ) = timed_exec( $backend, $path, 'exclusive', 1 );
+        ok( !$ok && $L->can('lock_error_acquire')->($err),
+            "$backend: writer timeout classifies as acquire contention" );
+        waitpid( $pid, 0 );
+    }
+}
+
+# --- cluster: nothing is left behind ---------------------------------------
+{
+    opendir( my $dh, $tmpdir ) or die;
+    my @left = grep { /^joviandss-lock-cluster/ } readdir($dh);
+    closedir($dh);
+    ok( !@left, "cluster: gate and reader markers all removed" );
+}
+
+# --- cluster: a shared holder refreshes its marker, not the gate -----------
+{
+    my $path = "$tmpdir/joviandss-lock-refresh";
+    my $ctx  = new_test_ctx();
+    my $seen;
+    $L->can('_lock_exec')->( $ctx, 'cluster', $path, 'shared', 2, 30, sub {
+        my ($rec) = @{ $ctx->{_held_locks} };
+        $seen = { gate   => -d $path,
+                  held   => $rec->{held},
+                  marker => -d $rec->{held} };
+    } );
+    ok( !$seen->{gate} && $seen->{marker}
+          && index( $seen->{held}, "$path.reader." ) == 0,
+        "cluster: reader holds only its marker while the body runs" );
+}
+
+print $failed ? "FAILED: $failed of $tests\n" : "PASS: all $tests tests\n";
+exit( $failed ? 1 : 0 );
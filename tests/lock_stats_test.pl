@@ -0,0 +1,191 @@
+#!/usr/bin/perl
+# Tests for OpenEJovianDSS::Lock's per-node statistics: every with_lock
+# appends one line (class, backend, mode, outcome, wait, hold, caller) to the
+# stats file, the file rotates past LOCK_STATS_MAX_SIZE, and
+# tools/joviandss-lock-stats summarizes it per class.
+#
+# Self-contained: PVE modules are stubbed, a forked child provides the
+# contention. Run from the repo root:
+#
+#     perl tests/lock_stats_test.pl        (~2 s wall time)
+
+use strict;
+use warnings;
+
+use FindBin ();
+use lib "$FindBin::Bin/..";
+
+use File::Temp ();
+use POSIX ();
+use Time::HiRes ();
+
+BEGIN {
+    $INC{'PVE/Cluster.pm'} = __FILE__;
+    $INC{'PVE/Tools.pm'}   = __FILE__;
+}
+{
+    package PVE::Cluster;
+    sub import     { }
+    sub cfs_update { }
+}
+{
+    package PVE::Tools;
+    sub import { }
+    sub run_with_timeout {
+        my ($timeout, $code, @param) = @_;
+        die "got timeout\n" if $timeout <= 0;
+        my $prev = alarm(0);
+        my $res;
+        my $ok = eval {
+            local $SIG{ALRM} = sub { die "got timeout\n" };
+            alarm($timeout);
+            $res = $code->(@param);
+            alarm(0);
+            1;
+        };
+        my $err = $@;
+        alarm(0);
+        alarm($prev) if $prev;
+        die $err if !$ok;
+        return $res;
+    }
+}
+
+use OpenEJovianDSS::Lock;
+
+{
+    package OpenEJovianDSS::Common;
+    no warnings 'redefine';
+    sub PROXMOX_CLUSTER_LOCK_TIMEOUT_MAX { 117 }
+    sub debugmsg { }
+}
+
+my $tmpdir = File::Temp::tempdir( CLEANUP => 1 );
+my $stats  = "$tmpdir/lock-stats.log";
+{
+    no warnings 'redefine';
+    *OpenEJovianDSS::Lock::_lock_stats_file = sub { $stats };
+}
+
+my $L      = 'OpenEJovianDSS::Lock';
+my $tests  = 0;
+my $failed = 0;
+
+sub ok {
+    my ( $cond, $name ) = @_;
+    $tests++;
+    print( ( $cond ? "ok" : "NOT ok" ) . " $tests - $name\n" );
+    $failed++ unless $cond;
+}
+
+sub new_test_ctx {
+    return { _held_locks => [],
+             scfg        => { jdssc_info_lock_path    => $tmpdir,
+                              jdssc_general_lock_type => 'node',
+                              jdssc_general_lock_path => $tmpdir } };
+}
+
+sub records {
+    open( my $fh, '<', $stats ) or return ();
+    my @rec;
+    while ( my $line = <$fh> ) {
+        chomp $line;
+        my %r;
+        @r{qw(epoch pid class backend mode outcome wait hold caller)} =
+            split( /\t/, $line );
+        push @rec, \%r;
+    }
+    return @rec;
+}
+
+# Locks are attributed to the outermost plugin method on the stack.
+{
+    package PVE::Storage::Custom::OpenEJovianDSSPlugin;
+    sub activate_volume { helper(@_) }
+    sub helper {
+        my ( $lock_class, $timeout, $code ) = @_;
+        return OpenEJovianDSS::Lock::with_lock( main::new_test_ctx(),
+            $lock_class, undef, $timeout, $code );
+    }
+}
+
+# --- a successful lock ------------------------------------------------------
+{
+    PVE::Storage::Custom::OpenEJovianDSSPlugin::activate_volume( 'jdssc_info',
+        undef, sub { Time::HiRes::sleep(0.2) } );
+    my ($r) = records();
+    ok( $r && $r->{class} eq 'jdssc_info' && $r->{backend} eq 'node'
+          && $r->{mode} eq 'shared' && $r->{outcome} eq 'ok',
+        "ok: class, backend, mode and outcome recorded" );
+    ok( $r && $r->{hold} >= 0.2 && $r->{wait} < 0.2,
+        "ok: hold and wait times recorded" );
+    ok( $r && $r->{caller} eq 'OpenEJovianDSSPlugin::activate_volume',
+        "ok: attributed to the plugin method" );
+}
+
+# --- the body dies ----------------------------------------------------------
+{
+    eval {
+        PVE::Storage::Custom::OpenEJovianDSSPlugin::activate_volume(
+            'jdssc_info', undef, sub { die "body failed\n" } );
+    };
+    my $r = ( records() )[-1];
+    ok( $r->{outcome} eq 'failed' && $r->{hold} ne '-',
+        "failed body: recorded as failed with its hold time" );
+}
+
+# --- acquire contention -----------------------------------------------------
+{
+    my $ready = "$tmpdir/holder-ready";
+    my $pid   = fork() // die "fork failed\n";
+    if ( !$pid ) {
+        $L->can('with_lock')->( new_test_ctx(), 'jdssc_general', undef, 5,
+            sub {
+                open( my $fh, '>', $ready ) or die;
+                close $fh;
+                sleep(2);
+            } );
+        POSIX::_exit(0);
+    }
+    for ( 1 .. 100 ) { last if -e $ready; Time::HiRes::sleep(0.05) }
+
+    eval { $L->can('with_lock')->( new_test_ctx(), 'jdssc_general', undef, 1,
+               sub { 1 } ) };
+    waitpid( $pid, 0 );
+    my @mine = grep { $_->{pid} == $$ } records();
+    my $r    = $mine[-1];
+    ok( $r->{class} eq 'jdssc_general' && $r->{outcome} eq 'timeout'
+          && $r->{hold} eq '-' && $r->{wait} >= 0.9,
+        "timeout: recorded with its wait and no hold" );
+    ok( $r->{caller} eq 'main', "timeout: direct caller when no plugin method" );
+}
+
+# --- summary tool -----------------------------------------------------------
+{
+    my $tool = "$FindBin::Bin/../tools/joviandss-lock-stats";
+    my @out  = `$^X $tool $stats`;
+    my ($info)    = grep { /^jdssc_info\s/ } @out;
+    my ($general) = grep { /^jdssc_general\s/ } @out;
+    my @info    = split( ' ', $info // '' );
+    my @general = split( ' ', $general // '' );
+    ok( @info && $info[2] == 2 && $info[5] == 1,
+        "summary: jdssc_info counted with its failed body" );
+    ok( @general && $general[2] == 2 && $general[3] == 1,
+        "summary: jdssc_general counted with its timeout" );
+    my @by = `$^X $tool --by-caller $stats`;
+    ok( grep( { /^jdssc_info\s+OpenEJovianDSSPlugin::activate_volume\s+2\s/ } @by ),
+        "summary: --by-caller groups by plugin method" );
+}
+
+# --- rotation ---------------------------------------------------------------
+{
+    truncate( $stats, OpenEJovianDSS::Lock::LOCK_STATS_MAX_SIZE() + 1 )
+        or die "truncate: $!\n";
+    $L->can('with_lock')->( new_test_ctx(), 'jdssc_info', undef, undef,
+        sub { 1 } );
+    my @rec = records();
+    ok( -e "$stats.1" && @rec == 1, "oversized stats file rotated to .1" );
+}
+
+print $failed ? "FAILED: $failed of $tests\n" : "PASS: all $tests tests\n";
+exit( $failed ? 1 : 0 );
@@ -0,0 +1,225 @@
+#!/usr/bin/perl
+# Unit tests for the per-storeid lun record index: a missing index is
+# rebuilt from the record tree on first use, entries whose record is gone
+# are skipped by lookups, and record creation, update and removal keep the
+# index a superset of the records on disk while writing it once each.
+#
+# Self-contained: PVE modules, String::Util and JSON are stubbed and the
+# local state tree lives in a temp dir.  From the repo root:
+#
+#     perl tests/lun_record_index_test.pl
+
+use strict;
+use warnings;
+
+use File::Path qw(make_path);
+use File::Temp ();
+use FindBin ();
+use lib "$FindBin::Bin/..";
+
+BEGIN {
+    $INC{'String/Util.pm'} = __FILE__;
+    $INC{'PVE/INotify.pm'} = __FILE__;
+    $INC{'PVE/Tools.pm'}   = __FILE__;
+    $INC{'PVE/Cluster.pm'} = __FILE__;
+    $INC{'JSON.pm'}        = __FILE__;
+}
+{
+    # Imported but unused on the paths under test.
+    package String::Util;
+    sub import { }
+}
+{
+    package PVE::INotify;
+    sub import   { }
+    sub nodename { 'testnode' }
+}
+{
+    package PVE::Cluster;
+    sub import     { }
+    sub cfs_update { }
+}
+{
+    package PVE::Tools;
+    sub run_command       { die "unexpected run_command: @{ $_[0] }\n" }
+    sub file_set_contents { }
+    sub run_with_timeout  { my ( $t, $code, @a ) = @_; return $code->(@a) }
+
+    sub import {
+        my $caller = caller;
+        no strict 'refs';
+        *{"${caller}::run_command"}       = \&run_command;
+        *{"${caller}::file_set_contents"} = \&file_set_contents;
+    }
+}
+{
+    package JSON;
+    use JSON::PP ();
+
+    sub encode_json { JSON::PP->new->canonical->encode( $_[0] ) }
+    sub decode_json { JSON::PP::decode_json( $_[0] ) }
+
+    sub import {
+        my $caller = caller;
+        no strict 'refs';
+        *{"${caller}::decode_json"} = \&JSON::PP::decode_json;
+        *{"${caller}::from_json"}   = \&JSON::PP::decode_json;
+        *{"${caller}::to_json"}     = \&JSON::PP::encode_json;
+    }
+}
+
+use OpenEJovianDSS::Common;
+
+my $C     = 'OpenEJovianDSS::Common';
+my $tmp   = File::Temp->newdir();
+my $STATE = "$tmp/state";
+my $INDEX = "$STATE/jdss/.lun-record-index.json";
+
+our $WRITES = 0;
+{
+    no warnings qw(redefine once);
+    *OpenEJovianDSS::Common::_local_state_dir = sub { $STATE };
+    *OpenEJovianDSS::Common::debugmsg         = sub { };
+    *OpenEJovianDSS::Common::volume_unstage_iscsi = sub { };
+    my $write = \&OpenEJovianDSS::Common::_lun_record_index_write;
+    *OpenEJovianDSS::Common::_lun_record_index_write = sub {
+        $main::WRITES++;
+        return $write->(@_);
+    };
+}
+
+# ---------------------------------------------------------------------------
+# Test harness
+# ---------------------------------------------------------------------------
+
+my ( $tests, $failures ) = ( 0, 0 );
+
+sub ok {
+    my ( $cond, $desc ) = @_;
+    $tests++;
+    if ($cond) {
+        print "ok $tests - $desc\n";
+        return 1;
+    }
+    $failures++;
+    print "NOT OK $tests - $desc\n";
+    return 0;
+}
+
+my $ctx = { storeid => 'jdss', scfg => {} };
+
+sub create {
+    my ( $target, $lun, $volname, $snapname ) = @_;
+    return $C->can('lun_record_local_create')->(
+        $ctx, $target, $lun, $volname, $snapname,
+        "id-${volname}", 1024, 0, 0, '192.0.2.1' );
+}
+
+sub indexed {
+    my $index = $C->can('_lun_record_index_read')->($ctx) or return ();
+    my @entries;
+    foreach my $volname ( sort keys %{ $index->{volumes} } ) {
+        push @entries, map { "$_->{target}/$_->{lun}/${volname}" }
+                       @{ $index->{volumes}{$volname} };
+    }
+    return sort @entries;
+}
+
+sub on_disk {
+    my $scan = $C->can('_lun_record_index_scan')->($ctx);
+    my @entries;
+    foreach my $volname ( keys %{ $scan->{volumes} } ) {
+        push @entries, map { "$_->{target}/$_->{lun}/${volname}" }
+                       @{ $scan->{volumes}{$volname} };
+    }
+    return sort @entries;
+}
+
+sub superset {
+    my %indexed = map { $_ => 1 } indexed();
+    return !grep { !$indexed{$_} } on_disk();
+}
+
+sub found {
+    my ( $volname, $snapname ) = @_;
+    my $matches = $C->can('lun_record_local_get_info_list')->(
+        $ctx, $volname, $snapname, undef );
+    return join( ' ', map { "$_->[0]/$_->[1]" } @{$matches} );
+}
+
+make_path("$STATE/jdss");
+
+# ---------------------------------------------------------------------------
+# Create, update and delete write the index once each, index first.
+# ---------------------------------------------------------------------------
+{
+    local $WRITES = 0;
+    create( 'iqn.t1', 0, 'vm-100-disk-0' );
+    ok( $WRITES == 1, 'create: index written once' );
+    ok( superset(), 'create: index covers the records' );
+
+    create( 'iqn.t1', 1, 'vm-100-disk-0', 'snap1' );
+    create( 'iqn.t2', 0, 'vm-101-disk-0' );
+    ok( found('vm-100-disk-0') eq 'iqn.t1/0', 'lookup: volume record' );
+    ok( found( 'vm-100-disk-0', 'snap1' ) eq 'iqn.t1/1',
+        'lookup: snapshot record' );
+
+    $WRITES = 0;
+    my $lunrec = $C->can('lun_record_local_get_by_path')->(
+        $ctx, "$STATE/jdss/iqn.t2/0/vm-101-disk-0" );
+    $lunrec->{hosts} = ['192.0.2.7'];
+    $C->can('lun_record_local_update')->(
+        $ctx, 'iqn.t2', 0, 'vm-101-disk-0', undef, $lunrec );
+    ok( $WRITES == 1, 'update: index written once' );
+    ok( superset(), 'update: index covers the records' );
+
+    $WRITES = 0;
+    $C->can('lun_record_local_delete')->(
+        $ctx, 'iqn.t1', 1, 'vm-100-disk-0', 'snap1' );
+    ok( $WRITES == 1, 'delete: index written once' );
+    ok( !grep( { $_ eq 'iqn.t1/1/vm-100-disk-0' } indexed() ),
+        'delete: entry dropped with its record' );
+    ok( superset(), 'delete: index covers the records' );
+}
+
+# ---------------------------------------------------------------------------
+# A record that could not be written leaves a stale entry lookups skip.
+# ---------------------------------------------------------------------------
+{
+    # A directory where the record file should go makes the write fail
+    make_path("$STATE/jdss/iqn.t1/2/vm-102-disk-0");
+    eval { create( 'iqn.t1', 2, 'vm-102-disk-0' ) };
+    ok( $@ =~ /Failed to create local lun record/, 'stale: record write fails' );
+    ok( scalar( grep { $_ eq 'iqn.t1/2/vm-102-disk-0' } indexed() ),
+        'stale: entry indexed before the record' );
+    ok( found('vm-102-disk-0') eq '', 'stale: lookup skips the entry' );
+
+    unlink "$STATE/jdss/iqn.t1/0/vm-100-disk-0";
+    ok( found('vm-100-disk-0') eq '',
+        'stale: record removed behind the index is skipped' );
+}
+
+# ---------------------------------------------------------------------------
+# A missing index is rebuilt from the tree on first use.
+# ---------------------------------------------------------------------------
+{
+    unlink $INDEX;
+    ok( found('vm-101-disk-0') eq 'iqn.t2/0', 'rebuild: lookup finds record' );
+    ok( -f $INDEX, 'rebuild: index written back' );
+    ok( join( ' ', indexed() ) eq join( ' ', on_disk() ),
+        'rebuild: stale entries dropped' );
+
+    open( my $fh, '>', $INDEX ) or die "$INDEX: $!\n";
+    print $fh "{not json";
+    close $fh;
+    ok( found('vm-101-disk-0') eq 'iqn.t2/0',
+        'rebuild: malformed index rebuilt' );
+}
+
+print "1..$tests\n";
+if ($failures) {
+    print "FAILED $failures/$tests\n";
+    exit 1;
+}
+print "PASSED $tests/$tests\n";
+exit 0;
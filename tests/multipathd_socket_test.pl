@@ -0,0 +1,292 @@
+#!/usr/bin/perl
+# Unit tests for the multipathd control socket client in
+# OpenEJovianDSS::Common: map and path queries are answered over one kept
+# connection without forking multipath, map changes go over the socket
+# under the multipath lock, a connection the daemon dropped is reopened,
+# a daemon that does not answer in time is given up on, and without a
+# daemon the multipath/multipathd commands are forked as before.
+#
+# Self-contained: PVE modules, String::Util and JSON are stubbed, and a
+# forked stand-in speaking multipathd's framing listens on a unix socket in
+# a temp dir.  From the repo root:
+#
+#     perl tests/multipathd_socket_test.pl        (~2 s wall time)
+
+use strict;
+use warnings;
+
+use File::Temp ();
+use FindBin ();
+use POSIX ();
+use lib "$FindBin::Bin/..";
+use Socket qw(AF_UNIX SOCK_STREAM pack_sockaddr_un);
+use Time::HiRes ();
+
+BEGIN {
+    $INC{'String/Util.pm'} = __FILE__;
+    $INC{'PVE/INotify.pm'} = __FILE__;
+    $INC{'PVE/Tools.pm'}   = __FILE__;
+    $INC{'PVE/Cluster.pm'} = __FILE__;
+    $INC{'JSON.pm'}        = __FILE__;
+}
+{
+    # Imported but unused on the paths under test.
+    package String::Util;
+    sub import { }
+}
+{
+    package PVE::INotify;
+    sub import   { }
+    sub nodename { 'testnode' }
+}
+{
+    package PVE::Cluster;
+    sub import     { }
+    sub cfs_update { }
+}
+
+# Forked commands are recorded; `multipath -ll <wwid>` prints a map line.
+my @CMDS;
+{
+    package PVE::Tools;
+
+    sub run_command {
+        my ( $cmd, %param ) = @_;
+        # Drop the timeout(1) wrapper; the tool path is undef on hosts
+        # without multipath-tools
+        my @argv = @$cmd;
+        splice( @argv, 0, 4 ) if $argv[0] eq '/usr/bin/timeout';
+        push @CMDS, join( ' ', map { $_ // 'undef' } @argv );
+        if ( $argv[1] && $argv[1] eq '-ll' && $param{outfunc} ) {
+            $param{outfunc}->("$argv[2] dm-9 JOVIAN,iSCSI");
+        }
+        return 0;
+    }
+    sub file_set_contents { }
+    sub run_with_timeout  { my ( $t, $code, @a ) = @_; return $code->(@a) }
+
+    sub import {
+        my $caller = caller;
+        no strict 'refs';
+        *{"${caller}::run_command"}       = \&run_command;
+        *{"${caller}::file_set_contents"} = \&file_set_contents;
+    }
+}
+{
+    package JSON;
+    use JSON::PP ();
+
+    sub import {
+        my $caller = caller;
+        no strict 'refs';
+        *{"${caller}::decode_json"} = \&JSON::PP::decode_json;
+        *{"${caller}::from_json"}   = \&JSON::PP::decode_json;
+        *{"${caller}::to_json"}     = \&JSON::PP::encode_json;
+    }
+}
+
+use OpenEJovianDSS::Common;
+
+my $C    = 'OpenEJovianDSS::Common';
+my $tmp  = File::Temp->newdir();
+my $SOCK = "$tmp/multipathd.sock";
+
+my @LOCKS;
+{
+    no warnings qw(redefine once);
+    *OpenEJovianDSS::Common::_multipathd_socket_address =
+      sub { pack_sockaddr_un($SOCK) };
+    *OpenEJovianDSS::Common::debugmsg       = sub { };
+    *OpenEJovianDSS::Common::cmd_log_output = sub { };
+    *OpenEJovianDSS::Lock::with_lock  = sub {
+        my ( $ctx, $class, $id, $timeout, $code ) = @_;
+        push @LOCKS, $class;
+        return $code->();
+    };
+}
+
+# ---------------------------------------------------------------------------
+# Test harness
+# ---------------------------------------------------------------------------
+
+my ( $tests, $failures ) = ( 0, 0 );
+
+sub ok {
+    my ( $cond, $desc ) = @_;
+    $tests++;
+    if ($cond) {
+        print "ok $tests - $desc\n";
+        return 1;
+    }
+    $failures++;
+    print "NOT OK $tests - $desc\n";
+    return 0;
+}
+
+# ---------------------------------------------------------------------------
+# Stand-in multipathd
+# ---------------------------------------------------------------------------
+
+my $W1 = '36001405aaaaaaaaaaaaaaaaaaaaaaaa1';
+my $W2 = '36001405aaaaaaaaaaaaaaaaaaaaaaaa2';
+my $W3 = '36001405aaaaaaaaaaaaaaaaaaaaaaaa3';
+
+my %REPLIES = (
+    'show maps raw format "%w %n %d"' =>
+        "$W1 mpatha dm-3\n$W2 $W2 dm-4\n",
+    'show paths raw format "%w %d %t %T"' =>
+        "$W1 sdb active ready\n$W1 sdc failed faulty\n"
+      . "$W2 sdd active faulty\n$W2 sde failed ready\n"
+      . "$W3 sdf active i/o pending\n$W3 sdg failed i/o pending\n",
+    "add map $W1" => "ok\n",
+);
+
+sub append {
+    my ( $file, $line ) = @_;
+    open( my $fh, '>>', $file ) or die "$file: $!\n";
+    print $fh "$line\n";
+    close $fh;
+}
+
+sub lines {
+    my ($file) = @_;
+    open( my $fh, '<', $file ) or return ();
+    chomp( my @lines = <$fh> );
+    close $fh;
+    return @lines;
+}
+
+sub read_n {
+    my ( $fh, $len ) = @_;
+    my $buf = '';
+    while ( length($buf) < $len ) {
+        my $got = sysread( $fh, $buf, $len - length($buf), length($buf) );
+        return undef if !$got;
+    }
+    return $buf;
+}
+
+# Serve clients one after the other; with $one_shot the connection is
+# closed after every reply, as a restarting daemon would.
+sub start_server {
+    my ($one_shot) = @_;
+    unlink $SOCK;
+    socket( my $srv, AF_UNIX, SOCK_STREAM, 0 ) or die "socket: $!\n";
+    bind( $srv, pack_sockaddr_un($SOCK) ) or die "bind: $!\n";
+    listen( $srv, 5 ) or die "listen: $!\n";
+
+    my $pid = fork() // die "fork: $!\n";
+    if ( !$pid ) {
+        while ( accept( my $conn, $srv ) ) {
+            append( "$tmp/accepts", 'accept' );
+            while ( defined( my $head = read_n( $conn, 8 ) ) ) {
+                my $cmd = read_n( $conn, unpack( 'Q', $head ) ) // last;
+                $cmd =~ s/\0\z//;
+                append( "$tmp/requests", $cmd );
+                if ( $cmd eq 'hang' ) {
+                    sleep 3;
+                    last;
+                }
+                my $reply = ( $REPLIES{$cmd} // "fail\n" ) . "\0";
+                syswrite( $conn, pack( 'Q', length($reply) ) . $reply );
+                last if $one_shot;
+            }
+            close $conn;
+        }
+        POSIX::_exit(0);
+    }
+    close $srv;
+    return $pid;
+}
+
+sub stop_server {
+    my ($pid) = @_;
+    kill 'KILL', $pid;
+    waitpid( $pid, 0 );
+    unlink $SOCK, "$tmp/accepts", "$tmp/requests";
+}
+
+my $ctx = { scfg => {}, storeid => 'jdss' };
+
+# ---------------------------------------------------------------------------
+# Queries are answered by the daemon over one connection, without forks.
+# ---------------------------------------------------------------------------
+{
+    my $pid = start_server();
+    @CMDS = ();
+    ok( $C->can('_multipathd_map_exists')->( $ctx, $W1 ) == 1, 'query: map exists' );
+    ok( $C->can('_multipathd_map_exists')->( $ctx, $W3 ) == 0, 'query: unknown map' );
+    ok( $C->can('get_device_mapper_name')->( $ctx, $W1 ) eq 'mpatha',
+        'query: alias is the mapper name' );
+    ok( !defined( $C->can('get_device_mapper_name')->( $ctx, $W3 ) ),
+        'query: no mapper name for unknown map' );
+    ok( $C->can('_multipath_map_has_active_path')->( $ctx, $W1 ) == 1,
+        'paths: active ready path counts' );
+    ok( $C->can('_multipath_map_has_active_path')->( $ctx, $W3 ) == 1,
+        'paths: checker state with a space is parsed' );
+    ok( !@CMDS, 'query: nothing forked' );
+    ok( !@LOCKS, 'query: multipath lock not taken' );
+    ok( lines("$tmp/accepts") == 1, 'query: one connection kept' );
+
+    # No active path in the daemon's table is not final: the checker
+    # states may be stale, so the command probes have the last word
+    ok( $C->can('_multipath_map_has_active_path')->( $ctx, $W2 ) == 0,
+        'paths: active but faulty and failed paths do not' );
+    ok( ( grep { / -ll \Q$W2\E$/ } @CMDS ) == 1,
+        'paths: no active path falls through to multipath -ll' );
+
+# ---------------------------------------------------------------------------
+# Changes go over the socket under the multipath lock.
+# ---------------------------------------------------------------------------
+    @CMDS  = ();
+    @LOCKS = ();
+    ok( $C->can('_multipathd_cmd')->( $ctx, [ 'add', 'map', $W1 ] ) == 1,
+        'change: ok reply is success' );
+    ok( $C->can('_multipathd_cmd')->( $ctx, [ 'del', 'map', $W3 ] ) == 0,
+        'change: fail reply is failure' );
+    ok( "@LOCKS" eq 'multipath multipath', 'change: sent under the multipath lock' );
+    ok( ( grep { $_ eq "add map $W1" } lines("$tmp/requests") ) == 1,
+        'change: command reached the daemon' );
+    ok( !@CMDS, 'change: nothing forked' );
+
+# ---------------------------------------------------------------------------
+# A daemon that does not answer is given up on at the timeout.
+# ---------------------------------------------------------------------------
+    my $start = Time::HiRes::time();
+    my $reply = $C->can('_multipathd_request')->( $ctx, 'hang', 1 );
+    my $took  = Time::HiRes::time() - $start;
+    ok( !defined($reply) && $took >= 1 && $took < 2.5,
+        sprintf( 'timeout: no reply after %.1fs', $took ) );
+    stop_server($pid);
+}
+
+# ---------------------------------------------------------------------------
+# A connection the daemon closed is reopened.
+# ---------------------------------------------------------------------------
+{
+    my $pid = start_server(1);
+    ok( $C->can('_multipathd_map_exists')->( $ctx, $W1 ) == 1, 'reconnect: first request' );
+    ok( $C->can('_multipathd_map_exists')->( $ctx, $W2 ) == 1,
+        'reconnect: request after the daemon closed the connection' );
+    ok( lines("$tmp/accepts") == 2, 'reconnect: second connection opened' );
+    stop_server($pid);
+}
+
+# ---------------------------------------------------------------------------
+# Without a daemon the command line tools answer.
+# ---------------------------------------------------------------------------
+{
+    @CMDS = ();
+    ok( $C->can('_multipathd_map_exists')->( $ctx, $W1 ) == 1,
+        'fallback: map found by multipath -ll' );
+    ok( ( grep { /-ll \Q$W1\E$/ } @CMDS ) == 1,
+        'fallback: multipath forked' );
+}
+
+print "1..$tests\n";
+if ($failures) {
+    print "FAILED $failures/$tests\n";
+    exit 1;
+}
+print "PASSED $tests/$tests\n";
+exit 0;
@@ -0,0 +1,230 @@
+#!/usr/bin/perl
+
+# Unit tests for the mount table reader in OpenEJovianDSS::NFSCommon:
+# path_is_mnt and path_is_nfs answer from /proc/self/mountinfo without
+# forking findmnt/mountpoint, the parsed table is kept per $ctx until a
+# mount or umount, and the fork-based checks remain the fallback when the
+# table can not be read.
+#
+# Self-contained: PVE modules, Net::IP, String::Util and JSON are stubbed and
+# a file in a temp dir stands in for /proc/self/mountinfo. From the repo
+# root:
+#
+#     perl tests/nfs_mountinfo_test.pl
+
+use strict;
+use warnings;
+
+use File::Path qw(make_path);
+use File::Temp ();
+use FindBin;
+use lib "$FindBin::Bin/..";
+
+BEGIN {
+    $INC{'String/Util.pm'} = __FILE__;
+    $INC{'PVE/INotify.pm'} = __FILE__;
+    $INC{'PVE/Tools.pm'}   = __FILE__;
+    $INC{'JSON.pm'}        = __FILE__;
+    $INC{'Net/IP.pm'}      = __FILE__;
+}
+{
+    # Imported but unused on the paths under test.
+    package String::Util;
+    sub import { }
+}
+{
+    package Net::IP;
+    sub import { }
+}
+{
+    package PVE::INotify;
+    sub import   { }
+    sub nodename { 'testnode' }
+}
+
+# Every command is recorded; 'umount' drops the mount from the table file,
+# as the kernel would, findmnt finds nothing and mountpoint says "not a
+# mount point".
+my @CMDS;
+our $ON_UMOUNT = sub { };
+{
+    package PVE::Tools;
+    sub run_command {
+        my ( $cmd, %param ) = @_;
+        push @CMDS, join( ' ', @$cmd );
+        $main::ON_UMOUNT->( $cmd->[-1] ) if $cmd->[0] eq '/bin/umount';
+        return $cmd->[0] eq '/usr/bin/mountpoint' ? 32 : 1;
+    }
+    sub file_set_contents { }
+    sub file_get_contents { '' }
+
+    sub import {
+        my $caller = caller;
+        no strict 'refs';
+        *{"${caller}::run_command"}       = \&run_command;
+        *{"${caller}::file_set_contents"} = \&file_set_contents;
+        *{"${caller}::file_get_contents"} = \&file_get_contents;
+    }
+}
+{
+    package JSON;
+    use JSON::PP ();
+
+    sub import {
+        my $caller = caller;
+        no strict 'refs';
+        *{"${caller}::decode_json"} = \&JSON::PP::decode_json;
+        *{"${caller}::from_json"}   = \&JSON::PP::decode_json;
+        *{"${caller}::to_json"}     = \&JSON::PP::encode_json;
+    }
+}
+
+require OpenEJovianDSS::NFSCommon;
+
+my $N   = 'OpenEJovianDSS::NFSCommon';
+my $tmp = File::Temp->newdir();
+my $MOUNTINFO = "$tmp/mountinfo";
+{
+    no warnings qw(redefine once);
+    *OpenEJovianDSS::NFSCommon::_mountinfo_file = sub { $MOUNTINFO };
+    *OpenEJovianDSS::Common::debugmsg           = sub { };
+}
+
+# ---------------------------------------------------------------------------
+# Test harness
+# ---------------------------------------------------------------------------
+
+my ( $tests, $failures ) = ( 0, 0 );
+
+sub ok {
+    my ( $cond, $desc ) = @_;
+    $tests++;
+    if ($cond) {
+        print "ok $tests - $desc\n";
+        return 1;
+    }
+    $failures++;
+    print "NOT OK $tests - $desc\n";
+    return 0;
+}
+
+my $SNAP  = "$tmp/private/mounts/102/vm-102-disk-0/daily";
+my $PLAIN = "$tmp/private/plain";
+my $TMPFS = "$tmp/private/tmpfs";
+my $SPACE = "$tmp/private/with space";
+make_path( $SNAP, $PLAIN, $TMPFS, $SPACE );
+
+( my $space_escaped = $SPACE ) =~ s/ /\\040/g;
+
+sub write_mountinfo {
+    my (@lines) = @_;
+    open( my $fh, '>', $MOUNTINFO ) or die "$MOUNTINFO: $!\n";
+    print $fh "$_\n" for @lines;
+    close $fh;
+}
+
+my @BASE = (
+    "22 1 0:21 / / rw,relatime shared:1 - ext4 /dev/sda1 rw",
+    "97 22 0:52 / $SNAP ro,relatime shared:61 - nfs4 192.0.2.10:/Pools/Pool-0/se_snap ro,vers=4.2",
+    "98 22 0:53 / $TMPFS rw,relatime - tmpfs tmpfs rw",
+    "99 22 0:54 / $space_escaped rw,relatime - tmpfs tmp\\040fs rw",
+);
+
+sub reset_state {
+    @CMDS = ();
+    write_mountinfo(@BASE);
+    return { scfg => {}, storeid => 'jdssnfs' };
+}
+
+# ---------------------------------------------------------------------------
+# Mount points are answered from the table, without a fork.
+# ---------------------------------------------------------------------------
+{
+    my $ctx = reset_state();
+    ok( $N->can('path_is_mnt')->( $ctx, $SNAP ) == 1, 'mounted path is a mount point' );
+    ok( $N->can('path_is_mnt')->( $ctx, "$SNAP/" ) == 1, 'trailing slash is ignored' );
+    ok( $N->can('path_is_mnt')->( $ctx, $PLAIN ) == 0, 'plain dir is not a mount point' );
+    ok( $N->can('path_is_mnt')->( $ctx, $TMPFS ) == 1, 'any fs type counts' );
+    ok( !@CMDS, 'no findmnt or mountpoint forked' );
+}
+
+# ---------------------------------------------------------------------------
+# path_is_nfs checks fs type, server and export path.
+# ---------------------------------------------------------------------------
+{
+    my $ctx = reset_state();
+    my $is_nfs = $N->can('path_is_nfs');
+    ok( $is_nfs->( $ctx, $SNAP, '/Pools/Pool-0/se_snap', '192.0.2.10' ),
+        'nfs: matching server and export' );
+    ok( !$is_nfs->( $ctx, $SNAP, '/Pools/Pool-0/other', '192.0.2.10' ),
+        'nfs: other export' );
+    ok( !$is_nfs->( $ctx, $SNAP, undef, '192.0.2.11' ), 'nfs: other server' );
+    ok( !$is_nfs->( $ctx, $TMPFS ), 'nfs: tmpfs is not nfs' );
+    ok( !$is_nfs->( $ctx, $PLAIN ), 'nfs: not mounted' );
+    ok( !@CMDS, 'nfs: no findmnt forked' );
+}
+
+# ---------------------------------------------------------------------------
+# Escaped mount points and sources are decoded.
+# ---------------------------------------------------------------------------
+{
+    my $ctx   = reset_state();
+    my $entry = $N->can('mountinfo')->($ctx)->{$SPACE};
+    ok( defined($entry) && $entry->{source} eq 'tmp fs',
+        'escapes: mount point and source decoded' );
+}
+
+# ---------------------------------------------------------------------------
+# Of mounts stacked on one point the visible, last one counts.
+# ---------------------------------------------------------------------------
+{
+    my $ctx = reset_state();
+    write_mountinfo( @BASE,
+        "100 97 0:55 / $SNAP rw,relatime - tmpfs tmpfs rw" );
+    ok( !$N->can('path_is_nfs')->( $ctx, $SNAP ), 'stacked: top mount wins' );
+}
+
+# ---------------------------------------------------------------------------
+# The table is read once per ctx and dropped on invalidation.
+# ---------------------------------------------------------------------------
+{
+    my $ctx = reset_state();
+    ok( $N->can('path_is_mnt')->( $ctx, $PLAIN ) == 0, 'memo: read once' );
+    write_mountinfo( @BASE, "101 22 0:56 / $PLAIN rw - tmpfs tmpfs rw" );
+    ok( $N->can('path_is_mnt')->( $ctx, $PLAIN ) == 0, 'memo: kept for the ctx' );
+    $N->can('mountinfo_invalidate')->($ctx);
+    ok( $N->can('path_is_mnt')->( $ctx, $PLAIN ) == 1, 'memo: reread after invalidation' );
+}
+
+# ---------------------------------------------------------------------------
+# umount sees its own unmount: one umount call, then the dir is removed.
+# ---------------------------------------------------------------------------
+{
+    my $ctx = reset_state();
+    local $ON_UMOUNT = sub {
+        my ($path) = @_;
+        write_mountinfo( grep { index( $_, " $path " ) < 0 } @BASE );
+    };
+    $N->can('path_is_mnt')->( $ctx, $SNAP );
+    $N->can('umount')->( $ctx, $SNAP );
+    ok( ( grep { /^\/bin\/umount / } @CMDS ) == 1, 'umount: unmounted once' );
+    ok( !-d $SNAP, 'umount: mount dir removed' );
+}
+
+# ---------------------------------------------------------------------------
+# Without a readable table the fork-based checks answer.
+# ---------------------------------------------------------------------------
+{
+    my $ctx = reset_state();
+    unlink $MOUNTINFO;
+    ok( $N->can('path_is_mnt')->( $ctx, $PLAIN ) == 0, 'fallback: answers' );
+    ok( ( grep { /^\/usr\/bin\/findmnt / } @CMDS ) == 1, 'fallback: findmnt forked' );
+}
+
+print "1..$tests\n";
+if ($failures) {
+    print "FAILED $failures/$tests\n";
+    exit 1;
+}
+print "PASSED $tests/$tests\n";
+exit 0;
@@ -131,9 +131,18 @@ sub reset_state {
     reset_state();
     OpenEJovianDSS::NFSCommon::snapshots_info( $CTX, 'data', 'vm-102-disk-0' );
     my $cmd = join ' ', @{ $CMDS[0] };
+    is( $cmd,
+        'pool Pool-0 nas_volume -d data snapshots list --guid --creation'
+          . ' --prefix 102_',
+        'query: snapshots list requests guid and creation of this vmid' );
+}
+{
+    reset_state();
+    OpenEJovianDSS::NFSCommon::snapshots_info( $CTX, 'data', 'custom-disk' );
+    my $cmd = join ' ', @{ $CMDS[0] };
     is( $cmd,
         'pool Pool-0 nas_volume -d data snapshots list --guid --creation',
-        'query: snapshots list requests guid and creation' );
+        'query: no name prefix without a vmid' );
 }
 
 # ---------------------------------------------------------------------------
@@ -0,0 +1,381 @@
+#!/usr/bin/perl
+
+# Unit tests for the NFS snapshot clone registry in OpenEJovianDSS::NFSCommon:
+# snapshot_mount_get reuses a clone that is still mounted instead of
+# publishing the snapshot again, snapshot_mount_put keeps the clone for
+# snapshot_mount_idle_timeout seconds, and snapshot_mounts_idle /
+# snapshot_mount_reap find and remove the ones nobody used since. The NFS
+# plugin's activate and deactivate are not counted: one deactivation
+# removes a clone however often it was activated.
+#
+# Self-contained: PVE modules, Net::IP, String::Util and JSON are stubbed,
+# publishing and mounting are replaced by recorders and the registry lives
+# in a temp dir. From the repo root:
+#
+#     perl tests/nfs_snapshot_mount_cache_test.pl
+
+use strict;
+use warnings;
+
+use File::Path qw(make_path remove_tree);
+use File::Temp ();
+use FindBin;
+use lib "$FindBin::Bin/..";
+
+BEGIN {
+    $INC{'String/Util.pm'}           = __FILE__;
+    $INC{'IO/File.pm'}               = __FILE__;
+    $INC{'PVE/INotify.pm'}           = __FILE__;
+    $INC{'PVE/Tools.pm'}             = __FILE__;
+    $INC{'PVE/Cluster.pm'}           = __FILE__;
+    $INC{'PVE/Network.pm'}           = __FILE__;
+    $INC{'PVE/ProcFSTools.pm'}       = __FILE__;
+    $INC{'PVE/JSONSchema.pm'}        = __FILE__;
+    $INC{'PVE/Storage.pm'}           = __FILE__;
+    $INC{'PVE/Storage/Plugin.pm'}    = __FILE__;
+    $INC{'PVE/Storage/DirPlugin.pm'} = __FILE__;
+    $INC{'JSON.pm'}                  = __FILE__;
+    $INC{'Net/IP.pm'}                = __FILE__;
+}
+{
+    # Imported but unused on the paths under test.
+    package String::Util;
+    sub import { }
+}
+{
+    package Net::IP;
+    sub import { }
+}
+{
+    package IO::File;
+    sub import { }
+}
+{
+    package PVE::INotify;
+    sub import   { }
+    sub nodename { 'testnode' }
+}
+{
+    package PVE::Cluster;
+    sub import { }
+}
+{
+    package PVE::Network;
+    sub import { }
+}
+{
+    package PVE::ProcFSTools;
+    sub import { }
+}
+{
+    package PVE::JSONSchema;
+    sub get_standard_option { return {} }
+
+    sub import {
+        my $caller = caller;
+        no strict 'refs';
+        *{"${caller}::get_standard_option"} = \&get_standard_option;
+    }
+}
+{
+    package PVE::Tools;
+    our $IPV4RE = qr/\d+\.\d+\.\d+\.\d+/;
+    our $IPV6RE = qr/[0-9a-fA-F:]+/;
+
+    sub run_command       { die "unexpected command: @{ $_[0] }\n" }
+    sub file_set_contents { }
+    sub file_get_contents { '' }
+
+    sub import {
+        my $caller = caller;
+        no strict 'refs';
+        *{"${caller}::run_command"}       = \&run_command;
+        *{"${caller}::file_set_contents"} = \&file_set_contents;
+        *{"${caller}::file_get_contents"} = \&file_get_contents;
+        ${"${caller}::IPV4RE"}            = $IPV4RE;
+        ${"${caller}::IPV6RE"}            = $IPV6RE;
+    }
+}
+{
+    package JSON;
+    use JSON::PP ();
+
+    sub import {
+        my $caller = caller;
+        no strict 'refs';
+        *{"${caller}::decode_json"} = \&JSON::PP::decode_json;
+        *{"${caller}::from_json"}   = \&JSON::PP::decode_json;
+        *{"${caller}::to_json"}     = \&JSON::PP::encode_json;
+    }
+}
+{
+    package PVE::Storage;
+    use constant APIVER => 15;
+    use constant APIAGE => 6;
+    sub import { }
+}
+{
+    package PVE::Storage::Plugin;
+    sub import { }
+
+    sub parse_volname {
+        my ( $class, $volname ) = @_;
+        my ( $vmid, $name ) = $volname =~ m{^(\d+)/([\w.-]+?)(?:\.raw)?$}
+            or die "unable to parse volume name '$volname'\n";
+        return ( 'images', $name, $vmid );
+    }
+}
+{
+    package PVE::Storage::DirPlugin;
+    sub import { }
+}
+
+# The plugin lives at the repo root but declares a PVE::Storage::Custom::
+# package, so it is loaded by path rather than by module name.
+BEGIN { require "$FindBin::Bin/../OpenEJovianDSSNFSPlugin.pm"; }
+
+my $PLUGIN = 'PVE::Storage::Custom::OpenEJovianDSSNFSPlugin';
+
+my $N   = 'OpenEJovianDSS::NFSCommon';
+my $tmp = File::Temp->newdir();
+
+# Every publish, mount, umount and unpublish is recorded; a mount creates
+# the mount dir and counts as NFS until it is unmounted.
+my @CALLS;
+my %MOUNTED;
+our $FAIL_ACTIVATE = 0;
+{
+    no warnings qw(redefine once);
+    *OpenEJovianDSS::NFSCommon::_snapshot_mounts_dir = sub { "$tmp/registry" };
+    *OpenEJovianDSS::Common::debugmsg                = sub { };
+    *OpenEJovianDSS::Common::get_data_address        = sub { '192.0.2.10' };
+
+    *OpenEJovianDSS::NFSCommon::snapshot_publish = sub {
+        my ( $ctx, $datname, $volname, $snapname ) = @_;
+        push @CALLS, "publish $snapname";
+        return "/Pools/Pool-0/se_${snapname}";
+    };
+    *OpenEJovianDSS::NFSCommon::snapshot_unpublish = sub {
+        my ( $ctx, $datname, $volname, $snapname ) = @_;
+        push @CALLS, "unpublish $snapname";
+    };
+    *OpenEJovianDSS::NFSCommon::snapshot_activate = sub {
+        my ( $ctx, $pool, $datname, $vmid, $volname, $snapname, $sharepath ) = @_;
+        push @CALLS, "mount $snapname";
+        die "mount failed\n" if $main::FAIL_ACTIVATE;
+        my $path = mntpath( $vmid, $volname, $snapname );
+        make_path($path);
+        $MOUNTED{$path} = $sharepath;
+        return $path;
+    };
+    *OpenEJovianDSS::NFSCommon::snapshot_deactivate = sub {
+        my ( $ctx, $datname, $vmid, $volname, $snapname ) = @_;
+        push @CALLS, "umount $snapname";
+        my $path = mntpath( $vmid, $volname, $snapname );
+        delete $MOUNTED{$path};
+        rmdir($path);
+    };
+    *OpenEJovianDSS::NFSCommon::path_is_nfs = sub {
+        my ( $ctx, $path, $sharepath, $server ) = @_;
+        return defined( $MOUNTED{$path} ) && $MOUNTED{$path} eq $sharepath;
+    };
+    *OpenEJovianDSS::NFSCommon::path_is_mnt = sub { defined( $MOUNTED{ $_[1] } ) ? 1 : 0 };
+}
+
+sub mntpath {
+    my ( $vmid, $volname, $snapname ) = @_;
+    return "$tmp/mnt/"
+      . $N->can('nas_private_mounts_volname_snapname')->( $vmid, $volname, $snapname );
+}
+
+# ---------------------------------------------------------------------------
+# Test harness
+# ---------------------------------------------------------------------------
+
+my ( $tests, $failures ) = ( 0, 0 );
+
+sub ok {
+    my ( $cond, $desc ) = @_;
+    $tests++;
+    if ($cond) {
+        print "ok $tests - $desc\n";
+        return 1;
+    }
+    $failures++;
+    print "NOT OK $tests - $desc\n";
+    return 0;
+}
+
+my $VOL = 'vm-102-disk-0';
+
+sub reset_state {
+    my ($idle) = @_;
+    @CALLS   = ();
+    %MOUNTED = ( "$tmp/mnt" => '/Pools/Pool-0/ds' );
+    remove_tree( "$tmp/registry", "$tmp/mnt" );
+    return {
+        scfg    => { path   => "$tmp/mnt",
+                     export => '/Pools/Pool-0/ds',
+                     snapshot_mount_idle_timeout => $idle },
+        storeid => 'jdssnfs',
+    };
+}
+
+sub entry {
+    my ($snapname) = @_;
+    return $N->can('_snapshot_mount_entry_read')
+      ->("$tmp/registry/jdssnfs/102/$VOL/$snapname");
+}
+
+sub get { $N->can('snapshot_mount_get')->( $_[0], 'Pool-0', 'ds', 102, $VOL, $_[1] ) }
+sub put { $N->can('snapshot_mount_put')->( $_[0], 'ds', 102, $VOL, $_[1] ) }
+
+sub activate {
+    $PLUGIN->can('_activate_volume')->( $PLUGIN, $_[0], "102/$VOL.raw", $_[1] );
+}
+sub deactivate {
+    $PLUGIN->can('_deactivate_volume')->( $PLUGIN, $_[0], "102/$VOL.raw", $_[1] );
+}
+
+# ---------------------------------------------------------------------------
+# A second activation reuses the mounted clone.
+# ---------------------------------------------------------------------------
+{
+    my $ctx = reset_state(600);
+    my ( $path, $share ) = get( $ctx, 'daily' );
+    ok( $path eq mntpath( 102, $VOL, 'daily' ) && -d $path, 'get: clone mounted' );
+    ok( $share eq '/Pools/Pool-0/se_daily', 'get: share path returned' );
+    my ( $path2, $share2 ) = get( $ctx, 'daily' );
+    ok( $path2 eq $path && $share2 eq $share, 'reuse: same mount returned' );
+    ok( "@CALLS" eq 'publish daily mount daily', 'reuse: published once' );
+    ok( entry('daily')->{refs} == 2, 'reuse: two users counted' );
+}
+
+# ---------------------------------------------------------------------------
+# Without an idle timeout the last user tears the clone down.
+# ---------------------------------------------------------------------------
+{
+    my $ctx = reset_state(0);
+    get( $ctx, 'daily' );
+    get( $ctx, 'daily' );
+    put( $ctx, 'daily' );
+    ok( !grep( { /umount|unpublish/ } @CALLS ), 'put: kept while in use' );
+    put( $ctx, 'daily' );
+    ok( grep( { $_ eq 'umount daily' } @CALLS )
+          && grep( { $_ eq 'unpublish daily' } @CALLS ),
+        'put: last user unmounts and unpublishes' );
+    ok( !defined( entry('daily') ), 'put: registry entry removed' );
+}
+
+# ---------------------------------------------------------------------------
+# With an idle timeout the clone stays for the next activation.
+# ---------------------------------------------------------------------------
+{
+    my $ctx = reset_state(600);
+    get( $ctx, 'daily' );
+    put( $ctx, 'daily' );
+    ok( !grep( { /umount|unpublish/ } @CALLS ), 'idle: clone kept mounted' );
+    ok( entry('daily')->{refs} == 0, 'idle: no users left' );
+    ok( !$N->can('snapshot_mounts_idle')->($ctx), 'idle: not expired yet' );
+    @CALLS = ();
+    get( $ctx, 'daily' );
+    ok( !@CALLS, 'idle: next activation reuses it' );
+}
+
+# ---------------------------------------------------------------------------
+# Expired unused clones are listed and reaped; used ones are not.
+# ---------------------------------------------------------------------------
+{
+    my $ctx = reset_state(600);
+    get( $ctx, $_ ) for qw(daily weekly);
+    put( $ctx, $_ ) for qw(daily weekly);
+    get( $ctx, 'weekly' );
+    for my $snapname (qw(daily weekly)) {
+        my $e = entry($snapname);
+        $e->{last_used} -= 3600;
+        $N->can('_snapshot_mount_entry_write')
+          ->( "$tmp/registry/jdssnfs/102/$VOL/$snapname", $e );
+    }
+    my @idle = $N->can('snapshot_mounts_idle')->($ctx);
+    ok( @idle == 1 && "@{ $idle[0] }" eq "102 $VOL daily",
+        'reap: only the unused expired clone is idle' );
+    @CALLS = ();
+    ok( $N->can('snapshot_mount_reap')->( $ctx, 'ds', 102, $VOL, 'daily' ) == 1,
+        'reap: idle clone removed' );
+    ok( "@CALLS" eq 'umount daily unpublish daily', 'reap: unmounted and unpublished' );
+    ok( !defined( entry('daily') ), 'reap: registry entry removed' );
+    ok( $N->can('snapshot_mount_reap')->( $ctx, 'ds', 102, $VOL, 'weekly' ) == 0,
+        'reap: clone in use is left alone' );
+}
+
+# ---------------------------------------------------------------------------
+# A clone that went away behind the registry's back is published again.
+# ---------------------------------------------------------------------------
+{
+    my $ctx = reset_state(600);
+    get( $ctx, 'daily' );
+    put( $ctx, 'daily' );
+    %MOUNTED = ();
+    @CALLS   = ();
+    get( $ctx, 'daily' );
+    ok( "@CALLS" eq 'publish daily mount daily', 'stale: published and mounted again' );
+    ok( entry('daily')->{refs} == 1, 'stale: one user counted' );
+}
+
+# ---------------------------------------------------------------------------
+# A failed mount unpublishes the clone and leaves no registry entry.
+# ---------------------------------------------------------------------------
+{
+    my $ctx = reset_state(600);
+    local $FAIL_ACTIVATE = 1;
+    ok( !eval { get( $ctx, 'daily' ); 1 } && $@ =~ /mount failed/,
+        'failure: activation error reported' );
+    ok( $CALLS[-1] eq 'unpublish daily', 'failure: share unpublished' );
+    ok( !defined( entry('daily') ), 'failure: no registry entry' );
+}
+
+# ---------------------------------------------------------------------------
+# Activations reuse the clone uncounted; one deactivation removes it.
+# ---------------------------------------------------------------------------
+{
+    my $ctx = reset_state(600);
+    activate( $ctx, 'daily' );
+    activate( $ctx, 'daily' );
+    ok( "@CALLS" eq 'publish daily mount daily', 'activate: published once' );
+    ok( entry('daily')->{refs} == 0 && entry('daily')->{activated},
+        'activate: marked, not counted' );
+
+    get( $ctx, 'daily' );
+    put( $ctx, 'daily' );
+    ok( entry('daily')->{activated}, 'activate: rollback keeps the mark' );
+
+    my $e = entry('daily');
+    $e->{last_used} -= 3600;
+    $N->can('_snapshot_mount_entry_write')
+      ->( "$tmp/registry/jdssnfs/102/$VOL/daily", $e );
+    ok( !$N->can('snapshot_mounts_idle')->($ctx),
+        'activate: activated clone is never idle' );
+
+    @CALLS = ();
+    deactivate( $ctx, 'daily' );
+    ok( "@CALLS" eq 'umount daily unpublish daily',
+        'deactivate: one call unmounts and unpublishes' );
+    ok( !defined( entry('daily') ), 'deactivate: registry entry removed' );
+}
+
+{
+    my $ctx = reset_state(0);
+    activate( $ctx, 'daily' );
+    get( $ctx, 'daily' );
+    put( $ctx, 'daily' );
+    ok( !grep( { /umount|unpublish/ } @CALLS ),
+        'activate: rollback release leaves the activated clone' );
+}
+
+print "1..$tests\n";
+if ($failures) {
+    print "FAILED $failures/$tests\n";
+    exit 1;
+}
+print "PASSED $tests/$tests\n";
+exit 0;
@@ -0,0 +1,245 @@
+#!/usr/bin/perl
+# Unit tests for the node-wide SCSI rescan coordinator: scans requested by
+# activations running at the same time are spooled and written by one
+# leader, once per host, a host asked for several LUNs gets one full scan,
+# and the direct per-host write stays the fallback when the spool can not
+# be used.
+#
+# Self-contained: PVE modules, String::Util and JSON are stubbed; temp dirs
+# stand in for /run/joviandss/scsi-rescan and /sys/class/scsi_host, and
+# forked children for the concurrent activations.  From the repo root:
+#
+#     perl tests/scsi_rescan_coalesce_test.pl        (~2 s wall time)
+
+use strict;
+use warnings;
+
+use File::Path qw(make_path);
+use File::Temp ();
+use FindBin ();
+use lib "$FindBin::Bin/..";
+use POSIX ();
+use Time::HiRes ();
+
+BEGIN {
+    $INC{'String/Util.pm'} = __FILE__;
+    $INC{'PVE/INotify.pm'} = __FILE__;
+    $INC{'PVE/Tools.pm'}   = __FILE__;
+    $INC{'PVE/Cluster.pm'} = __FILE__;
+    $INC{'JSON.pm'}        = __FILE__;
+}
+{
+    # Imported but unused on the paths under test.
+    package String::Util;
+    sub import { }
+}
+{
+    package PVE::INotify;
+    sub import   { }
+    sub nodename { 'testnode' }
+}
+{
+    package PVE::Cluster;
+    sub import     { }
+    sub cfs_update { }
+}
+{
+    package PVE::Tools;
+    sub run_command       { die "unexpected run_command: @{ $_[0] }\n" }
+    sub file_set_contents { }
+    sub run_with_timeout  { my ( $t, $code, @a ) = @_; return $code->(@a) }
+
+    sub import {
+        my $caller = caller;
+        no strict 'refs';
+        *{"${caller}::run_command"}       = \&run_command;
+        *{"${caller}::file_set_contents"} = \&file_set_contents;
+    }
+}
+{
+    package JSON;
+    use JSON::PP ();
+
+    sub import {
+        my $caller = caller;
+        no strict 'refs';
+        *{"${caller}::decode_json"} = \&JSON::PP::decode_json;
+        *{"${caller}::from_json"}   = \&JSON::PP::decode_json;
+        *{"${caller}::to_json"}     = \&JSON::PP::encode_json;
+    }
+}
+
+use OpenEJovianDSS::Common;
+
+my $C   = 'OpenEJovianDSS::Common';
+my $tmp = File::Temp->newdir();
+
+our $SPOOL = "$tmp/scsi-rescan";
+my $HOSTS  = "$tmp/scsi_host";
+my $LOG    = "$tmp/scans.log";
+my $host_scan = $C->can('_scsi_host_scan');
+
+# Every scan and every broad rescan is appended to one log, so the writes
+# of forked leaders are counted too.
+sub record {
+    open( my $fh, '>>', $LOG ) or die "$LOG: $!\n";
+    print $fh "@_\n";
+    close $fh;
+}
+{
+    no warnings qw(redefine once);
+    *OpenEJovianDSS::Common::_scsi_rescan_dir = sub { $main::SPOOL };
+    *OpenEJovianDSS::Common::_scsi_host_dir   = sub { $HOSTS };
+    *OpenEJovianDSS::Common::_scsi_host_scan  = sub {
+        my ( $ctx, $host, $lun ) = @_;
+        my $ok = $host_scan->(@_);
+        record( $ok ? 'scan' : 'failed', $host, $lun );
+        return $ok;
+    };
+    *OpenEJovianDSS::Common::_scsi_bus_rescan_try = sub { record( 'broad', $_[1] ) };
+    *OpenEJovianDSS::Common::debugmsg = sub { };
+}
+
+# ---------------------------------------------------------------------------
+# Test harness
+# ---------------------------------------------------------------------------
+
+my ( $tests, $failures ) = ( 0, 0 );
+
+sub ok {
+    my ( $cond, $desc ) = @_;
+    $tests++;
+    if ($cond) {
+        print "ok $tests - $desc\n";
+        return 1;
+    }
+    $failures++;
+    print "NOT OK $tests - $desc\n";
+    return 0;
+}
+
+sub logged {
+    open( my $fh, '<', $LOG ) or return ();
+    chomp( my @lines = <$fh> );
+    close $fh;
+    unlink $LOG;
+    return @lines;
+}
+
+sub touch_file {
+    open( my $fh, '>', $_[0] ) or die "$_[0]: $!\n";
+    close $fh;
+}
+
+make_path( "$HOSTS/host3", "$HOSTS/host4" );
+
+my $request = $C->can('_scsi_rescan_request');
+
+# ---------------------------------------------------------------------------
+# The scan file gets the kernel's "channel target lun" request.
+# ---------------------------------------------------------------------------
+{
+    ok( $host_scan->( {}, 'host3', 5 ), 'scan: written' );
+    open( my $fh, '<', "$HOSTS/host3/scan" ) or die;
+    my $content = <$fh>;
+    ok( $content eq "- - 5\n", 'scan: one lun of every channel and target' );
+    ok( !$host_scan->( {}, 'host9', 5 ), 'scan: missing host fails' );
+}
+
+# ---------------------------------------------------------------------------
+# A lone request is written by its own process, once.
+# ---------------------------------------------------------------------------
+{
+    ok( $request->( {}, [ 'host3', 5 ] ), 'single: queued' );
+    my @log = logged();
+    ok( "@log" eq 'scan host3 5', 'single: leader wrote the scan' );
+    ok( -z "$SPOOL/pending", 'single: spool drained' );
+}
+
+# ---------------------------------------------------------------------------
+# Duplicates collapse, several LUNs of one host become one full scan.
+# ---------------------------------------------------------------------------
+{
+    $request->( {}, [ 'host3', 7 ], [ 'host3', 7 ], [ 'host4', 7 ] );
+    my @log = logged();
+    ok( join( ',', @log ) eq 'scan host3 7,scan host4 7', 'dedupe: one scan per host' );
+
+    $request->( {}, [ 'host3', 1 ], [ 'host3', 2 ], [ 'host3', 1 ] );
+    @log = logged();
+    ok( "@log" eq 'scan host3 -', 'dedupe: several luns, one wildcard scan' );
+}
+
+# ---------------------------------------------------------------------------
+# Concurrent activations: one leader writes for all of them, the others
+# return at once.
+# ---------------------------------------------------------------------------
+{
+    my $children = 6;
+    my $start    = Time::HiRes::time();
+    my @pids;
+    for my $lun ( 1 .. $children ) {
+        my $pid = fork() // die "fork failed\n";
+        if ( !$pid ) {
+            my $t0 = Time::HiRes::time();
+            my $ok = $request->( {}, [ 'host3', $lun ], [ 'host4', $lun ] );
+            record( 'took', sprintf( '%.3f', Time::HiRes::time() - $t0 ) );
+            POSIX::_exit( $ok ? 0 : 1 );
+        }
+        push @pids, $pid;
+    }
+    my $all_ok = 1;
+    for (@pids) {
+        waitpid( $_, 0 );
+        $all_ok = 0 if $?;
+    }
+    my @log   = logged();
+    my @scans = grep { /^scan / } @log;
+    my @took  = sort { $a <=> $b } map { /^took (\S+)/ ? $1 : () } @log;
+    ok( $all_ok, 'concurrent: every request queued' );
+    ok( @scans < 2 * $children,
+        'concurrent: fewer writes than requests (' . scalar(@scans) . ')' );
+    ok( ( grep { /^scan host3 / } @scans ) && ( grep { /^scan host4 / } @scans ),
+        'concurrent: both hosts scanned' );
+    ok( $took[0] < 0.1, 'concurrent: followers do not wait for the pass' );
+    ok( -z "$SPOOL/pending", 'concurrent: spool drained' );
+}
+
+# ---------------------------------------------------------------------------
+# A failed scan falls back to the broad rescan of its luns.
+# ---------------------------------------------------------------------------
+{
+    $request->( {}, [ 'host9', 4 ] );
+    my @log = logged();
+    ok( join( ',', @log ) eq 'failed host9 4,broad 4', 'failure: broad rescan' );
+}
+
+# ---------------------------------------------------------------------------
+# _rescan_target_hosts writes the target's hosts directly when the spool is
+# unusable.
+# ---------------------------------------------------------------------------
+{
+    no warnings qw(redefine once);
+    local *OpenEJovianDSS::Common::_iscsi_sessions = sub {
+        [ { target => 'iqn.t1', host => 'host3' },
+          { target => 'iqn.t2', host => 'host4' },
+          { target => 'iqn.t1', host => undef } ]
+    };
+    touch_file("$tmp/not-a-dir");
+    local $SPOOL = "$tmp/not-a-dir/spool";
+    ok( !$request->( {}, [ 'host3', 2 ] ), 'no spool: request refused' );
+    $C->can('_rescan_target_hosts')->( {}, 'iqn.t1', 2 );
+    my @log = logged();
+    ok( "@log" eq 'scan host3 2', 'no spool: target host scanned directly' );
+
+    $C->can('_rescan_target_hosts')->( {}, 'iqn.t3', 2 );
+    @log = logged();
+    ok( "@log" eq 'broad 2', 'no session: broad rescan' );
+}
+
+print "1..$tests\n";
+if ($failures) {
+    print "FAILED $failures/$tests\n";
+    exit 1;
+}
+print "PASSED $tests/$tests\n";
+exit 0;
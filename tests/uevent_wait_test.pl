@@ -0,0 +1,224 @@
+#!/usr/bin/perl
+# Unit tests for the device-arrival waiter that replaced the fixed sleeps in
+# volume_stage_iscsi and the multipath VPD wait: _uevent_wait wakes early
+# only for the subsystems asked for, _block_device_wait returns the moment
+# its path appears, and both keep the plain-sleep tick as the fallback when
+# no netlink monitor could be opened.
+#
+# Self-contained: PVE modules, String::Util and JSON are stubbed, and a
+# unix datagram socketpair stands in for the udev netlink socket (the waiter
+# only ever select()s and recv()s on it).  From the repo root:
+#
+#     perl tests/uevent_wait_test.pl        (~3 s wall time)
+
+use strict;
+use warnings;
+
+use File::Temp ();
+use FindBin ();
+use POSIX ();
+use lib "$FindBin::Bin/..";
+use Socket qw(AF_UNIX SOCK_DGRAM PF_UNSPEC);
+use Time::HiRes ();
+
+BEGIN {
+    $INC{'String/Util.pm'} = __FILE__;
+    $INC{'PVE/INotify.pm'} = __FILE__;
+    $INC{'PVE/Tools.pm'}   = __FILE__;
+    $INC{'PVE/Cluster.pm'} = __FILE__;
+    $INC{'JSON.pm'}        = __FILE__;
+}
+{
+    # Imported but unused on the paths under test.
+    package String::Util;
+    sub import { }
+}
+{
+    package PVE::INotify;
+    sub import   { }
+    sub nodename { 'testnode' }
+}
+{
+    package PVE::Cluster;
+    sub import     { }
+    sub cfs_update { }
+}
+{
+    package PVE::Tools;
+    sub run_command       { die "unexpected run_command in this suite\n" }
+    sub file_set_contents { }
+    sub run_with_timeout  { my ( $t, $code, @a ) = @_; return $code->(@a) }
+
+    sub import {
+        my $caller = caller;
+        no strict 'refs';
+        *{"${caller}::run_command"}       = \&run_command;
+        *{"${caller}::file_set_contents"} = \&file_set_contents;
+    }
+}
+{
+    package JSON;
+    use JSON::PP ();
+
+    sub import {
+        my $caller = caller;
+        no strict 'refs';
+        *{"${caller}::decode_json"} = \&JSON::PP::decode_json;
+        *{"${caller}::from_json"}   = \&JSON::PP::decode_json;
+        *{"${caller}::to_json"}     = \&JSON::PP::encode_json;
+    }
+}
+
+use OpenEJovianDSS::Common;
+
+my $C = 'OpenEJovianDSS::Common';
+
+# ---------------------------------------------------------------------------
+# Test harness
+# ---------------------------------------------------------------------------
+
+my ( $tests, $failures ) = ( 0, 0 );
+
+sub ok {
+    my ( $cond, $desc ) = @_;
+    $tests++;
+    if ($cond) {
+        print "ok $tests - $desc\n";
+        return 1;
+    }
+    $failures++;
+    print "NOT OK $tests - $desc\n";
+    return 0;
+}
+
+my $tmp = File::Temp->newdir();
+my $ctx = { scfg => { log_file => "$tmp/joviandss.log" }, storeid => 'jdss' };
+
+sub monitor_pair {
+    socketpair( my $monitor, my $kernel, AF_UNIX, SOCK_DGRAM, PF_UNSPEC )
+      or die "socketpair: $!\n";
+    return ( $monitor, $kernel );
+}
+
+# A udevd-style message: properties are NUL separated KEY=value pairs.
+sub uevent {
+    my (%props) = @_;
+    return join( "\0", 'libudev', map { "$_=$props{$_}" } sort keys %props )
+      . "\0";
+}
+
+sub timed {
+    my ($code) = @_;
+    my $start = Time::HiRes::time();
+    my $res   = $code->();
+    return ( $res, Time::HiRes::time() - $start );
+}
+
+# ---------------------------------------------------------------------------
+# No monitor: the wait is the plain tick it replaced.
+# ---------------------------------------------------------------------------
+{
+    my ( $res, $took ) = timed( sub {
+        $C->can('_uevent_wait')->( $ctx, undef, 0.3, 'block' );
+    } );
+    ok( $res == 0, 'no monitor: reports a timeout' );
+    ok( $took >= 0.29, 'no monitor: sleeps the whole tick' );
+}
+
+# ---------------------------------------------------------------------------
+# A queued event of a wanted subsystem wakes the wait immediately.
+# ---------------------------------------------------------------------------
+{
+    my ( $monitor, $kernel ) = monitor_pair();
+    send( $kernel, uevent( ACTION => 'add', SUBSYSTEM => 'block' ), 0 );
+    my ( $res, $took ) = timed( sub {
+        $C->can('_uevent_wait')->( $ctx, $monitor, 2, 'block' );
+    } );
+    ok( $res == 1, 'wanted subsystem: wakes' );
+    ok( $took < 0.5, 'wanted subsystem: does not wait out the tick' );
+}
+
+# ---------------------------------------------------------------------------
+# Events of other subsystems are drained but do not end the wait.
+# ---------------------------------------------------------------------------
+{
+    my ( $monitor, $kernel ) = monitor_pair();
+    send( $kernel, uevent( ACTION => 'add', SUBSYSTEM => 'net' ), 0 )
+      for 1 .. 3;
+    my ( $res, $took ) = timed( sub {
+        $C->can('_uevent_wait')->( $ctx, $monitor, 0.3, 'iscsi_session' );
+    } );
+    ok( $res == 0, 'foreign subsystem: no wake-up' );
+    ok( $took >= 0.29, 'foreign subsystem: waits out the tick' );
+}
+
+# ---------------------------------------------------------------------------
+# No subsystem filter: any event wakes.
+# ---------------------------------------------------------------------------
+{
+    my ( $monitor, $kernel ) = monitor_pair();
+    send( $kernel, uevent( ACTION => 'change', SUBSYSTEM => 'scsi' ), 0 );
+    ok( $C->can('_uevent_wait')->( $ctx, $monitor, 2 ) == 1,
+        'unfiltered: any event wakes' );
+}
+
+# ---------------------------------------------------------------------------
+# _block_device_wait returns as soon as the path appears after an event.
+# ---------------------------------------------------------------------------
+{
+    my ( $monitor, $kernel ) = monitor_pair();
+    my $path = "$tmp/scsi-arrival";
+
+    my $pid = fork() // die "fork: $!\n";
+    if ( $pid == 0 ) {
+        Time::HiRes::sleep(0.2);
+        open( my $fh, '>', $path ) or POSIX::_exit(1);
+        close $fh;
+        send( $kernel, uevent( ACTION => 'add', SUBSYSTEM => 'block' ), 0 );
+        POSIX::_exit(0);
+    }
+    my ( $res, $took ) = timed( sub {
+        $C->can('_block_device_wait')->( $ctx, $monitor, $path, 2 );
+    } );
+    waitpid( $pid, 0 );
+    ok( $res == 1, 'arrival: reports the path' );
+    ok( $took < 1, 'arrival: wakes on the event, not the tick' );
+}
+
+# ---------------------------------------------------------------------------
+# A block event for some other device does not end the wait early.
+# ---------------------------------------------------------------------------
+{
+    my ( $monitor, $kernel ) = monitor_pair();
+    send( $kernel, uevent( ACTION => 'add', SUBSYSTEM => 'block' ), 0 );
+    my ( $res, $took ) = timed( sub {
+        $C->can('_block_device_wait')->( $ctx, $monitor, "$tmp/absent", 0.3 );
+    } );
+    ok( $res == 0, 'other device: still absent' );
+    ok( $took >= 0.29, 'other device: keeps waiting for the whole tick' );
+}
+
+# ---------------------------------------------------------------------------
+# A path present at the start of the tick sleeps the tick: the caller waits
+# on something else and must not re-probe on every block event.
+# ---------------------------------------------------------------------------
+{
+    my ( $monitor, $kernel ) = monitor_pair();
+    my $path = "$tmp/scsi-present";
+    open( my $fh, '>', $path ) or die "$path: $!\n";
+    close $fh;
+    send( $kernel, uevent( ACTION => 'change', SUBSYSTEM => 'block' ), 0 );
+    my ( $res, $took ) = timed( sub {
+        $C->can('_block_device_wait')->( $ctx, $monitor, $path, 0.3 );
+    } );
+    ok( $res == 0, 'already present: no arrival reported' );
+    ok( $took >= 0.29, 'already present: sleeps the whole tick' );
+}
+
+print "1..$tests\n";
+if ($failures) {
+    print "FAILED $failures/$tests\n";
+    exit 1;
+}
+print "PASSED $tests/$tests\n";
+exit 0;
@@ -0,0 +1,256 @@
+#!/usr/bin/perl
+# Unit tests for the in-process busy check of multipath unstaging: the
+# openers of a mapper device are found from /proc/<pid>/fd and its kernel
+# holders from sysfs, without forking lsof or ps, and the wait between two
+# wait-unused ticks returns as soon as a block event shows the device
+# released, scanning at most once per interval under an event burst.
+#
+# Self-contained: PVE modules, String::Util and JSON are stubbed; temp dirs
+# stand in for /proc, /sys/class/block and /dev, with links to two block
+# devices of the test host as the device nodes, and a unix datagram
+# socketpair for the udev netlink socket.  From the repo root:
+#
+#     perl tests/unstage_busy_check_test.pl        (~3 s wall time)
+
+use strict;
+use warnings;
+
+use Cwd ();
+use File::Basename ();
+use File::Path qw(make_path);
+use File::Temp ();
+use FindBin ();
+use POSIX ();
+use lib "$FindBin::Bin/..";
+use Socket qw(AF_UNIX SOCK_DGRAM PF_UNSPEC);
+use Time::HiRes ();
+
+BEGIN {
+    $INC{'String/Util.pm'} = __FILE__;
+    $INC{'PVE/INotify.pm'} = __FILE__;
+    $INC{'PVE/Tools.pm'}   = __FILE__;
+    $INC{'PVE/Cluster.pm'} = __FILE__;
+    $INC{'JSON.pm'}        = __FILE__;
+}
+{
+    # Imported but unused on the paths under test.
+    package String::Util;
+    sub import { }
+}
+{
+    package PVE::INotify;
+    sub import   { }
+    sub nodename { 'testnode' }
+}
+{
+    package PVE::Cluster;
+    sub import     { }
+    sub cfs_update { }
+}
+{
+    package PVE::Tools;
+    sub run_command       { die "unexpected run_command: @{ $_[0] }\n" }
+    sub file_set_contents { }
+    sub run_with_timeout  { my ( $t, $code, @a ) = @_; return $code->(@a) }
+
+    sub import {
+        my $caller = caller;
+        no strict 'refs';
+        *{"${caller}::run_command"}       = \&run_command;
+        *{"${caller}::file_set_contents"} = \&file_set_contents;
+    }
+}
+{
+    package JSON;
+    use JSON::PP ();
+
+    sub import {
+        my $caller = caller;
+        no strict 'refs';
+        *{"${caller}::decode_json"} = \&JSON::PP::decode_json;
+        *{"${caller}::from_json"}   = \&JSON::PP::decode_json;
+        *{"${caller}::to_json"}     = \&JSON::PP::encode_json;
+    }
+}
+
+use OpenEJovianDSS::Common;
+
+my $C   = 'OpenEJovianDSS::Common';
+my $tmp = File::Temp->newdir();
+
+my $PROC   = "$tmp/proc";
+my $SYS    = "$tmp/sys";
+my $DM     = "$tmp/dev/dm-3";
+my $MAPPER = "$tmp/dev/mapper/mpatha";
+{
+    no warnings qw(redefine once);
+    *OpenEJovianDSS::Common::_proc_dir              = sub { $PROC };
+    *OpenEJovianDSS::Common::_sys_block_dir         = sub { $SYS };
+    *OpenEJovianDSS::Common::_multipath_mapper_path = sub { $MAPPER };
+    *OpenEJovianDSS::Common::debugmsg               = sub { };
+}
+
+# ---------------------------------------------------------------------------
+# Test harness
+# ---------------------------------------------------------------------------
+
+my ( $tests, $failures ) = ( 0, 0 );
+
+sub ok {
+    my ( $cond, $desc ) = @_;
+    $tests++;
+    if ($cond) {
+        print "ok $tests - $desc\n";
+        return 1;
+    }
+    $failures++;
+    print "NOT OK $tests - $desc\n";
+    return 0;
+}
+
+sub timed {
+    my ($code) = @_;
+    my $start = Time::HiRes::time();
+    my $res   = $code->();
+    return ( $res, Time::HiRes::time() - $start );
+}
+
+sub touch {
+    my ( $path, $content ) = @_;
+    open( my $fh, '>', $path ) or die "$path: $!\n";
+    print $fh $content // '';
+    close $fh;
+}
+
+# A process with the given name holding the given files open.
+sub process {
+    my ( $pid, $comm, @files ) = @_;
+    make_path("$PROC/$pid/fd");
+    touch( "$PROC/$pid/comm", "$comm\n" );
+    my $fd = 3;
+    symlink( $_, "$PROC/$pid/fd/" . $fd++ ) for @files;
+}
+
+# Two block devices of the test host with different numbers stand in for
+# the dm nodes.
+my %seen;
+my @BLOCKS = grep { -b && !$seen{ ( stat(_) )[6] }++ }
+    glob('/dev/vd? /dev/sd? /dev/nvme?n? /dev/zram? /dev/loop?');
+if ( @BLOCKS < 2 ) {
+    print "1..0 # skip: needs two block devices on this host\n";
+    exit 0;
+}
+
+# /dev/mapper/mpatha -> ../dm-3 as udev lays it out. The opener of dm-3
+# holds it through a node of its own mount namespace, at another path.
+make_path( "$tmp/dev/mapper", "$tmp/ns/dev" );
+symlink( $BLOCKS[0], $DM );
+symlink( $BLOCKS[1], "$tmp/dev/dm-4" );
+symlink( '../dm-3', $MAPPER );
+symlink( $BLOCKS[0], "$tmp/ns/dev/dm-3" );
+my $DMNAME = File::Basename::basename( Cwd::abs_path($MAPPER) );
+make_path( "$SYS/${DMNAME}/holders" );
+
+process( 100, 'qemu-kvm', '/dev/null', "$tmp/ns/dev/dm-3" );
+process( 200, 'sshd', '/dev/null', "$tmp/dev/dm-4", 'socket:[1234]' );
+make_path("$PROC/300");    # exited meanwhile: no fd dir left
+make_path("$PROC/self/fd");
+
+# ---------------------------------------------------------------------------
+# Openers come from the fd links, other processes and devices are ignored.
+# ---------------------------------------------------------------------------
+{
+    my $openers = $C->can('_block_device_openers')->( {}, $MAPPER );
+    ok( defined($openers) && "@$openers" eq '100',
+        'openers: the process holding dm-3, by device number' );
+    ok( $C->can('_process_name')->(100) eq 'qemu-kvm', 'openers: named from comm' );
+    ok( $C->can('_process_name')->(300) eq 'unknown', 'openers: exited process' );
+
+    my $free = $C->can('_block_device_openers')->( {}, "$tmp/dev/dm-4" );
+    ok( "@$free" eq '200', 'openers: per device' );
+
+    my $proc = $PROC;
+    $PROC = "$tmp/missing";
+    ok( !defined( $C->can('_block_device_openers')->( {}, $MAPPER ) ),
+        'openers: unreadable /proc is no answer' );
+    $PROC = $proc;
+}
+
+# ---------------------------------------------------------------------------
+# Kernel holders come from sysfs.
+# ---------------------------------------------------------------------------
+{
+    ok( !$C->can('_block_device_holders')->($MAPPER), 'holders: none' );
+    make_path("$SYS/${DMNAME}/holders/dm-7");
+    ok( join( ',', $C->can('_block_device_holders')->($MAPPER) ) eq 'dm-7',
+        'holders: stacked device listed' );
+    rmdir("$SYS/${DMNAME}/holders/dm-7");
+}
+
+# ---------------------------------------------------------------------------
+# The wait between ticks ends with the first event that finds the device
+# released, and sleeps on while it stays busy.
+# ---------------------------------------------------------------------------
+sub block_event {
+    socketpair( my $monitor, my $kernel, AF_UNIX, SOCK_DGRAM, PF_UNSPEC )
+      or die "socketpair: $!\n";
+    send( $kernel,
+        join( "\0", 'libudev', 'ACTION=change', 'SUBSYSTEM=block' ) . "\0", 0 );
+    return ( $monitor, $kernel );
+}
+
+my $wait = $C->can('_volume_unstage_multipath_wait_released');
+{
+    my ( $monitor, $kernel ) = block_event();
+    my ( $res, $took ) = timed( sub { $wait->( {}, $monitor, 'wwid', 1 ) } );
+    ok( $res == 0 && $took >= 0.95, 'wait: busy device waits out the tick' );
+}
+{
+    unlink("$PROC/100/fd/4");
+    my ( $monitor, $kernel ) = block_event();
+    my ( $res, $took ) = timed( sub { $wait->( {}, $monitor, 'wwid', 2 ) } );
+    ok( $res == 1 && $took < 0.5, 'wait: release wakes the wait' );
+}
+{
+    # A steady stream of unrelated block events: /proc is scanned once per
+    # scan interval, not once per event.
+    socketpair( my $monitor, my $kernel, AF_UNIX, SOCK_DGRAM, PF_UNSPEC )
+      or die "socketpair: $!\n";
+    my $pid = fork() // die "fork failed\n";
+    if ( !$pid ) {
+        for ( 1 .. 60 ) {
+            send( $kernel, join( "\0", 'libudev', 'ACTION=change',
+                                  'SUBSYSTEM=block' ) . "\0", 0 );
+            Time::HiRes::sleep(0.01);
+        }
+        POSIX::_exit(0);
+    }
+    symlink( $DM, "$PROC/100/fd/4" );
+    my $scans = 0;
+    my $openers = $C->can('_block_device_openers');
+    no warnings 'redefine';
+    local *OpenEJovianDSS::Common::_block_device_openers =
+        sub { $scans++; return $openers->(@_) };
+    my ($res) = timed( sub { $wait->( {}, $monitor, 'wwid', 0.6 ) } );
+    waitpid( $pid, 0 );
+    ok( $res == 0 && $scans >= 2 && $scans <= 6,
+        "wait: event burst scans once per interval ($scans scans)" );
+}
+{
+    my ( $res, $took ) = timed( sub { $wait->( {}, undef, 'wwid', 0.3 ) } );
+    ok( $res == 0 && $took >= 0.29, 'wait: without a monitor a plain sleep' );
+}
+{
+    make_path("$SYS/${DMNAME}/holders/dm-7");
+    my ( $monitor, $kernel ) = block_event();
+    my ( $res, $took ) = timed( sub { $wait->( {}, $monitor, 'wwid', 0.5 ) } );
+    ok( $res == 0, 'wait: a kernel holder keeps the device busy' );
+}
+
+print "1..$tests\n";
+if ($failures) {
+    print "FAILED $failures/$tests\n";
+    exit 1;
+}
+print "PASSED $tests/$tests\n";
+exit 0;